@@ -0,0 +1,156 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Upload checks that run before the request body is buffered.
+
+AdmissionMiddleware looks at the Content-Length header and at the first
+chunk(s) of a multipart upload only: an oversized body is refused without
+reading it, and the file part's magic bytes are sniffed and checked against
+what the parser can actually read. Accepted requests get the peeked bytes
+replayed, so the endpoint sees the untouched body.
+"""
+
+import json
+import os
+import re
+from typing import Dict, Optional, Set, Tuple
+
+# What parse_file can read: extension -> MIME types its bytes may sniff as
+CAPABILITIES: Dict[str, Set[str]] = {
+    ".pdf": {"application/pdf"},
+    ".jpg": {"image/jpeg"},
+    ".jpeg": {"image/jpeg"},
+    ".png": {"image/png"},
+}
+SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+]
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+# How much of the body to peek at for the file part's headers and magic bytes
+SNIFF_BYTES = 64 * 1024
+MAGIC_BYTES = 2048
+UPLOAD_PATHS = {"/api/plan/upload", "/api/plan/upload/stream", "/api/plan/jobs"}
+
+def supported_mime_types() -> Set[str]:
+    return set().union(*CAPABILITIES.values())
+
+class TooLarge(Exception):
+    """A body without Content-Length grew past the limit while it was being read"""
+
+def sniff(head: bytes) -> str:
+    """MIME type from the first bytes of a file (python-magic, or a signature table without it)"""
+    for signature, mime in SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    try:
+        import magic
+    except ImportError:
+        return "application/octet-stream"
+    try:
+        return magic.from_buffer(head[:MAGIC_BYTES], mime=True)
+    except Exception:
+        return "application/octet-stream"
+
+def check_file(filename: str, head: bytes) -> Optional[str]:
+    """Why the parser cannot take this file, or None when it can"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in CAPABILITIES:
+        return f"Unsupported file type {extension or '(none)'}; the parser reads {', '.join(sorted(CAPABILITIES))}"
+    mime = sniff(head)
+    if mime not in CAPABILITIES[extension]:
+        return f"File content is {mime}, not a {extension} file"
+    return None
+
+def _file_part(body: bytes, boundary: bytes) -> Tuple[Optional[str], Optional[bytes], bool]:
+    """(filename, first content bytes, complete) of the first file part found in a multipart prefix"""
+    delimiter = b"--" + boundary
+    for part in body.split(delimiter)[1:]:
+        header_end = part.find(b"\r\n\r\n")
+        if header_end < 0:
+            return None, None, False
+        headers = part[:header_end].decode("latin-1")
+        m = re.search(r'filename="([^"]*)"', headers)
+        if m:
+            return m.group(1), part[header_end + 4:header_end + 4 + MAGIC_BYTES], True
+    return None, None, False
+
+class AdmissionMiddleware:
+    """Reject oversized and unreadable uploads before the body is read"""
+
+    def __init__(self, app, paths: Set[str] = UPLOAD_PATHS, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+
+        length = headers.get("content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(send, 413, f"Upload is larger than {self.max_bytes} bytes")
+
+        # Peek until the file part's first bytes are in (or the peek budget is spent);
+        # a body that is not multipart is only size-checked
+        peeked = []
+        more = True
+        m = re.search(r'boundary="?([^";]+)"?', headers.get("content-type", ""))
+        if m:
+            boundary = m.group(1).encode("latin-1")
+            size = 0
+            filename, head, found = None, None, False
+            while more and size < SNIFF_BYTES:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return
+                peeked.append(message.get("body", b""))
+                size += len(peeked[-1])
+                more = message.get("more_body", False)
+                filename, head, found = _file_part(b"".join(peeked), boundary)
+                if found and (len(head) >= MAGIC_BYTES or not more):
+                    break
+            if found:
+                problem = check_file(filename, head)
+                if problem:
+                    return await self._reject(send, 415, problem)
+
+        body = b"".join(peeked)
+        received = len(body)
+        replayed = False
+        started = False
+
+        async def replay():
+            nonlocal replayed, received
+            if not replayed and peeked:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more}
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.max_bytes:
+                # Chunked bodies have no Content-Length to check up front
+                raise TooLarge()
+            return message
+
+        async def watch(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, replay, watch)
+        except TooLarge:
+            if not started:
+                await self._reject(send, 413, f"Upload is larger than {self.max_bytes} bytes")
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
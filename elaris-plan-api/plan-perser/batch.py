@@ -0,0 +1,152 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Batch re-processing of archived plans: `python parser.py --batch ...`.
+
+Inputs are files, directories (searched recursively), glob patterns and/or a
+manifest listing one path per line. Files are analysed concurrently and one
+NDJSON line is written per file as soon as it finishes. The SHA-256 of every
+successfully analysed file is appended to a checkpoint, so a rerun after an
+interruption skips them (and duplicate files are only analysed once).
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Set
+
+from admission import CAPABILITIES
+
+DEFAULT_WORKERS = 4
+
+def collect(inputs: List[str], manifest: Optional[str] = None) -> List[str]:
+    """Readable plan files named by the inputs and manifest, in order, without repeats"""
+    names = list(inputs)
+    if manifest:
+        with open(manifest) as f:
+            names += [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    files = []
+    for name in names:
+        if os.path.isdir(name):
+            for root, _, entries in os.walk(name):
+                files += [os.path.join(root, entry) for entry in sorted(entries)]
+        elif glob.has_magic(name):
+            files += sorted(glob.glob(name, recursive=True))
+        else:
+            files.append(name)
+    seen = set()
+    found = []
+    for path in files:
+        if os.path.splitext(path)[1].lower() in CAPABILITIES and path not in seen:
+            seen.add(path)
+            found.append(path)
+    return found
+
+def load_checkpoint(path: str) -> Set[str]:
+    try:
+        with open(path) as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+def _analyse(file_path: str, user: Optional[str] = None, project: Optional[str] = None) -> Dict[str, Any]:
+    import parser as plan_parser
+
+    started = time.perf_counter()
+    record: Dict[str, Any] = {"file": file_path}
+    try:
+        record["hash"] = plan_parser.file_digest(file_path)
+        record["result"] = plan_parser.parse_file(file_path, user=user, project=project)
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+def _quantile(ordered: List[float], q: float) -> Optional[float]:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+def run_batch(
+    files: List[str],
+    out,
+    checkpoint: str,
+    workers: int = DEFAULT_WORKERS,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Analyse files concurrently, writing NDJSON records to out; returns the run summary.
+
+    Model requests are billed to user/project, so a token budget can stop a runaway batch.
+    """
+    import parser as plan_parser
+
+    done = load_checkpoint(checkpoint)
+    pending = []
+    skipped = 0
+    for path in files:
+        digest = plan_parser.file_digest(path)
+        if digest in done:
+            skipped += 1
+        else:
+            # A duplicate later in the list is skipped too
+            done.add(digest)
+            pending.append(path)
+    print(f"📦 {len(files)} files, {skipped} already done, {len(pending)} to analyse with {workers} workers", file=sys.stderr)
+
+    started = time.perf_counter()
+    latencies = []
+    failed = 0
+    with open(checkpoint, "a") as marks, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_analyse, path, user, project) for path in pending]
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            latencies.append(record["seconds"])
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+            out.flush()
+            if "error" in record:
+                # Not checkpointed, so the next run tries it again
+                failed += 1
+                print(f"❌ [{n}/{len(pending)}] {record['file']}: {record['error']}", file=sys.stderr)
+            else:
+                marks.write(record["hash"] + "\n")
+                marks.flush()
+                print(f"✅ [{n}/{len(pending)}] {record['file']} in {record['seconds']:.1f}s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "files": len(files),
+        "skipped": skipped,
+        "analysed": len(pending) - failed,
+        "failed": failed,
+        "seconds": round(elapsed, 1),
+        "filesPerMinute": round(len(pending) * 60 / elapsed, 2) if elapsed > 0 and pending else 0.0,
+        "latency": {"p50": _quantile(latencies, 0.5), "p95": _quantile(latencies, 0.95), "max": latencies[-1] if latencies else None},
+    }
+
+def main(argv: List[str]) -> int:
+    arguments = argparse.ArgumentParser(prog="parser.py --batch", description="Analyse many plans, one NDJSON line each")
+    arguments.add_argument("inputs", nargs="*", help="files, directories or glob patterns")
+    arguments.add_argument("--manifest", help="text file with one path (or pattern) per line")
+    arguments.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    arguments.add_argument("--out", help="NDJSON output file, appended to (default: stdout)")
+    arguments.add_argument("--checkpoint", help="completed hashes (default: <out>.checkpoint or batch.checkpoint)")
+    arguments.add_argument("--user", help="bill model requests to this user (and their token budget)")
+    arguments.add_argument("--project", help="bill model requests to this project")
+    options = arguments.parse_args(argv)
+
+    files = collect(options.inputs, options.manifest)
+    if not files:
+        arguments.error("no readable plan files in the inputs")
+    checkpoint = options.checkpoint or (f"{options.out}.checkpoint" if options.out else "batch.checkpoint")
+    out = open(options.out, "a") if options.out else sys.stdout
+    try:
+        summary = run_batch(files, out, checkpoint, max(1, options.workers), options.user, options.project)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"📊 {json.dumps(summary)}", file=sys.stderr)
+    return 1 if summary["failed"] else 0
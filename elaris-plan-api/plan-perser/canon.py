@@ -0,0 +1,238 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Snap free-text enum values in a model document to the calculator vocabularies.
+
+Each enum field (derived from the compact SPEC, so new fields are picked up
+automatically) is matched in three steps: an exact match on the normalised
+value or a synonym, an exact match on any word run inside it ("uPVC pipe"
+-> "upvc"), then a character trigram index scored by Dice similarity.
+Values that match nothing well enough, or two values only through a word
+both share ("roof tiles"), are left as the model wrote them.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import compact
+import vocab
+
+FUZZY_THRESHOLD = 0.6
+# A fuzzy match this close to a second value is dropped when the words it matched are in both
+FUZZY_MARGIN = 0.15
+
+# Plain-language names seen on drawings -> vocabulary value, per vocab list
+SYNONYMS = {
+    "BLOCK_TYPES": {"standard": "Standard Block", "large": "Large Block", "small": "Small Block"},
+    "PLASTER_OPTIONS": {"both": "Both Sides", "one": "One Side", "no plaster": "None", "unplastered": "None"},
+    "DOOR_TYPES": {
+        "flush": "Solid flush", "hollow core": "Semi-solid flush", "tongue and groove": "T&G",
+        "metal": "Steel", "aluminum": "Aluminium", "panelled": "Panel",
+    },
+    "FRAME_TYPES": {"timber": "Wood", "wooden": "Wood", "aluminium": "Aluminum", "metal": "Steel"},
+    "WINDOW_GLASS_TYPES": {"obscure": "Frosted", "opaque": "Frosted", "plain": "Clear", "reflective": "Tinted"},
+    "PLUMBING_SYSTEM_TYPES": {
+        "cold water": "water-supply", "water": "water-supply", "supply": "water-supply", "soil": "sewage",
+        "foul": "sewage", "waste": "drainage", "storm": "rainwater", "storm water": "rainwater",
+        "hot": "hot-water", "fire": "fire-fighting", "gas": "gas-piping",
+    },
+    "PIPE_MATERIALS": {
+        "upvc": "PVC-u", "pvc": "PVC-u", "u pvc": "PVC-u", "cpvc": "PVC-c", "galvanised": "galvanized-steel",
+        "gi": "galvanized-steel", "gs": "galvanized-steel", "pe": "HDPE", "polyethylene": "HDPE",
+        "pp r": "PPR", "polypropylene": "PPR", "ci": "cast-iron", "clay": "vitrified-clay", "vc": "vitrified-clay",
+        "pex al pex": "PEX",
+    },
+    "FIXTURE_TYPES": {
+        "toilet": "water-closet", "wc": "water-closet", "closet": "water-closet", "basin": "lavatory",
+        "wash basin": "lavatory", "hand basin": "lavatory", "whb": "lavatory", "sink": "kitchen-sink",
+        "bath": "bathtub", "tub": "bathtub", "shower tray": "shower", "gully": "floor-drain",
+        "floor trap": "floor-drain", "rodding eye": "cleanout", "tap": "hose-bib", "garden tap": "hose-bib",
+    },
+    "ELECTRICAL_SYSTEM_TYPES": {
+        "lights": "lighting", "sockets": "power", "small power": "power", "network": "data",
+        "alarm": "security", "cameras": "cctv", "fire detection": "fire-alarm", "solar": "renewable-energy",
+        "emergency": "emergency-lighting",
+    },
+    "CABLE_TYPES": {
+        "cat6": "Data-CAT6", "cat 6": "Data-CAT6", "utp": "Data-CAT6", "cat5e": "Ethernet",
+        "fibre": "Fiber-Optic", "fiber": "Fiber-Optic", "coax": "Coaxial", "twin and earth": "PVC/PVC",
+        "t e": "PVC/PVC", "armoured": "SWA", "mineral insulated": "MICC",
+    },
+    "OUTLET_TYPES": {
+        "socket": "power-socket", "socket outlet": "power-socket", "power outlet": "power-socket",
+        "switch": "light-switch", "dimmer": "dimmer-switch", "data": "data-port", "network": "data-port",
+        "rj45": "data-port", "tv": "tv-point", "aerial": "tv-point", "phone": "telephone", "usb": "usb-charger",
+    },
+    "LIGHTING_TYPES": {
+        "led": "led-downlight", "downlight": "led-downlight", "led light": "led-downlight",
+        "tube": "fluorescent", "emergency": "emergency-light", "flood": "floodlight",
+        "pendant": "decorative", "chandelier": "decorative", "bulkhead": "decorative",
+    },
+    "ROOF_TYPES": {
+        "hipped": "hip", "mono pitch": "skillion", "lean to": "skillion", "shed": "skillion",
+        "duo pitch": "gable", "gabled": "gable",
+    },
+    "ROOF_MATERIALS": {
+        "iron sheets": "metal-sheets", "mabati": "metal-sheets", "corrugated": "metal-sheets",
+        "it4": "box-profile", "concrete roof tiles": "concrete-tiles", "clay roof tiles": "clay-tiles", "shingles": "asphalt-shingles",
+        "makuti": "thatch", "bitumen": "membrane", "torch on": "membrane",
+    },
+    "TIMBER_TYPES": {
+        "rafters": "rafter", "wallplate": "wall-plate", "ridge": "ridge-board", "purlins": "purlin",
+        "batten": "battens", "trusses": "truss", "joists": "joist", "ceiling joist": "joist",
+    },
+    "UNDERLAYMENT_TYPES": {"felt": "felt-30", "sarking": "breathable", "membrane": "breathable"},
+    "INSULATION_TYPES": {
+        "fibreglass": "glass-wool", "mineral wool": "rock-wool", "polystyrene": "eps", "pu": "polyurethane",
+        "foil": "reflective-foil",
+    },
+    "GUTTER_TYPES": {"upvc": "PVC", "galvanised": "Galvanized Steel", "gi": "Galvanized Steel", "aluminium": "Aluminum"},
+    "DOWNPIPE_TYPES": {"upvc": "PVC", "galvanised": "Galvanized Steel", "gi": "Galvanized Steel", "aluminium": "Aluminum"},
+    "FLASHING_TYPES": {"upvc": "PVC", "galvanised": "Galvanized Steel", "gi": "Galvanized Steel", "aluminium": "Aluminum"},
+    "FASCIA_TYPES": {"timber": "Painted Wood", "wood": "Painted Wood", "upvc": "PVC", "aluminium": "Aluminum"},
+    "SOFFIT_TYPES": {"upvc": "PVC", "aluminium": "Aluminum", "steel": "Metal"},
+    "CONCRETE_ELEMENTS": {
+        "footing": "strip-footing", "strip foundation": "strip-footing", "raft": "raft-foundation",
+        "stairs": "staircase", "septic": "septic-tank", "ring beam": "ring-beam", "lintel": "beam",
+        "pad": "pile-cap", "floor slab": "slab",
+    },
+    "REINFORCEMENT_ELEMENTS": {"raft": "raft-foundation", "footing": "strip-footing", "strip foundation": "strip-footing"},
+    "REINFORCEMENT_TYPES": {"bars": "individual_bars", "rebar": "individual_bars", "brc": "mesh", "fabric": "mesh"},
+    "STRUCTURE_CATEGORIES": {"foundation": "substructure", "below ground": "substructure", "above ground": "superstructure"},
+}
+
+# Enum fields the SPEC does not mark but the calculators switch on
+EXTRA_FIELDS = [("reinforcement.meshGrade", "MESH_GRADES")]
+# Opening hooks move the compact "frame" value under frame.type
+RENAMED = {".doors.frame": ".doors.frame.type", ".windows.frame": ".windows.frame.type"}
+
+def _key(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def _grams(key: str) -> Counter:
+    padded = f"  {key} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def _rebar_size(key: str) -> Optional[str]:
+    """Y12, T12, H12, 12mm, dia 12 -> D12; R6 stays R6"""
+    m = re.fullmatch(r"(r|y|t|h|d|n|dia|o)?\s*(\d+)(?:\s*mm)?", key)
+    if not m:
+        return None
+    size = ("R" if m.group(1) == "r" else "D") + m.group(2)
+    return size if size in vocab.REBAR_SIZES else None
+
+NORMALISERS = {"REBAR_SIZES": _rebar_size}
+
+class EnumIndex:
+    """Exact, word-run and trigram lookup for one vocabulary list"""
+
+    def __init__(self, values: List[str], synonyms: Optional[Dict[str, str]] = None):
+        self.exact: Dict[str, str] = {}
+        for value in values:
+            self.exact[_key(value)] = value
+        for alias, value in (synonyms or {}).items():
+            self.exact.setdefault(_key(alias), value)
+        self.entries = list(self.exact.items())
+        self.sizes = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for i, (key, _) in enumerate(self.entries):
+            grams = _grams(key)
+            self.sizes.append(sum(grams.values()))
+            for gram, n in grams.items():
+                self.postings.setdefault(gram, []).append((i, n))
+
+    def match(self, text: str) -> Optional[str]:
+        key = _key(text)
+        if not key:
+            return None
+        if key in self.exact:
+            return self.exact[key]
+        words = key.split()
+        # Longest run first; among equal runs the rightmost, where English puts the head noun ("LED floodlight")
+        for size in range(len(words) - 1, 0, -1):
+            for start in range(len(words) - size, -1, -1):
+                run = " ".join(words[start:start + size])
+                if run in self.exact:
+                    return self.exact[run]
+        grams = _grams(key)
+        shared = Counter()
+        for gram, n in grams.items():
+            for i, m in self.postings.get(gram, ()):
+                shared[i] += min(n, m)
+        if not shared:
+            return None
+        total = sum(grams.values())
+        scores: Dict[str, float] = {}
+        for i, common in shared.items():
+            value = self.entries[i][1]
+            scores[value] = max(scores.get(value, 0.0), 2 * common / (total + self.sizes[i]))
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        value, score = ranked[0]
+        if score < FUZZY_THRESHOLD:
+            return None
+        if len(ranked) > 1 and score - ranked[1][1] < FUZZY_MARGIN:
+            # Close to two values only through a word they share ("roof tiles": clay or concrete?)
+            shared_words = set(key.split()) & set(_key(value).split())
+            if shared_words and shared_words <= set(_key(ranked[1][0]).split()):
+                return None
+        return value
+
+def _enum_fields(spec: Dict[str, Any], prefix: str, names: Dict[int, str], out: List[Tuple[str, str]]) -> None:
+    items = spec["rows"] if "rows" in spec else spec["object"].values()
+    for name, kind in items:
+        path = f"{prefix}.{name}" if prefix else name
+        if isinstance(kind, list) and id(kind) in names and all(isinstance(v, str) for v in kind):
+            for old, new in RENAMED.items():
+                if path.endswith(old):
+                    path = path[: -len(old)] + new
+            out.append((path, names[id(kind)]))
+        elif isinstance(kind, dict):
+            _enum_fields(kind, path, names, out)
+
+def _build() -> Tuple[Dict[str, EnumIndex], List[Tuple[List[str], str]]]:
+    names = {id(value): name for name, value in vars(vocab).items() if isinstance(value, list) and name.isupper()}
+    fields: List[Tuple[str, str]] = []
+    _enum_fields(compact.SPEC, "", names, fields)
+    fields += EXTRA_FIELDS
+    indexes = {name: EnumIndex(getattr(vocab, name), SYNONYMS.get(name)) for _, name in fields}
+    for category, materials in vocab.COMMON_MATERIALS.items():
+        indexes[f"COMMON_MATERIALS.{category}"] = EnumIndex(materials)
+    return indexes, [(path.split("."), name) for path, name in fields]
+
+INDEXES, FIELDS = _build()
+
+def canonical(value: Any, enum: str) -> Any:
+    """The vocabulary value for a free-text value, or the value unchanged"""
+    if not isinstance(value, str):
+        return value
+    index = INDEXES.get(enum)
+    if index is None or value in getattr(vocab, enum, ()):
+        return value
+    normaliser = NORMALISERS.get(enum)
+    match = (normaliser(_key(value)) if normaliser else None) or index.match(value)
+    return match or value
+
+def _apply(node: Any, parts: List[str], enum: str) -> int:
+    if isinstance(node, list):
+        return sum(_apply(item, parts, enum) for item in node)
+    if not isinstance(node, dict):
+        return 0
+    if len(parts) > 1:
+        return _apply(node.get(parts[0]), parts[1:], enum)
+    value = node.get(parts[0])
+    fixed = canonical(value, enum)
+    if fixed != value:
+        node[parts[0]] = fixed
+        return 1
+    return 0
+
+def canonicalise(doc: Any) -> int:
+    """Rewrite enum fields of a full-schema document in place; returns the number changed"""
+    if not isinstance(doc, dict):
+        return 0
+    changed = sum(_apply(doc, parts, enum) for parts, enum in FIELDS)
+    for finish in doc.get("finishes") or []:
+        if isinstance(finish, dict):
+            changed += _apply(finish, ["material"], f"COMMON_MATERIALS.{finish.get('category')}")
+    return changed
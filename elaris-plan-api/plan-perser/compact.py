@@ -0,0 +1,485 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Compact model output format.
+
+Output tokens dominate Gemini latency, so instead of the full schema the model
+is asked for short keys, 0/1 booleans and positional rows for repeated records
+(doors, fixtures, outlets...). Enum fields are plain words, which canon.py maps
+onto the vocabulary, so the prompt carries no value tables (an enum ordinal is
+still expanded). decode() expands that back into exactly the document the
+frontend calculators read; full-schema documents pass through untouched, so a
+model that ignores the instructions still works.
+
+The SPEC below drives both the decoder and describe(), which renders the
+output-format section of the prompt, so the two cannot drift apart.
+"""
+
+import copy
+from typing import Dict, Any, Iterable, List, Optional
+
+import vocab
+
+BOOL = "bool"  # 0/1 in the compact form
+STR = "str"    # numbers are stringified ("2.1"), matching the full schema
+
+def rows(fields, id_prefix=None, defaults=None, hook=None):
+    """Array of positional rows; each field is (full_key, kind), dotted keys nest"""
+    return {"rows": fields, "id": id_prefix, "defaults": defaults or {}, "hook": hook}
+
+def obj(keys, id_prefix=None, defaults=None, hook=None):
+    """Object (or array of objects) with short keys: {short: (full_key, kind)}"""
+    return {"object": keys, "id": id_prefix, "defaults": defaults or {}, "hook": hook}
+
+def _fmt(value: Any) -> Any:
+    """Render a number the way the full schema writes it ("2.1", "150")"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    return f"{float(value):g}"
+
+def _size_label(width: Any, height: Any, standard: List[str]) -> Optional[str]:
+    """Match a width x height pair against the frontend's standard size labels"""
+    try:
+        w, h = float(width), float(height)
+    except (TypeError, ValueError):
+        return None
+    for label in standard:
+        sw, sh = (float(p) for p in label.replace(" m", "").split(" × "))
+        if abs(sw - w) < 1e-6 and abs(sh - h) < 1e-6:
+            return label
+    return None
+
+def _opening(standard: List[str], kind_key: str):
+    """Hook expanding a door/window row into the full nested opening object"""
+    def hook(row: Dict[str, Any], index: int, ids: Dict[str, int]) -> Dict[str, Any]:
+        width, height = _fmt(row.get("width")), _fmt(row.get("height"))
+        label = _size_label(width, height, standard)
+        size_type = "standard" if label else "custom"
+        custom = {"height": height, "width": width, "price": ""}
+        return {
+            "sizeType": size_type,
+            "standardSize": label or "",
+            "custom": dict(custom),
+            kind_key: row.get(kind_key),
+            "frame": {
+                "type": row.get("frame"),
+                "sizeType": size_type,
+                "standardSize": label or "",
+                "height": height,
+                "width": width,
+                "custom": dict(custom),
+            },
+            "count": row.get("count", 1),
+            "price": 0,
+        }
+    return hook
+
+def opening(key: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """A full door ("doors") or window ("windows") object from {width, height, type or glass, frame, count}"""
+    return (DOOR if key == "doors" else WINDOW)["hook"](row, 0, {})
+
+def _foundation_wall_id(row, index, ids):
+    row["id"] = f"fwall-{row.get('type', 'wall')}-{index + 1:02d}"
+    return row
+
+def _standard_equipment(row, index, ids):
+    name = row.get("name")
+    out = {"id": vocab.STANDARD_EQUIPMENT_IDS.get(name) or _next_id(ids, "equip")}
+    out.update(row)
+    return out
+
+def _custom_equipment(row, index, ids):
+    out = {"equipment_type_id": _next_id(ids, "custom")}
+    out.update(row)
+    return out
+
+DOOR = rows([("width", None), ("height", None), ("count", None), ("type", vocab.DOOR_TYPES), ("frame", vocab.FRAME_TYPES)],
+            hook=_opening(vocab.STANDARD_DOOR_SIZES, "type"))
+WINDOW = rows([("width", None), ("height", None), ("count", None), ("glass", vocab.WINDOW_GLASS_TYPES), ("frame", vocab.FRAME_TYPES)],
+              hook=_opening(vocab.STANDARD_WINDOW_SIZES, "glass"))
+
+REINFORCEMENT_BASE_FIELDS = [
+    "element", "name", "length", "width", "depth", "columnHeight", "mainBarSpacing",
+    "distributionBarSpacing", "mainBarsCount", "distributionBarsCount", "slabLayers",
+    "mainBarSize", "distributionBarSize", "stirrupSize", "tieSize", "stirrupSpacing",
+    "tieSpacing", "category", "number", "reinforcementType", "meshGrade", "meshSheetWidth",
+    "meshSheetLength", "meshLapLength", "footingType", "longitudinalBars", "transverseBars",
+    "topReinforcement", "bottomReinforcement",
+]
+
+REINFORCEMENT = obj({
+    "e": ("element", vocab.REINFORCEMENT_ELEMENTS),
+    "n": ("name", None),
+    "l": ("length", STR),
+    "w": ("width", STR),
+    "d": ("depth", STR),
+    "ch": ("columnHeight", STR),
+    "ms": ("mainBarSpacing", STR),
+    "ds": ("distributionBarSpacing", STR),
+    "mc": ("mainBarsCount", STR),
+    "dc": ("distributionBarsCount", STR),
+    "sl": ("slabLayers", STR),
+    "mb": ("mainBarSize", vocab.REBAR_SIZES),
+    "db": ("distributionBarSize", vocab.REBAR_SIZES),
+    "ss": ("stirrupSize", vocab.REBAR_SIZES),
+    "ts": ("tieSize", vocab.REBAR_SIZES),
+    "sp": ("stirrupSpacing", STR),
+    "tp": ("tieSpacing", STR),
+    "c": ("category", vocab.STRUCTURE_CATEGORIES),
+    "no": ("number", STR),
+    "rt": ("reinforcementType", vocab.REINFORCEMENT_TYPES),
+    "mg": ("meshGrade", None),
+    "mw": ("meshSheetWidth", STR),
+    "ml": ("meshSheetLength", STR),
+    "lap": ("meshLapLength", STR),
+    "ft": ("footingType", vocab.FOOTING_TYPES),
+    "lb": ("longitudinalBars", None),
+    "tb": ("transverseBars", None),
+    "top": ("topReinforcement", None),
+    "bot": ("bottomReinforcement", None),
+    "rw": ("retainingWallType", vocab.RETAINING_WALL_TYPES),
+    "hl": ("heelLength", STR),
+    "tl": ("toeLength", STR),
+    "svb": ("stemVerticalBarSize", vocab.REBAR_SIZES),
+    "shb": ("stemHorizontalBarSize", vocab.REBAR_SIZES),
+    "svs": ("stemVerticalSpacing", STR),
+    "shs": ("stemHorizontalSpacing", STR),
+    "tt": ("tankType", vocab.TANK_TYPES),
+    "tsh": ("tankShape", None),
+    "wt": ("wallThickness", STR),
+    "bt": ("baseThickness", STR),
+    "ct": ("coverThickness", STR),
+    "ic": ("includeCover", BOOL),
+    "wvb": ("wallVerticalBarSize", vocab.REBAR_SIZES),
+    "whb": ("wallHorizontalBarSize", vocab.REBAR_SIZES),
+    "wvs": ("wallVerticalSpacing", STR),
+    "whs": ("wallHorizontalSpacing", STR),
+    "bmb": ("baseMainBarSize", vocab.REBAR_SIZES),
+    "bdb": ("baseDistributionBarSize", vocab.REBAR_SIZES),
+    "bms": ("baseMainSpacing", STR),
+    "bds": ("baseDistributionSpacing", STR),
+    "cmb": ("coverMainBarSize", vocab.REBAR_SIZES),
+    "cdb": ("coverDistributionBarSize", vocab.REBAR_SIZES),
+    "cms": ("coverMainSpacing", STR),
+    "cds": ("coverDistributionSpacing", STR),
+}, id_prefix="rebar", defaults={field: "" for field in REINFORCEMENT_BASE_FIELDS})
+
+CONCRETE = obj({
+    "n": ("name", None),
+    "e": ("element", vocab.CONCRETE_ELEMENTS),
+    "l": ("length", STR),
+    "w": ("width", STR),
+    "h": ("height", STR),
+    "mix": ("mix", None),
+    "fw": ("formwork", STR),
+    "c": ("category", vocab.STRUCTURE_CATEGORIES),
+    "no": ("number", STR),
+    "cb": ("hasConcreteBed", BOOL),
+    "va": ("verandahArea", None),
+    "sa": ("slabArea", None),
+    "bd": ("bedDepth", STR),
+    "ab": ("hasAggregateBed", BOOL),
+    "ad": ("aggregateDepth", STR),
+    "mw": ("hasMasonryWall", BOOL),
+    "mbt": ("masonryBlockType", None),
+    "mbd": ("masonryBlockDimensions", None),
+    "mwt": ("masonryWallThickness", STR),
+    "mwh": ("masonryWallHeight", STR),
+    "mwp": ("masonryWallPerimeter", None),
+    "ft": ("foundationType", None),
+    "cpw": ("clientProvidesWater", BOOL),
+    "cwr": ("cementWaterRatio", STR),
+    "sf": ("isSteppedFoundation", BOOL),
+    "steps": ("foundationSteps", rows([("length", STR), ("width", STR), ("depth", STR), ("offset", STR)], id_prefix="step")),
+    "tfd": ("totalFoundationDepth", STR),
+    "wp": ("waterproofing", None),
+    "r": ("reinforcement", obj({
+        "mb": ("mainBarSize", vocab.REBAR_SIZES),
+        "ms": ("mainBarSpacing", STR),
+        "db": ("distributionBarSize", vocab.REBAR_SIZES),
+        "ds": ("distributionBarSpacing", STR),
+        "cd": ("connectionDetails", None),
+    })),
+    "stair": ("staircaseDetails", None),
+    "tank": ("tankDetails", None),
+    "septic": ("septicTankDetails", None),
+    "ug": ("undergroundTankDetails", None),
+    "soak": ("soakPitDetails", None),
+    "sw": ("soakawayDetails", None),
+}, id_prefix="concrete")
+
+ROOFING = obj({
+    "n": ("name", None),
+    "t": ("type", vocab.ROOF_TYPES),
+    "m": ("material", vocab.ROOF_MATERIALS),
+    "a": ("area", None),
+    "p": ("pitch", None),
+    "l": ("length", None),
+    "w": ("width", None),
+    "eo": ("eavesOverhang", None),
+    "cv": ("covering", obj({
+        "t": ("type", None),
+        "m": ("material", vocab.ROOF_MATERIALS),
+        "u": ("underlayment", vocab.UNDERLAYMENT_TYPES),
+        "i": ("insulation", obj({"t": ("type", vocab.INSULATION_TYPES), "th": ("thickness", None)})),
+    })),
+    "tm": ("timbers", rows([
+        ("type", vocab.TIMBER_TYPES), ("size", vocab.TIMBER_SIZES), ("spacing", None),
+        ("grade", vocab.TIMBER_GRADES), ("treatment", vocab.TIMBER_TREATMENTS),
+        ("quantity", None), ("length", None), ("unit", vocab.TIMBER_UNITS),
+    ], id_prefix="timber")),
+    "ac": ("accessories", obj({
+        "g": ("gutters", None),
+        "gt": ("gutterType", vocab.GUTTER_TYPES),
+        "dp": ("downpipes", None),
+        "dt": ("downpipeType", vocab.DOWNPIPE_TYPES),
+        "f": ("flashings", None),
+        "flt": ("flashingType", vocab.FLASHING_TYPES),
+        "fa": ("fascia", None),
+        "fat": ("fasciaType", vocab.FASCIA_TYPES),
+        "so": ("soffit", None),
+        "sot": ("soffitType", vocab.SOFFIT_TYPES),
+        "rc": ("RidgeCaps", None),
+        "vt": ("valleyTraps", None),
+    })),
+}, id_prefix="roof")
+
+PLUMBING = rows([
+    ("name", None),
+    ("systemType", vocab.PLUMBING_SYSTEM_TYPES),
+    ("pipes", rows([("material", vocab.PIPE_MATERIALS), ("diameter", None), ("length", None), ("quantity", None)], id_prefix="pipe")),
+    ("fixtures", rows([
+        ("type", vocab.FIXTURE_TYPES), ("count", None), ("location", None), ("quality", vocab.FIXTURE_QUALITIES),
+        ("connections.waterSupply", BOOL), ("connections.drainage", BOOL), ("connections.vent", BOOL),
+    ], id_prefix="fixture")),
+], id_prefix="plumbing", defaults={"tanks": [], "pumps": [], "fittings": []})
+
+ELECTRICAL = rows([
+    ("name", None),
+    ("systemType", vocab.ELECTRICAL_SYSTEM_TYPES),
+    ("cables", rows([
+        ("type", vocab.CABLE_TYPES), ("size", None), ("length", None), ("quantity", None),
+        ("circuit", None), ("protection", None), ("installationMethod", vocab.INSTALLATION_METHODS),
+    ], id_prefix="cable")),
+    ("outlets", rows([
+        ("type", vocab.OUTLET_TYPES), ("count", None), ("location", None), ("circuit", None),
+        ("rating", None), ("gang", None), ("mounting", vocab.MOUNTING_TYPES),
+    ], id_prefix="outlet")),
+    ("lighting", rows([
+        ("type", vocab.LIGHTING_TYPES), ("count", None), ("location", None), ("circuit", None),
+        ("wattage", None), ("controlType", vocab.CONTROL_TYPES), ("emergency", BOOL),
+    ], id_prefix="light")),
+    ("distributionBoards", rows([
+        ("type", vocab.BOARD_TYPES), ("circuits", None), ("rating", None),
+        ("mounting", vocab.MOUNTING_TYPES), ("accessories", None),
+    ], id_prefix="db")),
+    ("voltage", None),
+], id_prefix="electrical", defaults={"protectionDevices": [], "voltage": 230})
+
+SPEC = obj({
+    "wd": ("wallDimensions", obj({
+        "ep": ("externalWallPerimiter", None),
+        "ip": ("internalWallPerimiter", None),
+        "eh": ("externalWallHeight", None),
+        "ih": ("internalWallHeight", None),
+    })),
+    "ws": ("wallSections", rows([
+        ("type", vocab.WALL_TYPES), ("blockType", vocab.BLOCK_TYPES), ("thickness", None),
+        ("plaster", vocab.PLASTER_OPTIONS), ("doors", DOOR), ("windows", WINDOW),
+    ], defaults={"doors": [], "windows": []})),
+    "wp": ("wallProperties", obj({
+        "bt": ("blockType", vocab.BLOCK_TYPES),
+        "t": ("thickness", None),
+        "p": ("plaster", vocab.PLASTER_OPTIONS),
+    })),
+    "fl": ("floors", None),
+    "fd": ("foundationDetails", obj({
+        "ft": ("foundationType", None),
+        "tp": ("totalPerimeter", None),
+        "mt": ("masonryType", vocab.BLOCK_TYPES),
+        "wt": ("wallThickness", STR),
+        "wh": ("wallHeight", STR),
+        "bd": ("blockDimensions", None),
+        "h": ("height", STR),
+        "l": ("length", STR),
+        "w": ("width", STR),
+    })),
+    "fw": ("foundationWalling", rows([
+        ("type", vocab.WALL_TYPES), ("blockDimensions", None), ("blockThickness", STR),
+        ("wallLength", STR), ("wallHeight", STR), ("numberOfWalls", None), ("mortarRatio", vocab.MORTAR_RATIOS),
+    ], hook=_foundation_wall_id)),
+    "pt": ("projectType", vocab.PROJECT_TYPES),
+    "ta": ("totalArea", None),
+    "ht": ("houseType", vocab.HOUSE_TYPES),
+    "ds": ("description", None),
+    "pn": ("projectName", None),
+    "pl": ("projectLocation", None),
+    "rm": ("rooms", rows([("name", None), ("length", None), ("width", None), ("area", None), ("x", None), ("y", None)])),
+    "fp": ("footprint", None),
+    "ew": ("earthworks", rows([
+        ("type", None), ("length", STR), ("width", STR), ("depth", STR), ("volume", STR), ("material", None),
+    ], id_prefix="excavation")),
+    "cs": ("concreteStructures", CONCRETE),
+    "rf": ("reinforcement", REINFORCEMENT),
+    "eq": ("equipment", obj({
+        "s": ("equipmentData.standardEquipment", rows([
+            ("name", None), ("description", None), ("usage_unit", vocab.EQUIPMENT_UNITS),
+            ("usage_quantity", None), ("category", None),
+        ], hook=_standard_equipment)),
+        "c": ("equipmentData.customEquipment", rows([
+            ("name", None), ("desc", None), ("usage_unit", vocab.EQUIPMENT_UNITS), ("usage_quantity", None),
+        ], hook=_custom_equipment)),
+    })),
+    "ro": ("roofing", ROOFING),
+    "pb": ("plumbing", PLUMBING),
+    "el": ("electrical", ELECTRICAL),
+    "fn": ("finishes", rows([
+        ("category", vocab.FINISH_CATEGORIES), ("type", None), ("material", None), ("area", None),
+        ("unit", vocab.FINISH_UNITS), ("quantity", None), ("location", None),
+    ], id_prefix="finish")),
+})
+
+SECTION_KEYS = {short: full for short, (full, _) in SPEC["object"].items()}
+
+def _next_id(ids: Dict[str, int], prefix: str) -> str:
+    ids[prefix] = ids.get(prefix, 0) + 1
+    return f"{prefix}-{ids[prefix]:02d}"
+
+def _set_path(out: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        out = out.setdefault(part, {})
+    out[parts[-1]] = value
+
+def _decode_value(kind: Any, value: Any, ids: Dict[str, int]) -> Any:
+    if kind is None or value is None:
+        return value
+    if kind is BOOL:
+        return bool(value) if value in (0, 1) else value
+    if kind is STR:
+        return _fmt(value)
+    if isinstance(kind, list):
+        if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(kind):
+            return kind[value]
+        return value
+    if isinstance(value, list):
+        return [_decode_item(kind, item, i, ids) for i, item in enumerate(value)]
+    if isinstance(value, dict):
+        return _decode_item(kind, value, 0, ids)
+    return value
+
+def _decode_item(spec: Dict[str, Any], item: Any, index: int, ids: Dict[str, int]) -> Any:
+    out: Dict[str, Any] = {}
+    if spec["id"]:
+        out["id"] = _next_id(ids, spec["id"])
+
+    if "rows" in spec and isinstance(item, list):
+        for (name, kind), value in zip(spec["rows"], item):
+            _set_path(out, name, _decode_value(kind, value, ids))
+    elif isinstance(item, dict):
+        keys = spec.get("object") or {}
+        by_full = {name: kind for name, kind in (spec.get("rows") or [])}
+        for key, value in item.items():
+            name, kind = keys.get(key, (key, by_full.get(key)))
+            _set_path(out, name, _decode_value(kind, value, ids))
+    else:
+        return item
+
+    for key, default in spec["defaults"].items():
+        out.setdefault(key, copy.deepcopy(default))
+    if spec["hook"]:
+        out = spec["hook"](out, index, ids)
+    return out
+
+def is_compact(doc: Any) -> bool:
+    """True if the document uses the compact keys rather than the full schema"""
+    return isinstance(doc, dict) and "wallDimensions" not in doc and any(key in SPEC["object"] for key in doc)
+
+def decode_section(key: str, value: Any, ids: Optional[Dict[str, int]] = None) -> tuple:
+    """Expand one top-level compact section; returns (full_key, value)"""
+    full, kind = SPEC["object"].get(key, (key, None))
+    return full, _decode_value(kind, value, ids if ids is not None else {})
+
+def section_fragment(key: str, value: Any, ids: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """One top-level section (compact or full) as a full-schema fragment, e.g. {"wallDimensions": {...}}"""
+    full, decoded = decode_section(key, value, ids)
+    out: Dict[str, Any] = {}
+    _set_path(out, full, decoded)
+    return out
+
+def decode(doc: Any) -> Any:
+    """Expand a compact model document into the full schema (full documents pass through)"""
+    if not is_compact(doc):
+        return doc
+    ids: Dict[str, int] = {}
+    out: Dict[str, Any] = {}
+    for key, value in doc.items():
+        full, decoded = decode_section(key, value, ids)
+        _set_path(out, full, decoded)
+    return out
+
+# ---------------------------------------------------------------------------
+# Prompt rendering
+# ---------------------------------------------------------------------------
+
+def _describe_kind(kind: Any) -> str:
+    # Enum fields are plain words like any other text field
+    return ":0/1" if kind is BOOL else ""
+
+def _describe(spec: Dict[str, Any], indent: str, lines: List[str]) -> None:
+    nested = []
+    if "rows" in spec:
+        fields = []
+        for name, kind in spec["rows"]:
+            label = name.split(".")[-1]
+            if isinstance(kind, dict):
+                nested.append((label, kind))
+                fields.append(f"[{label}]")
+            else:
+                fields.append(label + _describe_kind(kind))
+        lines.append(f"{indent}row = [{', '.join(fields)}]")
+    else:
+        fields = []
+        for short, (name, kind) in spec["object"].items():
+            label = name.split(".")[-1]
+            if isinstance(kind, dict):
+                nested.append((f"{short}={label}", kind))
+                fields.append(f"{short}={label}{{…}}" if "object" in kind else f"{short}={label}[…]")
+            else:
+                fields.append(f"{short}={label}" + _describe_kind(kind))
+        lines.append(f"{indent}{{{', '.join(fields)}}}")
+    for label, kind in nested:
+        lines.append(f"{indent}{label}:")
+        _describe(kind, indent + "  ", lines)
+
+def describe(sections: Optional[Iterable[str]] = None) -> str:
+    """Render the compact output-format section of the prompt from SPEC.
+
+    ``sections`` limits it to those top-level (full) keys, for sheet-specific prompts.
+    """
+    wanted = set(sections) if sections is not None else None
+    lines = [
+        "### 📤 OUTPUT REQUIREMENTS (COMPACT FORMAT):",
+        "Only use the materials specified above strictly.",
+        "Return ONLY minified JSON using the short keys below instead of the long field names used above.",
+        "- {k=name} lines are objects: write the short key k, never the long name.",
+        "- row = [...] lines mean the section is an array of arrays with the values in exactly that order, no keys.",
+        "- Types, materials, systems and other categorical fields are plain words as on the drawing; they are mapped to the calculator values locally.",
+        "- 0/1 means boolean. [x] is a nested array of rows. Do not output ids or prices.",
+        "- Measurements are plain numbers in meters (mm for bar spacing and pipe diameters), not strings.",
+        "- Omit empty sections and empty optional fields.",
+        "",
+    ]
+    for short, (name, kind) in SPEC["object"].items():
+        if wanted is not None and name.split(".")[0] not in wanted:
+            continue
+        if isinstance(kind, dict):
+            lines.append(f"{short} = {name}:")
+            _describe(kind, "  ", lines)
+        else:
+            lines.append(f"{short} = {name}" + _describe_kind(kind))
+    if wanted is not None and "wallDimensions" not in wanted:
+        return "\n".join(lines) + "\n"
+    lines.append("")
+    lines.append('Example: {"wd":{"ep":50.5,"ip":35.2,"eh":3.0,"ih":2.7},"ws":[["external","standard",0.2,"both sides",[[0.9,2.1,1,"panel","timber"]],[[1.2,1.2,2,"clear","steel"]]]],"wp":{"bt":"standard","t":0.2,"p":"both sides"}}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,21 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Where the parser keeps its runtime state: databases, metrics, job files and the raster cache.
+
+Everything defaults to one directory outside the source tree: PLAN_DATA_DIR,
+else $XDG_DATA_HOME/elaris-plan (~/.local/share/elaris-plan). A checkout
+stays clean and a redeploy keeps the state. Each file can still be moved
+on its own with its environment variable (PLAN_STORE_PATH, METRICS_PATH, ...).
+"""
+
+import os
+
+DATA_DIR = os.getenv("PLAN_DATA_DIR") or os.path.join(
+    os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), "elaris-plan"
+)
+
+def data_path(name: str) -> str:
+    """A file or directory inside DATA_DIR (which is created)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
@@ -0,0 +1,101 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Server-side download of plans that are already in storage.
+
+Only allow-listed hosts are fetched. The body is streamed to disk while it is
+hashed, and a remembered ETag is sent as If-None-Match so an unchanged object
+answers 304 and is never downloaded again.
+"""
+
+import fnmatch
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+import admission
+
+# Comma-separated host patterns; the storage project's host is allowed by default
+ALLOWED_HOSTS = [
+    host.strip().lower()
+    for host in os.getenv("PLAN_URL_HOSTS", "*.supabase.co,*.supabase.in").split(",")
+    if host.strip()
+]
+MAX_DOWNLOAD_BYTES = int(os.getenv("PLAN_URL_MAX_BYTES", str(100 * 1024 * 1024)))
+FETCH_TIMEOUT = 60.0  # seconds
+CHUNK_SIZE = 1 << 16
+
+EXTENSIONS = {"application/pdf": ".pdf", "image/jpeg": ".jpg", "image/png": ".png"}
+
+class FetchError(Exception):
+    """The URL is not allowed or the object could not be downloaded"""
+
+@dataclass
+class Download:
+    not_modified: bool
+    path: Optional[Path] = None
+    etag: Optional[str] = None
+    digest: Optional[str] = None
+    size: int = 0
+
+def allowed(url: str) -> bool:
+    """True for http(s) URLs whose host matches PLAN_URL_HOSTS"""
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    return parsed.scheme in ("http", "https") and any(fnmatch.fnmatch(host, pattern) for pattern in ALLOWED_HOSTS)
+
+def _extension(url: str, content_type: str) -> str:
+    suffix = os.path.splitext(urlparse(url).path)[1].lower()
+    if suffix in (".pdf", ".jpg", ".jpeg", ".png"):
+        return suffix
+    return EXTENSIONS.get(content_type.split(";")[0].strip().lower(), "")
+
+async def download(url: str, out_dir: Path, etag: Optional[str] = None) -> Download:
+    """Stream an object to out_dir, hashing it on the way; 304 when it still matches etag"""
+    import httpx
+
+    if not allowed(url):
+        raise FetchError("URL host is not allowed")
+    headers = {"If-None-Match": etag} if etag else {}
+    path = None
+    try:
+        async with httpx.AsyncClient(timeout=FETCH_TIMEOUT, follow_redirects=False) as client:
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    return Download(not_modified=True, etag=etag)
+                if response.status_code != 200:
+                    raise FetchError(f"Storage answered {response.status_code}")
+                length = int(response.headers.get("content-length") or 0)
+                if length > MAX_DOWNLOAD_BYTES:
+                    raise FetchError(f"Object is larger than {MAX_DOWNLOAD_BYTES} bytes")
+                extension = _extension(url, response.headers.get("content-type", ""))
+                if not extension:
+                    raise FetchError("Unsupported file type")
+                path = out_dir / f"{uuid.uuid4()}{extension}"
+                digest = hashlib.sha256()
+                size = 0
+                with open(path, "wb") as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        if size == 0:
+                            # Refuse content the parser cannot read on the first chunk
+                            problem = admission.check_file(path.name, chunk)
+                            if problem:
+                                raise FetchError(problem)
+                        size += len(chunk)
+                        if size > MAX_DOWNLOAD_BYTES:
+                            raise FetchError(f"Object is larger than {MAX_DOWNLOAD_BYTES} bytes")
+                        digest.update(chunk)
+                        f.write(chunk)
+                return Download(False, path, response.headers.get("etag"), digest.hexdigest(), size)
+    except httpx.HTTPError as e:
+        if path is not None and path.exists():
+            path.unlink()
+        raise FetchError(f"Download failed: {e}")
+    except FetchError:
+        if path is not None and path.exists():
+            path.unlink()
+        raise
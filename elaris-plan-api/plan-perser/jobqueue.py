@@ -0,0 +1,268 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Durable analysis jobs, so API nodes and parser workers scale and restart independently.
+
+A claimed job is invisible to other workers until its visibility timeout
+runs out; the worker keeps extending it while the analysis runs, so a worker
+that dies simply lets the job reappear for another one. Failed attempts are
+retried with backoff and land in the dead-letter state after max_attempts.
+The idempotency key is the content hash plus the previous analysis id and
+the submitting user and project, so the same drawing submitted twice by the
+same caller is one job, and never another tenant's.
+
+Broker is the interface; SQLiteBroker is the local implementation and needs
+nothing but a file every node can reach. Other brokers are plugged in with
+register_broker() and selected by the scheme of JOB_QUEUE_URL.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from datadir import data_path
+
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL") or "sqlite:///" + data_path("jobs.sqlite3")
+# Where the API leaves uploaded files for the workers (shared storage when they run on other nodes)
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR") or data_path("job_files")
+VISIBILITY_TIMEOUT = 300.0  # seconds
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 10.0  # seconds, doubled per attempt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    visible_at REAL NOT NULL,
+    worker TEXT,
+    result BLOB,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, visible_at);
+"""
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+def content_key(
+    file_path: str,
+    previous_id: Optional[str] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+) -> str:
+    """Idempotency key: SHA-256 of the file, plus the analysis it revises and who submitted it"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return json.dumps([digest.hexdigest(), previous_id, user, project])
+
+class Broker:
+    """What the API and the workers need from a job queue"""
+
+    def enqueue(self, key: str, payload: Dict[str, Any], max_attempts: int = MAX_ATTEMPTS) -> Tuple[str, bool]:
+        """(job id, whether this payload was queued); an existing job with the same key is returned instead"""
+        raise NotImplementedError
+
+    def claim(self, worker: str, visibility: float = VISIBILITY_TIMEOUT) -> Optional[Job]:
+        """Lease the oldest ready job, or None"""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: str, worker: str, visibility: float = VISIBILITY_TIMEOUT) -> bool:
+        """Extend a lease; False when the worker no longer holds it"""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def fail(self, job_id: str, worker: str, error: str) -> str:
+        """Record a failed attempt; returns the new state ("queued" for a retry, or "dead")"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """State, attempts, error and result of a job, with the "user" and "project" it was submitted for"""
+        raise NotImplementedError
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def retry(self, job_id: str) -> bool:
+        """Put a dead job back in the queue with fresh attempts"""
+        raise NotImplementedError
+
+class SQLiteBroker(Broker):
+    """Jobs in one SQLite file; claims are serialised with BEGIN IMMEDIATE"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def enqueue(self, key: str, payload: Dict[str, Any], max_attempts: int = MAX_ATTEMPTS) -> Tuple[str, bool]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            created = db.execute(
+                "INSERT OR IGNORE INTO jobs (id, key, payload, state, max_attempts, visible_at, created, updated) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, key, json.dumps(payload), max_attempts, now, now, now),
+            ).rowcount == 1
+            if not created:
+                job_id, state, result = db.execute("SELECT id, state, result FROM jobs WHERE key = ?", (key,)).fetchone()
+                if state == "dead":
+                    # Resubmitting a dead-lettered drawing is an explicit retry, with the new payload
+                    created = self._requeue(db, job_id, payload)
+                elif state == "done" and result is not None and "error" in json.loads(zlib.decompress(result)):
+                    # Written as done before error results were failed; analyse the drawing again
+                    created = self._requeue(db, job_id, payload, "done")
+        return job_id, created
+
+    def claim(self, worker: str, visibility: float = VISIBILITY_TIMEOUT) -> Optional[Job]:
+        now = time.time()
+        db = self._connect()
+        db.isolation_level = None
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            # A lease that ran out on the last attempt means the worker died every time
+            db.execute(
+                "UPDATE jobs SET state = 'dead', error = COALESCE(error, 'Visibility timeout expired'), worker = NULL, "
+                "updated = ? WHERE state = 'running' AND visible_at <= ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = db.execute(
+                "SELECT id, key, payload, attempts, max_attempts FROM jobs "
+                "WHERE state IN ('queued', 'running') AND visible_at <= ? ORDER BY created LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, visible_at = ?, updated = ? "
+                "WHERE id = ?",
+                (worker, now + visibility, now, row[0]),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        return Job(row[0], row[1], json.loads(row[2]), row[3] + 1, row[4])
+
+    def heartbeat(self, job_id: str, worker: str, visibility: float = VISIBILITY_TIMEOUT) -> bool:
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET visible_at = ?, updated = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                (time.time() + visibility, time.time(), job_id, worker),
+            ).rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        blob = zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"))
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET state = 'done', result = ?, error = NULL, worker = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = 'running'",
+                (blob, time.time(), job_id, worker),
+            ).rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str) -> str:
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'running'",
+                (job_id, worker),
+            ).fetchone()
+            if row is None:
+                # Lease lost: another worker owns the job now
+                return "running"
+            attempts, max_attempts = row
+            state = "dead" if attempts >= max_attempts else "queued"
+            db.execute(
+                "UPDATE jobs SET state = ?, error = ?, worker = NULL, visible_at = ?, updated = ? WHERE id = ?",
+                (state, error, now + RETRY_DELAY * 2 ** (attempts - 1), now, job_id),
+            )
+        return state
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, state, attempts, max_attempts, error, result, created, updated, payload FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("jobId", "state", "attempts", "maxAttempts", "error"), row[:5]))
+        job["created"], job["updated"] = row[6], row[7]
+        payload = json.loads(row[8])
+        job["user"], job["project"] = payload.get("user"), payload.get("project")
+        if row[5] is not None:
+            job["result"] = json.loads(zlib.decompress(row[5]))
+        return job
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, key, payload, attempts, error, updated FROM jobs WHERE state = 'dead' "
+                "ORDER BY updated DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"jobId": i, "key": k, "payload": json.loads(p), "attempts": a, "error": e, "updated": u}
+            for i, k, p, a, e, u in rows
+        ]
+
+    def retry(self, job_id: str) -> bool:
+        with self._connect() as db:
+            return self._requeue(db, job_id)
+
+    @staticmethod
+    def _requeue(db: sqlite3.Connection, job_id: str, payload: Optional[Dict[str, Any]] = None, state: str = "dead") -> bool:
+        now = time.time()
+        return db.execute(
+            "UPDATE jobs SET state = 'queued', attempts = 0, payload = COALESCE(?, payload), result = NULL, "
+            "visible_at = ?, updated = ? WHERE id = ? AND state = ?",
+            (json.dumps(payload) if payload is not None else None, now, now, job_id, state),
+        ).rowcount == 1
+
+# URL scheme -> factory taking the URL; external brokers register themselves here
+BROKERS: Dict[str, Callable[[str], Broker]] = {
+    "sqlite": lambda url: SQLiteBroker(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url[len("sqlite:"):]),
+}
+
+def register_broker(scheme: str, factory: Callable[[str], Broker]) -> None:
+    BROKERS[scheme] = factory
+
+_broker: Optional[Broker] = None
+
+def get_broker() -> Broker:
+    """Process-wide broker for JOB_QUEUE_URL"""
+    global _broker
+    if _broker is None:
+        scheme = JOB_QUEUE_URL.split(":", 1)[0]
+        if scheme not in BROKERS:
+            raise RuntimeError(f"No job broker registered for '{scheme}'")
+        _broker = BROKERS[scheme](JOB_QUEUE_URL)
+    return _broker
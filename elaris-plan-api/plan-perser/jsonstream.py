@@ -0,0 +1,80 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Pick finished top-level members out of a JSON object while it is still streaming.
+
+The scanner only tracks string/escape state and bracket depth, so each chunk
+is scanned once; a member's text is handed to json.loads as soon as the comma
+or closing brace after it arrives. Anything before the first "{" (a ```json
+fence, a sentence) is skipped.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+class SectionParser:
+    """Feed text chunks; get back (key, value) for each completed top-level member"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0            # next character to scan
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.member_start = 0   # start of the current "key": value text
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        if self.done or not text:
+            return []
+        self.buffer += text
+        found = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            c = buffer[i]
+            if not self.started:
+                if c == "{":
+                    self.started = True
+                    self.depth = 1
+                    self.member_start = i + 1
+                i += 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    found += self._member(buffer[self.member_start:i])
+                    self.done = True
+                    break
+            elif c == "," and self.depth == 1:
+                found += self._member(buffer[self.member_start:i])
+                self.member_start = i + 1
+            i += 1
+        # Drop scanned text that no pending member needs
+        keep = self.member_start if self.started else i
+        self.buffer = buffer[keep:]
+        self.member_start -= keep
+        self.pos = i - keep
+        return found
+
+    @staticmethod
+    def _member(text: str) -> List[Tuple[str, Any]]:
+        if not text.strip():
+            return []
+        try:
+            member = json.loads("{" + text + "}")
+        except json.JSONDecodeError:
+            return []
+        return list(member.items())
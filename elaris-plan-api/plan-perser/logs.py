@@ -0,0 +1,223 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Structured logging that never blocks a request and stays bounded in volume.
+
+Records go through a bounded queue to one listener thread, which writes a JSON
+line per record to stderr. When the queue is full a record is dropped and
+counted; the caller never waits. Messages and fields are cut to LOG_MAX_FIELD
+characters and whole records to LOG_MAX_RECORD bytes, so a plan's size never
+shows in the log. DEBUG records are kept for a sample of requests only. The
+choice is made per request id, so a sampled request is logged in full.
+
+Correlation ids (request, job, sheet, attempt) live in a context variable.
+bind() adds to it, and every record carries the ids bound where it was
+logged. The parser copies contexts into its worker threads, so the model
+attempts of a request log under its id.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+import uuid
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_MAX_FIELD = int(os.getenv("LOG_MAX_FIELD", "512"))  # characters per message or field
+LOG_MAX_RECORD = int(os.getenv("LOG_MAX_RECORD", "4096"))  # bytes per written line
+LOG_QUEUE_SIZE = 10000
+# Share of requests whose DEBUG records are kept
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "0.01"))
+REQUEST_ID_HEADER = "x-request-id"
+
+# LogRecord attributes; anything else on a record came in through extra= and is logged as a field
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "ids", "fields"}
+
+_ids: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("log_ids", default={})
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_dropped = 0
+_sampled_out = 0
+
+def new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def bind(**ids: Optional[str]) -> contextvars.Token:
+    """Add correlation ids to the records logged from this context (and contexts copied from it)"""
+    return _ids.set({**_ids.get(), **{key: str(value) for key, value in ids.items() if value is not None}})
+
+def reset(token: contextvars.Token) -> None:
+    _ids.reset(token)
+
+def ids() -> Dict[str, str]:
+    return _ids.get()
+
+def truncate(value: Any, limit: int = LOG_MAX_FIELD, tail: bool = False) -> str:
+    """At most limit characters of value, saying how many were cut (tail keeps the end)"""
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= limit:
+        return text
+    # The marker counts against the limit, so a truncated value is never cut again
+    keep = max(0, limit - len(f"…({len(text)} chars cut)"))
+    marker = f"…({len(text) - keep} chars cut)"
+    return marker + text[len(text) - keep:] if tail else text[:keep] + marker
+
+def _sampled(request_id: Optional[str]) -> bool:
+    if LOG_DEBUG_SAMPLE >= 1:
+        return True
+    if request_id is None:
+        return random.random() < LOG_DEBUG_SAMPLE
+    return zlib.crc32(request_id.encode("utf-8")) % 10000 < LOG_DEBUG_SAMPLE * 10000
+
+class _Correlate(logging.Filter):
+    """Stamps the bound ids on a record and drops the DEBUG records of unsampled requests"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        global _sampled_out
+        record.ids = _ids.get()
+        if record.levelno < logging.INFO and not _sampled(record.ids.get("request")):
+            with _lock:
+                _sampled_out += 1
+            return False
+        return True
+
+class _BoundedQueueHandler(QueueHandler):
+    """Cuts a record down in the logging thread and hands it over without ever waiting"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        prepared = logging.makeLogRecord({key: value for key, value in vars(record).items() if key in _STANDARD})
+        prepared.msg = truncate(record.getMessage())
+        prepared.args = None
+        prepared.ids = getattr(record, "ids", {})
+        prepared.fields = {
+            key: value if isinstance(value, (int, float, bool, type(None))) else truncate(value)
+            for key, value in vars(record).items() if key not in _STANDARD
+        }
+        # Tracebacks are rendered here (they hold frames) and keep their end, where the error is
+        prepared.exc_info = None
+        prepared.exc_text = (
+            truncate("".join(traceback.format_exception(*record.exc_info)).rstrip(), 4 * LOG_MAX_FIELD, tail=True)
+            if record.exc_info else None
+        )
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                _dropped += 1
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.msg,
+            **record.ids,
+            **record.fields,
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        if len(line.encode("utf-8")) > LOG_MAX_RECORD:
+            # Fields go first; the ids and a shortened message always fit
+            entry = {key: entry[key] for key in ("ts", "level", "logger", *record.ids)}
+            entry["msg"] = truncate(record.msg, LOG_MAX_RECORD // 8)
+            entry["truncated"] = True
+            line = json.dumps(entry, ensure_ascii=False, default=str)
+        return line
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        context = " ".join(f"{key}={value}" for key, value in {**record.ids, **record.fields}.items())
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname[0]} {record.msg}"
+        line = f"{line}  [{context}]" if context else line
+        if record.exc_text:
+            line = f"{line}\n{record.exc_text}"
+        return truncate(line, LOG_MAX_RECORD)
+
+def _stop() -> None:
+    """Flush what is queued at exit (a parser subprocess logs right up to its last line)"""
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass
+
+def setup() -> None:
+    """Route the "plan" loggers through the queue to stderr; once per process"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        records: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(_TextFormatter() if LOG_FORMAT == "text" else _JSONFormatter())
+        _listener = QueueListener(records, output)
+        _listener.start()
+        atexit.register(_stop)
+        handler = _BoundedQueueHandler(records)
+        handler.addFilter(_Correlate())
+        root = logging.getLogger("plan")
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+
+def get_logger(name: str) -> logging.Logger:
+    setup()
+    return logging.getLogger(f"plan.{name}")
+
+def stats() -> Dict[str, int]:
+    """Records lost to a full queue or left out by DEBUG sampling"""
+    with _lock:
+        return {"dropped": _dropped, "sampledOut": _sampled_out}
+
+class RequestIdMiddleware:
+    """Binds a request id (the caller's X-Request-ID, or a new one) for the request and echoes it back.
+
+    Logs one line per request with its status and duration.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.log = get_logger("http")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        given = headers.get(REQUEST_ID_HEADER.encode("latin-1"), b"").decode("latin-1").strip()
+        request_id = given[:64] if given else new_id()
+        token = bind(request=request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.log.info(
+                f"{scope['method']} {scope['path']} {status}",
+                extra={"status": status, "ms": round((time.perf_counter() - started) * 1000, 1)},
+            )
+            reset(token)
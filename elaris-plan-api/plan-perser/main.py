@@ -1,15 +1,57 @@
 # © 2025 Jeff. All rights reserved.
 # Unauthorized copying, distribution, or modification of this file is strictly prohibited.
 
+import asyncio
+import hmac
 import uuid
 import subprocess
 import json
 import os
+import threading
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-app = FastAPI(title="Plan Parser API")
+import logs
+from admission import CAPABILITIES, AdmissionMiddleware, supported_mime_types
+from responses import dumps, loads, plan_response
+
+# Cold-start mode: parse in-process so the Gemini client, prompt and open connection
+# survive between requests instead of being rebuilt by a new subprocess every time.
+COLD_START_MODE = os.getenv("COLD_START_MODE", "0") == "1"
+# Operators presenting this token as X-Admin-Token may read every user's analyses and usage
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+log = logs.get_logger("api")
+
+def load_parser():
+    """Import parser.py on first use; it pulls in dotenv and the prompt assets"""
+    import parser as plan_parser
+    return plan_parser
+
+def preload_parser():
+    """Background warm-up after the port is bound: imports, client and connection"""
+    try:
+        timings = load_parser().warm_up()
+        log.info("🔥 Parser warmed up", extra={"timings": timings})
+    except Exception as e:
+        log.warning("⚠️  Parser warm-up failed", extra={"error": str(e)})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if COLD_START_MODE:
+        # Don't block startup: uvicorn only binds the port once this yields
+        threading.Thread(target=preload_parser, daemon=True).start()
+    yield
+
+app = FastAPI(title="Plan Parser API", lifespan=lifespan)
+
+# Size and magic-byte checks on uploads, before the body is buffered or written to disk
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,26 +59,19 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Outermost, so every response (rejected uploads included) carries the id its logs are under
+app.add_middleware(logs.RequestIdMiddleware)
+
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-ALLOWED_EXTENSIONS = {
-    'jpg', 'jpeg', 'png', 'pdf', 'dwg', 'dxf', 'rvt', 'ifc',
-    'pln', 'zip', 'csv', 'xlsx', 'txt'
-}
-
-ALLOWED_MIME_TYPES = {
-    'image/jpeg', 'image/png', 'application/pdf',
-    'application/acad', 'application/x-acad', 'image/vnd.dwg',
-    'image/vnd.dxf', 'application/dxf', 'application/dwg',
-    'application/vnd.autodesk.revit', 'model/vnd.ifc',
-    'application/octet-stream', 'application/x-twinmotion',
-    'application/zip', 'application/x-zip-compressed',
-    'text/plain', 'text/csv',
-    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-}
+# Only what the parser can read; octet-stream is fine because the middleware sniffs the bytes
+ALLOWED_EXTENSIONS = {extension.lstrip('.') for extension in CAPABILITIES}
+
+ALLOWED_MIME_TYPES = supported_mime_types() | {'application/octet-stream'}
 
 def validate_file_type(filename: str, content_type: str) -> bool:
     """Validate file against allowed extensions and MIME types"""
@@ -55,10 +90,173 @@ def validate_file_type(filename: str, content_type: str) -> bool:
     
     return True
 
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/warmup")
+async def warmup():
+    """Prime the Gemini client and connection pool before the first real request"""
+    try:
+        timings = await run_in_threadpool(load_parser().warm_up)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Warm-up failed: {e}")
+    return {
+        "status": "warm",
+        "mode": "in-process" if COLD_START_MODE else "subprocess",
+        "timings": timings,
+    }
+
+@app.get("/metrics")
+async def model_metrics():
+    """Learned model latencies, hedge rate, circuit breaker states and counters"""
+    import metrics
+    
+    from scheduler import get_scheduler
+    
+    if not COLD_START_MODE:
+        # Parser subprocesses write the state; re-read what they left
+        metrics.reload()
+    return {**metrics.snapshot(), "admission": get_scheduler().snapshot(), "logging": logs.stats()}
+
+@app.get("/api/usage")
+async def token_usage(request: Request, by: str = "user,model", since: Optional[float] = None, until: Optional[float] = None):
+    """The caller's model requests, tokens and wall time grouped by any of user, project, model, sheet_type
+    (comma-separated); an admin sees every user's"""
+    from store import get_store
+    
+    user = None if is_admin(request) else caller(request)[0]
+    groups = [group.strip() for group in by.split(",") if group.strip()]
+    try:
+        totals = await run_in_threadpool(get_store().usage_totals, groups, since, until, user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"by": groups, "usage": totals}
+
+@app.post("/api/plan/quantities")
+async def recompute_quantities(plan: Dict[str, Any] = Body(...)):
+    """Recompute derived quantities after the user edits measurements, without a model call"""
+    return await run_in_threadpool(load_parser().post_process, plan)
+
+def parser_command(
+    file_path: Path,
+    previous_analysis_id: Optional[str],
+    user: Optional[str],
+    project: Optional[str],
+    *flags: str,
+) -> List[str]:
+    """parser.py invocation for a file, carrying the request id so its logs correlate"""
+    command = ["python", "parser.py", str(file_path), *flags]
+    options = {
+        "--previous": previous_analysis_id,
+        "--user": user,
+        "--project": project,
+        "--request-id": logs.ids().get("request"),
+    }
+    for name, value in options.items():
+        if value:
+            command += [name, value]
+    return command
+
+async def run_parser(
+    file_path: Path,
+    previous_analysis_id: Optional[str] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Analyze a saved file in-process (cold-start mode) or in a parser.py subprocess"""
+    if COLD_START_MODE:
+        # Exceptions fall through to the caller, same as a failed subprocess
+        return await run_in_threadpool(load_parser().parse_file, str(file_path), previous_analysis_id, None, user, project)
+
+    # 🚀 Run your Python parser
+    result = await run_in_threadpool(
+        subprocess.run,
+        parser_command(file_path, previous_analysis_id, user, project),
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+    # Handle subprocess result
+    if result.returncode != 0:
+        # The end of stderr is where the error is
+        log.error(
+            "❌ Parser failed",
+            extra={"returncode": result.returncode, "stderr": logs.truncate(result.stderr, tail=True), "stdout": result.stdout},
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Parser script error: {result.stderr[:200]}"
+        )
+
+    # Try to parse JSON
+    output = result.stdout.strip()
+    log.debug("📄 Parser output", extra={"bytes": len(output)})
+
+    try:
+        return loads(output)
+    except json.JSONDecodeError as e:
+        log.error("❌ Invalid JSON from parser", extra={"error": str(e), "output": output})
+        raise HTTPException(
+            status_code=500,
+            detail=f"Parser returned invalid JSON: {str(e)}"
+        )
+
+def user_of(request: Request) -> Optional[str]:
+    """The calling user, as forwarded by the app"""
+    return request.headers.get("x-user-id")
+
+def project_of(request: Request) -> Optional[str]:
+    return request.headers.get("x-project-id")
+
+def is_admin(request: Request) -> bool:
+    given = request.headers.get("x-admin-token")
+    return bool(ADMIN_TOKEN and given) and hmac.compare_digest(given, ADMIN_TOKEN)
+
+def caller(request: Request) -> Tuple[str, Optional[str]]:
+    """(user, project) whose stored data the request may read; 401 without a user"""
+    user = user_of(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="X-User-Id header required")
+    return user, project_of(request)
+
+def tenant_of(request: Request) -> str:
+    """Fair-queueing key: the caller's user and project, or its address without them"""
+    user = user_of(request) or (request.client.host if request.client else "anonymous")
+    return f"{user}/{project_of(request) or ''}"
+
+@asynccontextmanager
+async def analysis_slot(request: Request, file_path: Path):
+    """Wait for parser capacity for this file; 429 when the queue is full or the user's token budget is spent"""
+    import usage
+    from scheduler import Overloaded, estimate, get_scheduler
+    
+    try:
+        await run_in_threadpool(usage.check, user_of(request))
+    except usage.BudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    job = await run_in_threadpool(estimate, str(file_path))
+    try:
+        async with get_scheduler().slot(tenant_of(request), job["weight"], job["interactive"]):
+            yield
+    except Overloaded as e:
+        log.warning("🚦 Queue full", extra={"tenant": tenant_of(request), "retry_after": e.retry_after})
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 @app.post("/api/plan/upload")
-async def parse_plan(file: UploadFile = File(...)):
+async def parse_plan(
+    request: Request,
+    file: UploadFile = File(...),
+    previous_analysis_id: Optional[str] = Form(None),
+    fields: Optional[str] = None,
+):
+    """Analyze a plan; with previous_analysis_id only the sheets changed since that analysis are re-run.
+
+    ``fields=rooms,quantities.concrete`` returns only those sections.
+    """
     # Validate file type
-    print(f"📁 Received file: {file.filename}, Content-Type: {file.content_type}")
+    log.info("📁 Received file", extra={"file": file.filename, "content_type": file.content_type})
     if not validate_file_type(file.filename, file.content_type):
         raise HTTPException(
             status_code=400, 
@@ -77,52 +275,263 @@ async def parse_plan(file: UploadFile = File(...)):
         if not os.path.exists(file_path):
             raise HTTPException(status_code=500, detail="File save failed")
 
-        # 🚀 Run your Python parser
-        result = subprocess.run(
-            ["python", "parser.py", str(file_path)],
-            capture_output=True,
-            text=True,
-            cwd=os.path.dirname(os.path.abspath(__file__))
-        )
-
-        # Clean up file
+        async with analysis_slot(request, file_path):
+            parsed_data = await run_parser(file_path, previous_analysis_id, user_of(request), project_of(request))
         os.remove(file_path)
+        return plan_response(request, parsed_data, fields)
 
-        # Handle subprocess result
-        if result.returncode != 0:
-            print(f"❌ Parser failed with return code {result.returncode}")
-            print(f"STDERR: {result.stderr}")
-            print(f"STDOUT: {result.stdout}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Parser script error: {result.stderr[:200]}"
-            )
-
-        # Try to parse JSON
-        output = result.stdout.strip()
-        print(f"📄 Parser output: {output}")
-
-        try:
-            parsed_data = json.loads(output)
-            return parsed_data
-        except json.JSONDecodeError as e:
-            print(f"❌ Invalid JSON from parser: {e}")
-            print(f"Raw output: >>>{output}<<<")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Parser returned invalid JSON: {str(e)}"
-            )
-
+    except HTTPException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     except Exception as e:
         # Make sure file is cleaned up
         if os.path.exists(file_path):
             try:
                 os.remove(file_path)
-                print(f"🧹 Cleaned up broken file: {file_path}")
+                log.info("🧹 Cleaned up broken file", extra={"path": str(file_path)})
             except:
                 pass
 
-        print(f"💥 Unexpected error: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        log.exception(f"💥 Unexpected error: {type(e).__name__}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/api/plan/jobs", status_code=202)
+async def submit_plan_job(
+    request: Request,
+    file: UploadFile = File(...),
+    previous_analysis_id: Optional[str] = Form(None),
+):
+    """Queue an analysis for the parser workers; poll GET /api/plan/jobs/{job_id} for the result.
+
+    The same drawing (and previous analysis) submitted again by the same user and
+    project returns the existing job.
+    """
+    import jobqueue
+    
+    if not validate_file_type(file.filename, file.content_type):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    
+    os.makedirs(jobqueue.JOB_FILES_DIR, exist_ok=True)
+    file_path = Path(jobqueue.JOB_FILES_DIR) / f"{uuid.uuid4()}{Path(file.filename).suffix.lower()}"
+    with open(file_path, "wb") as f:
+        f.write(await file.read())
+    
+    user, project = user_of(request), project_of(request)
+    key = await run_in_threadpool(jobqueue.content_key, str(file_path), previous_analysis_id, user, project)
+    payload = {
+        "path": str(file_path),
+        "filename": file.filename,
+        "previousAnalysisId": previous_analysis_id,
+        "user": user,
+        "project": project,
+        "requestId": logs.ids().get("request"),
+    }
+    job_id, queued = await run_in_threadpool(jobqueue.get_broker().enqueue, key, payload)
+    if not queued:
+        # Already queued, running or done under the earlier upload of the same bytes
+        os.remove(file_path)
+    job = jobqueue.get_broker().get(job_id)
+    return {"jobId": job_id, "state": job["state"], "duplicate": not queued}
+
+@app.get("/api/plan/jobs/{job_id}")
+async def plan_job(request: Request, job_id: str, fields: Optional[str] = None):
+    """State of the caller's queued analysis, with the result (or its requested fields) once it is done"""
+    import jobqueue
+    from responses import parse_fields, project
+    
+    job = await run_in_threadpool(jobqueue.get_broker().get, job_id)
+    # Someone else's job is as unknown as a missing one
+    if job is None or (job.pop("user"), job.pop("project")) != (user_of(request), project_of(request)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if "result" in job:
+        job["result"] = project(job["result"], parse_fields(fields))
+    return plan_response(request, job)
+
+async def stored_analysis(analysis_id: str, cache: str) -> Dict[str, Any]:
+    """A stored analysis with its quantities recomputed, as returned for a cache hit"""
+    from store import get_store
+
+    document = get_store().result(analysis_id)
+    result = await run_in_threadpool(load_parser().post_process, document)
+    result.update(analysisId=analysis_id, cache=cache)
+    return result
+
+@app.get("/api/plan/analyses")
+async def list_analyses(
+    request: Request,
+    hash: Optional[str] = None,
+    project: Optional[str] = None,
+    user: Optional[str] = None,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 50,
+):
+    """The caller's stored analyses (metadata only) matching the filters, newest first; times are Unix seconds.
+
+    Only an admin sees every user's analyses and may filter by ``user``.
+    """
+    from store import get_store
+    
+    admin = is_admin(request)
+    analyses = await run_in_threadpool(
+        get_store().find,
+        since=since,
+        until=until,
+        limit=max(1, min(limit, 500)),
+        owner=None if admin else caller(request),
+        file_hash=hash,
+        project_name=project,
+        user=user if admin else None,
+        model=model,
+        prompt_version=prompt_version,
+    )
+    return {"analyses": analyses}
+
+@app.get("/api/plan/analyses/by-hash/{file_hash}")
+async def analysis_by_hash(request: Request, file_hash: str, fields: Optional[str] = None):
+    """The caller's latest stored analysis of a file with this SHA-256"""
+    from store import get_store
+    
+    analysis_id = get_store().by_file_hash(file_hash, *caller(request))
+    if analysis_id is None:
+        raise HTTPException(status_code=404, detail="No analysis of this file")
+    return plan_response(request, await stored_analysis(analysis_id, "stored"), fields)
+
+@app.get("/api/plan/analyses/{analysis_id}")
+async def analysis_by_id(request: Request, analysis_id: str, fields: Optional[str] = None):
+    """One of the caller's stored analyses (any, for an admin), with its quantities recomputed"""
+    from store import get_store
+    
+    metadata = get_store().metadata(analysis_id)
+    # Someone else's analysis is as unknown as a missing one
+    if metadata is None or (not is_admin(request) and (metadata["user"], metadata["project"]) != caller(request)):
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return plan_response(request, await stored_analysis(analysis_id, "stored"), fields)
+
+@app.post("/api/plan/from-url")
+async def parse_plan_from_url(request: Request, payload: Dict[str, Any] = Body(...), fields: Optional[str] = None):
+    """Analyze a plan that is already in storage: {"url": ..., "previousAnalysisId"?: ...}.
+
+    The object is streamed server-side from an allow-listed host. A remembered ETag is
+    sent as If-None-Match, so an unchanged object is neither downloaded nor analysed
+    again ("cache": "etag"); new bytes already analysed under another URL are matched
+    by content hash ("cache": "content").
+    """
+    import fetch
+    from store import get_store
+
+    url = payload.get("url")
+    previous_analysis_id = payload.get("previousAnalysisId")
+    if not isinstance(url, str) or not fetch.allowed(url):
+        raise HTTPException(status_code=400, detail="URL host is not allowed")
+
+    store = get_store()
+    user, project = user_of(request), project_of(request)
+    entry = store.url_entry(url)
+    # Only the caller's own analyses are served from the URL and content caches
+    if entry and not store.owned([entry["analysisId"]], user, project):
+        entry = None
+    try:
+        download = await fetch.download(url, UPLOAD_DIR, entry["etag"] if entry else None)
+    except fetch.FetchError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if download.not_modified:
+        log.info("♻️  Not modified since last fetch", extra={"url": url})
+        return plan_response(request, await stored_analysis(entry["analysisId"], "etag"), fields)
+
+    try:
+        analysis_id = None if previous_analysis_id else store.by_file_hash(download.digest, user, project)
+        if analysis_id:
+            result = await stored_analysis(analysis_id, "content")
+        else:
+            async with analysis_slot(request, download.path):
+                result = await run_parser(download.path, previous_analysis_id, user, project)
+        if result.get("analysisId"):
+            store.remember_url(url, download.etag, download.digest, result["analysisId"])
+        return plan_response(request, result, fields)
+    finally:
+        if download.path.exists():
+            os.remove(download.path)
+
+def format_event(event: Dict[str, Any], sse: bool) -> str:
+    """One stream event as an SSE message or an NDJSON line"""
+    data = dumps(event).decode("utf-8")
+    return f"event: {event['event']}\ndata: {data}\n\n" if sse else data + "\n"
+
+async def parser_events(
+    file_path: Path,
+    previous_analysis_id: Optional[str],
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+):
+    """Events from the parser as they are produced, in-process or from a parser.py --stream subprocess"""
+    try:
+        if COLD_START_MODE:
+            events = load_parser().parse_file_stream(str(file_path), previous_analysis_id, user, project)
+            async for event in iterate_in_threadpool(events):
+                yield event
+            return
+        
+        process = await asyncio.create_subprocess_exec(
+            *parser_command(file_path, previous_analysis_id, user, project, "--stream"),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            limit=64 * 1024 * 1024,  # the final result is a single line
+        )
+        finished = False
+        async for line in process.stdout:
+            try:
+                event = loads(line)
+            except json.JSONDecodeError:
+                continue
+            finished = finished or event.get("event") in ("result", "error")
+            yield event
+        if await process.wait() != 0 and not finished:
+            yield {"event": "error", "error": f"Parser exited with code {process.returncode}"}
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+@app.post("/api/plan/upload/stream")
+async def parse_plan_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    previous_analysis_id: Optional[str] = Form(None),
+):
+    """Like /api/plan/upload, but each section is sent as soon as the model has written it.
+
+    Responds with NDJSON, or Server-Sent Events when the client accepts text/event-stream.
+    Events: {"event": "section", "sheet", "section", "data"} as sections finish, then
+    {"event": "result", "data": <full analysis>} or {"event": "error", "error"}.
+    """
+    if not validate_file_type(file.filename, file.content_type):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    
+    file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{file.filename}"
+    with open(file_path, "wb") as f:
+        f.write(await file.read())
+    
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    # Capacity is taken before responding (so a full queue is still a 429) and held until the stream ends
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(analysis_slot(request, file_path))
+    except HTTPException:
+        os.remove(file_path)
+        raise
+    
+    async def body():
+        async with slot:
+            async for event in parser_events(file_path, previous_analysis_id, user_of(request), project_of(request)):
+                yield format_event(event, sse)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,442 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Pipe and cable run lengths for the `plumbing` and `electrical` sections.
+
+Rooms become rectangles (drawn positions when the model gives x/y, otherwise
+a shelf layout inside the footprint). Rooms sharing a wall are linked
+through a portal at the middle of the shared wall, which gives the room
+adjacency graph. Fixtures, outlets and lights are placed in their rooms:
+lights on a ceiling grid, everything else along the walls. Each circuit or
+pipe system is routed from its distribution board or riser: points in a
+room are joined by a minimum spanning tree, and rooms by an approximate
+Steiner tree over the room graph (networkx, Mehlhorn). Lengths are
+Manhattan because services run parallel to the walls.
+"""
+
+import math
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+from networkx.algorithms.approximation import steiner_tree
+
+WALL_TOLERANCE = 0.35     # m gap between rooms still treated as a shared wall
+MIN_PORTAL = 0.6          # m of shared wall needed for a route between rooms
+ROUTE_ALLOWANCE = 1.1     # bends, fittings and slack
+CEILING_HEIGHT = 2.7      # m, when the drawing gives none
+PLUMBING_DROP = 0.5       # m per fixture connection
+MOUNTING_HEIGHTS = {      # m above floor; cables drop from the ceiling
+    "power-socket": 0.3, "gpo": 0.3, "usb-charger": 0.3, "data-port": 0.3,
+    "tv-point": 0.3, "telephone": 0.3, "light-switch": 1.2, "dimmer-switch": 1.2,
+}
+POINTS_PER_CIRCUIT = {"lighting": 10, "emergency-lighting": 10, "power": 8}
+DEFAULT_POINTS_PER_CIRCUIT = 12
+DEFAULT_CABLES = {       # (cable type, conductor size in mm²)
+    "lighting": ("PVC/PVC", 1.5), "power": ("PVC/PVC", 2.5), "data": ("Data-CAT6", None),
+    "security": ("PVC/PVC", 1.0), "cctv": ("Coaxial", None), "fire-alarm": ("MICC", 1.5),
+    "access-control": ("Data-CAT6", None), "av-systems": ("Data-CAT6", None),
+    "emergency-lighting": ("MICC", 1.5), "renewable-energy": ("XLPE", 6.0),
+}
+DEFAULT_PIPES = {
+    "water-supply": ("PPR", 20), "hot-water": ("PPR", 20), "drainage": ("PVC-u", 110),
+    "sewage": ("PVC-u", 110), "rainwater": ("PVC-u", 110), "fire-fighting": ("galvanized-steel", 50),
+    "gas-piping": ("copper", 15), "irrigation": ("HDPE", 25),
+}
+SUPPLY_SYSTEMS = {"water-supply", "hot-water", "gas-piping", "fire-fighting"}
+DRAIN_SYSTEMS = {"drainage", "sewage"}
+BOARD_ROOMS = ("store", "utility", "garage", "entrance", "lobby", "hall", "corridor", "passage")
+WET_ROOMS = ("bath", "toilet", "wc", "shower", "ensuite", "kitchen", "laundry", "wash")
+
+def _num(value: Any, default: float = 0.0) -> float:
+    try:
+        number = float(value)
+        return number if number > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+def _cable_size(value: Any, default: Optional[float]) -> Optional[float]:
+    """Conductor size in mm² as a number; also read from text such as '2.5mm²'"""
+    m = re.search(r"\d+(?:\.\d+)?", str(value)) if value not in (None, "") else None
+    return _num(m.group(), default) if m else default
+
+def _words(text: Any) -> set:
+    return set(re.findall(r"[a-z0-9]+", str(text or "").lower()))
+
+# ---------------------------------------------------------------------------
+# Layout
+# ---------------------------------------------------------------------------
+
+def room_rects(rooms: List[Dict[str, Any]], footprint: Any = None) -> Tuple[np.ndarray, bool]:
+    """(N x 4 array of x, y, length, width; whether positions were drawn) for the rooms"""
+    length = np.array([_num(r.get("length")) or math.sqrt(_num(r.get("area"), 9.0)) for r in rooms])
+    width = np.array([_num(r.get("width")) or math.sqrt(_num(r.get("area"), 9.0)) for r in rooms])
+    drawn = all(isinstance(r.get("x"), (int, float)) and isinstance(r.get("y"), (int, float)) for r in rooms)
+    if drawn:
+        x = np.array([float(r["x"]) for r in rooms])
+        y = np.array([float(r["y"]) for r in rooms])
+        return np.stack([x, y, length, width], axis=1), True
+
+    # Shelf layout inside the footprint width (or a square strip of the total area)
+    try:
+        outline = np.array(footprint, dtype=float).reshape(-1, 2)
+        strip = float(np.ptp(outline[:, 0])) if len(outline) >= 3 else 0.0
+    except (TypeError, ValueError):
+        strip = 0.0
+    strip = max(strip, float(length.max()), math.sqrt(float((length * width).sum())))
+    x, y = np.zeros(len(rooms)), np.zeros(len(rooms))
+    cursor_x = cursor_y = shelf = 0.0
+    for i in np.argsort(-width, kind="stable"):
+        if cursor_x and cursor_x + length[i] > strip + 1e-9:
+            cursor_x, cursor_y, shelf = 0.0, cursor_y + shelf, 0.0
+        x[i], y[i] = cursor_x, cursor_y
+        cursor_x += length[i]
+        shelf = max(shelf, width[i])
+    return np.stack([x, y, length, width], axis=1), False
+
+def portals(rects: np.ndarray) -> List[Tuple[int, int, float, float]]:
+    """(room a, room b, x, y) at the middle of every shared wall"""
+    x0, y0 = rects[:, 0], rects[:, 1]
+    x1, y1 = x0 + rects[:, 2], y0 + rects[:, 3]
+    overlap_y = np.minimum(y1[:, None], y1[None, :]) - np.maximum(y0[:, None], y0[None, :])
+    overlap_x = np.minimum(x1[:, None], x1[None, :]) - np.maximum(x0[:, None], x0[None, :])
+    # a's right wall against b's left wall, and a's top wall against b's bottom wall
+    side = (np.abs(x1[:, None] - x0[None, :]) <= WALL_TOLERANCE) & (overlap_y >= MIN_PORTAL)
+    top = (np.abs(y1[:, None] - y0[None, :]) <= WALL_TOLERANCE) & (overlap_x >= MIN_PORTAL)
+    out = []
+    for a, b in zip(*np.nonzero(side)):
+        mid_y = (max(y0[a], y0[b]) + min(y1[a], y1[b])) / 2
+        out.append((int(a), int(b), float((x1[a] + x0[b]) / 2), float(mid_y)))
+    for a, b in zip(*np.nonzero(top)):
+        mid_x = (max(x0[a], x0[b]) + min(x1[a], x1[b])) / 2
+        out.append((int(a), int(b), float(mid_x), float((y1[a] + y0[b]) / 2)))
+    return out
+
+def _along_walls(rect: np.ndarray, n: int, inset: float = 0.1) -> np.ndarray:
+    """n points spaced evenly around the inside of a room's walls"""
+    x, y, l, w = rect
+    l, w = max(l - 2 * inset, 0.01), max(w - 2 * inset, 0.01)
+    s = (np.arange(n) + 0.5) / n * 2 * (l + w)
+    px = np.select([s < l, s < l + w, s < 2 * l + w], [s, l, 2 * l + w - s], 0.0)
+    py = np.select([s < l, s < l + w, s < 2 * l + w], [0.0, s - l, w], 2 * (l + w) - s)
+    return np.stack([x + inset + px, y + inset + py], axis=1)
+
+def _ceiling_grid(rect: np.ndarray, n: int) -> np.ndarray:
+    """n points on an even grid over a room's ceiling"""
+    x, y, l, w = rect
+    cols = max(1, math.ceil(math.sqrt(n * l / w))) if w else n
+    rows = math.ceil(n / cols)
+    gx, gy = np.meshgrid((np.arange(cols) + 0.5) / cols * l, (np.arange(rows) + 0.5) / rows * w)
+    return np.stack([x + gx.ravel(), y + gy.ravel()], axis=1)[:n]
+
+def match_room(location: Any, names: List[set]) -> Optional[int]:
+    """Index of the room a location string refers to (best word overlap)"""
+    words = _words(location)
+    if not words:
+        return None
+    scores = [len(words & n) / len(n | words) if n else 0 for n in names]
+    best = int(np.argmax(scores)) if scores else None
+    return best if best is not None and scores[best] > 0 else None
+
+def _mst_length(points: np.ndarray) -> float:
+    """Manhattan minimum spanning tree length (Prim, O(n²) with NumPy)"""
+    n = len(points)
+    if n < 2:
+        return 0.0
+    d = np.abs(points[:, None, :] - points[None, :, :]).sum(axis=2)
+    done = np.zeros(n, dtype=bool)
+    done[0] = True
+    best = d[0].copy()
+    total = 0.0
+    for _ in range(n - 1):
+        best[done] = np.inf
+        j = int(best.argmin())
+        total += float(best[j])
+        done[j] = True
+        best = np.minimum(best, d[j])
+    return total
+
+def _spread(count: int, areas: np.ndarray) -> np.ndarray:
+    """Split a count over rooms by floor area (largest remainder)"""
+    share = count * areas / areas.sum()
+    out = np.floor(share).astype(int)
+    out[np.argsort(out - share)[: count - out.sum()]] += 1
+    return out
+
+class Layout:
+    """Room rectangles and the routing graph between them"""
+
+    def __init__(self, rooms: List[Dict[str, Any]], footprint: Any = None):
+        self.rooms = rooms
+        self.rects, self.drawn = room_rects(rooms, footprint)
+        self.names = [_words(r.get("name")) for r in rooms]
+        self.graph = nx.Graph()
+        self.xy: Dict[Any, np.ndarray] = {}
+        self.members: Dict[int, List[Any]] = {i: [] for i in range(len(rooms))}
+        for i, rect in enumerate(self.rects):
+            self._add(("room", i), rect[:2] + rect[2:] / 2, i)
+        for k, (a, b, x, y) in enumerate(portals(self.rects)):
+            node = ("portal", k)
+            self._add(node, np.array([x, y]), a)
+            self._join(node, b)
+        self._connect_components()
+
+    def _add(self, node: Any, xy: np.ndarray, room: int) -> None:
+        self.xy[node] = xy
+        self._join(node, room)
+
+    def _join(self, node: Any, room: int) -> None:
+        """Link a node to the room centre and portals of a room"""
+        for other in self.members[room]:
+            self._link(node, other)
+        self.members[room].append(node)
+
+    def _link(self, a: Any, b: Any) -> None:
+        self.graph.add_edge(a, b, weight=float(np.abs(self.xy[a] - self.xy[b]).sum()))
+
+    def _connect_components(self) -> None:
+        """Join rooms that share no wall to the nearest connected room"""
+        components = [sorted(c) for c in nx.connected_components(self.graph)]
+        while len(components) > 1:
+            main = [n for n in components[0] if n[0] == "room"]
+            other = [n for n in components[1] if n[0] == "room"]
+            a = np.array([self.xy[n] for n in main])
+            b = np.array([self.xy[n] for n in other])
+            d = np.abs(a[:, None, :] - b[None, :, :]).sum(axis=2)
+            i, j = np.unravel_index(d.argmin(), d.shape)
+            self._link(main[i], other[j])
+            components = [sorted(c) for c in nx.connected_components(self.graph)]
+
+    def room_for(self, location: Any) -> Optional[int]:
+        return match_room(location, self.names)
+
+    def place(self, kind: str, count: int, room: Optional[int]) -> List[Tuple[int, np.ndarray]]:
+        """(room, xy) for count points of a kind (spread by area when the room is unknown)"""
+        if room is None:
+            areas = self.rects[:, 2] * self.rects[:, 3]
+            points = []
+            for i, n in enumerate(_spread(count, areas)):
+                if n:
+                    points += self.place(kind, int(n), i)
+            return points
+        rect = self.rects[room]
+        xy = _ceiling_grid(rect, count) if kind == "ceiling" else _along_walls(rect, count)
+        return [(room, p) for p in xy]
+
+    def hub(self, keywords: Tuple[str, ...], weights: Optional[Dict[int, float]] = None) -> Any:
+        """Room centre for a board or riser: a keyword room, else the weighted centre"""
+        if weights:
+            centres = self.rects[:, :2] + self.rects[:, 2:] / 2
+            rooms = list(weights)
+            target = np.average(centres[rooms], axis=0, weights=[weights[r] for r in rooms])
+            candidates = [r for r in rooms if self.names[r] & set(keywords)] or rooms
+            return ("room", min(candidates, key=lambda r: np.abs(centres[r] - target).sum()))
+        for word in keywords:
+            for i, names in enumerate(self.names):
+                if any(n.startswith(word) for n in names):
+                    return ("room", i)
+        centres = self.rects[:, :2] + self.rects[:, 2:] / 2
+        target = centres.mean(axis=0)
+        return ("room", int(np.abs(centres - target).sum(axis=1).argmin()))
+
+    def route(self, source: Any, points: List[Tuple[int, np.ndarray]]) -> float:
+        """Length of a tree joining the source and points.
+
+        Points in a room are joined by a minimum spanning tree and linked to
+        the nearest centre/portal of the room; those anchors and the source
+        are then joined by an approximate Steiner tree over the room graph.
+        """
+        by_room: Dict[int, List[np.ndarray]] = {}
+        for room, xy in points:
+            by_room.setdefault(room, []).append(xy)
+        terminals = {source}
+        length = 0.0
+        for room, xy in by_room.items():
+            xy = np.array(xy)
+            anchors = self.members[room]
+            d = np.abs(xy[:, None, :] - np.array([self.xy[a] for a in anchors])[None, :, :]).sum(axis=2)
+            i, j = np.unravel_index(d.argmin(), d.shape)
+            length += _mst_length(xy) + float(d[i, j])
+            terminals.add(anchors[j])
+        terminals = list(terminals)
+        if len(terminals) == 2:
+            length += nx.shortest_path_length(self.graph, terminals[0], terminals[1], weight="weight")
+        elif len(terminals) > 2:
+            length += steiner_tree(self.graph, terminals, weight="weight", method="mehlhorn").size(weight="weight")
+        return length
+
+# ---------------------------------------------------------------------------
+# Systems
+# ---------------------------------------------------------------------------
+
+def _count(row: Dict[str, Any]) -> int:
+    return max(int(_num(row.get("count"), 1)), 1)
+
+def _circuits(points: List[Tuple[Any, Any]], per_circuit: int) -> List[Tuple[Any, List[Any]]]:
+    """Group (circuit label, point) pairs into (label, points) circuits; unlabelled ones in runs of per_circuit"""
+    labelled: Dict[Any, List[Any]] = {}
+    loose = []
+    for label, point in points:
+        if label not in (None, ""):
+            labelled.setdefault(label, []).append(point)
+        else:
+            loose.append(point)
+    groups = list(labelled.items())
+    groups += [(None, loose[i:i + per_circuit]) for i in range(0, len(loose), per_circuit)]
+    return groups
+
+def _circuit_key(label: Any) -> str:
+    return " ".join(sorted(_words(label)))
+
+def _cable_picker(cables: List[Dict[str, Any]], default: Tuple[str, Optional[float]]):
+    """(cable type, size) for a circuit label: the cable naming that circuit, else the first cable naming none"""
+    def spec(cable: Optional[Dict[str, Any]]) -> Tuple[str, Optional[float]]:
+        if cable is None:
+            return default
+        return cable.get("type") or default[0], _cable_size(cable.get("size"), default[1])
+
+    by_circuit: Dict[str, Dict[str, Any]] = {}
+    for cable in cables:
+        by_circuit.setdefault(_circuit_key(cable.get("circuit")), cable)
+    fallback = by_circuit.get("") or (cables[0] if cables else None)
+
+    def pick(label: Any) -> Tuple[str, Optional[float]]:
+        cable = by_circuit.get(_circuit_key(label)) if label not in (None, "") else None
+        return spec(cable or fallback)
+    return pick
+
+def electrical_runs(layout: Layout, systems: List[Dict[str, Any]], ceiling: float) -> List[Dict[str, Any]]:
+    """One run per (system, cable type and size): each circuit takes the cable listed for it"""
+    board = layout.hub(BOARD_ROOMS)
+    out = []
+    for system in systems:
+        system_type = system.get("systemType") or "power"
+        cables = [c for c in system.get("cables") or [] if isinstance(c, dict)]
+        cable_for = _cable_picker(cables, DEFAULT_CABLES.get(system_type, ("PVC/PVC", 2.5)))
+
+        points = []
+        for key, kind in (("outlets", "wall"), ("lighting", "ceiling")):
+            for row in system.get(key) or []:
+                if not isinstance(row, dict):
+                    continue
+                count = _count(row)
+                placed = layout.place(kind, count, layout.room_for(row.get("location")))
+                drop = max(ceiling - MOUNTING_HEIGHTS.get(row.get("type"), 0.3), 0.0) if kind == "wall" else 0.0
+                points += [(row.get("circuit"), (p, drop)) for p in placed]
+        if not points:
+            continue
+        per_circuit = POINTS_PER_CIRCUIT.get(system_type, DEFAULT_POINTS_PER_CIRCUIT)
+        runs: Dict[Tuple[str, Optional[float]], Dict[str, Any]] = {}
+        for label, circuit in _circuits(points, per_circuit):
+            cable_type, size = cable_for(label)
+            run = runs.setdefault((cable_type, size), {
+                "id": system.get("id"),
+                "name": system.get("name"),
+                "systemType": system_type,
+                "cableType": cable_type,
+                "size": size,
+                "points": 0,
+                "circuits": 0,
+                "length": 0.0,
+            })
+            horizontal = layout.route(board, [p for p, _ in circuit])
+            run["points"] += len(circuit)
+            run["circuits"] += 1
+            run["length"] += (horizontal + sum(drop for _, drop in circuit)) * ROUTE_ALLOWANCE
+        for run in runs.values():
+            run["length"] = round(run["length"], 2)
+            out.append(run)
+    return out
+
+def _pipe_lengths(
+    pipes: List[Dict[str, Any]], default: Tuple[str, Any], trunk: float, connections: float,
+) -> Dict[Tuple[str, Any], float]:
+    """Split a system's routed length over its pipe entries: in proportion to the lengths read off
+    the drawing when every entry has one, otherwise the trunk in the widest pipe and the fixture
+    connections in the narrowest.
+    """
+    specs = [(p.get("material") or default[0], p.get("diameter") or default[1]) for p in pipes] or [default]
+    stated = [_num(p.get("length")) * _num(p.get("quantity"), 1) for p in pipes]
+    lengths: Dict[Tuple[str, Any], float] = {}
+    if pipes and all(stated):
+        for spec, share in zip(specs, stated):
+            lengths[spec] = lengths.get(spec, 0.0) + (trunk + connections) * share / sum(stated)
+        return lengths
+    widest = max(specs, key=lambda spec: _num(spec[1]))
+    narrowest = min(specs, key=lambda spec: _num(spec[1], math.inf))
+    lengths[widest] = trunk
+    lengths[narrowest] = lengths.get(narrowest, 0.0) + connections
+    return lengths
+
+def plumbing_runs(layout: Layout, systems: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One run per (system, pipe material and diameter), see _pipe_lengths"""
+    placed: Dict[Tuple[int, int], List[Tuple[int, np.ndarray]]] = {}
+    rows = []
+    for s, system in enumerate(systems):
+        for r, row in enumerate(system.get("fixtures") or []):
+            if isinstance(row, dict):
+                rows.append((s, r, row, layout.room_for(row.get("location"))))
+    # One riser/stack for the building, at the wet rooms' centre of gravity
+    weights: Dict[int, float] = {}
+    for _, _, row, room in rows:
+        if room is not None:
+            weights[room] = weights.get(room, 0) + _count(row)
+    riser = layout.hub(WET_ROOMS, weights or None)
+    for s, r, row, room in rows:
+        placed[(s, r)] = layout.place("wall", _count(row), room)
+
+    out = []
+    for s, system in enumerate(systems):
+        system_type = system.get("systemType") or "water-supply"
+        pipes = [p for p in system.get("pipes") or [] if isinstance(p, dict)]
+
+        flag = "waterSupply" if system_type in SUPPLY_SYSTEMS else "drainage" if system_type in DRAIN_SYSTEMS else None
+        own = [(fs, fr, row) for fs, fr, row, _ in rows if fs == s]
+        if flag and not own:
+            # Fixtures are often listed once under another system
+            own = [(fs, fr, row) for fs, fr, row, _ in rows]
+        if flag:
+            own = [(fs, fr, row) for fs, fr, row in own if (row.get("connections") or {}).get(flag) is not False]
+        terminals = [n for fs, fr, _ in own for n in placed[(fs, fr)]]
+        if not terminals:
+            continue
+        horizontal = layout.route(riser, terminals)
+        default = DEFAULT_PIPES.get(system_type, ("PVC-u", 50))
+        lengths = _pipe_lengths(pipes, default, horizontal, PLUMBING_DROP * len(terminals))
+        for (material, diameter), length in lengths.items():
+            out.append({
+                "id": system.get("id"),
+                "name": system.get("name"),
+                "systemType": system_type,
+                "material": material,
+                "diameter": diameter,
+                "fixtures": len(terminals),
+                "length": round(length * ROUTE_ALLOWANCE, 2),
+            })
+    return out
+
+def _totals(runs: List[Dict[str, Any]], key: str) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for run in runs:
+        totals[run[key]] = round(totals.get(run[key], 0.0) + run["length"], 2)
+    return totals
+
+def mep_quantities(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs per system and pipe or cable spec, and their totals per material and cable type"""
+    rooms = [r for r in doc.get("rooms") or [] if isinstance(r, dict)]
+    plumbing = [p for p in doc.get("plumbing") or [] if isinstance(p, dict)]
+    electrical = [e for e in doc.get("electrical") or [] if isinstance(e, dict)]
+    if not rooms or not (plumbing or electrical):
+        return {"layout": None, "plumbing": [], "electrical": [], "pipes": {}, "cables": {}}
+    layout = Layout(rooms, doc.get("footprint"))
+    ceiling = _num((doc.get("wallDimensions") or {}).get("internalWallHeight"), CEILING_HEIGHT)
+    pipe_runs = plumbing_runs(layout, plumbing)
+    cable_runs = electrical_runs(layout, electrical, ceiling)
+    return {
+        "layout": "drawn" if layout.drawn else "estimated",
+        "plumbing": pipe_runs,
+        "electrical": cable_runs,
+        "pipes": _totals(pipe_runs, "material"),
+        "cables": _totals(cable_runs, "cableType"),
+    }
@@ -0,0 +1,279 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Rolling model-call metrics: learned latency quantiles, a hedging budget and circuit breakers.
+
+State lives in memory and is mirrored to a small JSON file, so the default
+subprocess-per-upload mode still learns latencies and error rates across
+requests instead of starting cold every time. Parser subprocesses run side
+by side, so a save never overwrites the file with one process's view: under
+an exclusive file lock it merges what this process recorded since its last
+save (new samples, outcomes, counter increments, breaker transitions) into
+what the file holds, and adopts the merged state.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves still merge, but are not serialised between processes
+    fcntl = None
+
+from datadir import data_path
+
+METRICS_PATH = os.getenv("METRICS_PATH") or data_path("metrics_state.json")
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+# Share of model calls that may fire a hedge, and over how many recent calls it is measured
+HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.1"))
+HEDGE_WINDOW = 100
+# Breaker: open when this share of the recent calls failed, stay open for the cooldown
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_COOLDOWN = 30.0  # seconds
+# Model calls save at most this often (a breaker opening or closing at once); each analysis saves when it ends
+SAVE_INTERVAL = float(os.getenv("METRICS_SAVE_INTERVAL", "10"))
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling a model whose breaker is open"""
+
+class LatencyWindow:
+    """Most recent call latencies, with quantiles once enough have been seen"""
+
+    def __init__(self, samples=()):
+        self.samples = deque(samples, maxlen=LATENCY_WINDOW)
+        self.fresh: list = []  # added since the last save
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(round(seconds, 3))
+            self.fresh.append(round(seconds, 3))
+
+    def merge(self, stored) -> None:
+        with self.lock:
+            self.samples = deque([*stored, *self.fresh], maxlen=LATENCY_WINDOW)
+            self.fresh = []
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self.lock:
+            ordered = sorted(self.samples)
+        if len(ordered) < MIN_SAMPLES:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class HedgeBudget:
+    """Caps hedged calls at a share of recent calls"""
+
+    def __init__(self, recent=()):
+        self.recent = deque(recent, maxlen=HEDGE_WINDOW)
+        self.fresh: list = []
+        self.lock = threading.Lock()
+
+    def record(self, hedged: bool) -> None:
+        with self.lock:
+            self.recent.append(bool(hedged))
+            self.fresh.append(bool(hedged))
+
+    def merge(self, stored) -> None:
+        with self.lock:
+            self.recent = deque([*stored, *self.fresh], maxlen=HEDGE_WINDOW)
+            self.fresh = []
+
+    def allow(self) -> bool:
+        with self.lock:
+            return sum(self.recent) < HEDGE_BUDGET * len(self.recent)
+
+class CircuitBreaker:
+    """Closed -> open when the recent failure rate spikes -> half-open trial after the cooldown"""
+
+    def __init__(self, outcomes=(), opened_at: Optional[float] = None):
+        self.outcomes = deque(outcomes, maxlen=BREAKER_WINDOW)
+        self.opened_at = opened_at
+        self.trial = False
+        self.fresh: list = []
+        # Opened or closed here since the last save; the transition then wins over the file
+        self.changed = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.time() - self.opened_at >= BREAKER_COOLDOWN else "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self.lock:
+            self.outcomes.append(bool(ok))
+            self.fresh.append(bool(ok))
+            if self.opened_at is not None:
+                # The half-open trial decides: close and forget, or open for another cooldown
+                self.trial = False
+                self.opened_at = None if ok else time.time()
+                self.changed = True
+                if ok:
+                    self.outcomes.clear()
+                return
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= BREAKER_MIN_CALLS and failures >= BREAKER_FAILURE_RATE * len(self.outcomes):
+                self.opened_at = time.time()
+                self.changed = True
+
+    def merge(self, stored: Dict[str, Any]) -> None:
+        with self.lock:
+            if not self.changed:
+                self.outcomes = deque([*stored.get("outcomes", ()), *self.fresh], maxlen=BREAKER_WINDOW)
+                self.opened_at = stored.get("openedAt")
+            self.fresh = []
+            self.changed = False
+
+    def dump(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"outcomes": list(self.outcomes), "openedAt": self.opened_at}
+
+_lock = threading.Lock()
+_latency: Dict[str, LatencyWindow] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_budgets: Dict[str, HedgeBudget] = {}
+_counters: Counter = Counter()
+# Counter increments since the last save
+_pending: Counter = Counter()
+_loaded = False
+_saved_at = 0.0
+
+def _read() -> Dict[str, Any]:
+    try:
+        with open(METRICS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+@contextmanager
+def _file_lock() -> Iterator[None]:
+    """Exclusive lock on the state file, held while it is read, merged and rewritten"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{METRICS_PATH}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _load() -> None:
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    state = _read()
+    for name, samples in state.get("latency", {}).items():
+        _latency[name] = LatencyWindow(samples)
+    for name, breaker in state.get("breakers", {}).items():
+        _breakers[name] = CircuitBreaker(breaker.get("outcomes", ()), breaker.get("openedAt"))
+    for name, recent in state.get("hedges", {}).items():
+        _budgets[name] = HedgeBudget(recent)
+    _counters.update(state.get("counters", {}))
+
+def reload() -> None:
+    """Adopt the state other processes saved (this process's unsaved records are merged in, not lost)"""
+    save()
+
+def save_if_due() -> None:
+    """save() when SAVE_INTERVAL has passed since the last save or a breaker changed state since"""
+    with _lock:
+        due = time.monotonic() - _saved_at >= SAVE_INTERVAL or any(b.changed for b in _breakers.values())
+    if due:
+        save()
+
+def save() -> None:
+    """Merge this process's records since the last save into the file, and adopt the merged state"""
+    global _saved_at
+    with _lock:
+        _load()
+        _saved_at = time.monotonic()
+        try:
+            with _file_lock():
+                state = _read()
+                for name in state.get("latency", {}):
+                    _latency.setdefault(name, LatencyWindow())
+                for name in state.get("breakers", {}):
+                    _breakers.setdefault(name, CircuitBreaker())
+                for name in state.get("hedges", {}):
+                    _budgets.setdefault(name, HedgeBudget())
+                for name, window in _latency.items():
+                    window.merge(state.get("latency", {}).get(name, ()))
+                for name, b in _breakers.items():
+                    b.merge(state.get("breakers", {}).get(name, {}))
+                for name, budget in _budgets.items():
+                    budget.merge(state.get("hedges", {}).get(name, ()))
+                _counters.clear()
+                _counters.update(state.get("counters", {}))
+                _counters.update(_pending)
+                _pending.clear()
+                merged = {
+                    "latency": {name: list(window.samples) for name, window in _latency.items()},
+                    "breakers": {name: b.dump() for name, b in _breakers.items()},
+                    "hedges": {name: list(budget.recent) for name, budget in _budgets.items()},
+                    "escalationRate": _counters["cascade.escalated"] / _counters["cascade.sheets"] if _counters["cascade.sheets"] else None,
+                    "counters": dict(_counters),
+                }
+                tmp = f"{METRICS_PATH}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(merged, f)
+                os.replace(tmp, METRICS_PATH)
+        except OSError:
+            pass
+
+def latency(name: str) -> LatencyWindow:
+    with _lock:
+        _load()
+        return _latency.setdefault(name, LatencyWindow())
+
+def breaker(name: str) -> CircuitBreaker:
+    with _lock:
+        _load()
+        return _breakers.setdefault(name, CircuitBreaker())
+
+def hedge_budget(name: str) -> HedgeBudget:
+    with _lock:
+        _load()
+        return _budgets.setdefault(name, HedgeBudget())
+
+def count(name: str, n: int = 1) -> None:
+    with _lock:
+        _load()
+        _counters[name] += n
+        _pending[name] += n
+
+def snapshot() -> Dict[str, Any]:
+    """Latency quantiles (per model, i.e. per cascade tier), breaker states and counters for /metrics"""
+    with _lock:
+        _load()
+        return {
+            "latency": {
+                name: {"samples": len(w.samples), "p50": w.quantile(0.5), "p95": w.quantile(0.95), "p99": w.quantile(0.99)}
+                for name, w in _latency.items()
+            },
+            "breakers": {name: b.state for name, b in _breakers.items()},
+            "hedgeRate": {name: sum(b.recent) / len(b.recent) for name, b in _budgets.items() if b.recent},
+            "escalationRate": _counters["cascade.escalated"] / _counters["cascade.sheets"] if _counters["cascade.sheets"] else None,
+            "counters": dict(_counters),
+        }
@@ -1,14 +1,30 @@
 # © 2025 Jeff. All rights reserved.
 # Unauthorized copying, distribution, or modification of this file is strictly prohibited.
 
+import contextvars
+import hashlib
 import sys
 import json
 import os
+import queue
+import random
 import re
+import tempfile
+import threading
 import time
-from typing import Dict, Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed, wait
+from typing import Callable, Dict, Any, Iterator, List, Optional
 from dotenv import load_dotenv
 
+import canon
+import compact
+from admission import CAPABILITIES
+import logs
+import metrics
+import usage
+import validation
+from prompts import GEMINI_PROMPT, COMPACT_PROMPT, PROMPT_VERSION, SHEET_PROMPTS, TILE_PROMPT, expects_walls, recheck_prompt, sheet_prompt
+
 load_dotenv()
 
 # Configuration
@@ -22,24 +38,150 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 GEMINI_ENABLED = bool(GEMINI_API_KEY)
 GEMINI_TIMEOUT = 300  # 5 minutes timeout
 GEMINI_MAX_RETRIES = 3
-GEMINI_RETRY_DELAY = 10  # seconds between retries (will be multiplied by attempt number)
-GEMINI_MODEL = "gemini-2.5-flash-lite"  # Faster, more efficient model
-
-def call_gemini(file_path: str, prompt: str) -> Optional[Dict[str, Any]]:
-    """Call Gemini API with retry logic and timeout handling"""
+GEMINI_RETRY_DELAY = 1  # seconds before the first retry, doubled (with jitter) for each further one
+# Hedge a call still running after this latency quantile (learned per model), or the fixed delay until enough calls are seen
+GEMINI_HEDGE_QUANTILE = 0.95
+GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "45"))
+# Models tried in order: every sheet goes to the first (fastest); only the sections that fail
+# the local checks in validation.py are re-asked of the next one
+GEMINI_CASCADE = [m.strip() for m in os.getenv("GEMINI_CASCADE", "gemini-2.5-flash-lite,gemini-2.5-flash").split(",") if m.strip()]
+GEMINI_MODEL = GEMINI_CASCADE[0]
+# Ask the model for the compact wire format (short keys, positional rows) and expand it locally
+GEMINI_COMPACT_OUTPUT = os.getenv("GEMINI_COMPACT_OUTPUT", "1") == "1"
+ANALYSIS_PROMPT = COMPACT_PROMPT if GEMINI_COMPACT_OUTPUT else GEMINI_PROMPT
+# on_section(sheet_type, key, value) for sections delivered while the model is still writing
+SectionCallback = Callable[[str, str, Any], None]
+# Classify pages first and send each sheet type only the prompt sections it needs
+SHEET_ROUTING = os.getenv("SHEET_ROUTING", "1") == "1"
+# Keep finished analyses and reuse them for re-exported, visually identical pages
+REUSE_ANALYSES = os.getenv("REUSE_ANALYSES", "1") == "1"
+
+log = logs.get_logger("parser")
+
+def parse_gemini_text(text: str) -> Dict[str, Any]:
+    """Parse the JSON document out of a raw Gemini text response"""
+    cleaned = text.strip().replace('```json', '').replace('```', '').strip()
+    
+    # Try to parse JSON
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        # Try to extract JSON from text
+        m = re.search(r'\{.*\}', cleaned, re.DOTALL)
+        if m:
+            try:
+                return json.loads(m.group())
+            except Exception:
+                pass
+        raise RuntimeError("Gemini returned non-JSON response")
+
+def _generate(
+    model,
+    parts,
+    stats: Optional[Dict[str, Any]],
+    on_chunk: Optional[Callable[[str], None]] = None,
+    counts: Optional[Dict[str, int]] = None,
+) -> str:
+    """Run one generation; stream when stats are requested (time-to-first-token) or chunks are consumed.
+
+    ``counts`` receives the request's input/output/cached token counts.
+    """
+    started = time.perf_counter()
+    if stats is None and on_chunk is None:
+        response = model.generate_content(parts)
+        if counts is not None:
+            counts.update(usage.counts_of(response))
+        return response.text if response else ""
+    
+    chunks = []
+    ttft = None
+    response = model.generate_content(parts, stream=True)
+    for chunk in response:
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        chunks.append(chunk.text or "")
+        if on_chunk is not None:
+            on_chunk(chunks[-1])
+    if counts is not None:
+        # A streamed response carries its usage once it has been read to the end
+        counts.update(usage.counts_of(response))
+    
+    if stats is None:
+        return "".join(chunks)
+    metadata = getattr(response, "usage_metadata", None)
+    stats["input_tokens"] = getattr(metadata, "prompt_token_count", None)
+    stats["output_tokens"] = getattr(metadata, "candidates_token_count", None)
+    stats["ttft"] = ttft
+    stats["latency"] = time.perf_counter() - started
+    return "".join(chunks)
+
+_genai = None
+_models: Dict[str, Any] = {}
+
+def get_genai():
+    """Import and configure google.generativeai once per process.
+
+    The gRPC stack behind it is the slowest import in the parser, so it is only
+    paid for on the first model call (or by warm_up() in the API's cold-start mode).
+    """
+    global _genai
+    if _genai is None:
+        try:
+            import google.generativeai as genai
+        except ImportError as e:
+            raise RuntimeError(f"Google Generative AI library not installed: {e}")
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+def get_model(model_name: str = GEMINI_MODEL):
+    """Return a cached GenerativeModel so its client and channel are reused across calls"""
+    model = _models.get(model_name)
+    if model is None:
+        model = get_genai().GenerativeModel(model_name)
+        _models[model_name] = model
+    return model
+
+def warm_up(model_name: str = GEMINI_MODEL) -> Dict[str, float]:
+    """Import the Gemini client, build the model and open its connection; returns timings in seconds"""
     if not GEMINI_ENABLED:
         raise RuntimeError("Gemini API key not found. Set GEMINI_API_KEY or GOOGLE_API_KEY environment variable.")
+    timings = {}
+    started = time.perf_counter()
+    get_genai()
+    timings["import"] = time.perf_counter() - started
     
-    try:
-        import google.generativeai as genai
-    except ImportError as e:
-        raise RuntimeError(f"Google Generative AI library not installed: {e}")
+    started = time.perf_counter()
+    model = get_model(model_name)
+    timings["client"] = time.perf_counter() - started
+    
+    # A token count is the cheapest round trip that establishes the connection
+    started = time.perf_counter()
+    model.count_tokens("ping")
+    timings["connect"] = time.perf_counter() - started
+    return timings
+
+def call_gemini(
+    file_path: str,
+    prompt: str,
+    model_name: str = GEMINI_MODEL,
+    stats: Optional[Dict[str, Any]] = None,
+    new_reader: Optional[Callable[[], Callable[[str], None]]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Call Gemini API with retry logic and timeout handling.
+
+    If a ``stats`` dict is passed it is filled with the token counts, time-to-first-token
+    and latency of the successful attempt (used by prompt_bench.py). ``new_reader``
+    returns a fresh callback for the streamed text of each attempt.
+    """
+    if not GEMINI_ENABLED:
+        raise RuntimeError("Gemini API key not found. Set GEMINI_API_KEY or GOOGLE_API_KEY environment variable.")
     
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
     
     # Read file once
-    print(f"📤 Processing file: {os.path.basename(file_path)}", file=sys.stderr)
+    log.info("📤 Processing file", extra={"file": os.path.basename(file_path), "model": model_name})
     with open(file_path, 'rb') as f:
         file_data = f.read()
     
@@ -58,45 +200,44 @@ def call_gemini(file_path: str, prompt: str) -> Optional[Dict[str, Any]]:
         "data": file_data
     }
     
+    if stats is not None:
+        stats["model"] = model_name
+    
+    breaker = metrics.breaker(model_name)
+    
     # Retry logic
     last_error = None
     for attempt in range(GEMINI_MAX_RETRIES + 1):
+        # Stop before the request, not after, once the user's token budget is spent
+        usage.check_current()
+        if not breaker.allow():
+            metrics.count("breaker_rejections")
+            raise metrics.CircuitOpen(f"Gemini circuit open for {model_name} after repeated failures; try again shortly")
         try:
-            genai.configure(api_key=GEMINI_API_KEY)
+            if attempt:
+                log.info(f"🔄 Retry attempt {attempt}/{GEMINI_MAX_RETRIES}", extra={"model": model_name})
             
-            # Use the fastest available model
-            model_name = GEMINI_MODEL
-            if attempt == 0:
-                print(f"🔄 Using model: {model_name}", file=sys.stderr)
-            else:
-                print(f"🔄 Retry attempt {attempt}/{GEMINI_MAX_RETRIES} with model: {model_name}", file=sys.stderr)
-            
-            model = genai.GenerativeModel(model_name)
-            
-            print(f"⏳ Waiting for Gemini response...", file=sys.stderr)
+            if stats is not None:
+                stats["attempts"] = attempt + 1
             
             # Generate content with file data
-            response = model.generate_content([prompt, file_part])
+            try:
+                text = _hedged_generate(model_name, [prompt, file_part], stats, new_reader, attempt)
+            except Exception:
+                breaker.record(False)
+                raise
+            else:
+                breaker.record(True)
+            finally:
+                # Throttled: not a locked rewrite of the shared file per attempt; parse_file saves at the end
+                metrics.save_if_due()
             
-            if response and response.text:
-                cleaned = response.text.strip().replace('```json', '').replace('```', '').strip()
-                
-                # Try to parse JSON
-                try:
-                    result = json.loads(cleaned)
-                    print("✅ Successfully parsed Gemini response", file=sys.stderr)
-                    return result
-                except json.JSONDecodeError:
-                    # Try to extract JSON from text
-                    m = re.search(r'\{.*\}', cleaned, re.DOTALL)
-                    if m:
-                        try:
-                            result = json.loads(m.group())
-                            print("✅ Successfully extracted JSON from response", file=sys.stderr)
-                            return result
-                        except Exception:
-                            pass
-                    raise RuntimeError("Gemini returned non-JSON response")
+            if text:
+                if stats is not None:
+                    stats["text"] = text
+                result = parse_gemini_text(text)
+                log.debug("✅ Parsed Gemini response", extra={"model": model_name, "chars": len(text)})
+                return result
             else:
                 raise RuntimeError("Gemini returned empty response")
                 
@@ -105,19 +246,20 @@ def call_gemini(file_path: str, prompt: str) -> Optional[Dict[str, Any]]:
             error_type = type(e).__name__
             error_str = str(e).lower()
             
-            # Log full error details
-            print(f"🔍 Exception type: {error_type}", file=sys.stderr)
-            print(f"🔍 Full error: {str(e)}", file=sys.stderr)
-            
             # Check if it's a timeout/deadline error (handles google.api_core.exceptions.DeadlineExceeded)
             is_timeout = any(keyword in error_str for keyword in ['timeout', 'deadline', '504', 'deadlineexceeded', 'resource exhausted'])
-            is_timeout = is_timeout or error_type in ['DeadlineExceeded', 'ServerError', 'ServiceUnavailable']
+            is_timeout = is_timeout or error_type in ['DeadlineExceeded', 'ServerError', 'ServiceUnavailable', 'TimeoutError']
             
-            print(f"🔍 Is timeout: {is_timeout} (attempt {attempt + 1}/{GEMINI_MAX_RETRIES + 1})", file=sys.stderr)
+            # One bounded line per failed attempt; the error text is cut to LOG_MAX_FIELD
+            log.warning(
+                f"🔍 Gemini attempt {attempt + 1}/{GEMINI_MAX_RETRIES + 1} failed",
+                extra={"model": model_name, "error_type": error_type, "error": str(e), "timeout": is_timeout},
+            )
             
             if attempt < GEMINI_MAX_RETRIES and is_timeout:
-                wait_time = GEMINI_RETRY_DELAY * (attempt + 1)  # Exponential backoff
-                print(f"⚠️  Timeout/Deadline error on attempt {attempt + 1}. Retrying in {wait_time}s...", file=sys.stderr)
+                # Hedging already covers slow calls, so back off briefly (with jitter) instead of 10-30 s
+                wait_time = GEMINI_RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.0)
+                log.info(f"⚠️  Retrying in {wait_time:.1f}s", extra={"model": model_name})
                 time.sleep(wait_time)
                 continue
             elif is_timeout:
@@ -128,1009 +270,132 @@ def call_gemini(file_path: str, prompt: str) -> Optional[Dict[str, Any]]:
     # If we get here, all retries failed
     raise RuntimeError(f"Gemini API failed after {GEMINI_MAX_RETRIES + 1} attempts: {last_error}")
 
-def analyze_with_gemini(file_path: str) -> Dict[str, Any]:
-    """Analyze construction document using Gemini only"""
-    GEMINI_PROMPT = """
-You are an expert architectural AI analyzing construction drawings and plans with extreme attention to detail.
-(Keep output EXACTLY as JSON matching the requested schema. If no walls detected, respond with {"error":"No walls found"}.)
-
-Analyze this construction document and extract ALL available information about:
-
-### 🏗️ WALL STRUCTURE IDENTIFICATION:
-- Calculate the TOTAL EXTERNAL WALL PERIMETER of the building footprint in meters
-- Calculate the TOTAL INTERNAL WALL PERIMETER in meters  
-- Identify the EXTERNAL WALL HEIGHT from ground to slab level
-- Identify the INTERNAL WALL HEIGHT from ground to slab level
-- Create wall sections categorized as "external" or "internal"
-- For each wall section, identify and list all doors and windows with their properties
-- Pay special attention to door and window schedules or labels (like DOO-001, WD-012, etc.)
-- Count doors and windows per section type
-
-**Plumbing:**
-- System types: "water-supply", "drainage", "sewage", "rainwater", "hot-water", "fire-fighting", "gas-piping", "irrigation"
-- Pipe materials: "PVC-u", "PVC-c", "copper", "PEX", "galvanized-steel", "HDPE", "PPR", "cast-iron", "vitrified-clay"
-- Fixture types: "water-closet", "urinal", "lavatory", "kitchen-sink", "shower", "bathtub", "bidet", "floor-drain", "cleanout", "hose-bib"
-- Quality: "standard", "premium", "luxury"
-
-**Electrical:**
-- System types: "lighting", "power", "data", "security", "cctv", "fire-alarm", "access-control", "av-systems", "emergency-lighting", "renewable-energy"
-- Cable types: "NYM-J", "PVC/PVC", "XLPE", "MICC", "SWA", "Data-CAT6", "Ethernet", "Fiber-Optic", "Coaxial"
-- Outlet types: "power-socket", "light-switch", "dimmer-switch", "data-port", "tv-point", "telephone", "usb-charger", "gpo"
-- Lighting types: "led-downlight", "fluorescent", "halogen", "emergency-light", "floodlight", "street-light", "decorative"
-- Installation methods: "surface", "concealed", "underground", "trunking"
-- Amperes: "6, 10, 13, 16, 20, 25, 32, 40, 45, 63"
-- LIGHTING_WATTAGE = [3, 5, 7, 9, 12, 15, 18, 20, 24, 30, 36, 40, 50, 60];
-- commonOutletRatings = [6, 10, 13, 16, 20, 25, 32, 40, 45, 63];
-
-**Reinforcement:** 
-- ElementTypes =
-  | "slab"
-  | "beam"
-  | "column"
-  | "raft-foundation"
-  | "strip-footing"
-  | "tank";
-- RebarSize =
-  | "R6"
-  | "D6"
-  | "D8"
-  | "D10"
-  | "D12"
-  | "D14"
-  | "D16"
-  | "D18"
-  | "D20"
-  | "D22"
-  | "D25"
-  | "D28"
-  | "D32"
-  | "D36"
-  | "D40"
-  | "D50";
-- ReinforcementType = "individual_bars" | "mesh";
-- FootingType = "isolated" | "strip" | "combined";
-- MESH_PROPERTIES: Record<
-    string,
-    { weightPerSqm: number; wireDiameter: number; spacing: number }
-  > = {
-    A98: {
-      weightPerSqm: 1.54,
-      wireDiameter: 5,
-      spacing: 200,
-    },
-    A142: {
-      weightPerSqm: 2.22,
-      wireDiameter: 6,
-      spacing: 200,
-    },
-    A193: {
-      weightPerSqm: 3.02,
-      wireDiameter: 7,
-      spacing: 200,
-    },
-    A252: {
-      weightPerSqm: 3.95,
-      wireDiameter: 8,
-      spacing: 200,
-    },
-    A393: {
-      weightPerSqm: 6.16,
-      wireDiameter: 10,
-      spacing: 200,
-    },
-    B196: {
-      weightPerSqm: 2.45,
-      wireDiameter: 6,
-      spacing: 100,
-    },
-    B283: {
-      weightPerSqm: 3.73,
-      wireDiameter: 7,
-      spacing: 100,
-    },
-    B385: {
-      weightPerSqm: 5.0,
-      wireDiameter: 8,
-      spacing: 100,
-    },
-    B503: {
-      weightPerSqm: 6.72,
-      wireDiameter: 9,
-      spacing: 100,
-    },
-    B785: {
-      weightPerSqm: 10.9,
-      wireDiameter: 11,
-      spacing: 100,
-    },
-    C283: {
-      weightPerSqm: 4.34,
-      wireDiameter: 7,
-      spacing: 100,
-    },
-    C385: {
-      weightPerSqm: 6.0,
-      wireDiameter: 8.5,
-      spacing: 100,
-    },
-  };
-
-- STANDARD_MESH_SHEETS = [
-    { width: 2.4, length: 4.8 },
-    { width: 2.4, length: 6.0 },
-    { width: 2.4, length: 7.2 },
-    { width: 3.0, length: 6.0 },
-    { width: 3.6, length: 6.0 },
-  ];
-- TankType =
-  | "septic"
-  | "underground"
-  | "overhead"
-  | "water"
-  | "circular";
-- TankWallType = "walls" | "base" | "cover" | "all";
-- RetainingWallType = "cantilever" | "gravity" | "counterfort";
-- Be definite between the reinforcement types, eg either mesh or individual_bars
-- If you find both reinforcement types, create two individual entries for each with the correct type
-
-### DETAILED REINFORCEMENT EXTRACTION BY ELEMENT TYPE:
-
-**For Strip Footings and Raft Foundations:**
-- Extract longitudinalBars: Main bars running along the length (string format: "D12" for bar size or "D12@150" for bar size and spacing)
-- Extract transverseBars: Distribution bars across width (string format)
-- Extract topReinforcement: Top layer reinforcement specification
-- Extract bottomReinforcement: Bottom layer reinforcement specification
-- footingType: Must be "strip", "isolated", or "combined"
-- Include mainBarSpacing, distributionBarSpacing in mm (e.g., "150", "200")
-
-**For Retaining Walls:**
-- retainingWallType: MUST be "cantilever", "gravity", or "counterfort"
-- heelLength: Length of heel in meters (e.g., "0.5")
-- toeLength: Length of toe in meters (e.g., "0.5")
-- Stem reinforcement:
-  - stemVerticalBarSize: Vertical bar size (e.g., "D12", "D10")
-  - stemHorizontalBarSize: Horizontal bar size (e.g., "D10", "D8")
-  - stemVerticalSpacing: Vertical bar spacing in mm (e.g., "150")
-  - stemHorizontalSpacing: Horizontal bar spacing in mm (e.g., "200")
-- Base reinforcement (same structure as footings): 
-  - baseMainBarSize, baseDistributionBarSize
-  - baseMainSpacing, baseDistributionSpacing
-
-**For Beams:**
-- mainBarsCount: Number of main bars (e.g., "4", "6")
-- distributionBarsCount: Number of distribution/shear reinforcement bars
-- stirrupSpacing: Stirrup spacing in mm (e.g., "100", "150", "200")
-- stirrupSize: Stirrup bar size (e.g., "D8", "D6")
-- mainBarSpacing: Spacing of main bars (if continuous layout)
-
-**For Columns:**
-- mainBarsCount: Number of longitudinal bars (e.g., "4", "6", "8", "12")
-- tieSpacing: Column tie/link spacing in mm (e.g., "150", "200", "250")
-- tieSize: Tie bar size (e.g., "D6", "D8", "D10")
-- mainBarSize: Longitudinal bar size
-- columnHeight: Height of column in meters
-
-**For Slabs:**
-- mainBarSize: Bottom layer main bars
-- distributionBarSize: Bottom layer distribution bars
-- mainBarSpacing: Main bar spacing in mm
-- distributionBarSpacing: Distribution bar spacing in mm
-- slabLayers: Number of reinforcement layers ("1" for single, "2" for double)
-- If slabLayers > 1, also provide top layer reinforcement (use topReinforcement field)
-
-**For Tanks:**
-- All basic fields PLUS tank-specific reinforcement (wall, base, cover separately)
-- Ensure corresponding concrete tank exists
-- Tank reinforcement may include vertical and horizontal directions
-
-**Equipment:**
-- Standard equipment types and their respective id = Bulldozer:15846932-db16-4a28-a477-2e4b2e1e42d5, Concrete Mixer:3203526d-fa51-4878-911b-477b2b909db5, Generator: 32c2ea0f-be58-47f0-bdcd-3027099eac4b, Water Pump:598ca378-6eb3-451f-89ea-f45aa6ecece8, Crane: d4665c7d-6ace-474d-8282-e888b53e7b48, Compactoreb80f645-6450-4026-b007-064b5f15a72a, Excavator:ef8d17ca-581d-4703-b200-17395bbe1c51
-
-**Roofing:**
-- Roof types: "pitched", "flat", "gable", "hip", "mansard", "butterfly", "skillion"
-- Roof materials: "concrete-tiles", "clay-tiles", "metal-sheets", "box-profile", "thatch", "slate", "asphalt-shingles", "green-roof", "membrane"
-- Timber sizes: "50x25", "50x50", "75x50", "100x50", "100x75", "150x50", "200x50"
-- Underlayment: "felt-30", "felt-40", "synthetic", "rubberized", "breathable"
-- Insulation: "glass-wool", "rock-wool", "eps", "xps", "polyurethane", "reflective-foil"
-- Accessories: Use exact types (e.g., gutterType: "PVC", "Galvanized Steel", etc.)
-- TIMBER_GRADES = [
-  { value: "standard", label: "Standard Grade" },
-  { value: "structural", label: "Structural Grade" },
-  { value: "premium", label: "Premium Grade" },
-];
-
-- TIMBER_TREATMENTS = [
-  { value: "untreated", label: "Untreated" },
-  { value: "pressure-treated", label: "Pressure Treated" },
-  { value: "fire-retardant", label: "Fire Retardant" },
-];
-
-- TIMBER_TYPES = [
-  { value: "rafter", label: "Rafter" },
-  { value: "wall-plate", label: "Wall Plate" },
-  { value: "ridge-board", label: "Ridge Board" },
-  { value: "purlin", label: "Purlin" },
-  { value: "battens", label: "Battens" },
-  { value: "truss", label: "Truss" },
-  { value: "joist", label: "Joist" },
-];
-
-- UNDERLAYMENT_TYPES = [
-  { value: "felt-30", label: "30# Felt Underlayment" },
-  { value: "felt-40", label: "40# Felt Underlayment" },
-  { value: "synthetic", label: "Synthetic Underlayment" },
-  { value: "rubberized", label: "Rubberized Asphalt" },
-  { value: "breathable", label: "Breathable Membrane" },
-];
-
-- INSULATION_TYPES = [
-  { value: "glass-wool", label: "Glass Wool Batts" },
-  { value: "rock-wool", label: "Rock Wool" },
-  { value: "eps", label: "Expanded Polystyrene" },
-  { value: "xps", label: "Extruded Polystyrene" },
-  { value: "polyurethane", label: "Polyurethane Foam" },
-  { value: "reflective-foil", label: "Reflective Foil" },
-];
-
-- GUTTER_TYPES = [
-  { value: "PVC", label: "PVC Gutter" },
-  { value: "Galvanized Steel", label: "Galvanized Steel Gutter" },
-  { value: "Aluminum", label: "Aluminum Gutter" },
-  { value: "Copper", label: "Copper Gutter" },
-];
-
-- DOWNPIPE_TYPES = [
-  { value: "PVC", label: "PVC Downpipe" },
-  { value: "Galvanized Steel", label: "Galvanized Steel Downpipe" },
-  { value: "Aluminum", label: "Aluminum Downpipe" },
-  { value: "Copper", label: "Copper Downpipe" },
-];
-
-- FLASHING_TYPES = [
-  { value: "PVC", label: "PVC Flashing" },
-  { value: "Galvanized Steel", label: "Galvanized Steel Flashing" },
-  { value: "Aluminum", label: "Aluminum Flashing" },
-  { value: "Copper", label: "Copper Flashing" },
-];
-
-- FASCIA_TYPES = [
-  { value: "PVC", label: "PVC Fascia" },
-  { value: "Painted Wood", label: "Painted Wood Fascia" },
-  { value: "Aluminum", label: "Aluminum Fascia" },
-  { value: "Composite", label: "Composite Fascia" },
-];
-
-- SOFFIT_TYPES = [
-  { value: "PVC", label: "PVC Soffit" },
-  { value: "Aluminum", label: "Aluminum Soffit" },
-  { value: "Composite", label: "Composite Soffit" },
-  { value: "Metal", label: "Metal Soffit" },
-];
-
-- ROOF_TYPES: { value: RoofType; label: string }[] = [
-  { value: "flat", label: "Flat Roof" },
-  { value: "pitched", label: "Pitched Roof" },
-  { value: "gable", label: "Gable Roof" },
-  { value: "hip", label: "Hip Roof" },
-  { value: "mansard", label: "Mansard Roof" },
-  { value: "butterfly", label: "Butterfly Roof" },
-  { value: "skillion", label: "Skillion Roof" },
-];
-
-- ROOF_MATERIALS: { value: RoofMaterial; label: string }[] = [
-  { value: "concrete-tiles", label: "Concrete Tiles" },
-  { value: "clay-tiles", label: "Clay Tiles" },
-  { value: "metal-sheets", label: "Metal Sheets" },
-  { value: "box-profile", label: "Box Profile" },
-  { value: "thatch", label: "Thatch" },
-  { value: "slate", label: "Slate" },
-  { value: "asphalt-shingles", label: "Asphalt Shingles" },
-  { value: "green-roof", label: "Green Roof" },
-  { value: "membrane", label: "Membrane" },
-];
-
-- TIMBER_SIZES: { value: TimberSize; label: string }[] = [
-  { value: "50x25", label: "50mm x 25mm" },
-  { value: "50x50", label: "50mm x 50mm" },
-  { value: "75x50", label: "75mm x 50mm" },
-  { value: "100x50", label: "100mm x 50mm" },
-  { value: "100x75", label: "100mm x 75mm" },
-  { value: "150x50", label: "150mm x 50mm" },
-  { value: "200x50", label: "200mm x 50mm" },
-];
-
-
-**Finishes:**
-- Categories: "flooring", "ceiling", "wall-finishes",  "joinery"
-- Only use these specified categories: skip glass, blocks, anyting to do with masonry or glass etc that are not in this list
-- Materials must match common options per category (e.g., flooring: "Ceramic Tiles", "Hardwood", etc.)
-- COMMON_MATERIALS = {
-  flooring: [
-    "Ceramic Tiles",
-    "Porcelain Tiles",
-    "Hardwood",
-    "Laminate",
-    "Vinyl",
-    "Carpet",
-    "Polished Concrete",
-    "Terrazzo",
-  ],
-  ceiling: [
-    "Gypsum Board",
-    "PVC",
-    "Acoustic Tiles",
-    "Exposed Concrete",
-    "Suspended Grid",
-    "Wood Panels",
-  ],
-  "wall-finishes": [
-    "Wallpaper",
-    "Stone Cladding",
-    "Tile Cladding",
-    "Wood Paneling",
-  ],
-  joinery: ["Solid Wood", "Plywood", "MDF", "Melamine", "Laminate"],
-};
-
-**Concrete & Structure:**
-- Category = "substructure" | "superstructure";
-- If we have a concrete item, ensure there is a corresponding reinforcement item extracted as well, and vice versa
-- ElementType = "slab"| "beam"| "column"| "septic-tank"| "underground-tank"| "staircase"| "ring-beam"| "strip-footing"| "raft-foundation"| "pile-cap"|"water-tank"
-  | "ramp"| "retaining-wall"| "culvert"| "swimming-pool"| "paving"| "kerb"| "drainage-channel"| "manhole"| "inspection-chamber"|"soak-pit"| "soakaway";
-
-- FoundationStep {
-  id: string;
-  length: string;
-  width: string;
-  depth: string;
-  offset: string;
-}
-
-- ConnectionDetails {
-  lapLength?: number;
-  developmentLength?: number;
-  hookType?: "standard" | "seismic" | "special";
-  spliceType?: "lap" | "mechanical" | "welded";
-}
-
-- WaterproofingDetails {
-  includesDPC: boolean;
-  dpcWidth?: string;
-  dpcMaterial?: string;
-  includesPolythene: boolean;
-  polytheneGauge?: string;
-  includesWaterproofing: boolean;
-  waterproofingType?: "bituminous" | "crystalline" | "membrane";
-}
-
-- SepticTankDetails {
-  capacity: string;
-  numberOfChambers: number;
-  wallThickness: string;
-  baseThickness: string;
-  coverType: "slab" | "precast" | "none";
-  depth: string;
-  includesBaffles: boolean;
-  includesManhole: boolean;
-  manholeSize?: string;
-}
-
-- UndergroundTankDetails {
-  capacity: string;
-  wallThickness: string;
-  baseThickness: string;
-  coverType: "slab" | "precast" | "none";
-  includesManhole: boolean;
-  manholeSize?: string;
-  waterProofingRequired: boolean;
-}
-
-- SoakPitDetails {
-  diameter: string;
-  depth: string;
-  wallThickness: string;
-  baseThickness: string;
-  liningType: "brick" | "concrete" | "precast";
-  includesGravel: boolean;
-  gravelDepth?: string;
-  includesGeotextile: boolean;
-}
-
-- SoakawayDetails {
-  length: string;
-  width: string;
-  depth: string;
-  wallThickness: string;
-  baseThickness: string;
-  includesGravel: boolean;
-  gravelDepth?: string;
-  includesPerforatedPipes: boolean;
-}
-- Rebar sizes follow standard notation (e.g., "D10", "D12")
-- Mixes to follow ratios eg 1:2:4, 1:2:3
-- Notations C25 or C20 e.t.c, to be changed into their corresponding mixes for C:S:B(cement, sand, ballast)
-- Note that the provided file contains information about one building from different perspectives (e.g plan, section, elevation etc). Use all the information available to provide the most accurate dimensions and details
-- Ensure accuracy on measuring the wall perimeters and heights
-- If you create a concrete item, make sure there is a corresponding reinforcement item extracted as well, and vice versa
-
-### 📐 WALL DIMENSION EXTRACTION:
-- Calculate EXTERNAL WALL PERIMETER: sum of all exterior wall lengths in meters
-- Calculate INTERNAL WALL PERIMETER: sum of all interior partition wall lengths in meters
-- Extract EXTERNAL WALL HEIGHT: distance from ground to roof level in meters
-- Extract INTERNAL WALL HEIGHT: distance from ground to roof level for interior walls in meters
-- Look for dimension lines, labels, or grid references on the plan
-- Use external dimensions marked on the drawing
-- Convert all measurements to meters (mm values should be divided by 1000)
-- Pay attention to dimension strings and annotation
-
-### 🚪 DOOR & WINDOW SPECIFICATIONS IN WALLS:
-- Identify all doors: types, sizes, frame types, and counts
-- Identify all windows: glass types, sizes, frame types, and counts
-- Look for door/window schedules or symbols (like DOO-001, WD-012, etc.)
-- Note whether openings are in external or internal walls
-- We can only have two inputs for wall sections: "external" and "internal", we cannot have multiple wall sections of the same type, only one wall section with all its doors and windows listed
-- Count the total number of each type per wall section
-- standardDoorSizes = ["0.9 × 2.1 m", "1.0 × 2.1 m", "1.2 × 2.4 m"]
-- standardWindowSizes = ["1.2 × 1.2 m", "1.5 × 1.2 m", "2.0 × 1.5 m"]
-
-### 🏗️ CONSTRUCTION DETAILS:
-- Note wall thicknesses if specified
-- Identify floor levels (single story, multi-story)
-- Look for any construction notes or specifications
-- Note any special features like fireplaces, built-in cabinets, etc.
-- If a room cannot be plasters for whatever reason, mark as "None"
-- Do not assume any dimensions, only extract what is visible on the drawings
-- Make sure you get the correct areas for the finishes, eg painting area should be wall area minus openings area (doors and windows)
-
-### 🏗️ FOUNDATION AND CONSTRUCTION DETAILS: 
-# - Determine the **TOTAL EXTERNAL PERIMETER** of the building footprint in meters. 
-# - Identify the specified **FOUNDATION TYPE** (e.g., Strip Footing, Raft). 
-# - All concrete elements will need their reinforcement counterparts extracted as well.
-# - Identify the material used for the foundation wall/plinth level, specifically the **MASONRY TYPE** (e.g., Block Wall, Rubble Stone). 
-# - Extract the **MASONRY WALL THICKNESS** (e.g., 0.2m). 
-# - Extract the approximate **MASONRY WALL HEIGHT** from the top of the footing to the slab level (e.g., 1.0m).
-
-### 🧱 FOUNDATION WALLING DETAILS:
-Foundation walling refers to the masonry walls built on top of the foundation (above the strip footing or raft). Extract:
-- **Wall Type**: "external" or "internal" (external walls are perimeter walls, internal walls are partition walls)
-- **Block Dimensions**: Standard block sizes in format "LxHxT" (Length x Height x Thickness in meters):
-  - "0.2x0.2x0.2" (Large Block: 200×200×200mm)
-  - "0.15x0.2x0.15" (Standard Block: 150×200×150mm)
-  - "0.1x0.2x0.1" (Small Block: 100×200×100mm)
-- **Block Thickness** (wall thickness in mm): 100, 150, 200, 250, or 300
-- **Wall Length** (meters): Total length of the wall section
-- **Wall Height** (meters): Height from foundation top to slab level
-- **Number of Walls**: Count of identical walls (e.g., 4 external walls may have 2 different lengths)
-- **Mortar Ratio**: Cement to sand ratio - "1:3", "1:4", "1:5", or "1:6"
-- Create separate entries for external and internal walls with different characteristics
-- Use perimeter dimensions and extracted heights for calculation
-
-### 📤 OUTPUT REQUIREMENTS:
-Only use the materials specified above strictly.
-Return ONLY valid JSON with this structure. Use reasonable estimates if exact dimensions aren't visible.
-
-{
-  "wallDimensions": {
-    "externalWallPerimiter": 50.5,
-    "internalWallPerimiter": 35.2,
-    "externalWallHeight": 3.0,
-    "internalWallHeight": 2.7
-  },
-  "wallSections": [
-    {
-      "type": "external",
-      "blockType": "Standard Block" | "Large Block" | "Small Block",
-      "thickness": 0.2,
-      "plaster": "Both Sides",
-      "doors": [
-        {
-          "sizeType": "standard",
-          "standardSize": "0.9 × 2.1 m",
-          "custom": {
-            "height": "2.1",
-            "width": "0.9",
-            "price": ""
-          },
-          "type": "Panel",
-          "frame": {
-            "type": "Wood",
-            "sizeType": "standard",
-            "standardSize": "0.9 × 2.1 m",
-            "height": "2.1",
-            "width": "0.9",
-            "custom": {
-              "height": "2.1",
-              "width": "0.9",
-              "price": ""
-            }
-          },
-          "count": 1,
-          "price": 0
-        }
-      ],
-      "windows": [
-        {
-          "sizeType": "standard",
-          "standardSize": "1.2 × 1.2 m",
-          "custom": {
-            "height": "1.2",
-            "width": "1.2",
-            "price": ""
-          },
-          "glass": "Clear",
-          "frame": {
-            "type": "Steel",
-            "sizeType": "standard",
-            "standardSize": "1.2 × 1.2 m",
-            "height": "1.2",
-            "width": "1.2",
-            "custom": {
-              "height": "1.2",
-              "width": "1.2",
-              "price": ""
-            }
-          },
-          "count": 2,
-          "price": 0
-        }
-      ]
-    },
-    {
-      "type": "internal",
-      "blockType": "Standard Block" | "Large Block" | "Small Block",
-      "thickness": 0.2,
-      "plaster": "Both Sides",
-      "doors": [
-        {
-          "sizeType": "standard",
-          "standardSize": "0.9 × 2.1 m",
-          "custom": {
-            "height": "2.1",
-            "width": "0.9",
-            "price": ""
-          },
-          "type": "Panel",
-          "frame": {
-            "type": "Wood",
-            "sizeType": "standard",
-            "standardSize": "0.9 × 2.1 m",
-            "height": "2.1",
-            "width": "0.9",
-            "custom": {
-              "height": "2.1",
-              "width": "0.9",
-              "price": ""
-            }
-          },
-          "count": 5,
-          "price": 0
-        }
-      ],
-      "windows": []
-    }
-  ],
-  "wallProperties": {
-    "blockType": "Standard Block" | "Large Block" | "Small Block",
-    "thickness": 0.2,
-    "plaster": "Both Sides"
-  },
-  "floors": 1,
-  "foundationDetails": { 
-    "foundationType": "Strip Footing", 
-    "totalPerimeter": 50.5, // Total length of all exterior foundation walls in meters 
-    "masonryType": "Standard Block" | "Large Block" | "Small Block", // e.g., "Standard Block", "Rubble Stone" 
-    "wallThickness": "0.200", // Thickness of the block/stone wall in meters
-    "wallHeight": "1.0", // Height of the block/stone wall in meters 
-    "blockDimensions": "0.400 x 0.200 x 0.200" // L x W x H in meters (optional) 
-    "height": "1.0" // Depth or height of the foundation
-    "length": "5.0" // Length of the foundation
-    "width"" "6.0" //Width of the foundation
-  },
-  "foundationWalling": [
-    {
-      "id": "fwall-external-01",
-      "type": "external",
-      "blockDimensions": "0.2x0.2x0.2",
-      "blockThickness": "200",
-      "wallLength": "12.5",
-      "wallHeight": "1.0",
-      "numberOfWalls": 2,
-      "mortarRatio": "1:4"
-    },
-    {
-      "id": "fwall-internal-01",
-      "type": "internal",
-      "blockDimensions": "0.15x0.2x0.15",
-      "blockThickness": "150",
-      "wallLength": "8.0",
-      "wallHeight": "1.0",
-      "numberOfWalls": 1,
-      "mortarRatio": "1:4"
-    }
-  ], 
-  "projectType": "residential" | "commercial" | "industrial" | "institutional",
-  "floors": number,
-  "totalArea": number,
-  "houseType": "bungalow" | "mansionate",
-  "description": string
-  "projectName": string,
-  "projectLocation": string,
-  
-  "earthworks": [ {
-      "id": "excavation-01",
-      "type": "foundation-excavation",
-      "length": "15.5",
-      "width": "10.2", 
-      "depth": "1.2",
-      "volume": "189.72",
-      "material": "soil"
-    } 
-  ],
-  "concreteStructures": [
-    {
-      id:string;
-      name: string;
-      element: ElementType;
-      length: string;
-      width: string;
-      height: string;
-      mix: string;
-      formwork?: string;
-      category: Category;
-      number: string;
-      hasConcreteBed?: boolean;
-      verandahArea: number;
-      slabArea?: number;
-      bedDepth?: string;
-      hasAggregateBed?: boolean;
-      aggregateDepth?: string;
-      hasMasonryWall?: boolean;
-      masonryBlockType?: string;
-      masonryBlockDimensions?: string;
-      masonryWallThickness?: string;
-      masonryWallHeight?: string;
-      masonryWallPerimeter?: number;
-      foundationType?: string;
-      clientProvidesWater?: boolean;
-      cementWaterRatio?: string;
-
-      isSteppedFoundation?: boolean;
-      foundationSteps?: FoundationStep[];
-      totalFoundationDepth?: string;
-
-      waterproofing?: WaterproofingDetails;
-
-      reinforcement?: {
-        mainBarSize?: RebarSize;
-        mainBarSpacing?: string;
-        distributionBarSize?: RebarSize;
-        distributionBarSpacing?: string;
-        connectionDetails?: ConnectionDetails;
-      };
-
-      staircaseDetails?: {
-        riserHeight?: number;
-        treadWidth?: number;
-        numberOfSteps?: number;
-      };
-
-      tankDetails?: {
-        capacity?: string;
-        wallThickness?: string;
-        coverType?: string;
-      };
-
-      septicTankDetails?: SepticTankDetails;
-      undergroundTankDetails?: UndergroundTankDetails;
-      soakPitDetails?: SoakPitDetails;
-      soakawayDetails?: SoakawayDetails;
-    }
-  ],
-  "reinforcement":[
-    {
-      id?: string;
-      element: ElementTypes;
-      name: string;
-      length: string;
-      width: string;
-      depth: string;
-      columnHeight?: string;
-      mainBarSpacing?: string;
-      distributionBarSpacing?: string;
-      mainBarsCount?: string;
-      distributionBarsCount?: string;
-      slabLayers?: string;
-      mainBarSize?: RebarSize;
-      distributionBarSize?: RebarSize;
-      stirrupSize?: RebarSize;
-      tieSize?: RebarSize;
-      stirrupSpacing?: string;
-      tieSpacing?: string;
-      category?: Category;
-      number?: string;
-      reinforcementType?: ReinforcementType;
-      meshGrade?: string;
-      meshSheetWidth?: string;
-      meshSheetLength?: string;
-      meshLapLength?: string;
-      footingType?: FootingType;
-      longitudinalBars?: string;
-      transverseBars?: string;
-      topReinforcement?: string;
-      bottomReinforcement?: string;
-      retainingWallType?: RetainingWallType;
-      heelLength?: string;
-      toeLength?: string;
-      stemVerticalBarSize?: RebarSize;
-      stemHorizontalBarSize?: RebarSize;
-      stemVerticalSpacing?: string;
-      stemHorizontalSpacing?: string;
-    },
-    {
-      "id": "unique-id-6",
-      "element": "tank",
-      "name": "Septic Tank ST1",
-      "length": "3.0",
-      "width": "2.0",
-      "depth": "1.8",
-      "columnHeight": "",
-      "mainBarSpacing": "",
-      "distributionBarSpacing": "",
-      "mainBarsCount": "",
-      "distributionBarsCount": "",
-      "slabLayers": "",
-      "mainBarSize": "D12",
-      "distributionBarSize": "D10",
-      "stirrupSize": "",
-      "tieSize": "",
-      "stirrupSpacing": "",
-      "tieSpacing": "",
-      "category": "substructure",
-      "number": "1",
-      "reinforcementType": "individual_bars",
-      "meshGrade": "",
-      "meshSheetWidth": "",
-      "meshSheetLength": "",
-      "meshLapLength": "",
-      "footingType": "",
-      "longitudinalBars": "",
-      "transverseBars": "",
-      "topReinforcement": "",
-      "bottomReinforcement": "",
-      "tankType": "septic",
-      "tankShape": "rectangular",
-      "wallThickness": "0.2",
-      "baseThickness": "0.2",
-      "coverThickness": "0.15",
-      "includeCover": true,
-      "wallVerticalBarSize": "D12",
-      "wallHorizontalBarSize": "D10",
-      "wallVerticalSpacing": "150",
-      "wallHorizontalSpacing": "200",
-      "baseMainBarSize": "D12",
-      "baseDistributionBarSize": "D10",
-      "baseMainSpacing": "150",
-      "baseDistributionSpacing": "200",
-      "coverMainBarSize": "D10",
-      "coverDistributionBarSize": "D8",
-      "coverMainSpacing": "200",
-      "coverDistributionSpacing": "250"
-    },
-  ],
-  "equipment":{
-    "equipmentData": {
-      "standardEquipment": [
-        {
-          "id": "equip_001",
-          "name": "Excavator",
-          "description": "Heavy-duty excavator for digging and earthmoving",
-          "usage_unit": "day",
-          "usage_quantity": 1 // number of days, weeks, hours etc to be used,
-          "category": "earthmoving"
-        },
-      ],
-      "customEquipment": [
-        {
-          "equipment_type_id": "custom_001",
-          "name": "Specialized Drilling Rig",
-          "desc": "Custom drilling equipment for foundation work",
-          "usage_unit": "week",
-          "usage_quantity": 1 // number of days, weeks, hours etc to be used,
-        },
-      ],
-    }
-  }
-  "roofing": [
-    {
-      "id": string,
-      "name": string,
-      "type": RoofType,
-      "material": RoofMaterial,
-      "area": number,
-      "pitch": number, // degrees
-      "length": number,
-      "width": number,
-      "eavesOverhang": number,
-      "covering": {
-        "type": string,
-        "material": RoofMaterial,
-        "underlayment"?: UnderlaymentType,
-        "insulation"?: { "type": InsulationType, "thickness": number // m }
-      },
-      "timbers": [
-        {
-          "id": string,
-          "type": string, // e.g., "rafter", "battens"
-          "size": TimberSize,
-          "spacing": number,
-          "grade": "standard" | "structural" | "premium",
-          "treatment": "untreated" | "pressure-treated" | "fire-retardant",
-          "quantity": number,
-          "length": number,
-          "unit": "m" | "pcs"
-        }
-      ],
-      "accessories": {
-        "gutters": number,
-        "gutterType": GutterType,
-        "downpipes": number,
-        "downpipeType": DownpipeType,
-        "flashings": number,
-        "flashingType": FlashingType,
-        "fascia": number,
-        "fasciaType": FasciaType,
-        "soffit": number,
-        "soffitType": SoffitType
-        "RidgeCaps": number // m,
-        valleyTraps: number // m
-      },
-    }
-  ],
-  "plumbing": [
-    {
-      "id": string,
-      "name": string,
-      "systemType": PlumbingSystemType,
-      "pipes": [
-        {
-          "id": string,
-          "material": PipeMaterial,
-          "diameter": number, // from [15,20,...200]
-          "length": number,
-          "quantity": number,
-          "pressureRating"?: string,
-          "insulation"?: { "type": string, "thickness": number },
-          "trenchDetails"?: { "width": number, "depth": number, "length": number }
-        }
-      ],
-      "fixtures": [
-        {
-          "id": string,
-          "type": FixtureType,
-          "count": number,
-          "location": string,
-          "quality": "standard" | "premium" | "luxury",
-          "connections": {
-            "waterSupply": boolean,
-            "drainage": boolean,
-            "vent": boolean
-          }
-        }
-      ],
-      "tanks": [],
-      "pumps": [],
-      "fittings": []
-    }
-  ],
-  "electrical": [
-    {
-      "id": string,
-      "name": string,
-      "systemType": ElectricalSystemType,
-      "cables": [
-        {
-          "id": string,
-          "type": CableType,
-          "size": number, // mm² (from commonCableSizes)
-          "length": number,
-          "quantity": number,
-          "circuit": string,
-          "protection": string,
-          "installationMethod": InstallationMethod
-        }
-      ],
-      "outlets": [
-        {
-          "id": string,
-          "type": OutletType,
-          "count": number,
-          "location": string,
-          "circuit": string,
-          "rating": number, // from commonOutletRatings
-          "gang": number, // 1–4
-          "mounting": "surface" | "flush"
-        }
-      ],
-      "lighting": [
-        {
-          "id": string,
-          "type": LightingType,
-          "count": number,
-          "location": string,
-          "circuit": string,
-          "wattage": number, // from LIGHTING_WATTAGE
-          "controlType": "switch" | "dimmer" | "sensor" | "smart",
-          "emergency": boolean
-        }
-      ],
-      "distributionBoards": [
-        {
-          "id": string,
-          "type": "main" | "sub",
-          "circuits": number,
-          "rating": number,
-          "mounting": "surface" | "flush",
-          "accessories": string[]
-        }
-      ],
-      "protectionDevices": [],
-      "voltage": 230 // default if not specified
-    }
-  ],
-  "finishes": [
-    {
-      "id": string,
-      "category": FinishCategory,
-      "type": string,
-      "material": string, // from COMMON_MATERIALS[category]
-      "area": number,
-      "unit": "m²" | "m" | "pcs",
-      "quantity": number,
-      "location": string
-    }
-  ],
-  }
-
-IMPORTANT: 
-1. **DO NOT invent dimensions** that are not visible or inferable.
-2. **Use defaults only when reasonable**:
-   - External wall height → 3.0 m
-   - Internal wall height → 2.7 m
-   - Wall thickness → 0.2 m
-   - Block type → "Standard Block"
-   - Plaster → "Both Sides"
-   - Electrical voltage → 230V
-   - Fixture quality → "standard"
-   - Timber grade/treatment → "structural" / "pressure-treated" for structural elements
-3. **Map extracted names to closest enum** (e.g., "toilet" → "water-closet", "LED light" → "led-downlight")
-4. **If a section has no data, return empty array** (`[]`) or omit optional objects.
-5. **All numeric measurements in meters or as specified** (e.g., diameter in mm, area in m²).
-6. **Be consistent with your type system** — no arbitrary strings.
-- Base your analysis on what you can actually see in the drawing
-- Use external dimensions for perimeters
-- Make sure to identify all wall sections (external and internal)
-- External works should be in the concreteStructures section
-- Use reasonable architectural standards for missing information
-- Return wall structure even if some dimensions are estimated
-- Prefer custom sizes when specific dimensions are visible
-- Pay special attention to dimension lines and labels
-- Estimate reasonably the equipment that would be used and days to be used
-- Use the provided equipment types and ids, if your findings dont exist on the provided list, add them on your own
-- Convert all measurements to meters (mm ÷ 1000)
-- Use the specific types provided
-- Use the variables provided as is: eg led-downlight, water-closet, etc. should stay as they are in the output, do not change the spelling or characters
-- Be precise with wall dimension extraction
-- Calculate perimeters by summing all wall lengths
-- For internal walls, measure partition lengths
-- Do not leave any null items. If empty use reasonable estimates based on the plan and what would be expected
-"""
-
-    result = call_gemini(file_path, GEMINI_PROMPT)
+def _spawn(fn: Callable[..., Any], *args) -> Future:
+    """Run fn on a daemon thread, so a hung call that was abandoned never blocks process exit"""
+    future: Future = Future()
+    # The caller's context goes along, so the request is billed to the right account and sheet
+    context = contextvars.copy_context()
+    
+    def target() -> None:
+        try:
+            future.set_result(context.run(fn, *args))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+def _hedged_generate(
+    model_name: str,
+    parts,
+    stats: Optional[Dict[str, Any]],
+    new_reader: Optional[Callable[[], Callable[[str], None]]] = None,
+    attempt: int = 0,
+) -> str:
+    """One generation, hedged: if it is still running after the learned p95 latency, fire an
+    identical second request (within the hedge budget) and take whichever finishes first.
+
+    A call that outlives GEMINI_TIMEOUT is abandoned with a TimeoutError. Every request,
+    the losing hedge included, is accounted in usage.
+    """
+    settled = threading.Event()
+    window = metrics.latency(model_name)
+    
+    def run(attempt_stats: Optional[Dict[str, Any]], hedge: bool = False) -> str:
+        reader = new_reader() if new_reader else None
+        # Only the winner's sections should reach the client once the race is decided
+        on_chunk = (lambda text: None if settled.is_set() else reader(text)) if reader else None
+        counts: Dict[str, int] = {}
+        # Every request to the model, hedge included, logs under its own attempt id
+        logs.bind(attempt=f"{model_name}#{attempt + 1}{'h' if hedge else ''}")
+        started = time.perf_counter()
+        try:
+            text = _generate(get_model(model_name), parts, attempt_stats, on_chunk, counts)
+        except Exception:
+            elapsed = time.perf_counter() - started
+            usage.record(model_name, counts, elapsed, False, attempt, hedge)
+            log.debug("Model request failed", extra={"seconds": round(elapsed, 2)})
+            raise
+        elapsed = time.perf_counter() - started
+        window.add(elapsed)
+        usage.record(model_name, counts, elapsed, True, attempt, hedge)
+        log.debug("Model request", extra={"seconds": round(elapsed, 2), **counts})
+        return text
+    
+    attempts = [{} if stats is not None else None]
+    futures = [_spawn(run, attempts[0])]
+    delay = window.quantile(GEMINI_HEDGE_QUANTILE) or GEMINI_HEDGE_DELAY
+    budget = metrics.hedge_budget(model_name)
+    done, _ = wait(futures, timeout=delay)
+    hedged = not done and budget.allow()
+    budget.record(hedged)
+    metrics.count("calls")
+    if hedged:
+        log.info(f"🪁 No response after {delay:.1f}s (p{int(GEMINI_HEDGE_QUANTILE * 100)}); sending a hedge request", extra={"model": model_name})
+        metrics.count("hedges")
+        attempts.append({} if stats is not None else None)
+        futures.append(_spawn(run, attempts[1], True))
     
+    last_error: Optional[BaseException] = None
+    try:
+        for future in as_completed(futures, timeout=GEMINI_TIMEOUT):
+            try:
+                text = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            settled.set()
+            winner = futures.index(future)
+            if winner:
+                metrics.count("hedge_wins")
+            if stats is not None:
+                stats.update(attempts[winner], hedged=hedged)
+            return text
+    except FuturesTimeout:
+        settled.set()
+        raise TimeoutError(f"No Gemini response within {GEMINI_TIMEOUT}s")
+    raise last_error
+
+def analyze_with_gemini(
+    file_path: str,
+    prompt: str = ANALYSIS_PROMPT,
+    model_name: str = GEMINI_MODEL,
+    stats: Optional[Dict[str, Any]] = None,
+    require_walls: bool = True,
+    on_section: Optional[Callable[[str, Any], None]] = None,
+) -> Dict[str, Any]:
+    """Analyze construction document using Gemini only.
+
+    ``on_section(key, value)`` is called with each top-level section (expanded and
+    canonicalised) as soon as the model has finished writing it.
+    """
+    new_reader = (lambda: section_reader(on_section)) if on_section else None
+    result = call_gemini(file_path, prompt, model_name=model_name, stats=stats, new_reader=new_reader)
+    return check_gemini_result(result, require_walls)
+
+def section_reader(on_section: Callable[[str, Any], None]) -> Callable[[str], None]:
+    """Chunk callback that passes every completed top-level section of the streamed JSON on"""
+    from jsonstream import SectionParser
+    
+    sections = SectionParser()
+    ids: Dict[str, int] = {}
+    
+    def on_chunk(text: str) -> None:
+        for key, value in sections.feed(text):
+            fragment = compact.section_fragment(key, value, ids)
+            canon.canonicalise(fragment)
+            for full_key, full_value in fragment.items():
+                on_section(full_key, full_value)
+    return on_chunk
+
+def check_gemini_result(result: Any, require_walls: bool = True) -> Dict[str, Any]:
+    """Expand compact output, snap enum values and reject documents missing the wall structure"""
+    result = compact.decode(result)
     if not isinstance(result, dict):
         raise RuntimeError("Gemini returned invalid response format")
+    canon.canonicalise(result)
     
-    if "error" in result:
+    if "error" in result or not require_walls:
         return result
     
     if "wallDimensions" not in result or "wallProperties" not in result:
@@ -1141,42 +406,427 @@ IMPORTANT:
     
     return result
 
-def parse_file(file_path: str) -> Dict[str, Any]:
-    """Parse file using Gemini only - no fallbacks"""
+def post_process(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the locally computed quantities to a model document"""
+    if "error" in result:
+        return result
+    
+    # NumPy is only needed once a document comes back, so it stays off the import path
+    from quantities import compute_quantities
+    
+    result["quantities"] = compute_quantities(result, DEFAULT_BLOCK_TYPE)
+    for section, error in result["quantities"].get("errors", {}).items():
+        log.warning("⚠️  Quantity engine failed", extra={"section": section, "error": error})
+    return result
+
+def sheet_problems(result: Dict[str, Any], sheet_type: str) -> Dict[str, List[str]]:
+    """Validation problems in the sections this sheet type is responsible for"""
+    problems = validation.section_problems(result)
+    if "document" in problems:
+        # An empty answer is fine for sheets that are not expected to show walls
+        return problems if expects_walls(sheet_type) else {}
+    if sheet_type in SHEET_PROMPTS:
+        sections = SHEET_PROMPTS[sheet_type][1]
+        problems = {key: value for key, value in problems.items() if key in sections}
+    return problems
+
+def analyze_cascade(file_path: str, sheet_type: str, on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """Analyze with the first model of GEMINI_CASCADE, then hand only the sections that fail
+    validation to each stronger model in turn. Escalations are listed under "escalations".
+    """
+    prompt = sheet_prompt(sheet_type, GEMINI_COMPACT_OUTPUT)
+    require_walls = expects_walls(sheet_type)
+    result: Optional[Dict[str, Any]] = None
+    escalations = []
+    metrics.count("cascade.sheets")
+    for tier, model_name in enumerate(GEMINI_CASCADE):
+        problems = sheet_problems(result, sheet_type) if result is not None else None
+        if problems == {}:
+            break
+        if problems:
+            if tier == 1:
+                metrics.count("cascade.escalated")
+            escalations.append({"model": model_name, "problems": problems})
+            log.info(f"⬆️  Escalating {', '.join(problems)}", extra={"model": model_name})
+        metrics.count(f"cascade.{model_name}")
+        try:
+            if result is None or "document" in problems:
+                retry = analyze_with_gemini(file_path, prompt, model_name, require_walls=require_walls, on_section=on_section)
+                if result is None or "error" not in retry:
+                    result = retry
+            else:
+                fix = compact.decode(call_gemini(file_path, recheck_prompt(sheet_type, problems, GEMINI_COMPACT_OUTPUT), model_name))
+                if isinstance(fix, dict):
+                    canon.canonicalise(fix)
+                    for key in problems:
+                        if fix.get(key) not in (None, "", [], {}):
+                            result[key] = fix[key]
+                            if on_section:
+                                on_section(key, fix[key])
+        except RuntimeError as e:
+            # Includes an open circuit: fall back to what the previous tier produced, if anything
+            if result is None and tier == len(GEMINI_CASCADE) - 1:
+                raise
+            log.warning("⚠️  Model failed", extra={"model": model_name, "error": str(e)})
+    if escalations:
+        result["escalations"] = escalations
+    return result
+
+def analyze_tiled(
+    file_path: str,
+    sheet_type: str,
+    on_section: Optional[Callable[[str, Any], None]] = None,
+    page: int = 0,
+) -> Dict[str, Any]:
+    """An oversized page: an overview image through the cascade while overlapping detail tiles
+    are read concurrently, then the stitched tile inventory corrects the overview (see tiling.py).
+
+    A tile that fails is left out; the overview alone is still a result.
+    """
+    import raster
+    import tiling
+    
+    pyramid = raster.pyramid(file_path, page)
+    level, tiles = tiling.plan(pyramid)
+    log.info(f"🧩 Tiling the {sheet_type} sheet", extra={"page": page + 1, "tiles": len(tiles), "level": level})
+    metrics.count("tiling.sheets")
+    metrics.count("tiling.tiles", len(tiles))
+    
+    with tempfile.TemporaryDirectory() as out_dir:
+        def read_tile(number: int) -> Optional[Dict[str, Any]]:
+            path = tiling.write_png(tiles[number][1], os.path.join(out_dir, f"tile-{number}.png"))
+            try:
+                return call_gemini(path, TILE_PROMPT, GEMINI_MODEL)
+            except (metrics.CircuitOpen, usage.BudgetExceeded):
+                raise
+            except Exception as e:
+                log.warning("⚠️  Tile failed", extra={"tile": number, "error": str(e)})
+                return None
+        
+        overview = tiling.write_png(tiling.overview(pyramid), os.path.join(out_dir, "overview.png"))
+        # The overview has a worker of its own, so it never waits behind the tiles
+        with ThreadPoolExecutor(max_workers=min(tiling.TILE_WORKERS, len(tiles)) + 1) as pool:
+            whole = pool.submit(contextvars.copy_context().run, analyze_cascade, overview, sheet_type, on_section)
+            parts = [pool.submit(contextvars.copy_context().run, read_tile, number) for number in range(len(tiles))]
+            answers = [part.result() for part in parts]
+            result = whole.result()
+    
+    inventory = tiling.stitch([(box, answer) for (box, _), answer in zip(tiles, answers)])
+    if "error" in result:
+        if not inventory["walls"]:
+            return result
+        result = {}
+    changed = tiling.apply(result, inventory)
+    canon.canonicalise(result)
+    if on_section:
+        for key in changed:
+            on_section(key, result[key])
+    result["tiling"] = [{
+        "page": page + 1,
+        "level": level,
+        "tiles": len(tiles),
+        "failed": sum(answer is None for answer in answers),
+        "walls": len(inventory["walls"]),
+        "openings": len(inventory["openings"]),
+        "rooms": len(inventory["rooms"]),
+        "merged": inventory["merged"],
+    }]
+    return result
+
+def analyze_pages(
+    file_path: str,
+    sheet_type: str,
+    tiled: List[int],
+    on_section: Optional[Callable[[str, Any], None]] = None,
+) -> Dict[str, Any]:
+    """A sheet file with oversized pages: each of those is tiled on its own, the normal pages go
+    to the cascade together as they are, and the readings merge like sheets of different types.
+    """
+    import sheets
+    
+    normal = [number for number in range(sheets.page_count(file_path)) if number not in tiled]
+    if not normal and len(tiled) == 1:
+        return analyze_tiled(file_path, sheet_type, on_section, tiled[0])
+    with tempfile.TemporaryDirectory() as out_dir, ThreadPoolExecutor(max_workers=len(tiled) + 1) as pool:
+        jobs = [
+            ([number], pool.submit(contextvars.copy_context().run, analyze_tiled, file_path, sheet_type, on_section, number))
+            for number in tiled
+        ]
+        if normal:
+            path = sheets.write_pages(file_path, normal, os.path.join(out_dir, "pages.pdf"))
+            jobs.append((normal, pool.submit(contextvars.copy_context().run, analyze_cascade, path, sheet_type, on_section)))
+        parts = [(sheet_type, pages, job.result()) for pages, job in jobs]
+    for _, pages, part in parts:
+        if "error" in part:
+            log.warning("⚠️  Pages failed", extra={"pages": [number + 1 for number in pages], "error": part["error"]})
+    result = sheets.merge(parts)
+    # Which pages were tiled is under "tiling"; per-type provenance is added by analyze_by_sheet
+    result.pop("sheets")
+    return result
+
+def analyze_sheet(file_path: str, sheet_type: str, on_section: Optional[SectionCallback] = None) -> Dict[str, Any]:
+    """Analyze a file holding one type of sheet with that type's prompt (oversized pages are tiled)"""
+    import tiling
+    
+    forward = (lambda key, value: on_section(sheet_type, key, value)) if on_section else None
+    usage.set_sheet_type(sheet_type)
+    token = logs.bind(sheet=sheet_type)
+    try:
+        tiled = tiling.pages_to_tile(file_path) if expects_walls(sheet_type) else []
+        if tiled:
+            return analyze_pages(file_path, sheet_type, tiled, forward)
+        return analyze_cascade(file_path, sheet_type, forward)
+    except (metrics.CircuitOpen, usage.BudgetExceeded) as e:
+        # Fail fast; sheets reused from earlier analyses still come back
+        return {"error": str(e)}
+    finally:
+        logs.reset(token)
+
+def file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def analyze_by_sheet(
+    file_path: str,
+    previous_id: Optional[str] = None,
+    on_section: Optional[SectionCallback] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Classify the pages, analyze each sheet type with its own prompt and merge the results.
+
+    With REUSE_ANALYSES, sheet groups whose pages render identically to pages of a
+    stored analysis of the same user and project take the stored result instead of a model call.
+    Given ``previous_id`` (a revision of that analysis), pages are diffed against it
+    by pixel digest and only the sheet groups holding changed pages go to the model.
+    ``on_section(sheet_type, key, value)`` receives sections as they are produced.
+    The stored analysis is indexed under ``user``/``project``, the first cascade model and PROMPT_VERSION.
+    """
+    import sheets
+    
+    if REUSE_ANALYSES or previous_id:
+        import phash
+        from store import get_store
+        
+        store = get_store()
+        # Another user's analysis is as unknown as a missing one
+        if previous_id and not store.owned([previous_id], user, project):
+            raise ValueError(f"Unknown analysis id: {previous_id}")
+        digest = file_digest(file_path)
+        analysis_id = None if previous_id else store.by_file_hash(digest, user, project)
+        if analysis_id:
+            log.info("♻️  Same file as an earlier analysis", extra={"analysis": analysis_id})
+            return {**store.result(analysis_id), "analysisId": analysis_id, "reusedFrom": [analysis_id]}
+    
+    if SHEET_ROUTING:
+        groups = sheets.group_pages(sheets.classify_pages(file_path))
+    else:
+        groups = [("general", list(range(sheets.page_count(file_path))))]
+    log.info(f"🗂️  Sheets: {', '.join(f'{t} ({len(p)})' for t, p in groups)}")
+    
+    reused: Dict[int, Any] = {}
+    revision = None
+    if previous_id:
+        prints = phash.Fingerprints(file_path)
+        before = store.page_hashes(previous_id)
+        # Only a page near an old one in pHash can be unchanged, so only those are digested now
+        digests = prints.digests(prints.near(before))
+        diff = phash.page_diff(store.page_digests(previous_id), digests, before, prints.hashes)
+        reused = store.reuse_from(previous_id, diff["unchanged"], groups)
+        revision = {
+            "previousAnalysisId": previous_id,
+            "pages": {
+                "unchanged": {new + 1: old + 1 for new, old in diff["unchanged"].items()},
+                **{key: [page + 1 for page in diff[key]] for key in ("changed", "added", "removed")},
+                "revises": {new + 1: old + 1 for new, old in diff["revises"].items()},
+            },
+        }
+    elif REUSE_ANALYSES:
+        prints = phash.Fingerprints(file_path)
+        reused = store.find_parts(prints.hashes, prints.digest, groups, user, project)
+    if REUSE_ANALYSES or previous_id:
+        # The stored analysis keeps every page's digest; the rest are hashed while the sheets are read
+        prints.prefetch()
+    if reused:
+        log.info(f"♻️  Reusing {len(reused)}/{len(groups)} sheet groups from earlier analyses")
+    if on_section:
+        for position, (_, result) in sorted(reused.items()):
+            for key, value in result.items():
+                on_section(groups[position][0], key, value)
+    
+    results = {position: result for position, (_, result) in reused.items()}
+    todo = [position for position in range(len(groups)) if position not in reused]
+    if len(groups) == 1 and todo:
+        results[0] = analyze_sheet(file_path, groups[0][0], on_section)
+    elif todo:
+        with tempfile.TemporaryDirectory() as out_dir:
+            files = [
+                sheets.write_pages(file_path, groups[position][1], os.path.join(out_dir, f"{position}.pdf"))
+                for position in todo
+            ]
+            with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+                types = [groups[position][0] for position in todo]
+                # Each sheet runs in its own copy of this context (account, and its sheet type)
+                contexts = [contextvars.copy_context() for _ in todo]
+                analysed = pool.map(
+                    lambda context, *args: context.run(analyze_sheet, *args),
+                    contexts, files, types, [on_section] * len(todo),
+                )
+                results.update(zip(todo, analysed))
+    
+    parts = [(t, pages, results[position]) for position, (t, pages) in enumerate(groups)]
+    result = sheets.merge(parts)
+    for position, (analysis_id, _) in reused.items():
+        result["sheets"][position]["reusedFrom"] = analysis_id
+    if reused:
+        result["reusedFrom"] = sorted({analysis_id for analysis_id, _ in reused.values()})
+    if revision:
+        revision["reanalysed"] = [groups[position][0] for position in todo]
+        result["revision"] = revision
+    
+    account = usage.current()
+    if account is not None and account.totals:
+        result["usage"] = account.summary()
+    
+    if (REUSE_ANALYSES or previous_id) and "error" not in result:
+        stored = [part for part in parts if "error" not in part[2]]
+        # What this run cost belongs to this run, not to the stored drawing
+        document = {key: value for key, value in result.items() if key not in ("reusedFrom", "revision", "usage")}
+        result["analysisId"] = store.save(
+            digest, prints.hashes, prints.digests(), stored, document,
+            user=user, project=project, model=GEMINI_MODEL, prompt_version=PROMPT_VERSION,
+            complete=len(stored) == len(parts),
+        )
+    return result
+
+def revision_diff(result: Dict[str, Any], previous_id: str) -> List[Dict[str, Any]]:
+    """Quantity changes of a revised analysis against the analysis it revises"""
+    from quantities import diff_quantities
+    from store import get_store
+    
+    previous = post_process(get_store().result(previous_id) or {})
+    return diff_quantities(previous.get("quantities") or {}, result.get("quantities") or {})
+
+def parse_file(
+    file_path: str,
+    previous_id: Optional[str] = None,
+    on_section: Optional[SectionCallback] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Parse file using Gemini only - no fallbacks.
+
+    ``previous_id`` re-analyses a revision of a stored analysis incrementally and
+    adds the quantity changes under ``revision.quantities``. Model requests are
+    billed to ``user``/``project`` and refused once the user's token budget is spent.
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
     
     # Validate file type
     ext = os.path.splitext(file_path)[1].lower()
-    supported_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
+    supported_extensions = list(CAPABILITIES)
     
     if ext not in supported_extensions:
         raise ValueError(f"Unsupported file type: {ext}. Supported types: {', '.join(supported_extensions)}")
     
-    print(f"🔍 Beginning Gemini analysis: {file_path}", file=sys.stderr)
+    usage.open_account(user, project)
+    usage.check(user)
+    # Outside the API (CLI, batch) each analysis is its own request
+    token = logs.bind(request=logs.ids().get("request") or logs.new_id())
+    log.info("🔍 Beginning Gemini analysis", extra={"file": os.path.basename(file_path)})
     
     try:
-        result = analyze_with_gemini(file_path)
+        result = post_process(analyze_by_sheet(file_path, previous_id, on_section, user, project))
+        if "revision" in result:
+            result["revision"]["quantities"] = revision_diff(result, previous_id)
         result["analysis_method"] = "gemini_ai"
         return result
     except Exception as e:
         # Re-raise with clear error message
         raise RuntimeError(f"Gemini analysis failed: {str(e)}")
+    finally:
+        metrics.save()
+        logs.reset(token)
+
+def parse_file_stream(
+    file_path: str,
+    previous_id: Optional[str] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """parse_file() as a stream of events: a "section" event per finished section, then "result" or "error".
+
+    Sections from different sheets arrive as each call produces them; a section
+    can repeat after a retry. The final result (merged, with quantities) is authoritative.
+    """
+    events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+    
+    def on_section(sheet_type: str, key: str, value: Any) -> None:
+        events.put({"event": "section", "sheet": sheet_type, "section": key, "data": value})
+    
+    def run() -> None:
+        try:
+            events.put({"event": "result", "data": parse_file(file_path, previous_id, on_section, user, project)})
+        except Exception as e:
+            events.put({"event": "error", "error": str(e)})
+        events.put(None)
+    
+    # In a copy of this context, so the request id goes along
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    while (event := events.get()) is not None:
+        yield event
 
 # CLI Entrypoint
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(json.dumps({"error": "Usage: python parser.py <file_path>"}))
+    args = sys.argv[1:]
+    if args and args[0] == "--batch":
+        # batch.py imports parser; hand it this module instead of loading it a second time
+        sys.modules.setdefault("parser", sys.modules[__name__])
+        import batch
+        sys.exit(batch.main(args[1:]))
+    stream = "--stream" in args
+    if stream:
+        args.remove("--stream")
+    options = {}
+    for name in ("--previous", "--user", "--project", "--request-id"):
+        if name in args[:-1]:
+            at = args.index(name)
+            options[name] = args[at + 1]
+            del args[at:at + 2]
+    previous_id = options.get("--previous")
+    user = options.get("--user")
+    project = options.get("--project")
+    # Set by the API, so the subprocess logs under the request it serves
+    logs.bind(request=options.get("--request-id"))
+    if len(args) != 1:
+        print(json.dumps({"error": "Usage: python parser.py <file_path> [--previous <analysis_id>] [--user <id>] [--project <id>] [--request-id <id>] [--stream] | --batch <inputs...> [--help]"}))
         sys.exit(1)
     
-    file_path = sys.argv[1]
+    file_path = args[0]
+    
+    if stream:
+        # One JSON event per line, flushed as soon as it exists (read by the streaming endpoint)
+        from responses import dumps
+        failed = False
+        for event in parse_file_stream(file_path, previous_id, user, project):
+            failed = event["event"] == "error"
+            sys.stdout.buffer.write(dumps(event) + b"\n")
+            sys.stdout.flush()
+        sys.exit(1 if failed else 0)
     
     try:
-        result = parse_file(file_path)
-        print(json.dumps(result, indent=2))
+        result = parse_file(file_path, previous_id, user=user, project=project)
+        # Compact, in one write: the API reads it straight back
+        from responses import dumps
+        sys.stdout.buffer.write(dumps(result) + b"\n")
+        sys.stdout.flush()
         sys.exit(0)
     except Exception as e:
         error_result = {"error": str(e)}
-        print(json.dumps(error_result, indent=2))
-        print(f"❌ ERROR: {e}", file=sys.stderr)
+        print(json.dumps(error_result))
+        log.error("❌ Analysis failed", extra={"error": str(e)})
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,218 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Perceptual hashes of drawing pages, for spotting re-exported sheets.
+
+Each page's small grayscale rendering from the raster cache is
+area-averaged to 32x32 and run through a 2D DCT; the 8x8 lowest frequencies
+(DC excluded) are thresholded at their median into a 64-bit hash. Re-exports with a new timestamp or
+metadata land within a few bits of the original. A BK-tree over the stored
+hashes answers "which analysed pages are within N bits of this one".
+
+A thumbnail hash cannot see a changed dimension or title, so a near match is
+only ever a candidate; pixel_digest() decides whether two pages are the same.
+Digesting a full-resolution page is costly, so Fingerprints digests a page
+when a candidate needs it and leaves the rest to a background pool.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+IMAGE_SIZE = 32
+HASH_SIZE = 8
+# Smallest cached level whose short side has at least this many pixels is area-averaged
+RENDER_SIZE = 128
+# Pages within this many differing bits (of 64) count as the same drawing
+MAX_DISTANCE = 6
+# hashlib releases the GIL on large buffers, so page digests run in threads
+DIGEST_WORKERS = min(4, os.cpu_count() or 1)
+
+@lru_cache(maxsize=None)
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis; X = D @ x @ D.T is the 2D transform"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    d = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    d[0] /= np.sqrt(2)
+    return d
+
+def _resize(image: np.ndarray, size: int) -> np.ndarray:
+    """Area-average an image down to size x size"""
+    rows = np.linspace(0, image.shape[0], size + 1).astype(int)[:-1]
+    columns = np.linspace(0, image.shape[1], size + 1).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(image, rows, axis=0), columns, axis=1)
+    counts = np.outer(np.diff(np.append(rows, image.shape[0])), np.diff(np.append(columns, image.shape[1])))
+    return sums / counts
+
+def phash(image: np.ndarray) -> int:
+    """64-bit perceptual hash of a grayscale image"""
+    pixels = _resize(np.asarray(image, dtype=np.float64), IMAGE_SIZE)
+    d = _dct_matrix(IMAGE_SIZE)
+    low = (d @ pixels @ d.T)[:HASH_SIZE, :HASH_SIZE].ravel()[1:]
+    bits = low > np.median(low)
+    return int(np.packbits(np.append(bits, False)).view(">u8")[0])
+
+def page_images(file_path: str) -> List[np.ndarray]:
+    """Low-resolution grayscale image of every page of a PDF or image, from the shared raster cache"""
+    import raster
+
+    return [pyramid.smallest(short_side=RENDER_SIZE) for pyramid in raster.pyramids(file_path)]
+
+def page_hashes(file_path: str) -> List[int]:
+    """pHash of every page of a file"""
+    return [phash(image) for image in page_images(file_path)]
+
+def pixel_digest(image: np.ndarray) -> str:
+    """SHA-256 of an image's size and pixels: equal only when every pixel is"""
+    digest = hashlib.sha256(f"{image.shape}".encode("ascii"))
+    digest.update(np.ascontiguousarray(image))
+    return digest.hexdigest()
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=DIGEST_WORKERS, thread_name_prefix="digest")
+        return _pool
+
+class Fingerprints:
+    """pHash (for finding similar pages) of every page of a file, and full-resolution pixel
+    digests (for proving them identical) computed once per page, when first asked for.
+    """
+
+    def __init__(self, file_path: str):
+        import raster
+
+        self.pyramids = raster.pyramids(file_path)
+        self.hashes: List[int] = [phash(pyramid.smallest(short_side=RENDER_SIZE)) for pyramid in self.pyramids]
+        self._digests: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def _submit(self, pages: Iterable[int]) -> Dict[int, Future]:
+        with self._lock:
+            for page in pages:
+                if page not in self._digests:
+                    self._digests[page] = _executor().submit(pixel_digest, self.pyramids[page].levels[0])
+            return {page: self._digests[page] for page in pages}
+
+    def digest(self, page: int) -> str:
+        return self._submit([page])[page].result()
+
+    def digests(self, pages: Optional[Iterable[int]] = None) -> List[Optional[str]]:
+        """Digest of each page, computed for the given pages (default: all) and None for the others"""
+        wanted = self._submit(range(len(self.hashes)) if pages is None else set(pages))
+        return [wanted[page].result() if page in wanted else None for page in range(len(self.hashes))]
+
+    def near(self, hashes: Iterable[int], radius: int = MAX_DISTANCE) -> List[int]:
+        """Pages within radius of any of the given hashes: the only ones that can be identical to those pages"""
+        hashes = list(hashes)
+        return [page for page, key in enumerate(self.hashes) if any(hamming(key, other) <= radius for other in hashes)]
+
+    def prefetch(self) -> None:
+        """Start digesting the remaining pages in the background (a stored analysis keeps every digest)"""
+        self._submit(range(len(self.hashes)))
+
+def page_fingerprints(file_path: str) -> Tuple[List[int], List[str]]:
+    """pHash and pixel digest of every page"""
+    prints = Fingerprints(file_path)
+    return prints.hashes, prints.digests()
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class BKTree:
+    """Burkhard-Keller tree over hashes under Hamming distance"""
+
+    def __init__(self, items: Iterable[Tuple[int, Any]] = ()):
+        # node = [hash, [values], {distance: child}]
+        self.root: Optional[list] = None
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key: int, value: Any) -> None:
+        if self.root is None:
+            self.root = [key, [value], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key: int, radius: int = MAX_DISTANCE) -> List[Tuple[int, Any]]:
+        """[(distance, value)] of every stored hash within radius, closest first"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= radius:
+                found.extend((distance, value) for value in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return sorted(found, key=lambda item: item[0])
+
+def page_diff(
+    before_digests: Sequence[Optional[str]],
+    after_digests: Sequence[str],
+    before_hashes: Sequence[int],
+    after_hashes: Sequence[int],
+    radius: int = MAX_DISTANCE,
+) -> Dict[str, Any]:
+    """Match the pages of a revised set to the previous one.
+
+    A page is "unchanged" only when its pixel digest equals an old page's (the
+    same position is preferred among equal pages). Of the rest, a new page is
+    paired with the closest remaining old page within ``radius`` pHash bits
+    (a sheet that moved and was edited), else with the unmatched old page at its
+    position; paired pages are "changed", and "revises" maps them to the old page.
+    Returns {"unchanged": {new: old}, "changed": [...], "revises": {new: old},
+    "added": [...], "removed": [...]}.
+    """
+    unchanged: Dict[int, int] = {}
+    taken = set()
+    for new, digest in enumerate(after_digests):
+        same = [old for old, known in enumerate(before_digests) if known is not None and known == digest and old not in taken]
+        if same:
+            old = new if new in same else same[0]
+            unchanged[new] = old
+            taken.add(old)
+
+    pairs = sorted(
+        (hamming(after_hashes[new], before_hashes[old]), new, old)
+        for new in range(len(after_hashes)) if new not in unchanged
+        for old in range(len(before_hashes)) if old not in taken
+        if hamming(after_hashes[new], before_hashes[old]) <= radius
+    )
+    revises: Dict[int, int] = {}
+    for _, new, old in pairs:
+        if new not in revises and old not in taken:
+            revises[new] = old
+            taken.add(old)
+    for new in range(len(after_digests)):
+        if new not in unchanged and new not in revises and new < len(before_digests) and new not in taken:
+            revises[new] = new
+            taken.add(new)
+    return {
+        "unchanged": unchanged,
+        "changed": sorted(revises),
+        "revises": dict(sorted(revises.items())),
+        "added": [new for new in range(len(after_digests)) if new not in unchanged and new not in revises],
+        "removed": [old for old in range(len(before_digests)) if old not in taken],
+    }
@@ -0,0 +1,285 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Prompt/model regression harness.
+
+Runs a fixed corpus of plans through ``call_gemini`` for every prompt x model
+variant and prints a comparison table of token counts, time-to-first-token,
+latency, hedge and retry rates, schema pass rate and key wall dimensions.
+
+    # live run, saving responses so CI can replay them
+    python prompt_bench.py corpus/ --prompt current --prompt short=prompts/short.txt \\
+        --model gemini-2.5-flash-lite --model gemini-2.5-flash --record recordings/
+
+    # CI: no network, replays the recorded responses
+    python prompt_bench.py corpus/ --replay recordings/ --min-pass-rate 0.9
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import parser as plan_parser
+from validation import schema_errors
+
+CORPUS_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png'}
+
+KEY_FIELDS = [
+    ("wallDimensions", "externalWallPerimiter"),
+    ("wallDimensions", "internalWallPerimiter"),
+    ("wallDimensions", "externalWallHeight"),
+    ("wallDimensions", "internalWallHeight"),
+    (None, "totalArea"),
+]
+
+def file_sha256(path: str) -> str:
+    """Content hash used to key recordings"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def variant_key(prompt: str, model_name: str) -> str:
+    """Stable directory name for a prompt/model pair"""
+    return f"{model_name}-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]}"
+
+def load_corpus(path: str) -> List[str]:
+    """List plan files in a corpus directory (or a single file)"""
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for name in sorted(os.listdir(path)):
+        if os.path.splitext(name)[1].lower() in CORPUS_EXTENSIONS:
+            files.append(os.path.join(path, name))
+    return files
+
+def parse_prompt_spec(spec: str) -> Tuple[str, str]:
+    """'current', 'full', 'compact' or 'name=path/to/prompt.txt' -> (name, prompt text)"""
+    builtin = {
+        "current": plan_parser.ANALYSIS_PROMPT,
+        "full": plan_parser.GEMINI_PROMPT,
+        "compact": plan_parser.COMPACT_PROMPT,
+    }
+    if spec in builtin:
+        return spec, builtin[spec]
+    if "=" not in spec:
+        raise ValueError(f"Prompt variant must be current, full, compact or NAME=PATH, got: {spec}")
+    name, path = spec.split("=", 1)
+    with open(path, 'r', encoding='utf-8') as f:
+        return name, f.read()
+
+def extract_fields(result: Any) -> Dict[str, Optional[float]]:
+    """Pull the key numeric fields out of a result document"""
+    fields = {}
+    for section, key in KEY_FIELDS:
+        source = result.get(section, {}) if section and isinstance(result, dict) else result
+        value = source.get(key) if isinstance(source, dict) else None
+        try:
+            fields[key] = float(value)
+        except (TypeError, ValueError):
+            fields[key] = None
+    return fields
+
+def run_live(file_path: str, prompt: str, model_name: str) -> Dict[str, Any]:
+    """Analyze one file against the real API and collect stats.
+
+    TTFT and latency are timed around the whole call_gemini, so a hedge that won or a retry
+    after a failed attempt counts against the variant; "hedged" and "attempts" record which.
+    """
+    stats: Dict[str, Any] = {}
+    first_chunk: List[float] = []
+    started = time.perf_counter()
+
+    def new_reader():
+        def on_chunk(text: str) -> None:
+            if not first_chunk:
+                first_chunk.append(time.perf_counter() - started)
+        return on_chunk
+
+    try:
+        response = plan_parser.call_gemini(file_path, prompt, model_name=model_name, stats=stats, new_reader=new_reader)
+        result = plan_parser.check_gemini_result(response)
+        error = None
+    except Exception as e:
+        result, error = None, str(e)
+    stats["latency"] = time.perf_counter() - started
+    stats["ttft"] = first_chunk[0] if first_chunk else None
+    return {"stats": stats, "result": result, "error": error}
+
+def run_replay(recording_path: str) -> Dict[str, Any]:
+    """Re-score a recorded response without touching the network"""
+    with open(recording_path, 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    try:
+        result = plan_parser.check_gemini_result(plan_parser.parse_gemini_text(stats.get("text", "")))
+        error = None
+    except Exception as e:
+        result, error = None, str(e)
+    return {"stats": stats, "result": result, "error": error}
+
+def score(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a raw run into a row for the comparison table"""
+    stats = run["stats"]
+    errors = [run["error"]] if run["error"] else schema_errors(run["result"])
+    return {
+        "ok": not errors,
+        "errors": errors,
+        "input_tokens": stats.get("input_tokens"),
+        "output_tokens": stats.get("output_tokens"),
+        "ttft": stats.get("ttft"),
+        "latency": stats.get("latency"),
+        "attempts": stats.get("attempts"),
+        "retries": stats["attempts"] - 1 if stats.get("attempts") else None,
+        "hedged": stats.get("hedged"),
+        "fields": extract_fields(run["result"]) if run["result"] else {},
+    }
+
+def run_bench(
+    files: List[str],
+    prompts: List[Tuple[str, str]],
+    models: List[str],
+    replay_dir: Optional[str] = None,
+    record_dir: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Run every file through every variant; returns {variant: {"rows": {file: row}, ...}}"""
+    hashes = {path: file_sha256(path) for path in files}
+    variants = {}
+    for prompt_name, prompt in prompts:
+        for model_name in models:
+            name = f"{prompt_name}@{model_name}"
+            key = variant_key(prompt, model_name)
+            rows = {}
+            for path in files:
+                label = os.path.basename(path)
+                if replay_dir:
+                    recording = os.path.join(replay_dir, key, f"{hashes[path]}.json")
+                    if not os.path.exists(recording):
+                        print(f"⚠️  No recording for {label} under {name}", file=sys.stderr)
+                        rows[label] = None
+                        continue
+                    run = run_replay(recording)
+                else:
+                    print(f"🔄 {name}: {label}", file=sys.stderr)
+                    run = run_live(path, prompt, model_name)
+                    if record_dir:
+                        out_dir = os.path.join(record_dir, key)
+                        os.makedirs(out_dir, exist_ok=True)
+                        with open(os.path.join(out_dir, f"{hashes[path]}.json"), 'w', encoding='utf-8') as f:
+                            json.dump(run["stats"], f)
+                rows[label] = score(run)
+            variants[name] = {"key": key, "prompt_chars": len(prompt), "rows": rows}
+    return variants
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.fmean(values) if values else None
+
+def _percentile(values: List[Optional[float]], pct: float) -> Optional[float]:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def summarize(variants: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aggregate per-variant rows; field drift is measured against the first variant"""
+    baseline = next(iter(variants.values()))["rows"] if variants else {}
+    summary = []
+    for name, variant in variants.items():
+        rows = [r for r in variant["rows"].values() if r is not None]
+        drift = []
+        for label, row in variant["rows"].items():
+            base = baseline.get(label)
+            if not row or not base:
+                continue
+            for _, key in KEY_FIELDS:
+                a, b = row["fields"].get(key), base["fields"].get(key)
+                if a is not None and b:
+                    drift.append(abs(a - b) / abs(b))
+        summary.append({
+            "variant": name,
+            "prompt_chars": variant["prompt_chars"],
+            "files": len(rows),
+            "missing": len(variant["rows"]) - len(rows),
+            "pass_rate": sum(r["ok"] for r in rows) / len(rows) if rows else None,
+            "input_tokens": _mean([r["input_tokens"] for r in rows]),
+            "output_tokens": _mean([r["output_tokens"] for r in rows]),
+            "ttft_p50": _percentile([r["ttft"] for r in rows], 50),
+            "latency_p50": _percentile([r["latency"] for r in rows], 50),
+            "latency_p95": _percentile([r["latency"] for r in rows], 95),
+            "hedged": _mean([None if r.get("hedged") is None else float(r["hedged"]) for r in rows]),
+            "retries": _mean([r.get("retries") for r in rows]),
+            "field_drift": _mean(drift),
+            "fields": {key: _mean([r["fields"].get(key) for r in rows]) for _, key in KEY_FIELDS},
+        })
+    return summary
+
+def format_table(summary: List[Dict[str, Any]]) -> str:
+    """Render the summary as a plain-text comparison table"""
+    columns = [
+        ("variant", "variant", "{}"),
+        ("prompt_chars", "prompt chars", "{:.0f}"),
+        ("files", "files", "{}"),
+        ("pass_rate", "pass", "{:.0%}"),
+        ("input_tokens", "in tok", "{:.0f}"),
+        ("output_tokens", "out tok", "{:.0f}"),
+        ("ttft_p50", "ttft p50", "{:.2f}s"),
+        ("latency_p50", "lat p50", "{:.2f}s"),
+        ("latency_p95", "lat p95", "{:.2f}s"),
+        ("hedged", "hedged", "{:.0%}"),
+        ("retries", "retries", "{:.2f}"),
+        ("field_drift", "drift", "{:.1%}"),
+    ] + [(key, key, "{:.2f}") for _, key in KEY_FIELDS]
+
+    def cell(row, key, fmt):
+        value = row.get(key, row["fields"].get(key))
+        return "-" if value is None else fmt.format(value)
+
+    table = [[title for _, title, _ in columns]]
+    table += [[cell(row, key, fmt) for key, _, fmt in columns] for row in summary]
+    widths = [max(len(r[i]) for r in table) for i in range(len(columns))]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(r, widths)) for r in table]
+    lines.insert(1, "  ".join("-" * w for w in widths))
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Compare prompt/model variants on a fixed plan corpus")
+    ap.add_argument("corpus", help="Directory of plan files (pdf/jpg/png) or a single file")
+    ap.add_argument("--prompt", action="append", default=[], help="current, full, compact or NAME=PATH (repeatable)")
+    ap.add_argument("--model", action="append", default=[], help="Model name (repeatable)")
+    ap.add_argument("--replay", help="Score recorded responses from this directory instead of calling the API")
+    ap.add_argument("--record", help="Save live responses to this directory for later replay")
+    ap.add_argument("--json", help="Also write the full per-file results to this path")
+    ap.add_argument("--min-pass-rate", type=float, help="Exit non-zero if any variant falls below this pass rate")
+    args = ap.parse_args(argv)
+
+    files = load_corpus(args.corpus)
+    if not files:
+        print(f"❌ No plan files found in {args.corpus}", file=sys.stderr)
+        return 1
+
+    prompts = [parse_prompt_spec(spec) for spec in (args.prompt or ["current"])]
+    models = args.model or [plan_parser.GEMINI_MODEL]
+    variants = run_bench(files, prompts, models, replay_dir=args.replay, record_dir=args.record)
+    summary = summarize(variants)
+    print(format_table(summary))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"variants": variants, "summary": summary}, f, indent=2)
+
+    if args.min_pass_rate is not None:
+        failing = [s["variant"] for s in summary if s["pass_rate"] is None or s["pass_rate"] < args.min_pass_rate]
+        if failing:
+            print(f"❌ Pass rate below {args.min_pass_rate:.0%}: {', '.join(failing)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,939 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import compact
+
+# What to extract and how to read the drawings
+PROMPT_INSTRUCTIONS = """
+You are an expert architectural AI analyzing construction drawings and plans with extreme attention to detail.
+(Keep output EXACTLY as JSON matching the requested schema. If no walls detected, respond with {"error":"No walls found"}.)
+
+Analyze this construction document and extract ALL available information about:
+
+### 🏗️ WALL STRUCTURE IDENTIFICATION:
+- Calculate the TOTAL EXTERNAL WALL PERIMETER of the building footprint in meters
+- Calculate the TOTAL INTERNAL WALL PERIMETER in meters  
+- Identify the EXTERNAL WALL HEIGHT from ground to slab level
+- Identify the INTERNAL WALL HEIGHT from ground to slab level
+- Create wall sections categorized as "external" or "internal"
+- For each wall section, identify and list all doors and windows with their properties
+- Pay special attention to door and window schedules or labels (like DOO-001, WD-012, etc.)
+- Count doors and windows per section type
+
+**Plumbing:**
+- Name systems, pipe materials, fixtures and quality in plain construction terms (e.g. "cold water", "uPVC", "WC", "wash basin"); they are mapped to the calculator values locally
+- Fixture "location" must be the name of the room it is in, as listed in "rooms"
+- Pipe lengths are routed locally from the fixture positions: give pipe material and diameter, not lengths
+
+**Electrical:**
+- Name systems, cable, outlet, lighting and installation types in plain terms (e.g. "sockets", "twin and earth", "LED downlight"); they are mapped to the calculator values locally
+- Outlet ratings in amperes and lamp wattages as numbers
+- Outlet and lighting "location" must be the name of the room they are in, as listed in "rooms"
+- Cable runs are routed locally from the outlet and light positions: give cable type and size, not lengths
+
+**Reinforcement:** 
+- Element: slab, beam, column, raft foundation, strip footing or tank
+- Bar sizes in standard notation (D12, Y12, T12, R6); they are mapped to the calculator sizes locally
+- ReinforcementType = "individual_bars" | "mesh";
+- FootingType = "isolated" | "strip" | "combined";
+- MeshGrade = "A98" | "A142" | "A193" | "A252" | "A393" | "B196" | "B283" | "B385" | "B503" | "B785" | "C283" | "C385";
+- Mesh weights and sheet layout are calculated locally: only give meshSheetWidth/meshSheetLength/meshLapLength if they are shown on the drawing.
+- TankType: septic, underground, overhead, water or circular
+- TankWallType = "walls" | "base" | "cover" | "all";
+- RetainingWallType = "cantilever" | "gravity" | "counterfort";
+- Be definite between the reinforcement types, eg either mesh or individual_bars
+- If you find both reinforcement types, create two individual entries for each with the correct type
+
+### DETAILED REINFORCEMENT EXTRACTION BY ELEMENT TYPE:
+
+**For Strip Footings and Raft Foundations:**
+- Extract longitudinalBars: Main bars running along the length (string format: "D12" for bar size or "D12@150" for bar size and spacing)
+- Extract transverseBars: Distribution bars across width (string format)
+- Extract topReinforcement: Top layer reinforcement specification
+- Extract bottomReinforcement: Bottom layer reinforcement specification
+- footingType: Must be "strip", "isolated", or "combined"
+- Include mainBarSpacing, distributionBarSpacing in mm (e.g., "150", "200")
+
+**For Retaining Walls:**
+- retainingWallType: MUST be "cantilever", "gravity", or "counterfort"
+- heelLength: Length of heel in meters (e.g., "0.5")
+- toeLength: Length of toe in meters (e.g., "0.5")
+- Stem reinforcement:
+  - stemVerticalBarSize: Vertical bar size (e.g., "D12", "D10")
+  - stemHorizontalBarSize: Horizontal bar size (e.g., "D10", "D8")
+  - stemVerticalSpacing: Vertical bar spacing in mm (e.g., "150")
+  - stemHorizontalSpacing: Horizontal bar spacing in mm (e.g., "200")
+- Base reinforcement (same structure as footings): 
+  - baseMainBarSize, baseDistributionBarSize
+  - baseMainSpacing, baseDistributionSpacing
+
+**For Beams:**
+- mainBarsCount: Number of main bars (e.g., "4", "6")
+- distributionBarsCount: Number of distribution/shear reinforcement bars
+- stirrupSpacing: Stirrup spacing in mm (e.g., "100", "150", "200")
+- stirrupSize: Stirrup bar size (e.g., "D8", "D6")
+- mainBarSpacing: Spacing of main bars (if continuous layout)
+
+**For Columns:**
+- mainBarsCount: Number of longitudinal bars (e.g., "4", "6", "8", "12")
+- tieSpacing: Column tie/link spacing in mm (e.g., "150", "200", "250")
+- tieSize: Tie bar size (e.g., "D6", "D8", "D10")
+- mainBarSize: Longitudinal bar size
+- columnHeight: Height of column in meters
+
+**For Slabs:**
+- mainBarSize: Bottom layer main bars
+- distributionBarSize: Bottom layer distribution bars
+- mainBarSpacing: Main bar spacing in mm
+- distributionBarSpacing: Distribution bar spacing in mm
+- slabLayers: Number of reinforcement layers ("1" for single, "2" for double)
+- If slabLayers > 1, also provide top layer reinforcement (use topReinforcement field)
+
+**For Tanks:**
+- All basic fields PLUS tank-specific reinforcement (wall, base, cover separately)
+- Ensure corresponding concrete tank exists
+- Tank reinforcement may include vertical and horizontal directions
+
+**Equipment:**
+- Standard equipment types and their respective id = Bulldozer:15846932-db16-4a28-a477-2e4b2e1e42d5, Concrete Mixer:3203526d-fa51-4878-911b-477b2b909db5, Generator: 32c2ea0f-be58-47f0-bdcd-3027099eac4b, Water Pump:598ca378-6eb3-451f-89ea-f45aa6ecece8, Crane: d4665c7d-6ace-474d-8282-e888b53e7b48, Compactoreb80f645-6450-4026-b007-064b5f15a72a, Excavator:ef8d17ca-581d-4703-b200-17395bbe1c51
+
+**Roofing:**
+- Name the roof type, covering, underlayment, insulation, timber members and accessory materials in plain terms (e.g. "hipped", "iron sheets", "galvanised gutter"); they are mapped to the calculator values locally
+- Timber sizes as width x depth in mm (e.g. "100x50")
+- Roof areas, ridge/hip/valley lengths, timber quantities and lengths, gutter, fascia and downpipe runs are calculated locally from the footprint: extract the roof type, material, pitch (degrees), eavesOverhang (m) and timber sizes/spacing shown on the drawing
+
+**Finishes:**
+- Categories: "flooring", "ceiling", "wall-finishes",  "joinery"
+- Only use these specified categories: skip glass, blocks, anyting to do with masonry or glass etc that are not in this list
+- Name materials plainly (e.g. "ceramic floor tiles", "gypsum ceiling"); they are mapped to the common options per category locally
+
+**Concrete & Structure:**
+- Category = "substructure" | "superstructure";
+- If we have a concrete item, ensure there is a corresponding reinforcement item extracted as well, and vice versa
+- Element: the structural element in plain terms (slab, ring beam, septic tank, soak pit, ...); it is mapped to the calculator elements locally
+
+- FoundationStep {
+  id: string;
+  length: string;
+  width: string;
+  depth: string;
+  offset: string;
+}
+
+- ConnectionDetails {
+  lapLength?: number;
+  developmentLength?: number;
+  hookType?: "standard" | "seismic" | "special";
+  spliceType?: "lap" | "mechanical" | "welded";
+}
+
+- WaterproofingDetails {
+  includesDPC: boolean;
+  dpcWidth?: string;
+  dpcMaterial?: string;
+  includesPolythene: boolean;
+  polytheneGauge?: string;
+  includesWaterproofing: boolean;
+  waterproofingType?: "bituminous" | "crystalline" | "membrane";
+}
+
+- SepticTankDetails {
+  capacity: string;
+  numberOfChambers: number;
+  wallThickness: string;
+  baseThickness: string;
+  coverType: "slab" | "precast" | "none";
+  depth: string;
+  includesBaffles: boolean;
+  includesManhole: boolean;
+  manholeSize?: string;
+}
+
+- UndergroundTankDetails {
+  capacity: string;
+  wallThickness: string;
+  baseThickness: string;
+  coverType: "slab" | "precast" | "none";
+  includesManhole: boolean;
+  manholeSize?: string;
+  waterProofingRequired: boolean;
+}
+
+- SoakPitDetails {
+  diameter: string;
+  depth: string;
+  wallThickness: string;
+  baseThickness: string;
+  liningType: "brick" | "concrete" | "precast";
+  includesGravel: boolean;
+  gravelDepth?: string;
+  includesGeotextile: boolean;
+}
+
+- SoakawayDetails {
+  length: string;
+  width: string;
+  depth: string;
+  wallThickness: string;
+  baseThickness: string;
+  includesGravel: boolean;
+  gravelDepth?: string;
+  includesPerforatedPipes: boolean;
+}
+- Rebar sizes follow standard notation (e.g., "D10", "D12")
+- Mixes to follow ratios eg 1:2:4, 1:2:3
+- Notations C25 or C20 e.t.c, to be changed into their corresponding mixes for C:S:B(cement, sand, ballast)
+- Note that the provided file contains information about one building from different perspectives (e.g plan, section, elevation etc). Use all the information available to provide the most accurate dimensions and details
+- Ensure accuracy on measuring the wall perimeters and heights
+- If you create a concrete item, make sure there is a corresponding reinforcement item extracted as well, and vice versa
+
+### 📐 WALL DIMENSION EXTRACTION:
+- Calculate EXTERNAL WALL PERIMETER: sum of all exterior wall lengths in meters
+- Calculate INTERNAL WALL PERIMETER: sum of all interior partition wall lengths in meters
+- Extract EXTERNAL WALL HEIGHT: distance from ground to roof level in meters
+- Extract INTERNAL WALL HEIGHT: distance from ground to roof level for interior walls in meters
+- Look for dimension lines, labels, or grid references on the plan
+- Use external dimensions marked on the drawing
+- Convert all measurements to meters (mm values should be divided by 1000)
+- Pay attention to dimension strings and annotation
+
+### 🚪 DOOR & WINDOW SPECIFICATIONS IN WALLS:
+- Identify all doors: types, sizes, frame types, and counts
+- Identify all windows: glass types, sizes, frame types, and counts
+- Look for door/window schedules or symbols (like DOO-001, WD-012, etc.)
+- Note whether openings are in external or internal walls
+- We can only have two inputs for wall sections: "external" and "internal", we cannot have multiple wall sections of the same type, only one wall section with all its doors and windows listed
+- Count the total number of each type per wall section
+- standardDoorSizes = ["0.9 × 2.1 m", "1.0 × 2.1 m", "1.2 × 2.4 m"]
+- standardWindowSizes = ["1.2 × 1.2 m", "1.5 × 1.2 m", "2.0 × 1.5 m"]
+
+### 🏗️ CONSTRUCTION DETAILS:
+- Note wall thicknesses if specified
+- Identify floor levels (single story, multi-story)
+- Look for any construction notes or specifications
+- Note any special features like fireplaces, built-in cabinets, etc.
+- If a room cannot be plasters for whatever reason, mark as "None"
+- Do not assume any dimensions, only extract what is visible on the drawings
+- Only extract primary measurements. Do not calculate net wall, block, mortar, plaster or painting quantities; they are computed from your perimeters, heights and openings
+
+### 🏠 ROOMS:
+- List every room with its name and internal length and width in meters (read from the room dimensions or the grid)
+- If a room is not rectangular, give its floor area and the length/width of its bounding rectangle
+- Give x and y: the position of the room's lower-left corner in meters from the footprint origin [0, 0], with length along x and width along y
+
+### 📏 FOOTPRINT:
+- Give the outline of the external walls as "footprint": a list of [x, y] corners in meters, in order around the building, starting at [0, 0]
+- Read the corners from the overall dimension strings; a rectangular building has 4 corners
+
+### 🏗️ FOUNDATION AND CONSTRUCTION DETAILS: 
+# - Determine the **TOTAL EXTERNAL PERIMETER** of the building footprint in meters. 
+# - Identify the specified **FOUNDATION TYPE** (e.g., Strip Footing, Raft). 
+# - All concrete elements will need their reinforcement counterparts extracted as well.
+# - Identify the material used for the foundation wall/plinth level, specifically the **MASONRY TYPE** (e.g., Block Wall, Rubble Stone). 
+# - Extract the **MASONRY WALL THICKNESS** (e.g., 0.2m). 
+# - Extract the approximate **MASONRY WALL HEIGHT** from the top of the footing to the slab level (e.g., 1.0m).
+
+### 🧱 FOUNDATION WALLING DETAILS:
+Foundation walling refers to the masonry walls built on top of the foundation (above the strip footing or raft). Extract:
+- **Wall Type**: "external" or "internal" (external walls are perimeter walls, internal walls are partition walls)
+- **Block Dimensions**: Standard block sizes in format "LxHxT" (Length x Height x Thickness in meters):
+  - "0.2x0.2x0.2" (Large Block: 200×200×200mm)
+  - "0.15x0.2x0.15" (Standard Block: 150×200×150mm)
+  - "0.1x0.2x0.1" (Small Block: 100×200×100mm)
+- **Block Thickness** (wall thickness in mm): 100, 150, 200, 250, or 300
+- **Wall Length** (meters): Total length of the wall section
+- **Wall Height** (meters): Height from foundation top to slab level
+- **Number of Walls**: Count of identical walls (e.g., 4 external walls may have 2 different lengths)
+- **Mortar Ratio**: Cement to sand ratio - "1:3", "1:4", "1:5", or "1:6"
+- Create separate entries for external and internal walls with different characteristics
+- Use perimeter dimensions and extracted heights for calculation
+
+"""
+
+# Full output schema, exactly as the frontend reads it
+OUTPUT_SCHEMA = """### 📤 OUTPUT REQUIREMENTS:
+Only use the materials specified above strictly.
+Return ONLY valid JSON with this structure. Use reasonable estimates if exact dimensions aren't visible.
+
+{
+  "wallDimensions": {
+    "externalWallPerimiter": 50.5,
+    "internalWallPerimiter": 35.2,
+    "externalWallHeight": 3.0,
+    "internalWallHeight": 2.7
+  },
+  "wallSections": [
+    {
+      "type": "external",
+      "blockType": "Standard Block" | "Large Block" | "Small Block",
+      "thickness": 0.2,
+      "plaster": "Both Sides",
+      "doors": [
+        {
+          "sizeType": "standard",
+          "standardSize": "0.9 × 2.1 m",
+          "custom": {
+            "height": "2.1",
+            "width": "0.9",
+            "price": ""
+          },
+          "type": "Panel",
+          "frame": {
+            "type": "Wood",
+            "sizeType": "standard",
+            "standardSize": "0.9 × 2.1 m",
+            "height": "2.1",
+            "width": "0.9",
+            "custom": {
+              "height": "2.1",
+              "width": "0.9",
+              "price": ""
+            }
+          },
+          "count": 1,
+          "price": 0
+        }
+      ],
+      "windows": [
+        {
+          "sizeType": "standard",
+          "standardSize": "1.2 × 1.2 m",
+          "custom": {
+            "height": "1.2",
+            "width": "1.2",
+            "price": ""
+          },
+          "glass": "Clear",
+          "frame": {
+            "type": "Steel",
+            "sizeType": "standard",
+            "standardSize": "1.2 × 1.2 m",
+            "height": "1.2",
+            "width": "1.2",
+            "custom": {
+              "height": "1.2",
+              "width": "1.2",
+              "price": ""
+            }
+          },
+          "count": 2,
+          "price": 0
+        }
+      ]
+    },
+    {
+      "type": "internal",
+      "blockType": "Standard Block" | "Large Block" | "Small Block",
+      "thickness": 0.2,
+      "plaster": "Both Sides",
+      "doors": [
+        {
+          "sizeType": "standard",
+          "standardSize": "0.9 × 2.1 m",
+          "custom": {
+            "height": "2.1",
+            "width": "0.9",
+            "price": ""
+          },
+          "type": "Panel",
+          "frame": {
+            "type": "Wood",
+            "sizeType": "standard",
+            "standardSize": "0.9 × 2.1 m",
+            "height": "2.1",
+            "width": "0.9",
+            "custom": {
+              "height": "2.1",
+              "width": "0.9",
+              "price": ""
+            }
+          },
+          "count": 5,
+          "price": 0
+        }
+      ],
+      "windows": []
+    }
+  ],
+  "wallProperties": {
+    "blockType": "Standard Block" | "Large Block" | "Small Block",
+    "thickness": 0.2,
+    "plaster": "Both Sides"
+  },
+  "floors": 1,
+  "foundationDetails": { 
+    "foundationType": "Strip Footing", 
+    "totalPerimeter": 50.5, // Total length of all exterior foundation walls in meters 
+    "masonryType": "Standard Block" | "Large Block" | "Small Block", // e.g., "Standard Block", "Rubble Stone" 
+    "wallThickness": "0.200", // Thickness of the block/stone wall in meters
+    "wallHeight": "1.0", // Height of the block/stone wall in meters 
+    "blockDimensions": "0.400 x 0.200 x 0.200" // L x W x H in meters (optional) 
+    "height": "1.0" // Depth or height of the foundation
+    "length": "5.0" // Length of the foundation
+    "width"" "6.0" //Width of the foundation
+  },
+  "foundationWalling": [
+    {
+      "id": "fwall-external-01",
+      "type": "external",
+      "blockDimensions": "0.2x0.2x0.2",
+      "blockThickness": "200",
+      "wallLength": "12.5",
+      "wallHeight": "1.0",
+      "numberOfWalls": 2,
+      "mortarRatio": "1:4"
+    },
+    {
+      "id": "fwall-internal-01",
+      "type": "internal",
+      "blockDimensions": "0.15x0.2x0.15",
+      "blockThickness": "150",
+      "wallLength": "8.0",
+      "wallHeight": "1.0",
+      "numberOfWalls": 1,
+      "mortarRatio": "1:4"
+    }
+  ], 
+  "projectType": "residential" | "commercial" | "industrial" | "institutional",
+  "floors": number,
+  "totalArea": number,
+  "houseType": "bungalow" | "mansionate",
+  "description": string
+  "projectName": string,
+  "projectLocation": string,
+  "rooms": [
+    { "name": "Living Room", "length": 5.2, "width": 4.0, "area": 20.8, "x": 0, "y": 0 }
+  ],
+  "footprint": [[0, 0], [12.0, 0], [12.0, 8.5], [0, 8.5]],
+  
+  "earthworks": [ {
+      "id": "excavation-01",
+      "type": "foundation-excavation",
+      "length": "15.5",
+      "width": "10.2", 
+      "depth": "1.2",
+      "volume": "189.72",
+      "material": "soil"
+    } 
+  ],
+  "concreteStructures": [
+    {
+      id:string;
+      name: string;
+      element: ElementType;
+      length: string;
+      width: string;
+      height: string;
+      mix: string;
+      formwork?: string;
+      category: Category;
+      number: string;
+      hasConcreteBed?: boolean;
+      verandahArea: number;
+      slabArea?: number;
+      bedDepth?: string;
+      hasAggregateBed?: boolean;
+      aggregateDepth?: string;
+      hasMasonryWall?: boolean;
+      masonryBlockType?: string;
+      masonryBlockDimensions?: string;
+      masonryWallThickness?: string;
+      masonryWallHeight?: string;
+      masonryWallPerimeter?: number;
+      foundationType?: string;
+      clientProvidesWater?: boolean;
+      cementWaterRatio?: string;
+
+      isSteppedFoundation?: boolean;
+      foundationSteps?: FoundationStep[];
+      totalFoundationDepth?: string;
+
+      waterproofing?: WaterproofingDetails;
+
+      reinforcement?: {
+        mainBarSize?: RebarSize;
+        mainBarSpacing?: string;
+        distributionBarSize?: RebarSize;
+        distributionBarSpacing?: string;
+        connectionDetails?: ConnectionDetails;
+      };
+
+      staircaseDetails?: {
+        riserHeight?: number;
+        treadWidth?: number;
+        numberOfSteps?: number;
+      };
+
+      tankDetails?: {
+        capacity?: string;
+        wallThickness?: string;
+        coverType?: string;
+      };
+
+      septicTankDetails?: SepticTankDetails;
+      undergroundTankDetails?: UndergroundTankDetails;
+      soakPitDetails?: SoakPitDetails;
+      soakawayDetails?: SoakawayDetails;
+    }
+  ],
+  "reinforcement":[
+    {
+      id?: string;
+      element: ElementTypes;
+      name: string;
+      length: string;
+      width: string;
+      depth: string;
+      columnHeight?: string;
+      mainBarSpacing?: string;
+      distributionBarSpacing?: string;
+      mainBarsCount?: string;
+      distributionBarsCount?: string;
+      slabLayers?: string;
+      mainBarSize?: RebarSize;
+      distributionBarSize?: RebarSize;
+      stirrupSize?: RebarSize;
+      tieSize?: RebarSize;
+      stirrupSpacing?: string;
+      tieSpacing?: string;
+      category?: Category;
+      number?: string;
+      reinforcementType?: ReinforcementType;
+      meshGrade?: string;
+      meshSheetWidth?: string;
+      meshSheetLength?: string;
+      meshLapLength?: string;
+      footingType?: FootingType;
+      longitudinalBars?: string;
+      transverseBars?: string;
+      topReinforcement?: string;
+      bottomReinforcement?: string;
+      retainingWallType?: RetainingWallType;
+      heelLength?: string;
+      toeLength?: string;
+      stemVerticalBarSize?: RebarSize;
+      stemHorizontalBarSize?: RebarSize;
+      stemVerticalSpacing?: string;
+      stemHorizontalSpacing?: string;
+    },
+    {
+      "id": "unique-id-6",
+      "element": "tank",
+      "name": "Septic Tank ST1",
+      "length": "3.0",
+      "width": "2.0",
+      "depth": "1.8",
+      "columnHeight": "",
+      "mainBarSpacing": "",
+      "distributionBarSpacing": "",
+      "mainBarsCount": "",
+      "distributionBarsCount": "",
+      "slabLayers": "",
+      "mainBarSize": "D12",
+      "distributionBarSize": "D10",
+      "stirrupSize": "",
+      "tieSize": "",
+      "stirrupSpacing": "",
+      "tieSpacing": "",
+      "category": "substructure",
+      "number": "1",
+      "reinforcementType": "individual_bars",
+      "meshGrade": "",
+      "meshSheetWidth": "",
+      "meshSheetLength": "",
+      "meshLapLength": "",
+      "footingType": "",
+      "longitudinalBars": "",
+      "transverseBars": "",
+      "topReinforcement": "",
+      "bottomReinforcement": "",
+      "tankType": "septic",
+      "tankShape": "rectangular",
+      "wallThickness": "0.2",
+      "baseThickness": "0.2",
+      "coverThickness": "0.15",
+      "includeCover": true,
+      "wallVerticalBarSize": "D12",
+      "wallHorizontalBarSize": "D10",
+      "wallVerticalSpacing": "150",
+      "wallHorizontalSpacing": "200",
+      "baseMainBarSize": "D12",
+      "baseDistributionBarSize": "D10",
+      "baseMainSpacing": "150",
+      "baseDistributionSpacing": "200",
+      "coverMainBarSize": "D10",
+      "coverDistributionBarSize": "D8",
+      "coverMainSpacing": "200",
+      "coverDistributionSpacing": "250"
+    },
+  ],
+  "equipment":{
+    "equipmentData": {
+      "standardEquipment": [
+        {
+          "id": "equip_001",
+          "name": "Excavator",
+          "description": "Heavy-duty excavator for digging and earthmoving",
+          "usage_unit": "day",
+          "usage_quantity": 1 // number of days, weeks, hours etc to be used,
+          "category": "earthmoving"
+        },
+      ],
+      "customEquipment": [
+        {
+          "equipment_type_id": "custom_001",
+          "name": "Specialized Drilling Rig",
+          "desc": "Custom drilling equipment for foundation work",
+          "usage_unit": "week",
+          "usage_quantity": 1 // number of days, weeks, hours etc to be used,
+        },
+      ],
+    }
+  }
+  "roofing": [
+    {
+      "id": string,
+      "name": string,
+      "type": RoofType,
+      "material": RoofMaterial,
+      "area": number,
+      "pitch": number, // degrees
+      "length": number,
+      "width": number,
+      "eavesOverhang": number,
+      "covering": {
+        "type": string,
+        "material": RoofMaterial,
+        "underlayment"?: UnderlaymentType,
+        "insulation"?: { "type": InsulationType, "thickness": number // m }
+      },
+      "timbers": [
+        {
+          "id": string,
+          "type": string, // e.g., "rafter", "battens"
+          "size": TimberSize,
+          "spacing": number,
+          "grade": "standard" | "structural" | "premium",
+          "treatment": "untreated" | "pressure-treated" | "fire-retardant",
+          "quantity": number,
+          "length": number,
+          "unit": "m" | "pcs"
+        }
+      ],
+      "accessories": {
+        "gutters": number,
+        "gutterType": GutterType,
+        "downpipes": number,
+        "downpipeType": DownpipeType,
+        "flashings": number,
+        "flashingType": FlashingType,
+        "fascia": number,
+        "fasciaType": FasciaType,
+        "soffit": number,
+        "soffitType": SoffitType
+        "RidgeCaps": number // m,
+        valleyTraps: number // m
+      },
+    }
+  ],
+  "plumbing": [
+    {
+      "id": string,
+      "name": string,
+      "systemType": PlumbingSystemType,
+      "pipes": [
+        {
+          "id": string,
+          "material": PipeMaterial,
+          "diameter": number, // from [15,20,...200]
+          "length": number,
+          "quantity": number,
+          "pressureRating"?: string,
+          "insulation"?: { "type": string, "thickness": number },
+          "trenchDetails"?: { "width": number, "depth": number, "length": number }
+        }
+      ],
+      "fixtures": [
+        {
+          "id": string,
+          "type": FixtureType,
+          "count": number,
+          "location": string,
+          "quality": "standard" | "premium" | "luxury",
+          "connections": {
+            "waterSupply": boolean,
+            "drainage": boolean,
+            "vent": boolean
+          }
+        }
+      ],
+      "tanks": [],
+      "pumps": [],
+      "fittings": []
+    }
+  ],
+  "electrical": [
+    {
+      "id": string,
+      "name": string,
+      "systemType": ElectricalSystemType,
+      "cables": [
+        {
+          "id": string,
+          "type": CableType,
+          "size": number, // mm² (from commonCableSizes)
+          "length": number,
+          "quantity": number,
+          "circuit": string,
+          "protection": string,
+          "installationMethod": InstallationMethod
+        }
+      ],
+      "outlets": [
+        {
+          "id": string,
+          "type": OutletType,
+          "count": number,
+          "location": string,
+          "circuit": string,
+          "rating": number, // from commonOutletRatings
+          "gang": number, // 1–4
+          "mounting": "surface" | "flush"
+        }
+      ],
+      "lighting": [
+        {
+          "id": string,
+          "type": LightingType,
+          "count": number,
+          "location": string,
+          "circuit": string,
+          "wattage": number, // from LIGHTING_WATTAGE
+          "controlType": "switch" | "dimmer" | "sensor" | "smart",
+          "emergency": boolean
+        }
+      ],
+      "distributionBoards": [
+        {
+          "id": string,
+          "type": "main" | "sub",
+          "circuits": number,
+          "rating": number,
+          "mounting": "surface" | "flush",
+          "accessories": string[]
+        }
+      ],
+      "protectionDevices": [],
+      "voltage": 230 // default if not specified
+    }
+  ],
+  "finishes": [
+    {
+      "id": string,
+      "category": FinishCategory,
+      "type": string,
+      "material": string, // from COMMON_MATERIALS[category]
+      "area": number,
+      "unit": "m²" | "m" | "pcs",
+      "quantity": number,
+      "location": string
+    }
+  ],
+  }
+
+"""
+
+# Output rules shared by both output formats
+PROMPT_RULES = """IMPORTANT: 
+1. **DO NOT invent dimensions** that are not visible or inferable.
+2. **Use defaults only when reasonable**:
+   - External wall height → 3.0 m
+   - Internal wall height → 2.7 m
+   - Wall thickness → 0.2 m
+   - Block type → "Standard Block"
+   - Plaster → "Both Sides"
+   - Electrical voltage → 230V
+   - Fixture quality → "standard"
+   - Timber grade/treatment → "structural" / "pressure-treated" for structural elements
+3. **Map extracted names to closest enum** (e.g., "toilet" → "water-closet", "LED light" → "led-downlight")
+4. **If a section has no data, return empty array** (`[]`) or omit optional objects.
+5. **All numeric measurements in meters or as specified** (e.g., diameter in mm, area in m²).
+6. **Be consistent with your type system** — no arbitrary strings.
+- Base your analysis on what you can actually see in the drawing
+- Use external dimensions for perimeters
+- Make sure to identify all wall sections (external and internal)
+- External works should be in the concreteStructures section
+- Use reasonable architectural standards for missing information
+- Return wall structure even if some dimensions are estimated
+- Prefer custom sizes when specific dimensions are visible
+- Pay special attention to dimension lines and labels
+- Estimate reasonably the equipment that would be used and days to be used
+- Use the provided equipment types and ids, if your findings dont exist on the provided list, add them on your own
+- Convert all measurements to meters (mm ÷ 1000)
+- Use the specific types provided
+- Use the variables provided as is: eg led-downlight, water-closet, etc. should stay as they are in the output, do not change the spelling or characters
+- Be precise with wall dimension extraction
+- Calculate perimeters by summing all wall lengths
+- For internal walls, measure partition lengths
+- Do not leave any null items. If empty use reasonable estimates based on the plan and what would be expected
+"""
+
+GEMINI_PROMPT = PROMPT_INSTRUCTIONS + OUTPUT_SCHEMA + PROMPT_RULES
+
+# Same instructions, but the model answers in the compact wire format (see compact.py)
+COMPACT_PROMPT = PROMPT_INSTRUCTIONS + compact.describe() + "\n" + PROMPT_RULES
+
+# ---------------------------------------------------------------------------
+# Sheet-specific prompts
+# ---------------------------------------------------------------------------
+
+# Where each instruction fragment starts in PROMPT_INSTRUCTIONS, in order
+INSTRUCTION_FRAGMENTS = [
+    ("intro", ""),
+    ("walls", "### 🏗️ WALL STRUCTURE IDENTIFICATION:"),
+    ("plumbing", "**Plumbing:**"),
+    ("electrical", "**Electrical:**"),
+    ("reinforcement", "**Reinforcement:**"),
+    ("equipment", "**Equipment:**"),
+    ("roofing", "**Roofing:**"),
+    ("finishes", "**Finishes:**"),
+    ("concrete", "**Concrete & Structure:**"),
+    ("wallDimensions", "### 📐 WALL DIMENSION EXTRACTION:"),
+    ("openings", "### 🚪 DOOR & WINDOW SPECIFICATIONS IN WALLS:"),
+    ("construction", "### 🏗️ CONSTRUCTION DETAILS:"),
+    ("rooms", "### 🏠 ROOMS:"),
+    ("footprint", "### 📏 FOOTPRINT:"),
+    ("foundation", "### 🏗️ FOUNDATION AND CONSTRUCTION DETAILS:"),
+]
+
+# Instruction fragments and top-level output sections per sheet type
+SHEET_PROMPTS = {
+    "architectural": (
+        ["walls", "wallDimensions", "openings", "construction", "rooms", "footprint", "finishes", "equipment"],
+        ["wallDimensions", "wallSections", "wallProperties", "floors", "projectType", "totalArea", "houseType",
+         "description", "projectName", "projectLocation", "rooms", "footprint", "finishes", "equipment"],
+    ),
+    "elevation": (
+        ["walls", "wallDimensions", "openings", "construction", "roofing"],
+        ["wallDimensions", "wallSections", "wallProperties", "floors", "projectName", "roofing"],
+    ),
+    "structural": (
+        ["reinforcement", "concrete", "foundation", "equipment"],
+        ["foundationDetails", "foundationWalling", "earthworks", "concreteStructures", "reinforcement",
+         "projectName", "equipment"],
+    ),
+    "mep": (
+        ["plumbing", "electrical", "rooms"],
+        ["plumbing", "electrical", "rooms", "projectName"],
+    ),
+    "roof": (
+        ["roofing", "footprint"],
+        ["roofing", "footprint", "projectName"],
+    ),
+    "schedule": (
+        ["openings", "finishes", "reinforcement"],
+        ["wallSections", "wallProperties", "finishes", "reinforcement", "projectName"],
+    ),
+}
+
+NO_WALLS = '{"error":"No walls found"}'
+
+def _split(text: str, markers: List[Tuple[str, str]]) -> Dict[str, str]:
+    """Cut text at each marker (in order) into named fragments"""
+    starts = [0] + [text.index(marker) for _, marker in markers[1:]]
+    ends = starts[1:] + [len(text)]
+    return {name: text[start:end] for (name, _), start, end in zip(markers, starts, ends)}
+
+def _schema_sections(schema: str) -> Tuple[str, List[Tuple[str, str]], str]:
+    """(header, [(top-level key, text)], footer) of the OUTPUT_SCHEMA template"""
+    lines = schema.splitlines(keepends=True)
+    keys = [i for i, line in enumerate(lines) if re.match(r'^  "(\w+)"\s*:', line)]
+    close = max(i for i, line in enumerate(lines) if line.strip() == "}")
+    bounds = keys + [close]
+    sections = [
+        (re.match(r'^  "(\w+)"', lines[start]).group(1), "".join(lines[start:end]))
+        for start, end in zip(bounds, bounds[1:])
+    ]
+    return "".join(lines[:keys[0]]), sections, "".join(lines[close:])
+
+FRAGMENTS = _split(PROMPT_INSTRUCTIONS, INSTRUCTION_FRAGMENTS)
+SCHEMA_HEADER, SCHEMA_SECTIONS, SCHEMA_FOOTER = _schema_sections(OUTPUT_SCHEMA)
+
+def expects_walls(sheet_type: str) -> bool:
+    """Whether the prompt for this sheet type asks for the wall structure"""
+    return sheet_type not in SHEET_PROMPTS or "wallDimensions" in SHEET_PROMPTS[sheet_type][1]
+
+def _compose(fragments: List[str], sections: List[str], allow_empty: bool, compact_output: bool, note: str = "") -> str:
+    intro = FRAGMENTS["intro"]
+    if allow_empty:
+        # Sheets without walls are expected, so an empty answer is not an error
+        intro = intro.replace(f"If no walls detected, respond with {NO_WALLS}", "If the sheet shows none of this, respond with {}")
+    instructions = intro + note + "".join(FRAGMENTS[name] for name in fragments)
+    if compact_output:
+        schema = compact.describe(sections) + "\n"
+    else:
+        schema = SCHEMA_HEADER + "".join(text for key, text in SCHEMA_SECTIONS if key in sections) + SCHEMA_FOOTER
+    return instructions + schema + PROMPT_RULES
+
+@lru_cache(maxsize=None)
+def sheet_prompt(sheet_type: str, compact_output: bool = True) -> str:
+    """Prompt carrying only the instructions and output sections for one sheet type"""
+    if sheet_type not in SHEET_PROMPTS:
+        return COMPACT_PROMPT if compact_output else GEMINI_PROMPT
+    fragments, sections = SHEET_PROMPTS[sheet_type]
+    return _compose(fragments, sections, not expects_walls(sheet_type), compact_output)
+
+RECHECK_NOTE = (
+    "\nA first reading of this document failed these checks. Re-read the drawing carefully and "
+    "return ONLY the sections below, with corrected values:\n{listed}\n"
+)
+
+def recheck_prompt(sheet_type: str, problems: Dict[str, List[str]], compact_output: bool = True) -> str:
+    """Prompt asking a stronger model to redo only the sections that failed validation"""
+    fragments = SHEET_PROMPTS[sheet_type][0] if sheet_type in SHEET_PROMPTS else [name for name, _ in INSTRUCTION_FRAGMENTS[1:]]
+    listed = "\n".join(f"- {section}: {'; '.join(messages)}" for section, messages in problems.items())
+    return _compose(fragments, list(problems), True, compact_output, RECHECK_NOTE.format(listed=listed))
+
+# Detail pass over one tile of an oversized sheet (see tiling.py); positions let the tiles be stitched
+TILE_PROMPT = """
+You are reading ONE TILE cut from a large architectural drawing sheet. Neighbouring tiles overlap this one,
+so report everything visible in this tile, including items cut by its edges, and nothing outside it.
+
+Coordinates: x from 0 (left edge of this image) to 1000 (right edge), y from 0 (top edge) to 1000 (bottom edge).
+
+Return ONLY valid JSON:
+{
+  "walls": [
+    { "x1": 120, "y1": 40, "x2": 120, "y2": 980, "type": "external" | "internal", "length": 6.3 }
+  ],
+  "openings": [
+    { "kind": "door" | "window", "tag": "D1", "x": 118, "y": 400, "wall": "external" | "internal",
+      "width": 0.9, "height": 2.1, "type": "Panel", "glass": "Clear", "frame": "Wood" }
+  ],
+  "rooms": [
+    { "name": "Kitchen", "x": 300, "y": 500, "length": 3.6, "width": 3.0, "area": 10.8 }
+  ]
+}
+
+- walls: the centre line of every wall segment visible in the tile, from end to end within the tile
+- length: the wall's length in meters ONLY when a dimension string for the whole wall is readable in this tile, otherwise null
+- openings: every door and window symbol, at the centre of the symbol, with its tag or label as written (null if none)
+- width/height of openings in meters from the tag, the schedule or the dimension shown; "type" for doors, "glass" for windows
+- rooms: every room label, at the label, with the room's internal dimensions in meters if written next to it
+- Convert mm to meters. Do not estimate anything that is not drawn. If the tile is empty, return {"walls": [], "openings": [], "rooms": []}
+"""
+
+# Short hash of every prompt the parser can send (full, compact, per sheet type, recheck, tile), stored with
+# results so analyses can be traced to the prompts that made them
+PROMPT_VERSION = hashlib.sha256("\0".join([
+    GEMINI_PROMPT,
+    COMPACT_PROMPT,
+    *(sheet_prompt(sheet_type, compact_output) for sheet_type in sorted(SHEET_PROMPTS) for compact_output in (True, False)),
+    RECHECK_NOTE,
+    TILE_PROMPT,
+]).encode("utf-8")).hexdigest()[:12]
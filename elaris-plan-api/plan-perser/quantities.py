@@ -0,0 +1,215 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Deterministic wall, opening and finish quantities.
+
+The model only extracts primary measurements (perimeters, heights, opening
+sizes and counts, room sizes); everything derived from them is computed here
+with NumPy so the numbers are exact and cheap to recompute when a user edits
+a height. Constants mirror the frontend masonry calculator; rebar and mesh
+are in rebar.py, roof geometry in roof.py and pipe/cable runs in mep.py.
+"""
+
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+import mep
+import rebar
+import roof
+
+# Block face and thickness in meters (length, height, thickness), as in useMasonryCalculatorNew
+BLOCK_SIZES = {
+    "Large Block": (0.2, 0.2, 0.2),
+    "Standard Block": (0.15, 0.2, 0.15),
+    "Small Block": (0.1, 0.2, 0.1),
+}
+MORTAR_JOINT = 0.01        # m
+MORTAR_PER_SQM = 0.017     # m³ of wet mortar per m² of wall
+PLASTER_THICKNESS = 0.015  # m
+DRY_VOLUME_FACTOR = 1.33
+PLASTER_SIDES = {"Both Sides": 2, "One Side": 1, "None": 0}
+
+def _num(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def opening_size(opening: Dict[str, Any]):
+    """(width, height) of a door/window, from the standard label or the custom size"""
+    if opening.get("sizeType") == "standard" and opening.get("standardSize"):
+        parts = opening["standardSize"].replace(" m", "").replace("x", "×").split("×")
+        if len(parts) == 2:
+            return _num(parts[0]), _num(parts[1])
+    custom = opening.get("custom") or {}
+    return _num(custom.get("width")), _num(custom.get("height"))
+
+def wall_quantities(
+    wall_dimensions: Dict[str, Any],
+    wall_sections: List[Dict[str, Any]],
+    wall_properties: Optional[Dict[str, Any]] = None,
+    default_block_type: str = "Standard Block",
+) -> Dict[str, Any]:
+    """Gross/net wall area, openings, blocks, mortar, plaster and paint per wall type"""
+    wall_properties = wall_properties or {}
+    types = ["external", "internal"]
+    perimeter = np.array([_num(wall_dimensions.get("externalWallPerimiter")), _num(wall_dimensions.get("internalWallPerimiter"))])
+    height = np.array([_num(wall_dimensions.get("externalWallHeight")), _num(wall_dimensions.get("internalWallHeight"))])
+
+    sections = {s.get("type"): s for s in wall_sections if isinstance(s, dict)}
+    block_types = []
+    plaster = []
+    for wall_type in types:
+        section = sections.get(wall_type, {})
+        block_type = section.get("blockType") or wall_properties.get("blockType") or default_block_type
+        block_types.append(block_type if block_type in BLOCK_SIZES else default_block_type)
+        plaster.append(PLASTER_SIDES.get(section.get("plaster") or wall_properties.get("plaster"), 2))
+    block = np.array([BLOCK_SIZES[b] for b in block_types])
+    sides = np.array(plaster, dtype=float)
+
+    # One row per opening line: section index, area, count, kind (0 door / 1 window)
+    index, area, count, kind = [], [], [], []
+    for i, wall_type in enumerate(types):
+        section = sections.get(wall_type, {})
+        for k, key in enumerate(("doors", "windows")):
+            for opening in section.get(key) or []:
+                w, h = opening_size(opening)
+                index.append(i)
+                area.append(w * h)
+                count.append(_num(opening.get("count"), 1.0))
+                kind.append(k)
+    index = np.array(index, dtype=int)
+    weighted = np.array(area) * np.array(count)
+    kind = np.array(kind, dtype=int)
+    door_area = np.bincount(index[kind == 0], weights=weighted[kind == 0], minlength=2) if len(index) else np.zeros(2)
+    window_area = np.bincount(index[kind == 1], weights=weighted[kind == 1], minlength=2) if len(index) else np.zeros(2)
+    openings = door_area + window_area
+
+    gross = perimeter * height
+    net = np.maximum(gross - openings, 0.0)
+    block_face = (block[:, 0] + MORTAR_JOINT) * (block[:, 1] + MORTAR_JOINT)
+    blocks = np.ceil(net / block_face)
+    mortar = net * MORTAR_PER_SQM * DRY_VOLUME_FACTOR
+    plaster_area = net * sides
+    plaster_volume = plaster_area * PLASTER_THICKNESS * DRY_VOLUME_FACTOR
+
+    walls = []
+    for i, wall_type in enumerate(types):
+        if gross[i] <= 0:
+            continue
+        walls.append({
+            "type": wall_type,
+            "perimeter": round(float(perimeter[i]), 3),
+            "height": round(float(height[i]), 3),
+            "grossArea": round(float(gross[i]), 3),
+            "doorArea": round(float(door_area[i]), 3),
+            "windowArea": round(float(window_area[i]), 3),
+            "openingsArea": round(float(openings[i]), 3),
+            "netArea": round(float(net[i]), 3),
+            "blockType": block_types[i],
+            "blocks": int(blocks[i]),
+            "mortarVolume": round(float(mortar[i]), 3),
+            "plasterArea": round(float(plaster_area[i]), 3),
+            "plasterVolume": round(float(plaster_volume[i]), 3),
+            # Painted faces are the plastered faces less the openings (already deducted from net)
+            "paintArea": round(float(plaster_area[i]), 3),
+        })
+
+    totals = {
+        key: round(sum(w[key] for w in walls), 3)
+        for key in ("grossArea", "openingsArea", "netArea", "blocks", "mortarVolume", "plasterArea", "plasterVolume", "paintArea")
+    }
+    totals["blocks"] = int(totals["blocks"])
+    return {"walls": walls, "totals": totals}
+
+def room_quantities(rooms: List[Dict[str, Any]], wall_height: float) -> Dict[str, Any]:
+    """Floor, ceiling, skirting and wall-finish areas per room"""
+    rooms = [r for r in rooms if isinstance(r, dict)]
+    if not rooms:
+        return {"rooms": [], "totals": {"floorArea": 0.0, "ceilingArea": 0.0, "wallFinishArea": 0.0}}
+    length = np.array([_num(r.get("length")) for r in rooms])
+    width = np.array([_num(r.get("width")) for r in rooms])
+    given = np.array([_num(r.get("area"), np.nan) for r in rooms])
+    floor = np.where(np.isnan(given), length * width, given)
+    perimeter = 2 * (length + width)
+    walls = perimeter * wall_height
+
+    out = [
+        {
+            "name": r.get("name", f"Room {i + 1}"),
+            "floorArea": round(float(floor[i]), 3),
+            "ceilingArea": round(float(floor[i]), 3),
+            "perimeter": round(float(perimeter[i]), 3),
+            "wallFinishArea": round(float(walls[i]), 3),
+        }
+        for i, r in enumerate(rooms)
+    ]
+    return {
+        "rooms": out,
+        "totals": {
+            "floorArea": round(float(floor.sum()), 3),
+            "ceilingArea": round(float(floor.sum()), 3),
+            "wallFinishArea": round(float(walls.sum()), 3),
+        },
+    }
+
+def compute_quantities(doc: Dict[str, Any], default_block_type: str = "Standard Block") -> Dict[str, Any]:
+    """All derived quantities for an analysis document.
+
+    Each engine runs on its own: one that fails leaves out only its section and
+    is listed under "errors" ({section: message}) instead.
+    """
+    dims = doc.get("wallDimensions") or {}
+    engines = {
+        # The wall quantities are the top level of the document ("walls" and "totals")
+        "walls": lambda: wall_quantities(dims, doc.get("wallSections") or [], doc.get("wallProperties"), default_block_type),
+        "finishes": lambda: room_quantities(doc.get("rooms") or [], _num(dims.get("internalWallHeight"))),
+        "reinforcement": lambda: rebar.reinforcement_quantities(doc.get("reinforcement") or []),
+        "roofing": lambda: roof.roof_quantities(doc),
+        "mep": lambda: mep.mep_quantities(doc),
+    }
+    quantities: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for section, engine in engines.items():
+        try:
+            value = engine()
+        except Exception as e:
+            errors[section] = f"{type(e).__name__}: {e}"
+            continue
+        if section == "walls":
+            quantities.update(value)
+        else:
+            quantities[section] = value
+    if errors:
+        quantities["errors"] = errors
+    return quantities
+
+# Fields that identify a list entry across two documents, in order of preference
+ENTRY_KEYS = ("id", "name", "type", "element", "room", "size")
+
+def _entries(items: List[Any]) -> Dict[str, Any]:
+    keyed = {}
+    for i, item in enumerate(items):
+        key = next((str(item[k]) for k in ENTRY_KEYS if isinstance(item, dict) and item.get(k) not in (None, "")), str(i))
+        while key in keyed:
+            key += "'"
+        keyed[key] = item
+    return keyed
+
+def diff_quantities(before: Any, after: Any, path: str = "") -> List[Dict[str, Any]]:
+    """Changed leaves between two quantity documents: [{path, before, after, change}]"""
+    if isinstance(before, dict) and isinstance(after, dict):
+        changes = []
+        for key in list(before) + [key for key in after if key not in before]:
+            changes += diff_quantities(before.get(key), after.get(key), f"{path}.{key}" if path else str(key))
+        return changes
+    if isinstance(before, list) and isinstance(after, list):
+        return diff_quantities(_entries(before), _entries(after), path)
+    if before == after:
+        return []
+    change = {"path": path, "before": before, "after": after}
+    numbers = [v for v in (before, after) if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    if len(numbers) == 2:
+        change["change"] = round(after - before, 6)
+    return [change]
@@ -0,0 +1,265 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Shared page rasterisation: each page is rendered once and every stage reads the cached pixels.
+
+A page is rendered in grayscale at RASTER_DPI in a thread pool (PyMuPDF and
+NumPy release the GIL while they work), then halved repeatedly into a
+resolution pyramid. Each level is an .npy file under
+RASTER_CACHE_DIR, keyed by the file's SHA-256, the page and the DPI. Readers
+get read-only memory maps, so levels and tiles (slices of a level) are views
+of the page cache and are never copied. The least recently used pages are
+evicted once the cache grows past RASTER_CACHE_BYTES; the size is a running
+total of what this process rendered since its last scan of the cache, so a
+miss does not walk the cache tree.
+
+    pyramid = raster.pyramid(path, 0)
+    pyramid.smallest(short_side=128)          # the pHash input
+    for top, left, tile in pyramid.tiles(0, 1024, overlap=128): ...
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import AbstractSet, Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+from datadir import data_path
+
+RASTER_CACHE_DIR = os.getenv("RASTER_CACHE_DIR") or data_path("raster_cache")
+RASTER_CACHE_BYTES = int(os.getenv("RASTER_CACHE_BYTES", str(2 << 30)))
+RASTER_DPI = int(os.getenv("RASTER_DPI", "150"))
+RASTER_WORKERS = int(os.getenv("RASTER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Other processes share the cache directory; their renders are counted at the next scan this long after the last
+CACHE_RESCAN_SECONDS = 300
+# Level 0 is rendered at a lower DPI when the page would exceed this (an A0 sheet at 150 DPI is ~35 MP)
+MAX_PIXELS = 64_000_000
+# Halving stops once the long side is this small
+MIN_LEVEL_SIZE = 64
+TILE_SIZE = 1024
+
+class Pyramid:
+    """One page's cached renderings: level 0 at ``dpi``, each further level half the size of the one before"""
+
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = path
+        self.dpi: float = meta["dpi"]
+        # Page size in points (1/72 in), for mapping pixels back to page coordinates
+        self.width: float = meta["width"]
+        self.height: float = meta["height"]
+        self.levels: List[np.ndarray] = [
+            np.load(os.path.join(path, f"{level}.npy"), mmap_mode="r") for level in range(meta["levels"])
+        ]
+
+    def scale(self, level: int = 0) -> float:
+        """Pixels per point at a level"""
+        return self.dpi / 72 / 2 ** level
+
+    def smallest(self, long_side: int = 0, short_side: int = 0) -> np.ndarray:
+        """The smallest level at least this big (level 0 when none is)"""
+        for image in reversed(self.levels):
+            if max(image.shape) >= long_side and min(image.shape) >= short_side:
+                return image
+        return self.levels[0]
+
+    def tiles(self, level: int = 0, size: int = TILE_SIZE, overlap: int = 0) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """(top, left, view) of size x size tiles covering a level, each overlapping the next by ``overlap`` pixels"""
+        image = self.levels[level]
+        step = max(1, size - overlap)
+        height, width = image.shape
+        for top in _starts(height, size, step):
+            for left in _starts(width, size, step):
+                yield top, left, image[top:top + size, left:left + size]
+
+def _starts(length: int, size: int, step: int) -> List[int]:
+    """Tile offsets along one side; the last tile is pulled back to end at the edge instead of running short"""
+    if length <= size:
+        return [0]
+    starts = list(range(0, length - size, step))
+    return starts + [length - size]
+
+def _halve(image: np.ndarray) -> np.ndarray:
+    """2x2 area average (an odd last row or column is dropped)"""
+    height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    blocks = image[:height, :width].reshape(height // 2, 2, width // 2, 2).astype(np.uint16)
+    return (blocks.sum(axis=(1, 3)) // 4).astype(np.uint8)
+
+def _render(file_path: str, page_number: int, dpi: int, entry: str) -> None:
+    """Render one page into a new cache entry"""
+    import pymupdf
+
+    with pymupdf.open(file_path) as document:
+        page = document[page_number]
+        width, height = page.rect.width, page.rect.height
+        scale = dpi / 72
+        if width * height * scale * scale > MAX_PIXELS:
+            scale = (MAX_PIXELS / (width * height)) ** 0.5
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale), colorspace=pymupdf.csGRAY, alpha=False)
+        image = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)[:, :pixmap.width]
+
+    # Written beside the entry and moved into place, so readers never see half a pyramid
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=".render-")
+    try:
+        levels = 0
+        while True:
+            np.save(os.path.join(staging, f"{levels}.npy"), image)
+            levels += 1
+            if max(image.shape) <= MIN_LEVEL_SIZE or min(image.shape) < 2:
+                break
+            image = _halve(image)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"dpi": scale * 72, "width": width, "height": height, "levels": levels}, f)
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Another thread or process rendered the same page first
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+@lru_cache(maxsize=256)
+def _digest(file_path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file, remembered while its size and mtime stay the same"""
+    status = os.stat(file_path)
+    return _digest(os.path.abspath(file_path), status.st_size, status.st_mtime_ns)
+
+def entry_path(digest: str, page_number: int, dpi: int) -> str:
+    return os.path.join(RASTER_CACHE_DIR, digest[:2], f"{digest}-{page_number}-{dpi}")
+
+def _open(entry: str) -> Optional[Pyramid]:
+    try:
+        with open(os.path.join(entry, "meta.json")) as f:
+            pyramid = Pyramid(entry, json.load(f))
+    except (OSError, ValueError):
+        # Missing, or evicted while we looked
+        return None
+    # The directory's mtime is the LRU clock
+    try:
+        os.utime(entry)
+    except OSError:
+        pass
+    return pyramid
+
+_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_rendering: Dict[str, Future] = {}
+# Cache size at the last scan plus what was rendered since (None until the first scan)
+_cache_bytes: Optional[int] = None
+_scanned_at = 0.0
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=RASTER_WORKERS, thread_name_prefix="raster")
+        return _pool
+
+def pyramids(file_path: str, pages: Optional[Sequence[int]] = None, dpi: int = RASTER_DPI) -> List[Pyramid]:
+    """Cached pyramids of the given pages (default: all) of a PDF or image, rendering the missing ones"""
+    if pages is None:
+        import pymupdf
+
+        with pymupdf.open(file_path) as document:
+            pages = range(document.page_count)
+    digest = file_digest(file_path)
+    entries = [entry_path(digest, page_number, dpi) for page_number in pages]
+    found = {entry: _open(entry) for entry in entries}
+    missing = [(page_number, entry) for page_number, entry in zip(pages, entries) if found[entry] is None]
+    metrics.count("raster.hits", len(entries) - len(missing))
+
+    if missing:
+        with _lock:
+            # A page another thread is already rendering is waited for, not rendered twice
+            theirs = [_rendering[entry] for _, entry in missing if entry in _rendering]
+            own = [(page_number, entry) for page_number, entry in missing if entry not in _rendering]
+            for _, entry in own:
+                _rendering[entry] = Future()
+        metrics.count("raster.renders", len(own))
+        try:
+            if len(own) == 1:
+                # One page is rendered here rather than paying for a pool round trip
+                _render(file_path, own[0][0], dpi, own[0][1])
+            elif own:
+                pool = _executor()
+                for future in [pool.submit(_render, file_path, page_number, dpi, entry) for page_number, entry in own]:
+                    future.result()
+        finally:
+            with _lock:
+                for _, entry in own:
+                    _rendering.pop(entry).set_result(None)
+        for future in theirs:
+            future.result()
+        for _, entry in missing:
+            found[entry] = _open(entry)
+        _account(sum(_size(entry) for _, entry in own), keep=set(entries))
+
+    if any(found[entry] is None for entry in entries):
+        raise RuntimeError(f"Could not rasterise {os.path.basename(file_path)}")
+    return [found[entry] for entry in entries]
+
+def pyramid(file_path: str, page_number: int, dpi: int = RASTER_DPI) -> Pyramid:
+    return pyramids(file_path, [page_number], dpi)[0]
+
+def _size(entry: str) -> int:
+    try:
+        return sum(item.stat().st_size for item in os.scandir(entry))
+    except OSError:
+        return 0
+
+def _account(added: int, keep: AbstractSet[str] = frozenset()) -> int:
+    """Add newly rendered bytes to the running total; scan and evict only once it is over budget (or stale)"""
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is not None and time.monotonic() - _scanned_at < CACHE_RESCAN_SECONDS:
+            _cache_bytes += added
+            if _cache_bytes <= RASTER_CACHE_BYTES:
+                return 0
+    return evict(keep, RASTER_CACHE_BYTES)
+
+def evict(keep: AbstractSet[str] = frozenset(), budget: Optional[int] = None) -> int:
+    """Remove the least recently used pages until the cache fits the budget; returns bytes freed"""
+    global _cache_bytes, _scanned_at
+    budget = RASTER_CACHE_BYTES if budget is None else budget
+    entries = []
+    try:
+        shards = [shard.path for shard in os.scandir(RASTER_CACHE_DIR) if shard.is_dir()]
+    except FileNotFoundError:
+        with _lock:
+            _cache_bytes, _scanned_at = 0, time.monotonic()
+        return 0
+    for shard in shards:
+        for entry in os.scandir(shard):
+            if entry.is_dir() and not entry.name.startswith("."):
+                entries.append((entry.stat().st_mtime, entry.path, _size(entry.path)))
+    total = sum(size for _, _, size in entries)
+    freed = 0
+    for _, path, size in sorted(entries):
+        if total - freed <= budget:
+            break
+        if path in keep:
+            continue
+        # Open memory maps stay valid after the files are unlinked
+        shutil.rmtree(path, ignore_errors=True)
+        freed += size
+    with _lock:
+        _cache_bytes, _scanned_at = total - freed, time.monotonic()
+    if freed:
+        metrics.count("raster.evicted_bytes", freed)
+    return freed
@@ -0,0 +1,379 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Rebar weights and mesh-sheet layout for the `reinforcement` section.
+
+Bar lines (size x length x count) are generated per element and weighed in
+one vectorised pass. Mesh slabs/rafts are laid out on every standard sheet
+size; the full sheets are counted directly and the partial edge pieces from
+all elements of a grade are packed together into shared sheets (shelf
+best-fit decreasing), so offcuts from one slab cover the edges of another.
+Defaults mirror the frontend rebar calculator settings.
+"""
+
+import bisect
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from vocab import REBAR_SIZES
+
+# kg per meter, as in useRebarCalculator REBAR_PROPERTIES
+REBAR_WEIGHTS = {
+    "R6": 0.222, "D6": 0.222, "D8": 0.395, "D10": 0.617, "D12": 0.888,
+    "D14": 1.209, "D16": 1.58, "D18": 2.0, "D20": 2.466, "D22": 2.985,
+    "D25": 3.853, "D28": 4.834, "D32": 6.313, "D36": 7.99, "D40": 9.864,
+    "D50": 15.413,
+}
+REBAR_DIAMETERS = {size: int(size[1:]) for size in REBAR_SIZES}
+
+MESH_PROPERTIES = {
+    "A98": {"weightPerSqm": 1.54, "wireDiameter": 5, "spacing": 200},
+    "A142": {"weightPerSqm": 2.22, "wireDiameter": 6, "spacing": 200},
+    "A193": {"weightPerSqm": 3.02, "wireDiameter": 7, "spacing": 200},
+    "A252": {"weightPerSqm": 3.95, "wireDiameter": 8, "spacing": 200},
+    "A393": {"weightPerSqm": 6.16, "wireDiameter": 10, "spacing": 200},
+    "B196": {"weightPerSqm": 2.45, "wireDiameter": 6, "spacing": 100},
+    "B283": {"weightPerSqm": 3.73, "wireDiameter": 7, "spacing": 100},
+    "B385": {"weightPerSqm": 5.0, "wireDiameter": 8, "spacing": 100},
+    "B503": {"weightPerSqm": 6.72, "wireDiameter": 9, "spacing": 100},
+    "B785": {"weightPerSqm": 10.9, "wireDiameter": 11, "spacing": 100},
+    "C283": {"weightPerSqm": 4.34, "wireDiameter": 7, "spacing": 100},
+    "C385": {"weightPerSqm": 6.0, "wireDiameter": 8.5, "spacing": 100},
+}
+STANDARD_MESH_SHEETS = [(2.4, 4.8), (2.4, 6.0), (2.4, 7.2), (3.0, 6.0), (3.6, 6.0)]  # (width, length) m
+
+STANDARD_BAR_LENGTH = 12.0  # m
+LAP_FACTOR = 50             # lap = 50 x bar diameter
+HOOK_FACTOR = 10            # each link hook = 10 x diameter
+DEFAULT_MESH_GRADE = "A142"
+DEFAULT_MESH_LAP = 0.3      # m
+COVERS = {"slab": 0.02, "beam": 0.025, "column": 0.025, "raft-foundation": 0.04, "strip-footing": 0.04, "tank": 0.04}
+
+BAR_SPEC = re.compile(r'([RD]\d+)(?:\s*@\s*(\d+(?:\.\d+)?))?', re.IGNORECASE)
+
+def _num(value: Any, default: float = 0.0) -> float:
+    try:
+        number = float(value)
+        return number if number > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+def _meters(value: Any, default: float, mm_above: float) -> float:
+    """Lengths the model may give in mm (300) or m (0.3)"""
+    number = _num(value, default)
+    return number / 1000 if number > mm_above else number
+
+def _mesh_lap(value: Any, sheet: Tuple[float, float]) -> float:
+    """Lap between mesh sheets in m; a lap not smaller than the sheet falls back to the default (or none)"""
+    lap = _meters(value, DEFAULT_MESH_LAP, 5)
+    side = min(sheet)
+    if lap < side:
+        return lap
+    return DEFAULT_MESH_LAP if DEFAULT_MESH_LAP < side else 0.0
+
+def _size(value: Any, default: str) -> str:
+    if isinstance(value, str) and value.upper() in REBAR_WEIGHTS:
+        return value.upper()
+    return default
+
+def _spec(text: Any, size: str, spacing_mm: float) -> Tuple[str, float]:
+    """'D12@150' -> ('D12', 0.15); falls back to the given size/spacing (also for a spacing of 0)"""
+    if isinstance(text, str):
+        m = BAR_SPEC.search(text)
+        if m:
+            return _size(m.group(1), size), _num(m.group(2), spacing_mm) / 1000
+    return size, spacing_mm / 1000
+
+def _grid(length: float, width: float, main: Tuple[str, float], dist: Tuple[str, float], cover: float, layers: int):
+    """Two-way bar grid: main bars run along the length, distribution bars across"""
+    L, W = max(length - 2 * cover, 0), max(width - 2 * cover, 0)
+    lines = []
+    if L and W:
+        lines.append((main[0], L, (math.floor(W / main[1]) + 1) * layers))
+        lines.append((dist[0], W, (math.floor(L / dist[1]) + 1) * layers))
+    return lines
+
+def _link_length(a: float, b: float, cover: float, size: str) -> float:
+    d = REBAR_DIAMETERS[size] / 1000
+    return 2 * (max(a - 2 * cover, 0) + max(b - 2 * cover, 0)) + 2 * HOOK_FACTOR * d
+
+def bar_lines(entry: Dict[str, Any]) -> List[Tuple[str, float, float]]:
+    """(size, cut length m, count) for one individual_bars reinforcement entry"""
+    element = entry.get("element")
+    L, W, D = _num(entry.get("length")), _num(entry.get("width")), _num(entry.get("depth"))
+    cover = COVERS.get(element, 0.025)
+    main_size = _size(entry.get("mainBarSize"), "D12")
+    dist_size = _size(entry.get("distributionBarSize"), "D10")
+    main_spacing = _num(entry.get("mainBarSpacing"), 150)
+    dist_spacing = _num(entry.get("distributionBarSpacing"), 200)
+
+    if element in ("slab", "raft-foundation"):
+        layers = 2 if _num(entry.get("slabLayers"), 1) > 1 else 1
+        lines = _grid(L, W, (main_size, main_spacing / 1000), (dist_size, dist_spacing / 1000), cover, layers)
+        if entry.get("topReinforcement") and layers == 1:
+            top = _spec(entry.get("topReinforcement"), main_size, main_spacing)
+            lines += _grid(L, W, top, top, cover, 1)
+        return lines
+
+    if element == "strip-footing":
+        main = _spec(entry.get("longitudinalBars"), main_size, main_spacing)
+        dist = _spec(entry.get("transverseBars"), dist_size, dist_spacing)
+        return _grid(L, W, main, dist, cover, 1)
+
+    if element == "beam":
+        stirrup = _size(entry.get("stirrupSize"), "D8")
+        spacing = _num(entry.get("stirrupSpacing"), 200) / 1000
+        lines = [(main_size, L, _num(entry.get("mainBarsCount"), 4))]
+        if _num(entry.get("distributionBarsCount")):
+            lines.append((dist_size, L, _num(entry.get("distributionBarsCount"))))
+        lines.append((stirrup, _link_length(W, D, cover, stirrup), math.floor(L / spacing) + 1))
+        return lines
+
+    if element == "column":
+        height = _num(entry.get("columnHeight"), D)
+        tie = _size(entry.get("tieSize"), "D8")
+        spacing = _num(entry.get("tieSpacing"), 200) / 1000
+        return [
+            (main_size, height, _num(entry.get("mainBarsCount"), 4)),
+            (tie, _link_length(L, W, cover, tie), math.floor(height / spacing) + 1),
+        ]
+
+    if element == "tank":
+        perimeter = 2 * (L + W)
+        vertical = (_size(entry.get("wallVerticalBarSize"), main_size), _num(entry.get("wallVerticalSpacing"), main_spacing) / 1000)
+        horizontal = (_size(entry.get("wallHorizontalBarSize"), dist_size), _num(entry.get("wallHorizontalSpacing"), dist_spacing) / 1000)
+        lines = [
+            (vertical[0], D, math.floor(perimeter / vertical[1]) + 1),
+            (horizontal[0], perimeter, math.floor(D / horizontal[1]) + 1),
+        ]
+        base_main = (_size(entry.get("baseMainBarSize"), main_size), _num(entry.get("baseMainSpacing"), main_spacing) / 1000)
+        base_dist = (_size(entry.get("baseDistributionBarSize"), dist_size), _num(entry.get("baseDistributionSpacing"), dist_spacing) / 1000)
+        lines += _grid(L, W, base_main, base_dist, cover, 1)
+        if entry.get("includeCover") not in (False, "false", ""):
+            cover_main = (_size(entry.get("coverMainBarSize"), dist_size), _num(entry.get("coverMainSpacing"), 200) / 1000)
+            cover_dist = (_size(entry.get("coverDistributionBarSize"), dist_size), _num(entry.get("coverDistributionSpacing"), 250) / 1000)
+            lines += _grid(L, W, cover_main, cover_dist, cover, 1)
+        return lines
+
+    return []
+
+def bar_quantities(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Weights and standard-length bar orders for all individual_bars entries"""
+    size_index = {size: i for i, size in enumerate(REBAR_SIZES)}
+    owner, size, length, count = [], [], [], []
+    for i, entry in enumerate(entries):
+        multiplier = _num(entry.get("number"), 1)
+        for bar_size, cut_length, bars in bar_lines(entry):
+            if cut_length <= 0 or bars <= 0:
+                continue
+            owner.append(i)
+            size.append(size_index[bar_size])
+            length.append(cut_length)
+            count.append(bars * multiplier)
+    if not owner:
+        return {"bars": [], "elements": [], "totalWeight": 0.0}
+
+    owner = np.array(owner)
+    size = np.array(size)
+    length = np.array(length)
+    count = np.array(count)
+    diameter = np.array([REBAR_DIAMETERS[s] for s in REBAR_SIZES])[size] / 1000
+    unit_weight = np.array([REBAR_WEIGHTS[s] for s in REBAR_SIZES])[size]
+
+    # Bars longer than stock are lapped; shorter ones are cut several to a stock bar
+    lap = LAP_FACTOR * diameter
+    lapped = length > STANDARD_BAR_LENGTH
+    laps = np.where(lapped, np.ceil((length - STANDARD_BAR_LENGTH) / (STANDARD_BAR_LENGTH - lap)), 0)
+    run_length = length + laps * lap
+    pieces_per_bar = np.where(lapped, 1, np.floor(STANDARD_BAR_LENGTH / np.maximum(length, 1e-9)))
+    total_length = run_length * count
+    weight = total_length * unit_weight
+
+    n_sizes = len(REBAR_SIZES)
+    by_size_length = np.bincount(size, weights=total_length, minlength=n_sizes)
+    by_size_weight = np.bincount(size, weights=weight, minlength=n_sizes)
+    stock_bars = np.where(lapped, np.ceil(run_length / STANDARD_BAR_LENGTH) * count, np.ceil(count / np.maximum(pieces_per_bar, 1)))
+    by_size_stock = np.bincount(size, weights=stock_bars, minlength=n_sizes)
+    by_owner = np.bincount(owner, weights=weight, minlength=len(entries))
+
+    bars = [
+        {
+            "size": REBAR_SIZES[i],
+            "totalLength": round(float(by_size_length[i]), 2),
+            "weight": round(float(by_size_weight[i]), 2),
+            "standardBars": int(by_size_stock[i]),
+            "standardBarLength": STANDARD_BAR_LENGTH,
+        }
+        for i in np.nonzero(by_size_length)[0]
+    ]
+    elements = [
+        {"id": entry.get("id"), "name": entry.get("name"), "weight": round(float(by_owner[i]), 2)}
+        for i, entry in enumerate(entries)
+    ]
+    return {"bars": bars, "elements": elements, "totalWeight": round(float(weight.sum()), 2)}
+
+def _sheet_pieces(length: float, width: float, sheet: Tuple[float, float], lap: float):
+    """Full sheets and partial (w, l) pieces to cover one rectangle with lapped sheets"""
+    a, b = sheet
+    def along(extent, size):
+        if extent <= size:
+            return 0, extent
+        n = math.ceil((extent - size) / (size - lap)) + 1
+        last = extent - (n - 1) * (size - lap)
+        return (n, 0.0) if last >= size - 1e-9 else (n - 1, last)
+    full_w, part_w = along(width, a)
+    full_l, part_l = along(length, b)
+    pieces = []
+    pieces += [(part_w, b)] * full_l if part_w else []
+    pieces += [(a, part_l)] * full_w if part_l else []
+    pieces += [(part_w, part_l)] if part_w and part_l else []
+    return full_w * full_l, pieces
+
+class _Shelves:
+    """Open shelves by height, each height's free lengths sorted; a max tree over heights finds a fit in O(log n)"""
+
+    def __init__(self, heights: List[float]):
+        self.heights = sorted(set(heights))
+        self.free: List[List[float]] = [[] for _ in self.heights]
+        self.size = 1
+        while self.size < len(self.heights):
+            self.size *= 2
+        self.tree = [-1.0] * (2 * self.size)  # longest free length under each node
+
+    def _update(self, i: int) -> None:
+        node = i + self.size
+        self.tree[node] = self.free[i][-1] if self.free[i] else -1.0
+        node //= 2
+        while node:
+            left, right = self.tree[2 * node], self.tree[2 * node + 1]
+            longest = left if left > right else right
+            if self.tree[node] == longest:
+                break
+            self.tree[node] = longest
+            node //= 2
+
+    def _lowest(self, lo: int, need: float, node: int = 1, start: int = 0, end: Optional[int] = None) -> Optional[int]:
+        """Lowest height index >= lo with a shelf that has need free"""
+        end = self.size if end is None else end
+        if end <= lo or self.tree[node] < need:
+            return None
+        if node >= self.size:
+            return node - self.size
+        mid = (start + end) // 2
+        found = self._lowest(lo, need, 2 * node, start, mid)
+        return found if found is not None else self._lowest(lo, need, 2 * node + 1, mid, end)
+
+    def add(self, height: float, free: float) -> None:
+        i = bisect.bisect_left(self.heights, height - 1e-9)
+        bisect.insort(self.free[i], free)
+        self._update(i)
+
+    def take(self, w: float, l: float) -> Optional[Tuple[float, float]]:
+        """Remove the lowest shelf at least w high with at least l free (the tightest such); (height, free)"""
+        i = self._lowest(bisect.bisect_left(self.heights, w - 1e-9), l - 1e-9)
+        if i is None:
+            return None
+        free = self.free[i].pop(bisect.bisect_left(self.free[i], l - 1e-9))
+        self._update(i)
+        return self.heights[i], free
+
+def _pack(pieces: Counter, sheet: Tuple[float, float]) -> int:
+    """Shelf best-fit decreasing: number of sheets needed to cut all pieces ({(w, l): count}).
+
+    Identical pieces are placed together, as many per shelf as fit. Shelves
+    are searched by height and free length (_Shelves), and sheets are kept in
+    a list sorted by the width still free across them, so each placement is a
+    lookup rather than a scan of every open shelf.
+    """
+    a, b = sheet
+    groups: Counter = Counter()
+    for (w, l), n in pieces.items():
+        # Orient so the piece's longer side runs along the sheet length where possible
+        if l < w and w <= b and l <= a:
+            w, l = l, w
+        if w > a + 1e-9 or l > b + 1e-9:
+            w, l = l, w
+        groups[(round(w, 3), round(l, 3))] += n
+    shelves = _Shelves([w for w, _ in groups])
+    free_widths: List[float] = []  # free width across each sheet in use, sorted
+    sheets = 0
+    for (w, l), n in sorted(groups.items(), key=lambda item: max(item[0]), reverse=True):
+        per_shelf = int((b + 1e-9) // l) if l > 0 else n
+        if w > a + 1e-9 or not per_shelf:
+            # Larger than the sheet either way round: one sheet each
+            sheets += n
+            continue
+        while n:
+            shelf = shelves.take(w, l)
+            if shelf is None:
+                # New shelf w high, in the tightest sheet it fits across, else in a new sheet
+                shelf = (w, b)
+                j = bisect.bisect_left(free_widths, w - 1e-9)
+                if j < len(free_widths):
+                    bisect.insort(free_widths, free_widths.pop(j) - w)
+                else:
+                    sheets += 1
+                    bisect.insort(free_widths, a - w)
+            height, free = shelf
+            placed = min(n, int((free + 1e-9) // l))
+            n -= placed
+            shelves.add(height, free - placed * l)
+    return sheets
+
+def mesh_layout(entries: List[Dict[str, Any]], sheets: Optional[List[Tuple[float, float]]] = None) -> List[Dict[str, Any]]:
+    """Pick the sheet size per mesh grade that minimises waste, sharing offcuts between elements"""
+    by_grade: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        grade = entry.get("meshGrade") if entry.get("meshGrade") in MESH_PROPERTIES else DEFAULT_MESH_GRADE
+        by_grade.setdefault(grade, []).append(entry)
+
+    orders = []
+    for grade, items in by_grade.items():
+        candidates = list(sheets or STANDARD_MESH_SHEETS)
+        # A sheet size given on the drawing wins over the optimiser
+        given = {(_meters(e.get("meshSheetWidth"), 0.0, 20), _meters(e.get("meshSheetLength"), 0.0, 20)) for e in items}
+        if len(given) == 1:
+            (w, l), = given
+            if w and l:
+                candidates = [(w, l)]
+        net_area = sum(_num(e.get("length")) * _num(e.get("width")) * _num(e.get("number"), 1) for e in items)
+        best = None
+        for sheet in candidates:
+            full, pieces = 0, Counter()
+            for e in items:
+                n, parts = _sheet_pieces(_num(e.get("length")), _num(e.get("width")), sheet, _mesh_lap(e.get("meshLapLength"), sheet))
+                multiplier = int(_num(e.get("number"), 1))
+                full += n * multiplier
+                for piece in parts:
+                    pieces[piece] += multiplier
+            count = full + _pack(pieces, sheet)
+            area = count * sheet[0] * sheet[1]
+            if best is None or (area, count) < (best[2], best[1]):
+                best = (sheet, count, area)
+        sheet, count, area = best
+        weight = MESH_PROPERTIES[grade]["weightPerSqm"]
+        orders.append({
+            "grade": grade,
+            "sheet": f"{sheet[0]:g}x{sheet[1]:g}",
+            "sheets": count,
+            "sheetArea": round(area, 2),
+            "netArea": round(net_area, 2),
+            "wastePercent": round(100 * (area - net_area) / area, 1) if area else 0.0,
+            "weight": round(area * weight, 2),
+            "elements": [e.get("id") or e.get("name") for e in items],
+        })
+    return orders
+
+def reinforcement_quantities(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Bar schedule and mesh order for the reinforcement section"""
+    entries = [e for e in entries if isinstance(e, dict)]
+    mesh = [e for e in entries if e.get("reinforcementType") == "mesh"]
+    bars = [e for e in entries if e.get("reinforcementType") != "mesh"]
+    result = bar_quantities(bars)
+    result["mesh"] = mesh_layout(mesh) if mesh else []
+    result["totalWeight"] = round(result["totalWeight"] + sum(m["weight"] for m in result["mesh"]), 2)
+    return result
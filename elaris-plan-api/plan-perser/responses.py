@@ -0,0 +1,111 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Plan documents as HTTP responses: field projection, orjson and negotiated compression.
+
+Returning a ready Response skips FastAPI's jsonable_encoder walk over the
+whole document. ``fields=rooms,quantities.concrete`` keeps only those
+(dotted) paths; the body is gzip- or brotli-compressed when the client
+accepts it (brotli only when the optional brotli package is installed).
+"""
+
+import gzip
+import json
+from typing import Dict, Any, Iterable, List, Optional
+
+# Smaller bodies are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Kept in every projection so clients can still tell what they got
+ALWAYS_FIELDS = ("analysisId", "error", "cache")
+
+def _default(value: Any) -> Any:
+    # NumPy scalars and arrays from the quantity calculations
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+def dumps(document: Any) -> bytes:
+    """Compact UTF-8 JSON (orjson when installed)"""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(document, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+    return orjson.dumps(document, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def loads(data) -> Any:
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(data)
+    return orjson.loads(data)
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """"a,b.c" -> ["a", "b.c"]; None or empty means the whole document"""
+    if not fields:
+        return None
+    paths = [path.strip() for path in fields.split(",") if path.strip()]
+    return paths or None
+
+def project(document: Dict[str, Any], paths: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Only the given dotted paths of a document (missing ones are left out)"""
+    if paths is None or not isinstance(document, dict):
+        return document
+    projected: Dict[str, Any] = {key: document[key] for key in ALWAYS_FIELDS if key in document}
+    for path in paths:
+        keys = path.split(".")
+        value: Any = document
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+    return projected
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Accept-Encoding -> {coding: q}"""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            codings[coding.strip().lower()] = q
+    return codings
+
+def compress(body: bytes, accept_encoding: str):
+    """(body, Content-Encoding or None) for the best coding the client accepts"""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    accepted = _accepted(accept_encoding)
+    star = accepted.get("*", 0.0)
+    if accepted.get("br", star) > 0:
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if accepted.get("gzip", star) > 0:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+def plan_response(request, document: Any, fields: Optional[str] = None, status_code: int = 200):
+    """A JSON response of the projected document, compressed as negotiated"""
+    from fastapi.responses import Response
+    
+    body, encoding = compress(dumps(project(document, parse_fields(fields))), request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
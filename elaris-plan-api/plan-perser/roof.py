@@ -0,0 +1,305 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Roof geometry from the building footprint.
+
+The footprint polygon is offset by the eaves overhang with pyclipper, and
+everything that depends only on the plan (areas, eaves run, half-span,
+corner angles) is measured once by ``roof_plan``. ``roof_geometry`` then
+turns a plan into sloped areas, ridge/hip/valley lengths and timber runs for
+a roof type and pitch; pitch may be a NumPy array, so a whole range of
+pitches is evaluated in one call when a user edits it.
+
+Sloped area, eaves and soffit figures are exact for any footprint at a
+uniform pitch. Ridge, hip and valley lengths are exact for rectangles and
+use the footprint's inscribed half-span for L/T/U-shaped plans.
+"""
+
+import math
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+import pyclipper
+
+SCALE = 1000                 # pyclipper works on integers: mm
+DEFAULT_OVERHANG = 0.6       # m
+DEFAULT_PITCH = {"flat": 2.0, "skillion": 10.0}
+DEFAULT_PITCH_OTHER = 25.0   # degrees
+MAX_PITCH = 75.0             # degrees; steeper readings are misreads (the secant blows up at 90)
+RAFTER_SPACING = 0.6         # m
+DOWNPIPE_SPACING = 10.0      # m of gutter per downpipe
+UNDERLAY_LAP = 0.1
+# Batten/purlin spacing (m) for the covering; None means a deck, not battens
+COVERING_SUPPORT = {
+    "concrete-tiles": ("battens", 0.32),
+    "clay-tiles": ("battens", 0.32),
+    "slate": ("battens", 0.25),
+    "asphalt-shingles": ("battens", 0.3),
+    "thatch": ("battens", 0.25),
+    "metal-sheets": ("purlin", 0.9),
+    "box-profile": ("purlin", 1.2),
+    "green-roof": (None, None),
+    "membrane": (None, None),
+}
+# Roof types the engine does not model separately
+ROOF_SHAPES = {"pitched": "gable", "mansard": "hip"}
+
+Pitch = Union[float, np.ndarray]
+
+def _num(value: Any, default: float = 0.0) -> float:
+    try:
+        number = float(value)
+        return number if number > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+def _meters(value: Any, default: float, mm_above: float) -> float:
+    """Lengths the model may give in mm (600) or m (0.6)"""
+    number = _num(value, default)
+    return number / 1000 if number > mm_above else number
+
+def _pitch(value: Any, default: float) -> float:
+    """Pitch in degrees, in (0, MAX_PITCH]; anything else is a misread and takes the default"""
+    number = _num(value, default)
+    return number if number <= MAX_PITCH else default
+
+def _polygon(points: Any) -> Optional[np.ndarray]:
+    """Nx2 counter-clockwise array without the closing point or collinear vertices"""
+    try:
+        poly = np.array(points, dtype=float).reshape(-1, 2)
+    except (TypeError, ValueError):
+        return None
+    if len(poly) > 1 and np.allclose(poly[0], poly[-1]):
+        poly = poly[:-1]
+    if len(poly) < 3:
+        return None
+    if _signed_area(poly) < 0:
+        poly = poly[::-1]
+    prev, nxt = np.roll(poly, 1, axis=0), np.roll(poly, -1, axis=0)
+    a, b = poly - prev, nxt - poly
+    turn = np.abs(np.arctan2(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0], (a * b).sum(axis=1)))
+    poly = poly[turn > math.radians(1)]
+    return poly if len(poly) >= 3 and _signed_area(poly) > 0 else None
+
+def _signed_area(poly: np.ndarray) -> float:
+    x, y = poly[:, 0], poly[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+def _perimeter(poly: np.ndarray) -> float:
+    return float(np.linalg.norm(np.roll(poly, -1, axis=0) - poly, axis=1).sum())
+
+def offset_polygon(poly: np.ndarray, distance: float) -> np.ndarray:
+    """Grow a polygon outwards by distance meters (mitred corners, as eaves are cut)"""
+    if distance <= 0:
+        return poly
+    pco = pyclipper.PyclipperOffset()
+    pco.AddPath(np.round(poly * SCALE).astype(int).tolist(), pyclipper.JT_MITER, pyclipper.ET_CLOSEDPOLYGON)
+    paths = pco.Execute(distance * SCALE)
+    if not paths:
+        return poly
+    largest = max(paths, key=lambda p: abs(pyclipper.Area(p)))
+    return _polygon(np.array(largest, dtype=float) / SCALE)
+
+def _edge_distance(points: np.ndarray, poly: np.ndarray) -> np.ndarray:
+    """Distance from each point to the nearest polygon edge, negative outside"""
+    a = poly[None, :, :]
+    ab = np.roll(poly, -1, axis=0)[None, :, :] - a
+    ap = points[:, None, :] - a
+    t = np.clip((ap * ab).sum(axis=2) / (ab * ab).sum(axis=2), 0, 1)
+    dist = np.linalg.norm(ap - t[:, :, None] * ab, axis=2).min(axis=1)
+
+    # Even-odd ray cast for inside/outside
+    y0, y1 = poly[:, 1][None, :], np.roll(poly, -1, axis=0)[:, 1][None, :]
+    x0, x1 = poly[:, 0][None, :], np.roll(poly, -1, axis=0)[:, 0][None, :]
+    px, py = points[:, :1], points[:, 1:]
+    crosses = (y0 > py) != (y1 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    inside = (crosses & (px < x_at)).sum(axis=1) % 2 == 1
+    return np.where(inside, dist, -dist)
+
+def half_span(poly: np.ndarray, samples: int = 48, passes: int = 4) -> float:
+    """Inscribed radius of the polygon: the horizontal run of a common rafter"""
+    lo, hi = poly.min(axis=0), poly.max(axis=0)
+    best_point, best = None, 0.0
+    for _ in range(passes):
+        xs = np.linspace(lo[0], hi[0], samples)
+        ys = np.linspace(lo[1], hi[1], samples)
+        grid = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+        dist = _edge_distance(grid, poly)
+        i = int(dist.argmax())
+        if dist[i] > best:
+            best_point, best = grid[i], float(dist[i])
+        if best_point is None:
+            break
+        # Zoom in on the best cell
+        step = (hi - lo) / (samples - 1)
+        lo, hi = best_point - 2 * step, best_point + 2 * step
+    return best
+
+def roof_plan(footprint: Any, overhang: float = DEFAULT_OVERHANG) -> Optional[Dict[str, Any]]:
+    """Pitch-independent measurements of a footprint offset by the eaves overhang"""
+    building = _polygon(footprint)
+    if building is None:
+        return None
+    roof = offset_polygon(building, overhang)
+    if roof is None:
+        return None
+    prev, nxt = np.roll(roof, 1, axis=0), np.roll(roof, -1, axis=0)
+    a, b = roof - prev, nxt - roof
+    turn = np.arctan2(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0], (a * b).sum(axis=1))
+    interior = math.pi - turn  # > pi at reflex corners
+    plan_area = _signed_area(roof)
+    return {
+        "outline": roof,
+        "overhang": overhang,
+        "planArea": plan_area,
+        "footprintArea": _signed_area(building),
+        "eaves": _perimeter(roof),
+        "wallPlate": _perimeter(building),
+        "halfSpan": half_span(roof),
+        "hipCorners": interior[turn > 0],
+        "valleyCorners": interior[turn < 0],
+    }
+
+def _corner_lines(plan_lengths: np.ndarray, rise: Pitch) -> Pitch:
+    """Total true length of hip/valley lines from their plan lengths and the rise"""
+    rise = np.asarray(rise)
+    return np.sqrt(plan_lengths[:, None] ** 2 + rise.reshape(1, -1) ** 2).sum(axis=0).reshape(rise.shape)
+
+def roof_geometry(plan: Dict[str, Any], roof_type: str, pitch: Pitch) -> Dict[str, Pitch]:
+    """Areas and line lengths for one roof shape; pitch in degrees (scalar or array)"""
+    shape = ROOF_SHAPES.get(roof_type, roof_type)
+    theta = np.radians(np.asarray(pitch, dtype=float))
+    cos, tan = np.cos(theta), np.tan(theta)
+    area, d, eaves = plan["planArea"], plan["halfSpan"], plan["eaves"]
+    centreline = area / (2 * d) if d else 0.0  # ridge-direction length of a constant-span roof
+    zero = np.zeros_like(theta)
+
+    run = 2 * d if shape in ("skillion", "flat") else d
+    rafter = run / cos
+    out = {
+        "slopedArea": area / cos,
+        "rise": run * tan,
+        "rafterLength": rafter,
+        "ridge": zero,
+        "hips": zero,
+        "valleys": zero,
+        "gutters": zero + eaves,
+        "fascia": zero + eaves,
+        "bargeBoards": zero,
+    }
+
+    if shape == "hip":
+        # Each corner line runs along the bisector until it meets the ridge
+        rise = d * tan
+        out["ridge"] = zero + max(centreline - 2 * d, 0.0)
+        out["hips"] = _corner_lines(d / np.sin(plan["hipCorners"] / 2), rise)
+        out["valleys"] = _corner_lines(d / np.sin((2 * math.pi - plan["valleyCorners"]) / 2), rise)
+    elif shape == "gable":
+        # Two gable ends, each with a verge on both slopes
+        out["ridge"] = zero + centreline
+        out["bargeBoards"] = 4 * rafter
+        out["gutters"] = out["fascia"] = zero + max(eaves - 4 * d, 0.0)
+        out["gableArea"] = 2 * d * d * tan
+    elif shape == "skillion":
+        out["gutters"] = zero + centreline
+        out["fascia"] = zero + max(eaves - 4 * d, 0.0)
+        out["bargeBoards"] = 2 * rafter
+        out["flashing"] = zero + centreline
+    elif shape == "butterfly":
+        # Both slopes fall to a central valley gutter
+        out["valleys"] = zero + centreline
+        out["gutters"] = zero + centreline
+        out["fascia"] = zero + max(eaves - 4 * d, 0.0)
+        out["bargeBoards"] = 4 * rafter
+    elif shape == "flat":
+        out["gutters"] = zero + centreline
+    return out
+
+def _timber_rows(entry: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {t.get("type"): t for t in entry.get("timbers") or [] if isinstance(t, dict)}
+
+def timber_schedule(entry: Dict[str, Any], geometry: Dict[str, Pitch], plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rafter, batten/purlin, ridge board and wall plate runs for one roof"""
+    given = _timber_rows(entry)
+    material = entry.get("material") or (entry.get("covering") or {}).get("material")
+    sloped, rafter = float(geometry["slopedArea"]), float(geometry["rafterLength"])
+    rows = []
+
+    def add(kind: str, total: float, piece: Optional[float] = None, spacing: Optional[float] = None):
+        if total <= 0:
+            return
+        row = given.get(kind, {})
+        out = {"type": kind, "size": row.get("size"), "length": round(total, 2), "unit": "m"}
+        if spacing:
+            out["spacing"] = round(spacing, 3)
+        if piece:
+            out["pieces"] = math.ceil(total / piece - 1e-9)
+            out["pieceLength"] = round(piece, 2)
+        rows.append(out)
+
+    if entry.get("type") != "flat":
+        # Common + jack rafters together cover the sloped area at the rafter spacing
+        spacing = _meters((given.get("rafter") or {}).get("spacing"), RAFTER_SPACING, 10)
+        add("rafter", sloped / spacing, rafter, spacing)
+    support, default_spacing = COVERING_SUPPORT.get(material, ("battens", 0.32))
+    if support:
+        spacing = _meters((given.get(support) or {}).get("spacing"), default_spacing, 10)
+        add(support, sloped / spacing, spacing=spacing)
+    add("ridge-board", float(geometry["ridge"]))
+    add("wall-plate", plan["wallPlate"])
+    return rows
+
+def footprint_for(doc: Dict[str, Any], entry: Dict[str, Any]) -> Optional[List[List[float]]]:
+    """Footprint polygon for a roof: drawn outline, roof length x width, or a rectangle from perimeter/area"""
+    for source in (entry.get("footprint"), doc.get("footprint")):
+        if isinstance(source, list) and len(source) >= 3:
+            return source
+    length, width = _num(entry.get("length")), _num(entry.get("width"))
+    if not (length and width):
+        perimeter = _num((doc.get("wallDimensions") or {}).get("externalWallPerimiter"))
+        area = _num(doc.get("totalArea"))
+        if not (perimeter and area):
+            return None
+        # L + W = P/2 and L x W = A; fall back to a square when they disagree
+        half = perimeter / 2
+        disc = half * half - 4 * area
+        root = math.sqrt(disc) if disc >= 0 else 0.0
+        length, width = ((half + root) / 2, (half - root) / 2) if disc >= 0 else (math.sqrt(area),) * 2
+    return [[0, 0], [length, 0], [length, width], [0, width]]
+
+def roof_quantities(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Geometry and timber schedule for every entry in the roofing section"""
+    out = []
+    for entry in doc.get("roofing") or []:
+        if not isinstance(entry, dict):
+            continue
+        roof_type = entry.get("type") or "gable"
+        footprint = footprint_for(doc, entry)
+        overhang = _meters(entry.get("eavesOverhang"), DEFAULT_OVERHANG, 5)
+        plan = roof_plan(footprint, overhang) if footprint else None
+        if plan is None:
+            continue
+        default = DEFAULT_PITCH.get(roof_type, DEFAULT_PITCH_OTHER)
+        pitch = _pitch(entry.get("pitch"), default)
+        geometry = roof_geometry(plan, roof_type, pitch)
+        gutters = float(geometry["gutters"])
+        result = {
+            "id": entry.get("id"),
+            "name": entry.get("name"),
+            "type": roof_type,
+            "pitch": pitch,
+            "pitchAssumed": _pitch(entry.get("pitch"), 0.0) == 0.0,
+            "overhang": overhang,
+            "planArea": round(plan["planArea"], 2),
+            "soffitArea": round(plan["planArea"] - plan["footprintArea"], 2),
+            "underlaymentArea": round(float(geometry["slopedArea"]) * (1 + UNDERLAY_LAP), 2),
+            "downpipes": math.ceil(gutters / DOWNPIPE_SPACING) if gutters else 0,
+        }
+        for key in ("slopedArea", "rise", "rafterLength", "ridge", "hips", "valleys", "gutters", "fascia", "bargeBoards", "gableArea", "flashing"):
+            if key in geometry:
+                result[key] = round(float(geometry[key]), 2)
+        result["timbers"] = timber_schedule(entry, geometry, plan)
+        out.append(result)
+    return out
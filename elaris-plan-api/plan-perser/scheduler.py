@@ -0,0 +1,209 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Admission control in front of the parser: a weighted semaphore with fair queues.
+
+Every analysis costs "work units" estimated from its size and page count, and
+at most CAPACITY units run at once. Waiting jobs sit in per-tenant queues
+served by deficit round-robin, so a tenant with many heavy uploads gets its
+share of capacity and no more. Single-sheet scans queue ahead of bulk sets
+(a bulk job that has waited BULK_AGING seconds goes first). When the queued
+work is over MAX_QUEUE_WORK the request is refused with a retry delay worked
+out from the observed seconds per unit.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+CAPACITY = int(os.getenv("ANALYSIS_CAPACITY", "16"))
+MAX_QUEUE_WORK = int(os.getenv("ANALYSIS_MAX_QUEUE_WORK", "64"))
+QUANTUM = 4
+# Weight: one unit per job, one per page, one per 10 MB
+PAGE_UNITS = 1
+MB_PER_UNIT = 10
+# Sheets up to this many pages count as interactive scans
+INTERACTIVE_PAGES = 1
+BULK_AGING = 60.0  # seconds
+# Seconds per work unit before any analysis has finished, then a moving average
+DEFAULT_UNIT_SECONDS = 5.0
+RATE_SMOOTHING = 0.2
+
+class Overloaded(Exception):
+    """The queue is full; retry_after is the estimated wait in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+def estimate(file_path: str) -> Dict[str, Any]:
+    """{"pages", "weight", "interactive"} for a saved upload"""
+    pages = 1
+    if str(file_path).lower().endswith(".pdf"):
+        try:
+            import pymupdf
+            with pymupdf.open(file_path) as document:
+                pages = max(1, document.page_count)
+        except Exception:
+            pass
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    weight = 1 + PAGE_UNITS * pages + int(size_mb // MB_PER_UNIT)
+    return {"pages": pages, "weight": weight, "interactive": pages <= INTERACTIVE_PAGES}
+
+class Job:
+    def __init__(self, tenant: str, weight: int):
+        self.tenant = tenant
+        self.weight = weight
+        self.enqueued = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+
+class FairQueue:
+    """Per-tenant FIFO queues served by deficit round-robin"""
+
+    def __init__(self):
+        self.queues: "OrderedDict[str, deque]" = OrderedDict()
+        self.deficit: Dict[str, int] = {}
+        self.current: Optional[str] = None  # tenant whose turn it is and has had its quantum
+        self.work = 0
+
+    def __len__(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def push(self, job: Job) -> None:
+        if job.tenant not in self.queues:
+            self.queues[job.tenant] = deque()
+            self.deficit[job.tenant] = 0
+        self.queues[job.tenant].append(job)
+        self.work += job.weight
+
+    def next(self) -> Optional[Job]:
+        """The job DRR serves next: each turn adds QUANTUM, a tenant is served while its deficit covers its head"""
+        while self.queues:
+            tenant, q = next(iter(self.queues.items()))
+            if tenant != self.current:
+                self.current = tenant
+                self.deficit[tenant] += QUANTUM
+            if self.deficit[tenant] >= q[0].weight:
+                return q[0]
+            self.queues.move_to_end(tenant)
+            self.current = None
+        return None
+
+    def pop(self, job: Job) -> None:
+        self.deficit[job.tenant] -= job.weight
+        self._remove(job)
+
+    def discard(self, job: Job) -> None:
+        if job in self.queues.get(job.tenant, ()):
+            self._remove(job)
+
+    def _remove(self, job: Job) -> None:
+        q = self.queues[job.tenant]
+        q.remove(job)
+        self.work -= job.weight
+        if not q:
+            # An idle tenant does not bank credit
+            del self.queues[job.tenant]
+            del self.deficit[job.tenant]
+            if self.current == job.tenant:
+                self.current = None
+
+    def oldest(self) -> Optional[float]:
+        return min((q[0].enqueued for q in self.queues.values()), default=None)
+
+class Scheduler:
+    """Weighted semaphore over CAPACITY work units with fair, prioritised waiting"""
+
+    def __init__(self, capacity: int = CAPACITY, max_queue_work: int = MAX_QUEUE_WORK):
+        self.capacity = capacity
+        self.max_queue_work = max_queue_work
+        self.in_use = 0
+        self.interactive = FairQueue()
+        self.bulk = FairQueue()
+        self.unit_seconds = DEFAULT_UNIT_SECONDS
+        self.completed = 0
+        self.rejected = 0
+
+    def retry_after(self, weight: int) -> int:
+        """Seconds until the queue has drained enough to take this job"""
+        excess = self.interactive.work + self.bulk.work + weight - self.max_queue_work
+        # Queued work drains at capacity / unit_seconds units per second
+        return max(1, math.ceil(excess * self.unit_seconds / self.capacity))
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, weight: int, interactive: bool):
+        """Hold capacity for one analysis; raises Overloaded when the queue is full"""
+        # A job bigger than the whole pool still runs, alone
+        weight = max(1, min(weight, self.capacity))
+        queue = self.interactive if interactive else self.bulk
+        job = Job(tenant, weight)
+        queue.push(job)
+        self._dispatch()
+        if not job.granted.done() and self.interactive.work + self.bulk.work > self.max_queue_work:
+            queue.discard(job)
+            self.rejected += 1
+            raise Overloaded(self.retry_after(weight))
+        try:
+            await job.granted
+        except asyncio.CancelledError:
+            # Client went away while queued (or right after being granted)
+            queue.discard(job)
+            if job.granted.done() and not job.granted.cancelled():
+                self._release(weight)
+            raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.unit_seconds += RATE_SMOOTHING * (elapsed / weight - self.unit_seconds)
+            self.completed += 1
+            self._release(weight)
+
+    def _release(self, weight: int) -> None:
+        self.in_use -= weight
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant queued jobs while they fit; the job DRR picks waits rather than being overtaken"""
+        while True:
+            oldest_bulk = self.bulk.oldest()
+            aged = oldest_bulk is not None and time.monotonic() - oldest_bulk >= BULK_AGING
+            order = (self.bulk, self.interactive) if aged else (self.interactive, self.bulk)
+            queue = next((q for q in order if q.queues), None)
+            if queue is None:
+                return
+            job = queue.next()
+            if job.granted.cancelled():
+                # Its request was cancelled but has not woken up to leave the queue yet
+                queue.discard(job)
+                continue
+            if self.in_use + job.weight > self.capacity:
+                return
+            queue.pop(job)
+            self.in_use += job.weight
+            job.granted.set_result(True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "inUse": self.in_use,
+            "queued": {"interactive": len(self.interactive), "bulk": len(self.bulk)},
+            "queuedWork": self.interactive.work + self.bulk.work,
+            "tenantsWaiting": len(set(self.interactive.queues) | set(self.bulk.queues)),
+            "secondsPerUnit": round(self.unit_seconds, 3),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+_scheduler: Optional[Scheduler] = None
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+    return _scheduler
@@ -0,0 +1,245 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Classify drawing sheets so each model call only carries the prompt it needs.
+
+Every page is scored against keyword lists using the PDF text layer. Pages
+with no usable text (scans, images) fall back to a small image check: a page
+ruled by long horizontal and vertical lines is a table, i.e. a schedule.
+Pages of the same type are analysed together with that type's prompt from
+prompts.sheet_prompt(), and the per-type documents are merged back into one.
+"""
+
+import re
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Order the per-type documents are merged in; earlier types win on conflicts
+SHEET_ORDER = ["architectural", "general", "elevation", "schedule", "structural", "roof", "mep"]
+
+# Title-block and annotation words per sheet type (phrases count double)
+KEYWORDS = {
+    "architectural": [
+        "floor plan", "ground floor", "first floor", "layout plan", "bedroom", "kitchen", "living", "dining",
+        "lounge", "bathroom", "toilet", "verandah", "corridor", "store", "master", "wardrobe", "door", "window",
+    ],
+    "elevation": [
+        "elevation", "front elevation", "rear elevation", "side elevation", "section a-a", "section b-b",
+        "cross section", "ffl", "ngl", "finished floor level", "ground level", "eaves level", "ridge level",
+    ],
+    "structural": [
+        "reinforcement", "rebar", "brc", "mesh", "stirrup", "stirrups", "links", "cover", "lap", "footing",
+        "foundation", "column", "beam", "slab", "ring beam", "bending schedule", "bar mark", "concrete grade",
+        "c25", "c20", "y12", "y10", "y16", "r8", "r10", "structural",
+    ],
+    "mep": [
+        "plumbing", "drainage", "electrical", "lighting", "socket", "switch", "distribution board", "db",
+        "manhole", "inspection chamber", "soil pipe", "waste pipe", "water supply", "wc", "whb", "sink",
+        "septic", "soakpit", "cable", "conduit", "luminaire", "earthing",
+    ],
+    "roof": [
+        "roof plan", "roof", "ridge", "hip", "valley", "rafter", "truss", "purlin", "fascia", "gutter",
+        "downpipe", "pitch", "eaves", "wall plate", "iron sheets", "tiles",
+    ],
+    "schedule": [
+        "schedule", "door schedule", "window schedule", "finishes schedule", "ironmongery", "qty", "quantity",
+        "ref", "remarks", "no off", "size",
+    ],
+}
+
+# Keyword score a page needs before it counts as that type
+MIN_SCORE = 3
+THUMBNAIL_SIZE = 256
+# A row/column of the thumbnail this dark over this share of its length is a ruled line
+DARK_LEVEL = 128
+RULE_COVERAGE = 0.4
+MIN_RULES = 4
+
+def _words(text: str) -> str:
+    return " " + " ".join(re.findall(r"[a-z0-9]+", text.lower())) + " "
+
+def _score(text: str) -> Dict[str, int]:
+    text = _words(text)
+    return {
+        sheet_type: sum((2 if " " in word else 1) * text.count(_words(word)) for word in words)
+        for sheet_type, words in KEYWORDS.items()
+    }
+
+def _thumbnail(page) -> np.ndarray:
+    """Grayscale rendering of a page, about THUMBNAIL_SIZE pixels on the long side"""
+    import pymupdf
+
+    scale = THUMBNAIL_SIZE / max(page.rect.width, page.rect.height)
+    pixmap = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale), colorspace=pymupdf.csGRAY, alpha=False)
+    return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width)
+
+def is_table(image: np.ndarray) -> bool:
+    """True when the image is ruled like a table (several long horizontal and vertical lines)"""
+    dark = image < DARK_LEVEL
+    rows = np.count_nonzero(dark.mean(axis=1) >= RULE_COVERAGE)
+    columns = np.count_nonzero(dark.mean(axis=0) >= RULE_COVERAGE)
+    return rows >= MIN_RULES and columns >= MIN_RULES // 2
+
+def classify_page(page, thumbnail: Optional[Callable[[], np.ndarray]] = None) -> str:
+    """Sheet type of one PyMuPDF page; ``thumbnail`` supplies its image instead of rendering one"""
+    scores = _score(page.get_text())
+    best = max(scores, key=scores.get)
+    if scores[best] >= MIN_SCORE:
+        return best
+    return "schedule" if is_table(thumbnail() if thumbnail else _thumbnail(page)) else "general"
+
+def classify_pages(file_path: str) -> List[str]:
+    """Sheet type of every page of a PDF or image file"""
+    import pymupdf
+    import raster
+
+    def thumbnail(number: int) -> Callable[[], np.ndarray]:
+        # From the shared raster cache, which the page hashes and tiles read as well
+        return lambda: raster.pyramid(file_path, number).smallest(long_side=THUMBNAIL_SIZE)
+
+    with pymupdf.open(file_path) as document:
+        return [classify_page(page, thumbnail(page.number)) for page in document]
+
+def group_pages(types: List[str]) -> List[Tuple[str, List[int]]]:
+    """[(sheet type, zero-based page numbers)] in merge order"""
+    groups: Dict[str, List[int]] = {}
+    for number, sheet_type in enumerate(types):
+        groups.setdefault(sheet_type, []).append(number)
+    return [(sheet_type, groups[sheet_type]) for sheet_type in SHEET_ORDER if sheet_type in groups]
+
+def page_count(file_path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(file_path) as document:
+        return document.page_count
+
+def write_pages(file_path: str, pages: List[int], out_path: str) -> str:
+    """Copy the given pages of a PDF into a new PDF"""
+    import pymupdf
+
+    with pymupdf.open(file_path) as source, pymupdf.open() as target:
+        for number in pages:
+            target.insert_pdf(source, from_page=number, to_page=number)
+        target.save(out_path)
+    return out_path
+
+def _empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+# Sheet type whose reading wins when a section, or an entry of it, shows up on several sheets
+SECTION_OWNERS = {
+    "footprint": "architectural", "rooms": "architectural", "finishes": "schedule", "roofing": "roof",
+    "reinforcement": "structural", "concreteStructures": "structural", "earthworks": "structural",
+    "foundationWalling": "structural", "plumbing": "mep", "electrical": "mep",
+}
+# List sections that are one value (a polygon), taken whole from one sheet instead of merged
+WHOLE_SECTIONS = {"footprint"}
+# Fields that identify the same entry of a list on two sheets; lists not named here match on "name"
+ENTRY_KEYS = {
+    "finishes": ("category", "material", "location"),
+    "reinforcement": ("element", "name"),
+    "concreteStructures": ("element", "name"),
+    "roofing": ("type", "name"),
+    "plumbing": ("systemType", "name"),
+    "electrical": ("systemType", "name"),
+    "earthworks": ("type", "length", "width", "depth"),
+}
+
+def _entry_key(item: Any, fields: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+    if not isinstance(item, dict):
+        return None
+    key = tuple("" if _empty(item.get(field)) else _words(str(item[field])).strip() for field in fields)
+    return key if any(key) else None
+
+def _merge_entry(kept: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """One entry read on two sheets: the kept reading, with the fields it left empty taken from the other"""
+    merged = dict(kept)
+    for key, value in other.items():
+        if _empty(merged.get(key)):
+            merged[key] = value
+    return merged
+
+def _merge_list(current: List[Any], incoming: List[Any], fields: Tuple[str, ...], owns: bool) -> List[Any]:
+    """Entries matching on ``fields`` merge one to one (the owner's reading wins), the rest append"""
+    merged = list(current)
+    unmatched: Dict[Tuple[str, ...], List[int]] = {}
+    for i, item in enumerate(merged):
+        key = _entry_key(item, fields)
+        if key is not None:
+            unmatched.setdefault(key, []).append(i)
+    ids = {item.get("id") for item in current if isinstance(item, dict)}
+    for item in incoming:
+        key = _entry_key(item, fields)
+        if unmatched.get(key):
+            i = unmatched[key].pop(0)
+            existing = merged[i]
+            entry = _merge_entry(item, existing) if owns else _merge_entry(existing, item)
+            if "id" in existing:
+                entry["id"] = existing["id"]
+            merged[i] = entry
+            continue
+        if isinstance(item, dict) and item.get("id") in ids - {None}:
+            item = {**item, "id": f"{item['id']}-{len(merged) + 1}"}
+        merged.append(item)
+    return merged
+
+def _merge_value(current: Any, incoming: Any, path: str = "", owns: bool = False) -> Any:
+    """Lists merge entry by entry, objects merge per field, otherwise the first non-empty value wins
+
+    ``path`` is the dotted key of the value in the document; ``owns`` is set when the incoming
+    sheet is the section's owner, whose reading then wins over earlier sheets.
+    """
+    if _empty(current):
+        return incoming
+    if isinstance(current, list) and isinstance(incoming, list):
+        if path in WHOLE_SECTIONS:
+            return incoming if owns and not _empty(incoming) else current
+        return _merge_list(current, incoming, ENTRY_KEYS.get(path, ("name",)), owns)
+    if isinstance(current, dict) and isinstance(incoming, dict):
+        merged = dict(current)
+        for key, value in incoming.items():
+            merged[key] = _merge_value(merged.get(key), value, f"{path}.{key}" if path else key, owns)
+        return merged
+    return current
+
+def _merge_wall_sections(current: List[Dict[str, Any]], incoming: List[Dict[str, Any]], schedule: bool):
+    """Wall sections merge by wall type; a schedule's doors and windows replace those counted on plans"""
+    merged = {section.get("type"): dict(section) for section in current if isinstance(section, dict)}
+    for section in incoming:
+        if not isinstance(section, dict):
+            continue
+        existing = merged.get(section.get("type"))
+        if existing is None:
+            merged[section.get("type")] = dict(section)
+            continue
+        for key, value in section.items():
+            if key in ("doors", "windows"):
+                if value and (schedule or not existing.get(key)):
+                    existing[key] = value
+            else:
+                existing[key] = _merge_value(existing.get(key), value)
+    return list(merged.values())
+
+def merge(parts: List[Tuple[str, List[int], Dict[str, Any]]]) -> Dict[str, Any]:
+    """One document from the per-type results, with the sheets each section came from"""
+    doc: Dict[str, Any] = {}
+    provenance = []
+    for sheet_type, pages, result in parts:
+        entry: Dict[str, Any] = {"type": sheet_type, "pages": [number + 1 for number in pages]}
+        if "error" in result:
+            entry["error"] = result["error"]
+            provenance.append(entry)
+            continue
+        entry["sections"] = [key for key, value in result.items() if not _empty(value)]
+        for key in entry["sections"]:
+            if key == "wallSections" and isinstance(doc.get(key), list):
+                doc[key] = _merge_wall_sections(doc[key], result[key], sheet_type == "schedule")
+            else:
+                doc[key] = _merge_value(doc.get(key), result[key], key, SECTION_OWNERS.get(key) == sheet_type)
+        provenance.append(entry)
+    if not doc:
+        errors = [entry["error"] for entry in provenance if "error" in entry]
+        doc = {"error": errors[0] if errors else "Nothing found on any sheet"}
+    doc["sheets"] = provenance
+    return doc
@@ -0,0 +1,96 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Cold-start benchmark.
+
+Measures, in fresh interpreters, how long each module on the request path
+takes to import, and optionally how long a running (or just woken) server
+takes to answer /health, /warmup and a first upload.
+
+    python startup_bench.py
+    python startup_bench.py --url https://constructly-backend.onrender.com --file sample.pdf
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from typing import Dict, List, Optional
+
+# Ordered roughly by when a cold request pays for them
+IMPORT_TARGETS = [
+    "fastapi",
+    "main",
+    "dotenv",
+    "prompts",
+    "parser",
+    "quantities",
+    "google.generativeai",
+]
+
+def time_import(module: str, repeat: int) -> Optional[float]:
+    """Best-of-N wall time for `python -c "import module"`, minus bare interpreter start-up"""
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def run(code: str) -> Optional[float]:
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True)
+        if proc.returncode != 0:
+            return None
+        return time.perf_counter() - started
+
+    baseline = min(run("pass") for _ in range(repeat))
+    samples = [run(f"import {module}") for _ in range(repeat)]
+    if any(s is None for s in samples):
+        return None
+    return max(0.0, min(samples) - baseline)
+
+def time_request(url: str, method: str = "GET", body: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None) -> float:
+    """Wall time of one HTTP request (raises on HTTP errors)"""
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        resp.read()
+    return time.perf_counter() - started
+
+def upload_body(file_path: str):
+    """Build a multipart body for /api/plan/upload"""
+    boundary = uuid.uuid4().hex
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(file_path)}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Measure import and wake-up cost of the plan parser")
+    ap.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (best is reported)")
+    ap.add_argument("--url", help="Base URL of a running server to time /health, /warmup and an upload against")
+    ap.add_argument("--file", help="Plan to upload after warm-up (requires --url)")
+    args = ap.parse_args(argv)
+
+    print(f"{'module':<24}import (s)")
+    for module in IMPORT_TARGETS:
+        elapsed = time_import(module, args.repeat)
+        print(f"{module:<24}{'unavailable' if elapsed is None else f'{elapsed:.3f}'}")
+
+    if args.url:
+        base = args.url.rstrip("/")
+        print()
+        print(f"{'request':<24}time (s)")
+        print(f"{'GET /health':<24}{time_request(base + '/health'):.3f}")
+        print(f"{'GET /warmup':<24}{time_request(base + '/warmup'):.3f}")
+        if args.file:
+            body, headers = upload_body(args.file)
+            elapsed = time_request(base + "/api/plan/upload", "POST", body, headers)
+            print(f"{'POST /api/plan/upload':<24}{elapsed:.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""SQLite store of finished analyses, so repeated drawings are not paid for twice.
+
+An analysis keeps its merged document plus the per-sheet-type parts it was
+merged from, and a perceptual hash and a pixel digest of every page. A new
+upload from the same user and project can reuse whole parts instead of
+calling the model again: the perceptual hash finds candidate pages, and only
+pages whose rendered pixels are identical are reused. Analyses are indexed by content hash, project name, user,
+model, prompt version and time, so history lookups are index reads; the
+documents themselves are stored as zlib-compressed compact JSON.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+from datadir import data_path
+from phash import BKTree, MAX_DISTANCE
+
+STORE_PATH = os.getenv("PLAN_STORE_PATH") or data_path("plan_store.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    result BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parts (
+    analysis_id TEXT NOT NULL REFERENCES analyses (id),
+    position INTEGER NOT NULL,
+    sheet_type TEXT NOT NULL,
+    pages TEXT NOT NULL,
+    result BLOB NOT NULL,
+    PRIMARY KEY (analysis_id, position)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    file_hash TEXT NOT NULL,
+    analysis_id TEXT NOT NULL REFERENCES analyses (id)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    analysis_id TEXT NOT NULL REFERENCES analyses (id),
+    page INTEGER NOT NULL,
+    phash INTEGER NOT NULL,
+    PRIMARY KEY (analysis_id, page)
+);
+CREATE TABLE IF NOT EXISTS usage (
+    created REAL NOT NULL,
+    user TEXT,
+    project TEXT,
+    model TEXT NOT NULL,
+    sheet_type TEXT,
+    attempt INTEGER NOT NULL,
+    hedge INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_user ON usage (user, created);
+CREATE INDEX IF NOT EXISTS usage_created ON usage (created);
+"""
+
+# Columns added after the first release, per table; existing files are migrated on open
+COLUMNS = {
+    "analyses": {
+        "project_name": "TEXT", "user": "TEXT", "model": "TEXT", "prompt_version": "TEXT", "project": "TEXT",
+        "complete": "INTEGER",
+    },
+    "pages": {"digest": "TEXT"},
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS analyses_file_hash ON analyses (file_hash, created);
+CREATE INDEX IF NOT EXISTS analyses_project ON analyses (project_name, created);
+CREATE INDEX IF NOT EXISTS analyses_user ON analyses (user, created);
+CREATE INDEX IF NOT EXISTS analyses_model ON analyses (model, created);
+CREATE INDEX IF NOT EXISTS analyses_prompt ON analyses (prompt_version, created);
+CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created);
+CREATE INDEX IF NOT EXISTS analyses_owner ON analyses (user, project, created);
+"""
+
+# Indexed columns find() filters on
+FILTERS = ("file_hash", "project_name", "user", "project", "model", "prompt_version")
+METADATA = ("id", "file_hash", "created", "project_name", "user", "project", "model", "prompt_version")
+# Columns usage_totals() can group by
+USAGE_GROUPS = ("user", "project", "model", "sheet_type")
+USAGE_COLUMNS = (
+    "user", "project", "model", "sheet_type", "attempt", "hedge", "ok",
+    "input_tokens", "output_tokens", "cached_tokens", "seconds",
+)
+
+def _pack(doc: Any) -> bytes:
+    return zlib.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+def _signed(key: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+def _unsigned(key: int) -> int:
+    return key + (1 << 64) if key < 0 else key
+
+def _metadata(row: tuple) -> Dict[str, Any]:
+    return dict(zip(("analysisId", "fileHash", "created", "projectName", "user", "project", "model", "promptVersion"), row))
+
+Part = Tuple[str, List[int], Dict[str, Any]]
+
+class Store:
+    """Analyses, their parts and page hashes in one SQLite file"""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._tree: Optional[BKTree] = None
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            for table, columns in COLUMNS.items():
+                existing = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+                for column, kind in columns.items():
+                    if column not in existing:
+                        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+                # Older files have a single-column file_hash index; the (file_hash, created) one replaces it
+                if table == "analyses" and "project_name" not in existing:
+                    db.execute("DROP INDEX IF EXISTS analyses_file_hash")
+            db.executescript(INDEXES)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def save(
+        self,
+        file_hash: str,
+        hashes: List[int],
+        digests: List[str],
+        parts: List[Part],
+        result: Dict[str, Any],
+        user: Optional[str] = None,
+        project: Optional[str] = None,
+        model: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+        complete: bool = True,
+    ) -> str:
+        """Store a finished analysis for user/project; returns its id.
+
+        An incomplete analysis (a sheet failed) keeps its good parts for reuse but
+        is never returned whole by by_file_hash, so the failed sheets run again.
+        """
+        analysis_id = uuid.uuid4().hex
+        project_name = result.get("projectName") if isinstance(result.get("projectName"), str) else None
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO analyses (id, file_hash, created, result, project_name, user, project, model, prompt_version, complete) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (analysis_id, file_hash, time.time(), _pack(result), project_name, user, project, model, prompt_version, int(complete)),
+            )
+            db.executemany(
+                "INSERT INTO parts (analysis_id, position, sheet_type, pages, result) VALUES (?, ?, ?, ?, ?)",
+                [(analysis_id, i, t, json.dumps(pages), _pack(part)) for i, (t, pages, part) in enumerate(parts)],
+            )
+            db.executemany(
+                "INSERT INTO pages (analysis_id, page, phash, digest) VALUES (?, ?, ?, ?)",
+                [(analysis_id, page, _signed(key), digest) for page, (key, digest) in enumerate(zip(hashes, digests))],
+            )
+        with self._lock:
+            if self._tree is not None:
+                for page, key in enumerate(hashes):
+                    self._tree.add(key, (analysis_id, page))
+        return analysis_id
+
+    def result(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            row = db.execute("SELECT result FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def by_file_hash(self, file_hash: str, user: Optional[str], project: Optional[str]) -> Optional[str]:
+        """Id of the latest complete analysis of exactly these bytes made for this user and project"""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM analyses WHERE file_hash = ? AND user IS ? AND project IS ? AND complete = 1 "
+                "ORDER BY created DESC LIMIT 1",
+                (file_hash, user, project),
+            ).fetchone()
+        return row[0] if row else None
+
+    def owned(self, analysis_ids: Iterable[str], user: Optional[str], project: Optional[str]) -> set:
+        """Those of the analyses that were made for this user and project"""
+        analysis_ids = list(analysis_ids)
+        if not analysis_ids:
+            return set()
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT id FROM analyses WHERE id IN ({', '.join('?' * len(analysis_ids))}) AND user IS ? AND project IS ?",
+                (*analysis_ids, user, project),
+            ).fetchall()
+        return {analysis_id for analysis_id, in rows}
+
+    def metadata(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Who, what and when of a stored analysis, without its document"""
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(METADATA)} FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return _metadata(row) if row else None
+
+    def find(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        owner: Optional[Tuple[Optional[str], Optional[str]]] = None,
+        **filters: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        """Metadata of stored analyses matching the filters (see FILTERS), newest first.
+
+        A filter that is None is not applied; pass owner=(user, project) to match
+        those columns exactly, unset ones included.
+        """
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        where, values = [], []
+        for name, value in filters.items():
+            if value is not None:
+                where.append(f"{name} = ?")
+                values.append(value)
+        if owner is not None:
+            where.append("user IS ? AND project IS ?")
+            values.extend(owner)
+        if since is not None:
+            where.append("created >= ?")
+            values.append(since)
+        if until is not None:
+            where.append("created < ?")
+            values.append(until)
+        query = f"SELECT {', '.join(METADATA)} FROM analyses"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        with self._connect() as db:
+            rows = db.execute(query + " ORDER BY created DESC LIMIT ?", (*values, limit)).fetchall()
+        return [_metadata(row) for row in rows]
+
+    def record_usage(self, row: Dict[str, Any]) -> None:
+        """One model request (see usage.record)"""
+        with self._connect() as db:
+            db.execute(
+                f"INSERT INTO usage (created, {', '.join(USAGE_COLUMNS)}) VALUES (?{', ?' * len(USAGE_COLUMNS)})",
+                (time.time(), *(row.get(column) for column in USAGE_COLUMNS)),
+            )
+
+    def tokens_used(self, user: Optional[str], since: float) -> int:
+        """Input plus output tokens billed to a user (None: unattributed) since a time"""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM usage WHERE user IS ? AND created >= ?",
+                (user, since),
+            ).fetchone()
+        return row[0]
+
+    def usage_totals(
+        self, by: Iterable[str], since: Optional[float] = None, until: Optional[float] = None, user: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Requests, tokens and wall time (of one user, or everyone) grouped by any of USAGE_GROUPS, biggest token users first"""
+        by = list(by)
+        unknown = set(by) - set(USAGE_GROUPS)
+        if unknown:
+            raise ValueError(f"Cannot group usage by: {', '.join(sorted(unknown))}")
+        where, values = [], []
+        if user is not None:
+            where.append("user = ?")
+            values.append(user)
+        if since is not None:
+            where.append("created >= ?")
+            values.append(since)
+        if until is not None:
+            where.append("created < ?")
+            values.append(until)
+        query = (
+            f"SELECT {''.join(column + ', ' for column in by)}COUNT(*), SUM(1 - ok), SUM(hedge), "
+            "SUM(input_tokens), SUM(output_tokens), SUM(cached_tokens), SUM(seconds) FROM usage"
+        )
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        if by:
+            query += f" GROUP BY {', '.join(by)}"
+        with self._connect() as db:
+            rows = db.execute(query + " ORDER BY SUM(input_tokens + output_tokens) DESC", values).fetchall()
+        keys = by + ["calls", "failed", "hedges", "inputTokens", "outputTokens", "cachedTokens", "seconds"]
+        return [dict(zip(keys, row)) for row in rows if row[len(by)]]
+
+    def url_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        """ETag, content hash and analysis last seen for a storage URL"""
+        with self._connect() as db:
+            row = db.execute("SELECT etag, file_hash, analysis_id FROM urls WHERE url = ?", (url,)).fetchone()
+        return dict(zip(("etag", "fileHash", "analysisId"), row)) if row else None
+
+    def remember_url(self, url: str, etag: Optional[str], file_hash: str, analysis_id: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO urls (url, etag, file_hash, analysis_id) VALUES (?, ?, ?, ?)",
+                (url, etag, file_hash, analysis_id),
+            )
+
+    def parts(self, analysis_id: str) -> List[Part]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT sheet_type, pages, result FROM parts WHERE analysis_id = ? ORDER BY position", (analysis_id,)
+            ).fetchall()
+        return [(t, json.loads(pages), _unpack(blob)) for t, pages, blob in rows]
+
+    def page_hashes(self, analysis_id: str) -> List[int]:
+        with self._connect() as db:
+            rows = db.execute("SELECT phash FROM pages WHERE analysis_id = ? ORDER BY page", (analysis_id,)).fetchall()
+        return [_unsigned(key) for key, in rows]
+
+    def page_digests(self, analysis_id: str) -> List[Optional[str]]:
+        """Pixel digest of every page (None for pages stored before digests were kept)"""
+        with self._connect() as db:
+            rows = db.execute("SELECT digest FROM pages WHERE analysis_id = ? ORDER BY page", (analysis_id,)).fetchall()
+        return [digest for digest, in rows]
+
+    def part(self, analysis_id: str, sheet_type: str, pages: Iterable[int]) -> Optional[Dict[str, Any]]:
+        """The stored result of an analysis's part of this sheet type over exactly these pages"""
+        pages = sorted(pages)
+        return next((result for t, p, result in self.parts(analysis_id) if t == sheet_type and sorted(p) == pages), None)
+
+    def reuse_from(self, analysis_id: str, unchanged: Dict[int, int], groups: List[Tuple[str, List[int]]]):
+        """Parts of one earlier analysis for the groups whose pages are all unchanged ({new page: old page}).
+
+        Returns {group position: (analysis id, result)} like find_parts().
+        """
+        reused = {}
+        for position, (sheet_type, pages) in enumerate(groups):
+            if all(page in unchanged for page in pages):
+                part = self.part(analysis_id, sheet_type, [unchanged[page] for page in pages])
+                if part is not None:
+                    reused[position] = (analysis_id, part)
+        return reused
+
+    def similar(self, hashes: List[int], radius: int = MAX_DISTANCE) -> List[List[Tuple[int, Tuple[str, int]]]]:
+        """Stored pages near each hash: per page, [(distance, (analysis id, page))] closest first"""
+        with self._lock:
+            if self._tree is None:
+                with self._connect() as db:
+                    rows = db.execute("SELECT phash, analysis_id, page FROM pages").fetchall()
+                self._tree = BKTree((_unsigned(key), (analysis_id, page)) for key, analysis_id, page in rows)
+            return [self._tree.search(key, radius) for key in hashes]
+
+    def find_parts(
+        self,
+        hashes: List[int],
+        digest: Callable[[int], str],
+        groups: List[Tuple[str, List[int]]],
+        user: Optional[str],
+        project: Optional[str],
+    ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        """Stored results for the sheet groups that an earlier analysis of the same user and project already covered.
+
+        Earlier pages within MAX_DISTANCE of a page's perceptual hash are only
+        candidates: a group is reused when every one of its pages has exactly the
+        pixel digest of a page of one earlier analysis, and that analysis has a
+        part of the same sheet type over exactly those pages. A sheet with the same
+        layout but another title or dimension is never reused. ``digest(page)``
+        is only called for pages with a candidate.
+        Returns {group position: (analysis id, result)}.
+        """
+        matches = self.similar(hashes)
+        owned = self.owned({analysis_id for found in matches for _, (analysis_id, _) in found}, user, project)
+        stored_digests: Dict[str, List[Optional[str]]] = {}
+
+        def identical(analysis_id: str, earlier: int, page: int) -> bool:
+            if analysis_id not in stored_digests:
+                stored_digests[analysis_id] = self.page_digests(analysis_id)
+            known = stored_digests[analysis_id]
+            return earlier < len(known) and known[earlier] is not None and known[earlier] == digest(page)
+
+        reused = {}
+        for position, (sheet_type, pages) in enumerate(groups):
+            # analysis id -> (total distance, {page: earlier page}) for analyses matching every page
+            candidates: Dict[str, Tuple[int, Dict[int, int]]] = {}
+            for n, page in enumerate(pages):
+                closest: Dict[str, Tuple[int, int]] = {}
+                for distance, (analysis_id, earlier) in matches[page]:
+                    if analysis_id in owned and identical(analysis_id, earlier, page):
+                        closest.setdefault(analysis_id, (distance, earlier))
+                if n == 0:
+                    candidates = {a: (d, {page: e}) for a, (d, e) in closest.items()}
+                else:
+                    candidates = {
+                        a: (total + closest[a][0], {**mapping, page: closest[a][1]})
+                        for a, (total, mapping) in candidates.items() if a in closest
+                    }
+            for analysis_id, (_, mapping) in sorted(candidates.items(), key=lambda item: item[1][0]):
+                part = self.part(analysis_id, sheet_type, mapping.values())
+                if part is not None:
+                    reused[position] = (analysis_id, part)
+                    break
+        return reused
+
+_store: Optional[Store] = None
+
+def get_store() -> Store:
+    """Process-wide store, opened on first use"""
+    global _store
+    if _store is None:
+        _store = Store()
+    return _store
@@ -0,0 +1,11 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import os
+import sys
+import tempfile
+
+# The parser modules import each other by name, as when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Runtime state (store, metrics, jobs, raster cache) goes to a scratch directory, never the real one
+os.environ["PLAN_DATA_DIR"] = tempfile.mkdtemp(prefix="elaris-plan-tests-")
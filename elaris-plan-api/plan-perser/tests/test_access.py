@@ -0,0 +1,67 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""One caller must never read another caller's analyses, jobs or usage through the API."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import jobqueue
+import main
+import store
+
+ALICE = {"x-user-id": "alice", "x-project-id": "p1"}
+BOB = {"x-user-id": "bob", "x-project-id": "p1"}
+ALICE_OTHER_PROJECT = {"x-user-id": "alice", "x-project-id": "p2"}
+ADMIN = {"x-admin-token": "secret"}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "_store", store.Store(str(tmp_path / "store.sqlite3")))
+    monkeypatch.setattr(jobqueue, "_broker", jobqueue.SQLiteBroker(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    return TestClient(main.app)
+
+@pytest.fixture
+def alices(client):
+    """An analysis, a finished job and a model request of alice's in project p1"""
+    analysis_id = store.get_store().save("f1", [1], ["d1"], [], {"projectName": "Alice's house"}, "alice", "p1")
+    job_id, _ = jobqueue.get_broker().enqueue("k1", {"user": "alice", "project": "p1"})
+    job = jobqueue.get_broker().claim("w1")
+    jobqueue.get_broker().complete(job.id, "w1", {"projectName": "Alice's house"})
+    store.get_store().record_usage({
+        "user": "alice", "project": "p1", "model": "m", "sheet_type": "architectural", "attempt": 0, "hedge": False,
+        "ok": True, "input_tokens": 500, "output_tokens": 20, "cached_tokens": 0, "seconds": 1.0,
+    })
+    return analysis_id, job_id
+
+def test_the_owner_reads_their_own(client, alices):
+    analysis_id, job_id = alices
+    assert client.get(f"/api/plan/analyses/{analysis_id}", headers=ALICE).json()["projectName"] == "Alice's house"
+    assert client.get("/api/plan/analyses/by-hash/f1", headers=ALICE).json()["analysisId"] == analysis_id
+    assert [a["analysisId"] for a in client.get("/api/plan/analyses", headers=ALICE).json()["analyses"]] == [analysis_id]
+    assert client.get(f"/api/plan/jobs/{job_id}", headers=ALICE).json()["result"]["projectName"] == "Alice's house"
+    assert client.get("/api/usage?by=user", headers=ALICE).json()["usage"][0]["inputTokens"] == 500
+
+@pytest.mark.parametrize("headers", [BOB, ALICE_OTHER_PROJECT, {}], ids=["other-user", "other-project", "anonymous"])
+def test_others_cannot_read_them(client, alices, headers):
+    analysis_id, job_id = alices
+    assert client.get(f"/api/plan/analyses/{analysis_id}", headers=headers).status_code in (401, 404)
+    assert client.get("/api/plan/analyses/by-hash/f1", headers=headers).status_code in (401, 404)
+    listed = client.get("/api/plan/analyses?user=alice", headers=headers)
+    assert listed.status_code == 401 or listed.json()["analyses"] == []
+    job = client.get(f"/api/plan/jobs/{job_id}", headers=headers)
+    assert job.status_code == 404 and "Alice" not in job.text
+
+@pytest.mark.parametrize("headers", [BOB, {}], ids=["other-user", "anonymous"])
+def test_others_cannot_read_their_usage(client, alices, headers):
+    # Budgets are per user, so usage is too: alice sees hers from any project
+    usage = client.get("/api/usage?by=user,project", headers=headers)
+    assert usage.status_code == 401 or all(row["user"] != "alice" for row in usage.json()["usage"])
+    assert client.get("/api/usage?by=user", headers=ALICE_OTHER_PROJECT).json()["usage"][0]["inputTokens"] == 500
+
+def test_a_wrong_admin_token_is_just_another_caller(client, alices):
+    analysis_id, _ = alices
+    assert client.get(f"/api/plan/analyses/{analysis_id}", headers={**BOB, "x-admin-token": "guess"}).status_code == 404
+    assert client.get(f"/api/plan/analyses/{analysis_id}", headers=ADMIN).status_code == 200
+    assert client.get("/api/usage?by=user", headers=ADMIN).json()["usage"][0]["user"] == "alice"
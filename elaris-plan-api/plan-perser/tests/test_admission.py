@@ -0,0 +1,63 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import admission
+
+PDF = b"%PDF-1.7\n" + b"0" * 5000
+PNG = b"\x89PNG\r\n\x1a\n" + b"0" * 100
+JPEG = b"\xff\xd8\xff\xe0" + b"0" * 100
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post("/api/plan/upload")
+    async def upload(request: Request):
+        # The endpoint must see the body exactly as sent, peeked bytes included
+        return {"bytes": len(await request.body())}
+
+    app.add_middleware(admission.AdmissionMiddleware, max_bytes=4096 * 4)
+    return TestClient(app)
+
+@pytest.mark.parametrize("head, mime", [(PDF, "application/pdf"), (PNG, "image/png"), (JPEG, "image/jpeg")])
+def test_sniff_signatures(head, mime):
+    assert admission.sniff(head) == mime
+
+def test_check_file():
+    assert admission.check_file("plan.pdf", PDF) is None
+    assert admission.check_file("PLAN.PNG", PNG) is None
+    assert "not a .pdf" in admission.check_file("plan.pdf", PNG)
+    assert "Unsupported file type .dwg" in admission.check_file("plan.dwg", PDF)
+    assert "(none)" in admission.check_file("plan", PDF)
+
+def test_readable_upload_passes_untouched(client):
+    response = client.post("/api/plan/upload", files={"file": ("plan.pdf", PDF, "application/pdf")})
+    assert response.status_code == 200
+    assert response.json()["bytes"] > len(PDF)
+
+@pytest.mark.parametrize("name, content", [("plan.pdf", PNG), ("plan.png", PDF), ("notes.txt", b"hello")])
+def test_unreadable_upload_is_415(client, name, content):
+    response = client.post("/api/plan/upload", files={"file": (name, content, "application/octet-stream")})
+    assert response.status_code == 415
+
+def test_oversized_upload_is_413(client):
+    big = b"%PDF-1.7\n" + b"0" * (4096 * 4)
+    response = client.post("/api/plan/upload", files={"file": ("plan.pdf", big, "application/pdf")})
+    assert response.status_code == 413
+    assert "larger than" in response.json()["detail"]
+
+def test_chunked_upload_past_the_limit_is_413(client):
+    def chunks():
+        yield b"0" * 4096
+        for _ in range(8):
+            yield b"0" * 4096
+
+    response = client.post("/api/plan/upload", content=chunks(), headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 413
+
+def test_other_paths_are_not_checked(client):
+    assert client.post("/api/other", content=b"x" * 100000).status_code == 404
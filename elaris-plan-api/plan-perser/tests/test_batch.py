@@ -0,0 +1,79 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import io
+import json
+
+import pytest
+
+import batch
+import parser
+
+@pytest.fixture
+def analysed(monkeypatch):
+    """A fake parse_file that fails files whose content says so, recording what it analysed"""
+    calls = []
+
+    def parse_file(file_path, user=None, project=None):
+        calls.append((file_path, user))
+        with open(file_path, "rb") as f:
+            if b"broken" in f.read():
+                raise ValueError("unreadable")
+        return {"analysisId": file_path}
+
+    monkeypatch.setattr(parser, "parse_file", parse_file)
+    return calls
+
+def _plan(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.7\n" + content)
+    return str(path)
+
+def _records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+def test_collect_inputs(tmp_path):
+    a = _plan(tmp_path / "plans" / "a.pdf", b"a")
+    b = _plan(tmp_path / "plans" / "sub" / "b.png", b"b")
+    c = _plan(tmp_path / "more" / "c.jpg", b"c")
+    (tmp_path / "plans" / "notes.txt").write_text("not a plan")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"# archived\n\n{c}\n{a}\n")
+    assert batch.collect([str(tmp_path / "plans")], str(manifest)) == [a, b, c]
+    assert batch.collect([str(tmp_path / "**" / "*.jpg")]) == [c]
+
+def test_rerun_skips_what_finished_and_retries_failures(tmp_path, analysed):
+    files = [_plan(tmp_path / "a.pdf", b"a"), _plan(tmp_path / "b.pdf", b"broken"), _plan(tmp_path / "c.pdf", b"c")]
+    checkpoint = str(tmp_path / "batch.checkpoint")
+    out = io.StringIO()
+    summary = batch.run_batch(files, out, checkpoint, workers=2, user="u1")
+    assert (summary["files"], summary["skipped"], summary["analysed"], summary["failed"]) == (3, 0, 2, 1)
+    records = {record["file"]: record for record in _records(out)}
+    assert records[files[1]]["error"] == "unreadable" and "result" not in records[files[1]]
+    assert records[files[0]]["result"] == {"analysisId": files[0]}
+    assert sorted(open(checkpoint).read().split()) == sorted(records[path]["hash"] for path in (files[0], files[2]))
+    assert {user for _, user in analysed} == {"u1"}
+
+    # Interrupted or not, a rerun only analyses what has no checkpoint mark
+    analysed.clear()
+    out = io.StringIO()
+    summary = batch.run_batch(files, out, checkpoint)
+    assert (summary["skipped"], summary["analysed"], summary["failed"]) == (2, 0, 1)
+    assert [path for path, _ in analysed] == [files[1]]
+    assert [record["file"] for record in _records(out)] == [files[1]]
+
+def test_duplicate_content_is_analysed_once(tmp_path, analysed):
+    files = [_plan(tmp_path / "a.pdf", b"same"), _plan(tmp_path / "copy" / "a.pdf", b"same")]
+    summary = batch.run_batch(files, io.StringIO(), str(tmp_path / "batch.checkpoint"))
+    assert (summary["skipped"], summary["analysed"]) == (1, 1)
+    assert [path for path, _ in analysed] == [files[0]]
+
+def test_main_appends_to_out_and_its_checkpoint(tmp_path, analysed):
+    _plan(tmp_path / "plans" / "a.pdf", b"a")
+    _plan(tmp_path / "plans" / "b.pdf", b"broken")
+    out = tmp_path / "results.ndjson"
+    assert batch.main([str(tmp_path / "plans"), "--out", str(out), "--workers", "0"]) == 1
+    assert (tmp_path / "results.ndjson.checkpoint").read_text().count("\n") == 1
+    assert batch.main([str(tmp_path / "plans"), "--out", str(out)]) == 1
+    # The second run only added the retried failure
+    assert len(out.read_text().splitlines()) == 3
@@ -0,0 +1,62 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import pytest
+
+import canon
+
+@pytest.mark.parametrize("value, enum, expected", [
+    ("Wood", "FRAME_TYPES", "Wood"),
+    ("timber", "FRAME_TYPES", "Wood"),
+    ("Standard", "BLOCK_TYPES", "Standard Block"),
+    ("upvc pipe", "PIPE_MATERIALS", "PVC-u"),
+    ("wash hand basin", "FIXTURE_TYPES", "lavatory"),
+    ("Y12", "REBAR_SIZES", "D12"),
+    ("12mm", "REBAR_SIZES", "D12"),
+    ("R6", "REBAR_SIZES", "R6"),
+    ("clay roof tiles", "ROOF_MATERIALS", "clay-tiles"),
+    ("concrete tile", "ROOF_MATERIALS", "concrete-tiles"),
+    ("suparstructure", "STRUCTURE_CATEGORIES", "superstructure"),
+    ("Cermic Tiles", "COMMON_MATERIALS.flooring", "Ceramic Tiles"),
+    # The head noun decides, not a leading modifier that is also a synonym
+    ("LED floodlight", "LIGHTING_TYPES", "floodlight"),
+    ("LED tube", "LIGHTING_TYPES", "fluorescent"),
+    ("LED", "LIGHTING_TYPES", "led-downlight"),
+    ("recessed LED downlight", "LIGHTING_TYPES", "led-downlight"),
+])
+def test_canonical(value, enum, expected):
+    assert canon.canonical(value, enum) == expected
+
+@pytest.mark.parametrize("value, enum", [
+    # Ambiguous or unrelated: left as the model wrote them
+    ("uPVC", "FRAME_TYPES"),
+    ("tiles", "ROOF_MATERIALS"),
+    ("roof tiles", "ROOF_MATERIALS"),
+    ("xyzzy", "FRAME_TYPES"),
+    ("", "FRAME_TYPES"),
+])
+def test_unmatched_values_are_kept(value, enum):
+    assert canon.canonical(value, enum) == value
+
+def test_non_strings_and_unknown_enums_are_kept():
+    assert canon.canonical(3, "FRAME_TYPES") == 3
+    assert canon.canonical(None, "FRAME_TYPES") is None
+    assert canon.canonical("timber", "NO_SUCH_ENUM") == "timber"
+
+def test_canonicalise_rewrites_nested_fields():
+    doc = {
+        "wallSections": [{
+            "blockType": "standard",
+            "plaster": "both",
+            "doors": [{"type": "flush", "frame": {"type": "timber"}}],
+            "windows": [{"glass": "obscure", "frame": {"type": "Steel"}}],
+        }],
+        "finishes": [{"category": "flooring", "material": "ceramic tile"}],
+    }
+    assert canon.canonicalise(doc) == 6
+    section = doc["wallSections"][0]
+    assert (section["blockType"], section["plaster"]) == ("Standard Block", "Both Sides")
+    assert section["doors"][0] == {"type": "Solid flush", "frame": {"type": "Wood"}}
+    assert section["windows"][0]["glass"] == "Frosted"
+    assert doc["finishes"][0]["material"] == "Ceramic Tiles"
+    assert canon.canonicalise(doc) == 0
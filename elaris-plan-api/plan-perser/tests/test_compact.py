@@ -0,0 +1,107 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import json
+import re
+
+import compact
+import prompts
+
+SCHEMA = dict(prompts.SCHEMA_SECTIONS)
+
+def _keys(value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            out.add(key)
+            _keys(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _keys(item, out)
+    return out
+
+def test_every_section_is_in_the_baseline_schema():
+    for full in compact.SECTION_KEYS.values():
+        assert full.split(".")[0] in SCHEMA
+
+def test_wall_sections_decode_to_the_schema_example():
+    doc = {
+        "wd": {"ep": 50.5, "ip": 35.2, "eh": 3.0, "ih": 2.7},
+        "ws": [[0, 0, 0.2, 0, [[0.9, 2.1, 1, 0, 0]], [[1.2, 1.2, 2, 0, 1]]]],
+    }
+    decoded = compact.decode(doc)
+    assert decoded["wallDimensions"] == {
+        "externalWallPerimiter": 50.5, "internalWallPerimiter": 35.2, "externalWallHeight": 3.0, "internalWallHeight": 2.7,
+    }
+    section = decoded["wallSections"][0]
+    assert (section["type"], section["blockType"], section["thickness"], section["plaster"]) == ("external", "Standard Block", 0.2, "Both Sides")
+    custom = {"height": "2.1", "width": "0.9", "price": ""}
+    assert section["doors"] == [{
+        "sizeType": "standard",
+        "standardSize": "0.9 × 2.1 m",
+        "custom": custom,
+        "type": "Panel",
+        "frame": {"type": "Wood", "sizeType": "standard", "standardSize": "0.9 × 2.1 m", "height": "2.1", "width": "0.9", "custom": custom},
+        "count": 1,
+        "price": 0,
+    }]
+    window = section["windows"][0]
+    assert (window["glass"], window["frame"]["type"], window["standardSize"], window["count"]) == ("Clear", "Steel", "1.2 × 1.2 m", 2)
+
+def test_custom_opening_size():
+    door = compact.opening("doors", {"width": 0.85, "height": 2.0, "type": "Steel", "frame": "Steel"})
+    assert door["sizeType"] == "custom"
+    assert door["standardSize"] == ""
+    assert door["custom"] == {"height": "2", "width": "0.85", "price": ""}
+
+def test_decoded_keys_appear_in_their_schema_section():
+    doc = {
+        "wd": {"ep": 40, "ip": 20, "eh": 3, "ih": 2.7},
+        "ws": [[1, 2, 0.15, 1, [], []]],
+        "wp": {"bt": 0, "t": 0.2, "p": 0},
+        "fd": {"ft": "Strip Footing", "tp": 40, "mt": 0, "wt": 0.2, "wh": 1, "h": 1, "l": 5, "w": 6},
+        "fw": [[0, "0.4 x 0.2 x 0.2", 0.2, 40, 1, 1, 1]],
+        "rm": [["Kitchen", 4, 3, 12, 0, 0]],
+        "ew": [["trench", 40, 0.6, 0.9, 21.6, "soil"]],
+        "fn": [[0, "tiles", "Ceramic Tiles", 12, 0, 12, "Kitchen"]],
+    }
+    decoded = compact.decode(doc)
+    for section, value in decoded.items():
+        text = SCHEMA[section]
+        missing = {key for key in _keys(value, set()) if not re.search(rf'"{re.escape(key)}"', text)}
+        assert not missing, (section, missing)
+
+def test_stringified_numbers_and_ids():
+    decoded = compact.decode({"ew": [["trench", 40, 0.6, 0.9, 21.6, "soil"], ["pit", 2, 2, 1.5, 6, "soil"]]})
+    first, second = decoded["earthworks"]
+    assert (first["id"], second["id"]) == ("excavation-01", "excavation-02")
+    assert (first["length"], first["width"], first["volume"]) == ("40", "0.6", "21.6")
+
+def test_full_documents_pass_through():
+    doc = {"wallDimensions": {"externalWallPerimiter": 10}, "rooms": []}
+    assert not compact.is_compact(doc)
+    assert compact.decode(doc) is doc
+
+def test_out_of_range_ordinals_are_kept():
+    decoded = compact.decode({"ws": [[7, "Hollow Block", 0.2, 0]]})
+    assert decoded["wallSections"][0]["type"] == 7
+    assert decoded["wallSections"][0]["blockType"] == "Hollow Block"
+
+def test_prompt_has_no_enum_tables():
+    text = compact.describe()
+    assert "ENUM" not in text and "index" not in text
+    # Nothing in the prompt asks for ordinals while the instructions ask for plain terms
+    assert "mapped to the calculator values locally" in text
+    assert "mapped to the calculator values locally" in prompts.COMPACT_PROMPT
+
+def test_plain_word_enums_decode_and_canonicalise():
+    import canon
+
+    example = compact.describe().split("Example: ", 1)[1].strip()
+    decoded = compact.decode(json.loads(example))
+    canon.canonicalise(decoded)
+    section = decoded["wallSections"][0]
+    assert (section["type"], section["blockType"], section["plaster"]) == ("external", "Standard Block", "Both Sides")
+    door, window = section["doors"][0], section["windows"][0]
+    assert (door["type"], door["frame"]["type"], door["standardSize"]) == ("Panel", "Wood", "0.9 × 2.1 m")
+    assert (window["glass"], window["frame"]["type"]) == ("Clear", "Steel")
+    assert decoded["wallProperties"] == {"blockType": "Standard Block", "thickness": 0.2, "plaster": "Both Sides"}
@@ -0,0 +1,114 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+import fetch
+
+URL = "https://abc.supabase.co/storage/v1/object/plans/house.pdf"
+PDF = b"%PDF-1.7\n" + b"0" * 5000
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Route fetch's client to a handler, recording the requests it made"""
+    seen = []
+    routes = {}
+    client = httpx.AsyncClient
+
+    def handler(request):
+        seen.append(request)
+        return routes["handler"](request)
+
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs))
+
+    def route(fn):
+        routes["handler"] = fn
+        return seen
+
+    return route
+
+def _download(tmp_path, url=URL, etag=None):
+    return asyncio.run(fetch.download(url, tmp_path, etag))
+
+class _Broken(httpx.AsyncByteStream):
+    """A body that drops after its first chunk"""
+
+    async def __aiter__(self):
+        yield PDF[:1000]
+        raise httpx.ReadError("connection reset")
+
+@pytest.mark.parametrize("url, ok", [
+    (URL, True),
+    ("http://abc.supabase.in/plan.pdf", True),
+    ("https://example.com/plan.pdf", False),
+    ("https://abc.supabase.co.evil.com/plan.pdf", False),
+    ("https://evil.com/abc.supabase.co/plan.pdf", False),
+    ("ftp://abc.supabase.co/plan.pdf", False),
+    ("file:///etc/passwd", False),
+])
+def test_allow_list(url, ok):
+    assert fetch.allowed(url) is ok
+
+def test_disallowed_host_is_never_requested(tmp_path, storage):
+    seen = storage(lambda request: httpx.Response(200, content=PDF))
+    with pytest.raises(fetch.FetchError, match="not allowed"):
+        _download(tmp_path, "https://example.com/plan.pdf")
+    assert seen == []
+
+def test_download_streams_and_hashes(tmp_path, storage):
+    seen = storage(lambda request: httpx.Response(200, content=PDF, headers={"etag": '"v1"'}))
+    result = _download(tmp_path)
+    assert not result.not_modified and result.etag == '"v1"' and result.size == len(PDF)
+    assert result.digest == hashlib.sha256(PDF).hexdigest()
+    assert result.path.suffix == ".pdf" and result.path.read_bytes() == PDF
+    assert "if-none-match" not in seen[0].headers
+
+def test_remembered_etag_answers_not_modified(tmp_path, storage):
+    def handler(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=PDF, headers={"etag": '"v2"'})
+
+    storage(handler)
+    result = _download(tmp_path, etag='"v1"')
+    assert result.not_modified and result.path is None and result.etag == '"v1"'
+    assert list(tmp_path.iterdir()) == []
+    assert _download(tmp_path, etag='"v0"').etag == '"v2"'
+
+def test_declared_size_over_the_cap_is_refused(tmp_path, storage, monkeypatch):
+    monkeypatch.setattr(fetch, "MAX_DOWNLOAD_BYTES", 1000)
+    storage(lambda request: httpx.Response(200, content=PDF))
+    with pytest.raises(fetch.FetchError, match="larger than 1000"):
+        _download(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+def test_streamed_size_over_the_cap_is_unlinked(tmp_path, storage, monkeypatch):
+    monkeypatch.setattr(fetch, "MAX_DOWNLOAD_BYTES", 1000)
+    monkeypatch.setattr(fetch, "CHUNK_SIZE", 256)
+    # No Content-Length: the cap is only hit while streaming
+    storage(lambda request: httpx.Response(200, stream=httpx.ByteStream(PDF)))
+    with pytest.raises(fetch.FetchError, match="larger than 1000"):
+        _download(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("response, message", [
+    (lambda request: httpx.Response(200, content=b"<html>nope</html>"), "not a .pdf file"),
+    (lambda request: httpx.Response(200, stream=_Broken()), "Download failed"),
+    (lambda request: httpx.Response(404), "answered 404"),
+])
+def test_failures_leave_no_file_behind(tmp_path, storage, response, message):
+    storage(response)
+    with pytest.raises(fetch.FetchError, match=message):
+        _download(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+def test_type_comes_from_content_type_when_the_path_has_none(tmp_path, storage):
+    storage(lambda request: httpx.Response(200, content=PDF, headers={"content-type": "application/pdf"}))
+    assert _download(tmp_path, URL.replace(".pdf", "")).path.suffix == ".pdf"
+    storage(lambda request: httpx.Response(200, content=PDF, headers={"content-type": "text/plain"}))
+    with pytest.raises(fetch.FetchError, match="Unsupported"):
+        _download(tmp_path, URL.replace(".pdf", ""))
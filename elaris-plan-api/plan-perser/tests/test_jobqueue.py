@@ -0,0 +1,101 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import time
+
+import pytest
+
+import jobqueue
+import worker
+from jobqueue import SQLiteBroker
+
+@pytest.fixture
+def broker(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobqueue, "RETRY_DELAY", 0.0)
+    return SQLiteBroker(str(tmp_path / "jobs.sqlite3"))
+
+def test_enqueue_is_idempotent(broker):
+    job_id, created = broker.enqueue("k", {"file": "a.pdf"})
+    assert created
+    assert broker.enqueue("k", {"file": "b.pdf"}) == (job_id, False)
+    assert broker.get(job_id)["state"] == "queued"
+
+def test_content_key_includes_the_submitter(tmp_path):
+    path = tmp_path / "plan.pdf"
+    path.write_bytes(b"%PDF-1.7 plan")
+    key = jobqueue.content_key(str(path), None, "alice", "p1")
+    assert key == jobqueue.content_key(str(path), None, "alice", "p1")
+    assert key != jobqueue.content_key(str(path), None, "bob", "p1")
+    assert key != jobqueue.content_key(str(path), None, "alice", "p2")
+
+def test_lease_is_exclusive_until_it_expires(broker):
+    job_id, _ = broker.enqueue("k", {})
+    first = broker.claim("w1", visibility=0.2)
+    assert (first.id, first.attempts) == (job_id, 1)
+    assert broker.claim("w2") is None
+    assert broker.heartbeat(job_id, "w1", visibility=0.2)
+    assert not broker.heartbeat(job_id, "w2")
+    time.sleep(0.3)
+    # w1 went quiet: the job is handed to another worker and w1's late result is refused
+    second = broker.claim("w2", visibility=30)
+    assert (second.id, second.attempts) == (job_id, 2)
+    assert not broker.complete(job_id, "w1", {"sheets": []})
+    assert broker.fail(job_id, "w1", "late") == "running"
+    assert broker.complete(job_id, "w2", {"sheets": []})
+    job = broker.get(job_id)
+    assert (job["state"], job["result"], job["error"]) == ("done", {"sheets": []}, None)
+
+def test_failed_attempts_are_retried(broker):
+    job_id, _ = broker.enqueue("k", {}, max_attempts=3)
+    job = broker.claim("w1")
+    assert broker.fail(job.id, "w1", "model timeout") == "queued"
+    retried = broker.claim("w1")
+    assert (retried.id, retried.attempts) == (job_id, 2)
+    assert broker.get(job_id)["error"] == "model timeout"
+
+def test_retry_waits_for_the_backoff(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "jobs.sqlite3"))
+    broker.enqueue("k", {})
+    job = broker.claim("w1")
+    assert broker.fail(job.id, "w1", "boom") == "queued"
+    assert broker.claim("w1") is None
+
+def test_last_failure_dead_letters(broker):
+    job_id, _ = broker.enqueue("k", {"file": "a.pdf"}, max_attempts=2)
+    for expected in ("queued", "dead"):
+        job = broker.claim("w1")
+        assert broker.fail(job.id, "w1", "bad drawing") == expected
+    assert broker.claim("w1") is None
+    (letter,) = broker.dead_letters()
+    assert (letter["jobId"], letter["attempts"], letter["error"]) == (job_id, 2, "bad drawing")
+    assert broker.retry(job_id)
+    assert not broker.retry(job_id)
+    assert broker.claim("w1").attempts == 1
+
+def test_expired_last_lease_dead_letters(broker):
+    job_id, _ = broker.enqueue("k", {}, max_attempts=1)
+    broker.claim("w1", visibility=0.05)
+    time.sleep(0.1)
+    assert broker.claim("w2") is None
+    assert broker.get(job_id)["state"] == "dead"
+    assert broker.get(job_id)["error"] == "Visibility timeout expired"
+
+def test_resubmitting_a_dead_job_requeues_it(broker):
+    job_id, _ = broker.enqueue("k", {"file": "old.pdf"}, max_attempts=1)
+    broker.fail(broker.claim("w1").id, "w1", "boom")
+    assert broker.enqueue("k", {"file": "new.pdf"}) == (job_id, True)
+    assert broker.claim("w1").payload == {"file": "new.pdf"}
+
+def test_error_documents_are_not_done(broker):
+    job_id, _ = broker.enqueue("k", {})
+    job = broker.claim("w1")
+    # A legacy worker completed an error document; resubmitting analyses it again
+    broker.complete(job.id, "w1", {"error": "No walls found"})
+    assert broker.enqueue("k", {}) == (job_id, True)
+    assert "result" not in broker.get(job_id)
+
+def test_worker_failure_reasons():
+    assert worker.failure({"error": "No walls found"}) == "No walls found"
+    sheets = [{"type": "plan"}, {"type": "roof", "error": "timeout"}]
+    assert worker.failure({"sheets": sheets}) == "roof: timeout"
+    assert worker.failure({"sheets": [{"type": "plan"}]}) is None
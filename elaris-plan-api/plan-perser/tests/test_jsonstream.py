@@ -0,0 +1,51 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import json
+
+import pytest
+
+from jsonstream import SectionParser
+
+DOC = {
+    "wd": {"ep": 50.5, "eh": 3},
+    "pn": "House \"A\", {phase 1}",
+    "ds": "Path C:\\plans\\ground [rev 2]\nline two, end}",
+    "rm": [["Kitchen", 4, 3], ["Store, rear", 2, 2]],
+    "ta": 120,
+}
+TEXT = "```json\n" + json.dumps(DOC) + "\n```"
+
+def feed_all(parser, chunks):
+    found = []
+    for chunk in chunks:
+        found += parser.feed(chunk)
+    return found
+
+def test_whole_text():
+    assert feed_all(SectionParser(), [TEXT]) == list(DOC.items())
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16])
+def test_split_chunks(size):
+    chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    assert feed_all(SectionParser(), chunks) == list(DOC.items())
+
+@pytest.mark.parametrize("cut", ["\\\"", "\\\\", "\\n"])
+def test_chunk_boundary_inside_an_escape(cut):
+    # Split between the backslash and the escaped character
+    at = TEXT.index(cut) + 1
+    assert feed_all(SectionParser(), [TEXT[:at], TEXT[at:]]) == list(DOC.items())
+
+def test_members_arrive_as_soon_as_they_finish():
+    parser = SectionParser()
+    assert parser.feed('{"wd": {"ep": 1}') == []
+    assert parser.feed(', "pn"') == [("wd", {"ep": 1})]
+    assert parser.feed(': "x"}') == [("pn", "x")]
+
+def test_text_after_the_object_is_ignored():
+    parser = SectionParser()
+    assert parser.feed('{"ta": 1} trailing {"ta": 2}') == [("ta", 1)]
+    assert parser.feed('{"pn": "late"}') == []
+
+def test_broken_members_are_skipped():
+    assert feed_all(SectionParser(), ['{"ta": 1, "bad": tru, "pn": "x"}']) == [("ta", 1), ("pn", "x")]
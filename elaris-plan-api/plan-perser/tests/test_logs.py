@@ -0,0 +1,97 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logs
+import main
+
+def _record(msg, level=logging.INFO, exc_info=None, **fields):
+    return logging.getLogger("plan.test").makeRecord("plan.test", level, __file__, 1, msg, None, exc_info, extra=fields)
+
+def _emit(record, size=100):
+    """What the listener would receive and write for a record logged in this context"""
+    records = queue.Queue(size)
+    handler = logs._BoundedQueueHandler(records)
+    handler.addFilter(logs._Correlate())
+    handler.handle(record)
+    return records.get_nowait() if not records.empty() else None
+
+@pytest.mark.parametrize("tail", [False, True])
+def test_truncate(tail):
+    assert logs.truncate("short", 10) == "short"
+    text = "".join(str(n % 10) for n in range(1000))
+    cut = logs.truncate(text, 100, tail=tail)
+    marker = "…(917 chars cut)"
+    assert len(cut) <= 100 and cut == (marker + text[-83:] if tail else text[:83] + marker)
+    # A cut value is never cut again
+    assert logs.truncate(cut, 100, tail=tail) == cut
+
+def test_messages_and_fields_are_cut():
+    document = {"rooms": [{"name": f"Room {n}"} for n in range(1000)]}
+    prepared = _emit(_record("x" * 5000, output=json.dumps(document), count=12345678901, ok=True))
+    assert len(prepared.msg) <= logs.LOG_MAX_FIELD and prepared.msg.endswith("chars cut)")
+    assert len(prepared.fields["output"]) <= logs.LOG_MAX_FIELD and "chars cut" in prepared.fields["output"]
+    assert prepared.fields["count"] == 12345678901 and prepared.fields["ok"] is True
+
+def test_tracebacks_keep_their_end():
+    try:
+        raise ValueError("the actual error " + "y" * 10000)
+    except ValueError:
+        prepared = _emit(_record("failed", exc_info=sys.exc_info()))
+    assert prepared.exc_info is None
+    assert len(prepared.exc_text) <= 4 * logs.LOG_MAX_FIELD
+    assert prepared.exc_text.startswith("…(") and prepared.exc_text.endswith("y")
+
+def test_oversized_json_record_keeps_ids_and_message(monkeypatch):
+    monkeypatch.setattr(logs, "LOG_MAX_RECORD", 400)
+    token = logs.bind(request="r1", job="j1")
+    try:
+        prepared = _emit(_record("analysis done", **{f"field{n}": "v" * 100 for n in range(20)}))
+    finally:
+        logs.reset(token)
+    line = logs._JSONFormatter().format(prepared)
+    assert len(line.encode("utf-8")) <= 400
+    entry = json.loads(line)
+    assert (entry["request"], entry["job"], entry["msg"], entry["truncated"]) == ("r1", "j1", "analysis done", True)
+    assert not any(key.startswith("field") for key in entry)
+
+def test_full_queue_drops_instead_of_waiting():
+    records = queue.Queue(1)
+    handler = logs._BoundedQueueHandler(records)
+    before = logs.stats()["dropped"]
+    for n in range(3):
+        handler.handle(_record(f"line {n}"))
+    assert records.qsize() == 1 and logs.stats()["dropped"] == before + 2
+
+def test_debug_is_sampled_per_request(monkeypatch):
+    monkeypatch.setattr(logs, "LOG_DEBUG_SAMPLE", 0.5)
+    request_ids = [f"request-{n}" for n in range(400)]
+    sampled = [logs._sampled(request_id) for request_id in request_ids]
+    # Deterministic per request, so a sampled request keeps all its DEBUG lines
+    assert sampled == [logs._sampled(request_id) for request_id in request_ids]
+    assert 100 < sum(sampled) < 300
+
+    monkeypatch.setattr(logs, "LOG_DEBUG_SAMPLE", 0.0)
+    before = logs.stats()["sampledOut"]
+    token = logs.bind(request="r1")
+    try:
+        assert _emit(_record("details", level=logging.DEBUG)) is None
+        assert _emit(_record("summary")).msg == "summary"
+    finally:
+        logs.reset(token)
+    assert logs.stats()["sampledOut"] == before + 1
+    monkeypatch.setattr(logs, "LOG_DEBUG_SAMPLE", 1.0)
+    assert _emit(_record("details", level=logging.DEBUG)).msg == "details"
+
+def test_request_id_is_echoed_or_made():
+    client = TestClient(main.app)
+    assert client.get("/health", headers={"x-request-id": "abc123"}).headers["x-request-id"] == "abc123"
+    made = client.get("/health").headers["x-request-id"]
+    assert len(made) == 16 and made != client.get("/health").headers["x-request-id"]
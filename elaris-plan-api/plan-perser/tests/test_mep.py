@@ -0,0 +1,126 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import numpy as np
+import pytest
+
+import mep
+
+# Kitchen and store side by side, bedroom above the kitchen
+ROOMS = [
+    {"name": "Kitchen", "x": 0, "y": 0, "length": 4, "width": 3},
+    {"name": "Store", "x": 4, "y": 0, "length": 3, "width": 3},
+    {"name": "Bedroom", "x": 0, "y": 3, "length": 4, "width": 4},
+]
+
+def test_portals_at_the_middle_of_shared_walls():
+    rects, drawn = mep.room_rects(ROOMS)
+    assert drawn
+    assert mep.portals(rects) == [(0, 1, 4.0, 1.5), (0, 2, 2.0, 3.0)]
+
+def test_route_between_room_centres_goes_through_the_portal():
+    layout = mep.Layout(ROOMS)
+    # Kitchen centre (2, 1.5) -> portal (4, 1.5) -> store centre (5.5, 1.5)
+    assert layout.route(("room", 0), [(1, np.array([5.5, 1.5]))]) == pytest.approx(3.5)
+
+def test_board_goes_in_the_store():
+    assert mep.Layout(ROOMS).hub(mep.BOARD_ROOMS) == ("room", 1)
+
+def test_mst_length_is_manhattan():
+    assert mep._mst_length(np.array([[0, 0], [1, 0], [3, 0], [3, 2.0]])) == pytest.approx(5.0)
+
+@pytest.mark.parametrize("value, expected", [("4mm²", 4.0), ("2.5 mm2", 2.5), (6, 6.0), ("", 1.5), (None, 1.5), ("n/a", 1.5)])
+def test_cable_size(value, expected):
+    assert mep._cable_size(value, 1.5) == expected
+
+def test_mep_quantities():
+    doc = {
+        "rooms": ROOMS,
+        "electrical": [
+            {"systemType": "lighting", "lighting": [{"type": "led-downlight", "count": 4, "location": "Kitchen"}]},
+            {"systemType": "power", "cables": [{"type": "PVC/PVC", "size": "4mm²"}],
+             "outlets": [{"type": "power-socket", "count": 2, "location": "bedroom"}]},
+        ],
+        "plumbing": [
+            {"systemType": "water-supply", "fixtures": [{"type": "kitchen-sink", "count": 1, "location": "Kitchen"}]},
+            # Fixtures listed once under another system are drained too
+            {"systemType": "drainage"},
+        ],
+    }
+    result = mep.mep_quantities(doc)
+    assert result["layout"] == "drawn"
+    lighting, power = result["electrical"]
+    # Conductor sizes are numbers, as in the schema
+    assert (lighting["size"], power["size"]) == (1.5, 4.0)
+    assert (lighting["points"], lighting["circuits"], power["points"]) == (4, 1, 2)
+    # The sockets are further from the board than the kitchen lights, and have drops
+    assert power["length"] > lighting["length"] > 0
+    supply, drainage = result["plumbing"]
+    assert (supply["material"], supply["diameter"], supply["fixtures"]) == ("PPR", 20, 1)
+    assert (drainage["material"], drainage["fixtures"]) == ("PVC-u", 1)
+    assert result["cables"] == {"PVC/PVC": round(lighting["length"] + power["length"], 2)}
+
+def test_rooms_without_positions_get_an_estimated_layout():
+    rooms = [{"name": "Kitchen", "length": 4, "width": 3}, {"name": "Store", "area": 9}]
+    doc = {"rooms": rooms, "electrical": [{"systemType": "power", "outlets": [{"count": 3}]}]}
+    result = mep.mep_quantities(doc)
+    assert result["layout"] == "estimated"
+    assert result["electrical"][0]["points"] == 3
+
+def test_nothing_to_route():
+    assert mep.mep_quantities({"rooms": ROOMS})["layout"] is None
+
+def test_each_circuit_takes_its_own_cable():
+    doc = {
+        "rooms": ROOMS,
+        "electrical": [{
+            "systemType": "power",
+            "cables": [
+                {"type": "PVC/PVC", "size": 2.5, "circuit": "C1"},
+                {"type": "SWA", "size": 6, "circuit": "C2 cooker"},
+            ],
+            "outlets": [
+                {"type": "power-socket", "count": 2, "location": "Bedroom", "circuit": "C1"},
+                {"type": "gpo", "count": 1, "location": "Kitchen", "circuit": "cooker C2"},
+            ],
+        }],
+    }
+    result = mep.mep_quantities(doc)
+    ring, cooker = result["electrical"]
+    assert (ring["cableType"], ring["size"], ring["points"]) == ("PVC/PVC", 2.5, 2)
+    assert (cooker["cableType"], cooker["size"], cooker["points"]) == ("SWA", 6.0, 1)
+    assert result["cables"] == {"PVC/PVC": ring["length"], "SWA": cooker["length"]}
+
+def test_unlisted_circuits_take_the_cable_naming_no_circuit():
+    doc = {
+        "rooms": ROOMS,
+        "electrical": [{
+            "systemType": "power",
+            "cables": [{"type": "SWA", "size": 10, "circuit": "sub-main"}, {"type": "PVC/PVC", "size": 4}],
+            "outlets": [{"count": 3, "location": "Kitchen"}],
+        }],
+    }
+    (run,) = mep.mep_quantities(doc)["electrical"]
+    assert (run["cableType"], run["size"]) == ("PVC/PVC", 4.0)
+
+def test_pipe_length_is_split_over_the_listed_pipes():
+    fixtures = [{"type": "wc", "count": 1, "location": "Bedroom"}, {"type": "kitchen-sink", "count": 1, "location": "Kitchen"}]
+    plain = {"rooms": ROOMS, "plumbing": [{"systemType": "drainage", "fixtures": fixtures}]}
+    (total,) = mep.mep_quantities(plain)["plumbing"]
+
+    by_size = {"rooms": ROOMS, "plumbing": [{"systemType": "drainage", "fixtures": fixtures, "pipes": [
+        {"material": "PVC-u", "diameter": 40}, {"material": "PVC-u", "diameter": 110}, {"material": "HDPE", "diameter": 50},
+    ]}]}
+    result = mep.mep_quantities(by_size)
+    stack, branch = result["plumbing"]
+    # The trunk runs in the widest pipe, the two fixture connections in the narrowest
+    assert (stack["diameter"], branch["diameter"]) == (110, 40)
+    assert branch["length"] == pytest.approx(2 * mep.PLUMBING_DROP * mep.ROUTE_ALLOWANCE)
+    assert branch["length"] + stack["length"] == pytest.approx(total["length"], abs=0.01)
+    assert result["pipes"] == {"PVC-u": pytest.approx(total["length"], abs=0.01)}
+
+    stated = {"rooms": ROOMS, "plumbing": [{"systemType": "drainage", "fixtures": fixtures, "pipes": [
+        {"material": "PVC-u", "diameter": 110, "length": 6}, {"material": "HDPE", "diameter": 50, "length": 3},
+    ]}]}
+    result = mep.mep_quantities(stated)
+    assert result["pipes"]["PVC-u"] == pytest.approx(2 * result["pipes"]["HDPE"], abs=0.02)
@@ -0,0 +1,96 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+import metrics
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One parser process: a few calls to one model, then the end-of-analysis save
+WORKER = """
+import sys
+import metrics
+
+name, n = sys.argv[1], int(sys.argv[2])
+for i in range(n):
+    metrics.latency("model-a").add(1 + i / 100)
+    metrics.count("calls")
+    metrics.count(f"calls.{name}")
+    metrics.save_if_due()
+metrics.save()
+"""
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    """Fresh in-memory metrics backed by a state file of their own"""
+    path = str(tmp_path / "metrics_state.json")
+    monkeypatch.setattr(metrics, "METRICS_PATH", path)
+    for name, value in [("_latency", {}), ("_breakers", {}), ("_budgets", {}), ("_counters", Counter()),
+                        ("_pending", Counter()), ("_loaded", False), ("_saved_at", 0.0)]:
+        monkeypatch.setattr(metrics, name, value)
+    return path
+
+def _file(path):
+    with open(path) as f:
+        return json.load(f)
+
+def test_concurrent_processes_merge_their_saves(state):
+    env = {**os.environ, "METRICS_PATH": state, "METRICS_SAVE_INTERVAL": "0"}
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, f"w{i}", "15"], cwd=HERE, env=env)
+        for i in range(4)
+    ]
+    assert [worker.wait(timeout=60) for worker in workers] == [0] * 4
+    saved = _file(state)
+    assert saved["counters"]["calls"] == 60
+    assert all(saved["counters"][f"calls.w{i}"] == 15 for i in range(4))
+    assert len(saved["latency"]["model-a"]) == 60
+
+def test_save_merges_what_another_process_wrote(state):
+    metrics.count("calls", 2)
+    metrics.latency("model-a").add(1.0)
+    metrics.save()
+    # Another process saves in between
+    other = _file(state)
+    other["counters"]["calls"] += 5
+    other["latency"]["model-a"].append(2.0)
+    other["breakers"] = {"model-b": {"outcomes": [False] * 5, "openedAt": 123.0}}
+    with open(state, "w") as f:
+        json.dump(other, f)
+    metrics.count("calls")
+    metrics.latency("model-a").add(3.0)
+    metrics.save()
+    saved = _file(state)
+    assert saved["counters"]["calls"] == 8
+    assert saved["latency"]["model-a"] == [1.0, 2.0, 3.0]
+    assert saved["breakers"]["model-b"]["openedAt"] == 123.0
+    assert metrics.snapshot()["counters"]["calls"] == 8
+
+def test_model_calls_save_at_most_once_per_interval(state, monkeypatch):
+    monkeypatch.setattr(metrics, "SAVE_INTERVAL", 3600)
+    metrics.count("calls")
+    metrics.save_if_due()
+    assert _file(state)["counters"]["calls"] == 1
+    for _ in range(5):
+        metrics.count("calls")
+        metrics.save_if_due()
+    assert _file(state)["counters"]["calls"] == 1
+    metrics.save()
+    assert _file(state)["counters"]["calls"] == 6
+
+def test_a_breaker_opening_is_saved_at_once(state, monkeypatch):
+    monkeypatch.setattr(metrics, "SAVE_INTERVAL", 3600)
+    metrics.save()
+    breaker = metrics.breaker("model-a")
+    for _ in range(metrics.BREAKER_MIN_CALLS):
+        breaker.record(False)
+    assert breaker.state == "open"
+    metrics.save_if_due()
+    assert _file(state)["breakers"]["model-a"]["openedAt"] == breaker.opened_at
@@ -0,0 +1,123 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import numpy as np
+import pymupdf
+import pytest
+
+import phash
+import raster
+
+# Page hashes far apart from each other; a near copy differs in two bits
+A, B, C = 0x0F0F0F0F0F0F0F0F, 0xF0F0F0F0F0F0F0F0, 0x00FF00FF00FF00FF
+C_EDITED = C ^ 0b101
+
+def test_identical_set():
+    diff = phash.page_diff(["a", "b"], ["a", "b"], [A, B], [A, B])
+    assert diff == {"unchanged": {0: 0, 1: 1}, "changed": [], "revises": {}, "added": [], "removed": []}
+
+def test_edit_invisible_to_the_phash_is_changed():
+    # A dimension changed: the thumbnails hash the same, the pixels do not
+    diff = phash.page_diff(["a", "b"], ["a", "b2"], [A, B], [A, B])
+    assert diff["unchanged"] == {0: 0}
+    assert (diff["changed"], diff["revises"]) == ([1], {1: 1})
+
+def test_reordered_pages_are_unchanged():
+    diff = phash.page_diff(["a", "b"], ["b", "a"], [A, B], [B, A])
+    assert diff["unchanged"] == {0: 1, 1: 0}
+    assert diff["changed"] == diff["added"] == diff["removed"] == []
+
+def test_equal_pages_prefer_their_own_position():
+    diff = phash.page_diff(["blank", "blank"], ["blank", "blank"], [A, A], [A, A])
+    assert diff["unchanged"] == {0: 0, 1: 1}
+
+def test_moved_and_edited_page_is_paired_by_phash():
+    diff = phash.page_diff(["a", "b", "c"], ["c2", "a", "b"], [A, B, C], [C_EDITED, A, B])
+    assert diff["unchanged"] == {1: 0, 2: 1}
+    assert diff["revises"] == {0: 2}
+
+def test_inserted_and_removed_pages():
+    inserted = phash.page_diff(["a", "b"], ["a", "n", "b"], [A, B], [A, C, B])
+    assert (inserted["unchanged"], inserted["added"], inserted["removed"]) == ({0: 0, 2: 1}, [1], [])
+    removed = phash.page_diff(["a", "b", "c"], ["a", "c"], [A, B, C], [A, C])
+    assert (removed["unchanged"], removed["added"], removed["removed"]) == ({0: 0, 1: 2}, [], [1])
+
+def test_unmatched_page_revises_the_page_at_its_position():
+    diff = phash.page_diff(["a", "b"], ["a", "x"], [A, B], [A, C])
+    assert diff["revises"] == {1: 1}
+
+def test_pages_without_digests_are_never_unchanged():
+    # Analyses stored before pixel digests: equal pHashes only pair the pages
+    diff = phash.page_diff([None, None], ["a", "b"], [A, B], [A, B])
+    assert diff["unchanged"] == {}
+    assert diff["revises"] == {0: 0, 1: 1}
+
+def test_pixel_digest_sees_one_pixel():
+    page = np.full((400, 300), 255, dtype=np.uint8)
+    page[40:360:40, 20:280] = 0
+    page[40:360, 20:280:50] = 0
+    page[100:180, 60:160] = 128
+    edited = page.copy()
+    edited[300, 150] = 0
+    assert phash.pixel_digest(page) == phash.pixel_digest(page.copy())
+    assert phash.pixel_digest(page) != phash.pixel_digest(edited)
+    assert phash.hamming(phash.phash(page), phash.phash(edited)) <= phash.MAX_DISTANCE
+    # Same pixels, different shape
+    assert phash.pixel_digest(page.reshape(300, 400)) != phash.pixel_digest(page)
+
+def test_bk_tree_search():
+    tree = phash.BKTree([(A, "a"), (C, "c"), (C_EDITED, "c2")])
+    assert tree.search(C, radius=2) == [(0, "c"), (2, "c2")]
+    assert tree.search(B, radius=2) == []
+
+@pytest.fixture
+def drawing(tmp_path, monkeypatch):
+    """A three-sheet PDF in a raster cache of its own; digested pages are counted"""
+    monkeypatch.setattr(raster, "RASTER_CACHE_DIR", str(tmp_path / "cache"))
+    with pymupdf.open() as document:
+        for n, shape in enumerate([(72, 72, 500, 300), (100, 400, 500, 800), (300, 72, 520, 760)]):
+            page = document.new_page(width=595, height=842)
+            page.draw_rect(pymupdf.Rect(*shape), color=(0, 0, 0), fill=(0, 0, 0))
+            page.insert_text((72, 820), f"Sheet {n + 1}", fontsize=11)
+        document.save(str(tmp_path / "set.pdf"))
+    digested = []
+    digest = phash.pixel_digest
+    monkeypatch.setattr(phash, "pixel_digest", lambda image: digested.append(image.shape) or digest(image))
+    return str(tmp_path / "set.pdf"), digested
+
+def test_only_pages_near_a_candidate_are_digested_up_front(drawing):
+    path, digested = drawing
+    prints = phash.Fingerprints(path)
+    assert len(prints.hashes) == 3 and digested == []
+    near = prints.near([prints.hashes[1]])
+    assert 1 in near and len(near) < 3
+    digests = prints.digests(near)
+    assert [digest is not None for digest in digests] == [page in near for page in range(3)]
+    assert len(digested) == len(near)
+    # The rest are digested once, in the background, for storing
+    prints.prefetch()
+    assert prints.digests() == phash.Fingerprints(path).digests()
+    assert prints.digest(1) == digests[1]
+    assert len(digested) == 3 + 3
+
+def test_find_parts_digests_only_candidate_pages(drawing, tmp_path):
+    from store import Store
+
+    path, digested = drawing
+    store = Store(str(tmp_path / "store.db"))
+    first = phash.Fingerprints(path)
+    parts = [("architectural", [0], {"rooms": []}), ("structural", [1, 2], {"reinforcement": []})]
+    store.save("file-1", first.hashes, first.digests(), parts, {}, user="u", project="p")
+    digested.clear()
+
+    groups = [("architectural", [0]), ("structural", [1, 2])]
+    again = phash.Fingerprints(path)
+    reused = store.find_parts(again.hashes, again.digest, groups, "u", "p")
+    assert sorted(reused) == [0, 1]
+    assert len(digested) == 3
+
+    # Another caller's pages are not candidates, so nothing is digested
+    digested.clear()
+    other = phash.Fingerprints(path)
+    assert store.find_parts(other.hashes, other.digest, groups, "someone-else", "p") == {}
+    assert digested == []
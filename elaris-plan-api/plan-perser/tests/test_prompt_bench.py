@@ -0,0 +1,91 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import json
+import os
+import time
+
+import pytest
+
+import prompt_bench
+
+DOC = {
+    "wallDimensions": {
+        "externalWallPerimiter": 40, "internalWallPerimiter": 25,
+        "externalWallHeight": 3.0, "internalWallHeight": 2.7,
+    },
+    "wallProperties": {"blockType": "Standard Block"},
+    "wallSections": [],
+    "totalArea": 96,
+}
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Two plans, a recording for the first only"""
+    plans = tmp_path / "corpus"
+    plans.mkdir()
+    (plans / "a.pdf").write_bytes(b"%PDF-1.4 plan a")
+    (plans / "b.png").write_bytes(b"\x89PNG plan b")
+    (plans / "notes.txt").write_text("not a plan")
+    recordings = tmp_path / "recordings"
+    key = prompt_bench.variant_key("PROMPT", "model-x")
+    (recordings / key).mkdir(parents=True)
+    stats = {
+        "text": json.dumps(DOC), "input_tokens": 1200, "output_tokens": 300,
+        "ttft": 0.8, "latency": 4.0, "attempts": 2, "hedged": True,
+    }
+    (recordings / key / f"{prompt_bench.file_sha256(str(plans / 'a.pdf'))}.json").write_text(json.dumps(stats))
+    return str(plans), str(recordings)
+
+def test_replay_scores_recordings(corpus):
+    plans, recordings = corpus
+    files = prompt_bench.load_corpus(plans)
+    assert [os.path.basename(path) for path in files] == ["a.pdf", "b.png"]
+    variants = prompt_bench.run_bench(files, [("p", "PROMPT")], ["model-x"], replay_dir=recordings)
+    rows = variants["p@model-x"]["rows"]
+    assert rows["b.png"] is None
+    row = rows["a.pdf"]
+    assert row["ok"] and (row["retries"], row["hedged"]) == (1, True)
+    assert row["fields"]["externalWallPerimiter"] == 40.0
+
+    summary = prompt_bench.summarize(variants)[0]
+    assert (summary["files"], summary["missing"], summary["pass_rate"]) == (1, 1, 1.0)
+    assert (summary["hedged"], summary["retries"], summary["latency_p50"]) == (1.0, 1.0, 4.0)
+    table = prompt_bench.format_table([summary]).splitlines()
+    assert "hedged" in table[0] and "retries" in table[0]
+    assert "100%" in table[2] and "1.00" in table[2]
+
+def test_replay_min_pass_rate(corpus, capsys):
+    plans, recordings = corpus
+    args = [plans, "--prompt", "p=" + os.path.join(plans, "notes.txt"), "--model", "model-x", "--replay", recordings]
+    # The prompt text differs from the recording's, so nothing is found and the variant fails
+    assert prompt_bench.main(args + ["--min-pass-rate", "0.5"]) == 1
+    assert "No recording for a.pdf" in capsys.readouterr().err
+
+def test_replay_of_a_bad_response_fails_the_schema(tmp_path):
+    recording = tmp_path / "r.json"
+    recording.write_text(json.dumps({"text": '{"error": "No walls found"}'}))
+    row = prompt_bench.score(prompt_bench.run_replay(str(recording)))
+    assert not row["ok"] and row["errors"] == ["model returned error: No walls found"]
+
+def test_live_timing_covers_the_whole_call(monkeypatch, tmp_path):
+    def call_gemini(file_path, prompt, model_name=None, stats=None, new_reader=None):
+        # A failed first attempt and a hedge that won: per-request times are short
+        time.sleep(0.05)
+        new_reader()('{"wallDimensions"')
+        stats.update(ttft=0.001, latency=0.01, attempts=2, hedged=True)
+        return DOC
+
+    monkeypatch.setattr(prompt_bench.plan_parser, "call_gemini", call_gemini)
+    run = prompt_bench.run_live(str(tmp_path / "a.pdf"), "PROMPT", "model-x")
+    assert run["error"] is None
+    assert run["stats"]["ttft"] >= 0.05 and run["stats"]["latency"] >= 0.05
+    assert (run["stats"]["attempts"], run["stats"]["hedged"]) == (2, True)
+
+def test_live_failure_is_a_failed_row(monkeypatch, tmp_path):
+    def call_gemini(*args, **kwargs):
+        raise RuntimeError("Gemini API call failed: quota")
+
+    monkeypatch.setattr(prompt_bench.plan_parser, "call_gemini", call_gemini)
+    row = prompt_bench.score(prompt_bench.run_live(str(tmp_path / "a.pdf"), "PROMPT", "model-x"))
+    assert not row["ok"] and row["ttft"] is None and row["latency"] is not None
@@ -0,0 +1,62 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import pytest
+
+import compact
+import quantities
+import roof
+
+# 40 m of external wall at 3 m with a standard door and two standard windows;
+# 20 m of internal Small Block wall at 2.7 m, plastered one side, with three doors
+DOC = compact.decode({
+    "wd": {"ep": 40, "ip": 20, "eh": 3, "ih": 2.7},
+    "ws": [
+        [0, 0, 0.2, 0, [[0.9, 2.1, 1, 0, 0]], [[1.2, 1.2, 2, 0, 1]]],
+        [1, 2, 0.1, 1, [[0.9, 2.1, 3, 0, 0]], []],
+    ],
+    "rm": [["Kitchen", 4, 3, None, None, None], ["Store", 2, 2, 10, None, None]],
+})
+
+def test_wall_quantities():
+    result = quantities.wall_quantities(DOC["wallDimensions"], DOC["wallSections"])
+    external, internal = result["walls"]
+    assert external["grossArea"] == 120.0
+    assert (external["doorArea"], external["windowArea"]) == (1.89, 2.88)
+    assert external["netArea"] == 115.23
+    # Standard Block face with 10 mm joints: 0.16 x 0.21 m
+    assert external["blocks"] == 3430
+    assert external["plasterArea"] == 230.46
+    assert external["mortarVolume"] == pytest.approx(115.23 * 0.017 * 1.33, abs=1e-3)
+    assert (internal["blockType"], internal["openingsArea"], internal["netArea"]) == ("Small Block", 5.67, 48.33)
+    assert internal["blocks"] == 2093
+    assert internal["plasterArea"] == 48.33
+    assert result["totals"]["blocks"] == 3430 + 2093
+
+def test_openings_never_make_the_net_area_negative():
+    sections = [{"type": "external", "doors": [{"sizeType": "custom", "custom": {"width": "5", "height": "5"}, "count": 10}]}]
+    result = quantities.wall_quantities({"externalWallPerimiter": 10, "externalWallHeight": 3}, sections)
+    assert result["walls"][0]["netArea"] == 0.0
+    assert result["walls"][0]["blocks"] == 0
+
+def test_room_quantities_prefer_the_given_area():
+    result = quantities.room_quantities(DOC["rooms"], 2.7)
+    kitchen, store = result["rooms"]
+    assert (kitchen["floorArea"], kitchen["perimeter"], kitchen["wallFinishArea"]) == (12.0, 14.0, 37.8)
+    assert store["floorArea"] == 10.0
+    assert result["totals"]["floorArea"] == 22.0
+
+def test_compute_quantities_isolates_a_failing_engine(monkeypatch):
+    def broken(doc):
+        raise ValueError("bad footprint")
+
+    monkeypatch.setattr(roof, "roof_quantities", broken)
+    result = quantities.compute_quantities(DOC)
+    assert result["errors"] == {"roofing": "ValueError: bad footprint"}
+    assert "roofing" not in result
+    assert result["totals"]["netArea"] == 163.56
+    assert result["finishes"]["totals"]["floorArea"] == 22.0
+    assert {"reinforcement", "mep"} <= set(result)
+
+def test_compute_quantities_without_errors():
+    assert "errors" not in quantities.compute_quantities(DOC)
@@ -0,0 +1,82 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import os
+
+import numpy as np
+import pymupdf
+import pytest
+
+import raster
+
+DPI = 36
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """An empty raster cache of its own, and a count of full cache scans"""
+    monkeypatch.setattr(raster, "RASTER_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(raster, "_cache_bytes", None)
+    scans = []
+    evict = raster.evict
+    monkeypatch.setattr(raster, "evict", lambda *args, **kwargs: scans.append(1) or evict(*args, **kwargs))
+    return scans
+
+def _pdf(path, pages):
+    with pymupdf.open() as document:
+        for n in range(pages):
+            page = document.new_page(width=595, height=842)
+            page.insert_text((72, 72 + 20 * n), f"Sheet {n + 1}", fontsize=24)
+        document.save(str(path))
+    return str(path)
+
+def test_pages_render_once_into_a_pyramid(tmp_path, cache):
+    path = _pdf(tmp_path / "a.pdf", 3)
+    first = raster.pyramids(path, dpi=DPI)
+    assert len(first) == 3
+    pyramid = first[0]
+    assert pyramid.levels[0].shape == (round(842 / 72 * DPI), round(595 / 72 * DPI))
+    assert all(b.shape[0] == a.shape[0] // 2 for a, b in zip(pyramid.levels, pyramid.levels[1:]))
+    assert max(pyramid.levels[-1].shape) <= raster.MIN_LEVEL_SIZE
+    # Read back from the cache: the same files, memory mapped and read-only
+    again = raster.pyramid(path, 1, dpi=DPI)
+    assert again.path == first[1].path and isinstance(again.levels[0], np.memmap)
+    assert not again.levels[0].flags.writeable
+
+def test_tiles_cover_the_level(tmp_path, cache):
+    pyramid = raster.pyramid(_pdf(tmp_path / "a.pdf", 1), 0, dpi=DPI)
+    height, width = pyramid.levels[0].shape
+    covered = np.zeros((height, width), dtype=bool)
+    for top, left, view in pyramid.tiles(0, 100, overlap=20):
+        assert view.shape == (min(100, height), min(100, width))
+        covered[top:top + view.shape[0], left:left + view.shape[1]] = True
+    assert covered.all()
+
+def test_misses_under_budget_do_not_scan_the_cache(tmp_path, cache, monkeypatch):
+    monkeypatch.setattr(raster, "RASTER_CACHE_BYTES", 1 << 30)
+    raster.pyramids(_pdf(tmp_path / "a.pdf", 2), dpi=DPI)
+    # The first miss scans to learn the size, later ones only add to it
+    assert len(cache) == 1
+    raster.pyramids(_pdf(tmp_path / "b.pdf", 2), dpi=DPI)
+    raster.pyramids(_pdf(tmp_path / "c.pdf", 1), dpi=DPI)
+    assert len(cache) == 1
+    on_disk = sum(raster._size(os.path.join(shard.path, entry.name))
+                  for shard in os.scandir(raster.RASTER_CACHE_DIR) for entry in os.scandir(shard.path))
+    assert raster._cache_bytes == on_disk
+
+def test_over_budget_evicts_the_least_recently_used(tmp_path, cache, monkeypatch):
+    old = raster.pyramid(_pdf(tmp_path / "a.pdf", 1), 0, dpi=DPI)
+    entry_bytes = raster._cache_bytes
+    os.utime(old.path, (1, 1))
+    monkeypatch.setattr(raster, "RASTER_CACHE_BYTES", int(entry_bytes * 1.5))
+    new = raster.pyramid(_pdf(tmp_path / "b.pdf", 1), 0, dpi=DPI)
+    assert len(cache) == 2
+    assert not os.path.exists(old.path) and os.path.exists(new.path)
+    assert raster._cache_bytes == entry_bytes
+    # Evicted pages are rendered again on the next read
+    assert raster.pyramid(_pdf(tmp_path / "a.pdf", 1), 0, dpi=DPI).levels[0].shape == old.levels[0].shape
+
+def test_evict_keeps_the_pages_in_use(tmp_path, cache):
+    pyramids = raster.pyramids(_pdf(tmp_path / "a.pdf", 2), dpi=DPI)
+    keep = {pyramids[0].path}
+    assert raster.evict(keep, budget=0) > 0
+    assert os.path.exists(pyramids[0].path) and not os.path.exists(pyramids[1].path)
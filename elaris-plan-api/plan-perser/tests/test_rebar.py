@@ -0,0 +1,111 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import time
+from collections import Counter
+
+import pytest
+
+import rebar
+
+# 5 x 4 m slab, 20 mm cover: D12 @ 150 along the length, D10 @ 200 across
+SLAB = {
+    "element": "slab", "length": 5, "width": 4,
+    "mainBarSize": "D12", "mainBarSpacing": 150, "distributionBarSize": "D10", "distributionBarSpacing": 200,
+}
+
+@pytest.mark.parametrize("text, expected", [
+    ("D16@200", ("D16", 0.2)),
+    ("d16 @ 200", ("D16", 0.2)),
+    ("D16", ("D16", 0.15)),
+    ("D16@0", ("D16", 0.15)),
+    (None, ("D12", 0.15)),
+])
+def test_spec(text, expected):
+    assert rebar._spec(text, "D12", 150) == expected
+
+def test_slab_grid():
+    assert rebar.bar_lines(SLAB) == [("D12", 4.96, 27), ("D10", 3.96, 25)]
+
+def test_zero_spacing_falls_back_to_the_default():
+    entry = {"element": "strip-footing", "length": 10, "width": 0.6, "longitudinalBars": "Y12@0", "transverseBars": "D10 @ 250"}
+    assert rebar.bar_lines(entry) == [("D12", 9.92, 4), ("D10", 0.52, 40)]
+
+def test_beam_stirrups():
+    entry = {
+        "element": "beam", "length": 6, "width": 0.23, "depth": 0.45,
+        "mainBarSize": "D16", "mainBarsCount": 4, "stirrupSize": "D8", "stirrupSpacing": 200,
+    }
+    (main, stirrups) = rebar.bar_lines(entry)
+    assert main == ("D16", 6.0, 4.0)
+    # 2 x (0.18 + 0.40) around the cage plus two 10d hooks
+    assert stirrups[0] == "D8" and stirrups[1] == pytest.approx(1.32) and stirrups[2] == 31
+
+def test_bar_weights_and_stock_bars():
+    result = rebar.bar_quantities([SLAB])
+    bars = {bar["size"]: bar for bar in result["bars"]}
+    assert bars["D12"]["weight"] == pytest.approx(27 * 4.96 * 0.888, abs=0.01)
+    assert bars["D10"]["weight"] == pytest.approx(25 * 3.96 * 0.617, abs=0.01)
+    # Two 4.96 m cuts per 12 m bar, three 3.96 m cuts
+    assert (bars["D12"]["standardBars"], bars["D10"]["standardBars"]) == (14, 9)
+    assert result["totalWeight"] == 180.0
+
+def test_bars_longer_than_stock_are_lapped():
+    column = {"element": "column", "columnHeight": 14, "length": 0.3, "width": 0.3, "mainBarSize": "D16", "mainBarsCount": 4}
+    main = next(bar for bar in rebar.bar_quantities([column])["bars"] if bar["size"] == "D16")
+    # One 50d lap of 0.8 m per bar, two stock bars each
+    assert main["totalLength"] == pytest.approx(4 * 14.8)
+    assert main["standardBars"] == 8
+
+def test_mesh_sheet_choice():
+    (order,) = rebar.mesh_layout([{"id": "s1", "meshGrade": "A142", "length": 4.8, "width": 2.4}])
+    assert (order["sheet"], order["sheets"], order["wastePercent"]) == ("2.4x4.8", 1, 0.0)
+
+def test_reinforcement_quantities_adds_mesh_weight():
+    mesh = {"reinforcementType": "mesh", "id": "m1", "length": 4.8, "width": 2.4}
+    result = rebar.reinforcement_quantities([SLAB, mesh])
+    assert result["totalWeight"] == pytest.approx(180.0 + result["mesh"][0]["weight"])
+
+@pytest.mark.parametrize("pieces, sheets", [
+    ({(1.2, 4.8): 4}, 2),
+    # Two 1.0 m high shelves across the sheet, two 2.4 m pieces along each
+    ({(2.4, 1.0): 10}, 3),
+    # Offcuts share a sheet with a half-width strip
+    ({(1.2, 4.8): 1, (1.2, 2.0): 2}, 1),
+    ({(5.0, 5.0): 2}, 2),
+])
+def test_pack(pieces, sheets):
+    assert rebar._pack(Counter(pieces), (2.4, 4.8)) == sheets
+
+def test_mesh_layout_scales_to_hundreds_of_elements():
+    entries = [
+        {"id": f"s{i}", "reinforcementType": "mesh", "length": 2 + (i * 37 % 130) / 10, "width": 2 + (i * 53 % 70) / 10}
+        for i in range(500)
+    ]
+    started = time.perf_counter()
+    (order,) = rebar.mesh_layout(entries)
+    assert time.perf_counter() - started < 2.0
+    assert order["sheetArea"] >= order["netArea"]
+    assert len(order["elements"]) == 500
+
+def test_mesh_lap_in_millimetres():
+    slab = {"id": "s1", "length": 10, "width": 5}
+    in_metres = rebar.mesh_layout([{**slab, "meshLapLength": 0.3}])
+    in_mm = rebar.mesh_layout([{**slab, "meshLapLength": 300}])
+    assert in_mm == in_metres
+    assert 0 <= in_mm[0]["wastePercent"] < 100
+
+@pytest.mark.parametrize("lap", [2.4, 4.8, 5])
+def test_lap_not_smaller_than_the_sheet_falls_back_to_the_default(lap):
+    slab = {"id": "s1", "length": 10, "width": 5, "meshSheetWidth": 2.4, "meshSheetLength": 4.8}
+    assert rebar.mesh_layout([{**slab, "meshLapLength": lap}]) == rebar.mesh_layout([slab])
+    assert rebar._mesh_lap(lap, (2.4, 4.8)) == rebar.DEFAULT_MESH_LAP
+
+def test_lap_on_a_sheet_smaller_than_the_default_lap():
+    assert rebar._mesh_lap(None, (0.2, 0.4)) == 0.0
+    (order,) = rebar.mesh_layout([{"id": "s1", "length": 1, "width": 1, "meshSheetWidth": 0.2, "meshSheetLength": 0.4}])
+    assert order["sheets"] == 13
+
+def test_sheet_size_in_millimetres():
+    (order,) = rebar.mesh_layout([{"id": "s1", "length": 4.8, "width": 2.4, "meshSheetWidth": 2400, "meshSheetLength": 4800}])
+    assert (order["sheet"], order["sheets"]) == ("2.4x4.8", 1)
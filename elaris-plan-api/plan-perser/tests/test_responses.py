@@ -0,0 +1,53 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import gzip
+
+import numpy as np
+import pytest
+
+import responses
+
+DOC = {
+    "analysisId": "a1",
+    "cache": "hit",
+    "rooms": [{"name": "Kitchen"}],
+    "quantities": {"concrete": {"volume": 12.5}, "walls": [1, 2], "totals": {"blocks": 3430}},
+    "projectName": "House A",
+}
+
+def test_project_keeps_dotted_paths_and_always_fields():
+    projected = responses.project(DOC, ["rooms", "quantities.concrete", "quantities.totals.blocks"])
+    assert projected == {
+        "analysisId": "a1",
+        "cache": "hit",
+        "rooms": [{"name": "Kitchen"}],
+        "quantities": {"concrete": {"volume": 12.5}, "totals": {"blocks": 3430}},
+    }
+
+def test_project_leaves_out_missing_paths():
+    assert responses.project(DOC, ["nothing", "rooms.name", "quantities.walls.0"]) == {"analysisId": "a1", "cache": "hit"}
+
+def test_project_without_fields_is_the_whole_document():
+    assert responses.project(DOC, None) is DOC
+    assert responses.project(["not", "a", "dict"], ["rooms"]) == ["not", "a", "dict"]
+
+def test_project_does_not_modify_the_document():
+    responses.project(DOC, ["quantities.concrete"])
+    assert set(DOC["quantities"]) == {"concrete", "walls", "totals"}
+
+@pytest.mark.parametrize("fields, expected", [
+    (None, None), ("", None), (" , ", None), ("rooms, quantities.concrete ,", ["rooms", "quantities.concrete"]),
+])
+def test_parse_fields(fields, expected):
+    assert responses.parse_fields(fields) == expected
+
+def test_dumps_handles_numpy():
+    assert responses.loads(responses.dumps({"a": np.float64(1.5), "b": np.arange(3)})) == {"a": 1.5, "b": [0, 1, 2]}
+
+def test_compress_negotiates_gzip():
+    body = responses.dumps({"rows": ["x" * 10] * 200})
+    compressed, encoding = responses.compress(body, "gzip;q=1.0, identity;q=0.5")
+    assert encoding == "gzip" and gzip.decompress(compressed) == body
+    assert responses.compress(body, "gzip;q=0") == (body, None)
+    assert responses.compress(b"{}", "gzip") == (b"{}", None)
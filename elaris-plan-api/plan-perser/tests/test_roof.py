@@ -0,0 +1,83 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import math
+
+import numpy as np
+import pytest
+
+import roof
+
+RECTANGLE = [[0, 0], [10, 0], [10, 6], [0, 6]]
+# 10 x 4 m wing with a 4 x 4 m wing on its left end
+L_SHAPE = [[0, 0], [10, 0], [10, 4], [4, 4], [4, 8], [0, 8]]
+
+def test_plan_of_a_rectangle():
+    plan = roof.roof_plan(RECTANGLE, 0.5)
+    # 11 x 7 m with the overhang
+    assert plan["planArea"] == pytest.approx(77.0)
+    assert plan["footprintArea"] == pytest.approx(60.0)
+    assert plan["eaves"] == pytest.approx(36.0)
+    assert plan["wallPlate"] == pytest.approx(32.0)
+    assert plan["halfSpan"] == pytest.approx(3.5, abs=1e-3)
+    assert (len(plan["hipCorners"]), len(plan["valleyCorners"])) == (4, 0)
+
+def test_plan_of_an_l_shape():
+    plan = roof.roof_plan(L_SHAPE, 0.5)
+    assert plan["planArea"] == pytest.approx(11 * 9 - 6 * 4)
+    assert (len(plan["hipCorners"]), len(plan["valleyCorners"])) == (5, 1)
+
+def test_gable_geometry():
+    geometry = roof.roof_geometry(roof.roof_plan(RECTANGLE, 0.5), "gable", 30)
+    cos30, tan30 = math.cos(math.radians(30)), math.tan(math.radians(30))
+    assert float(geometry["slopedArea"]) == pytest.approx(77 / cos30)
+    assert float(geometry["rise"]) == pytest.approx(3.5 * tan30, abs=1e-3)
+    assert float(geometry["ridge"]) == pytest.approx(11.0, abs=1e-3)
+    # Eaves on the two long sides only; four verges
+    assert float(geometry["gutters"]) == pytest.approx(22.0, abs=1e-3)
+    assert float(geometry["bargeBoards"]) == pytest.approx(4 * 3.5 / cos30, abs=1e-3)
+
+def test_hip_geometry():
+    geometry = roof.roof_geometry(roof.roof_plan(RECTANGLE, 0.5), "hip", 30)
+    rise = 3.5 * math.tan(math.radians(30))
+    assert float(geometry["ridge"]) == pytest.approx(11 - 7, abs=1e-3)
+    # Four hips, each over a 45 degree plan line from the corner to the ridge
+    assert float(geometry["hips"]) == pytest.approx(4 * math.hypot(3.5 * math.sqrt(2), rise), abs=1e-2)
+    assert float(geometry["gutters"]) == pytest.approx(36.0)
+
+def test_pitch_arrays():
+    plan = roof.roof_plan(RECTANGLE, 0.5)
+    pitches = np.array([20.0, 30.0, 40.0])
+    areas = roof.roof_geometry(plan, "gable", pitches)["slopedArea"]
+    assert areas == pytest.approx(77 / np.cos(np.radians(pitches)))
+
+def test_footprint_from_perimeter_and_area():
+    doc = {"wallDimensions": {"externalWallPerimiter": 32}, "totalArea": 60}
+    assert roof.footprint_for(doc, {}) == [[0, 0], [10.0, 0], [10.0, 6.0], [0, 6.0]]
+
+def test_roof_quantities():
+    doc = {"roofing": [{"type": "gable", "length": 10, "width": 6, "pitch": 30, "eavesOverhang": 500}]}
+    (result,) = roof.roof_quantities(doc)
+    assert (result["overhang"], result["planArea"], result["soffitArea"]) == (0.5, 77.0, 17.0)
+    assert result["pitchAssumed"] is False
+    assert result["downpipes"] == 3
+    timbers = {row["type"]: row for row in result["timbers"]}
+    # 88.91 m² of slope at 600 mm centres, in 4.04 m rafters
+    assert (timbers["rafter"]["spacing"], timbers["rafter"]["pieces"]) == (0.6, 37)
+    assert timbers["ridge-board"]["length"] == 11.0
+    assert timbers["wall-plate"]["length"] == 32.0
+
+def test_flat_roof_has_no_rafters():
+    (result,) = roof.roof_quantities({"roofing": [{"type": "flat", "length": 10, "width": 6}]})
+    assert result["pitch"] == 2.0 and result["pitchAssumed"] is True
+    assert "rafter" not in {row["type"] for row in result["timbers"]}
+
+@pytest.mark.parametrize("pitch", [0, -10, 90, 450, "steep", None])
+def test_implausible_pitch_falls_back_to_the_default(pitch):
+    (result,) = roof.roof_quantities({"roofing": [{"type": "hip", "length": 10, "width": 6, "pitch": pitch}]})
+    assert result["pitch"] == roof.DEFAULT_PITCH_OTHER and result["pitchAssumed"] is True
+    assert math.isfinite(result["slopedArea"]) and result["slopedArea"] < 200
+
+def test_steepest_accepted_pitch():
+    (result,) = roof.roof_quantities({"roofing": [{"type": "gable", "length": 10, "width": 6, "pitch": "75"}]})
+    assert result["pitch"] == roof.MAX_PITCH and result["pitchAssumed"] is False
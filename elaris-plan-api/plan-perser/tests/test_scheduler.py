@@ -0,0 +1,113 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import asyncio
+
+import pytest
+
+import scheduler
+from scheduler import FairQueue, Job, Overloaded, Scheduler
+
+def serve(queue):
+    order = []
+    while len(queue):
+        job = queue.next()
+        queue.pop(job)
+        order.append(job.tenant)
+    return order
+
+def test_deficit_round_robin_alternates_tenants():
+    async def main():
+        queue = FairQueue()
+        for tenant in ("a", "a", "a", "b", "b", "b"):
+            queue.push(Job(tenant, 2))
+        return serve(queue)
+
+    # A quantum of 4 covers two weight-2 jobs per turn
+    assert scheduler.QUANTUM == 4
+    assert asyncio.run(main()) == ["a", "a", "b", "b", "a", "b"]
+
+def test_heavy_jobs_wait_for_enough_deficit():
+    async def main():
+        queue = FairQueue()
+        queue.push(Job("big", 10))
+        for _ in range(4):
+            queue.push(Job("small", 1))
+        return serve(queue)
+
+    # The weight-10 job needs three turns of credit; the small tenant is served meanwhile
+    assert asyncio.run(main()) == ["small"] * 4 + ["big"]
+
+def test_idle_tenants_do_not_bank_credit():
+    async def main():
+        queue = FairQueue()
+        job = Job("a", 1)
+        queue.push(job)
+        queue.pop(queue.next())
+        assert "a" not in queue.deficit
+        assert queue.work == 0
+
+    asyncio.run(main())
+
+def test_slots_are_granted_in_fair_order():
+    async def main():
+        pool = Scheduler(capacity=1, max_queue_work=100)
+        order = []
+
+        async def analysis(tenant):
+            async with pool.slot(tenant, 1, True):
+                order.append(tenant)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(analysis(tenant) for tenant in "aaaaaaaaab"))
+        return "".join(order), pool.snapshot()
+
+    order, snapshot = asyncio.run(main())
+    # The first "a" runs at once; b, queued behind eight more, waits only for a's next quantum
+    assert order == "a" + "a" * scheduler.QUANTUM + "b" + "aaaa"
+    assert (snapshot["inUse"], snapshot["completed"], snapshot["queuedWork"]) == (0, 10, 0)
+
+def test_full_queue_raises_overloaded():
+    async def main():
+        pool = Scheduler(capacity=2, max_queue_work=2)
+        release = asyncio.Event()
+
+        async def hold(weight):
+            async with pool.slot("a", weight, True):
+                await release.wait()
+
+        running = asyncio.create_task(hold(2))
+        queued = asyncio.create_task(hold(2))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            async with pool.slot("b", 1, True):
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value, pool
+
+    error, pool = asyncio.run(main())
+    # One unit over the limit, draining at 2 units per 5 s
+    assert error.retry_after == 3
+    assert pool.rejected == 1 and pool.completed == 2
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        pool = Scheduler(capacity=1, max_queue_work=10)
+        release = asyncio.Event()
+
+        async def hold():
+            async with pool.slot("a", 1, True):
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        waiting = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        queued = pool.snapshot()["queuedWork"]
+        release.set()
+        await running
+        return queued, pool.in_use
+
+    assert asyncio.run(main()) == (0, 0)
@@ -0,0 +1,94 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import sheets
+
+PLAN_FOOTPRINT = [[0, 0], [12, 0], [12, 8], [0, 8]]
+ROOF_FOOTPRINT = [[0, 0], [12.2, 0], [12.2, 8.1], [0, 8.1]]
+
+def test_footprint_is_taken_whole_from_its_owner():
+    doc = sheets.merge([
+        ("architectural", [0], {"footprint": PLAN_FOOTPRINT}),
+        ("roof", [1], {"footprint": ROOF_FOOTPRINT}),
+    ])
+    assert doc["footprint"] == PLAN_FOOTPRINT
+
+def test_footprint_from_a_later_owner_replaces_an_earlier_sheet():
+    doc = sheets.merge([
+        ("elevation", [0], {"footprint": ROOF_FOOTPRINT}),
+        ("architectural", [1], {"footprint": PLAN_FOOTPRINT}),
+    ])
+    assert doc["footprint"] == PLAN_FOOTPRINT
+
+def test_rooms_on_plan_and_services_sheets_are_not_doubled():
+    doc = sheets.merge([
+        ("architectural", [0], {"rooms": [
+            {"name": "Kitchen", "length": 3.6, "width": 3.0},
+            {"name": "Bedroom", "length": 3.0, "width": 3.0},
+            {"name": "Bedroom", "length": 3.2, "width": 3.0},
+        ]}),
+        ("mep", [1], {"rooms": [
+            {"name": "kitchen", "length": 3.5, "area": 10.5},
+            {"name": "Bedroom"},
+            {"name": "Bedroom"},
+            {"name": "Store", "length": 2.0, "width": 1.5},
+        ]}),
+    ])
+    assert [room["name"] for room in doc["rooms"]] == ["Kitchen", "Bedroom", "Bedroom", "Store"]
+    # The plan's dimensions win, the services sheet only fills blanks
+    assert doc["rooms"][0] == {"name": "Kitchen", "length": 3.6, "width": 3.0, "area": 10.5}
+
+def test_owner_reading_wins_for_keyed_entries():
+    doc = sheets.merge([
+        ("elevation", [0], {"roofing": [{"id": "roof-01", "type": "gable", "name": "Main", "pitch": 30}]}),
+        ("roof", [1], {"roofing": [{"id": "roof-1", "type": "gable", "name": "Main", "pitch": 22.5, "material": "tiles"}]}),
+    ])
+    assert doc["roofing"] == [{"id": "roof-01", "type": "gable", "name": "Main", "pitch": 22.5, "material": "tiles"}]
+
+def test_nested_equipment_and_distinct_entries():
+    doc = sheets.merge([
+        ("architectural", [0], {
+            "equipment": {"equipmentData": {"standardEquipment": [{"id": "equip_001", "name": "Excavator"}]}},
+            "reinforcement": [{"id": "r-01", "element": "slab", "name": "Ground slab"}],
+        }),
+        ("structural", [1], {
+            "equipment": {"equipmentData": {"standardEquipment": [
+                {"id": "equip_001", "name": "Excavator", "usage_quantity": 3},
+                {"id": "equip_002", "name": "Concrete mixer"},
+            ]}},
+            "reinforcement": [
+                {"id": "r-01", "element": "slab", "name": "Ground slab", "mainBarSize": "D12"},
+                {"id": "r-02", "element": "beam", "name": "Ring beam"},
+            ],
+        }),
+    ])
+    equipment = doc["equipment"]["equipmentData"]["standardEquipment"]
+    assert [item["name"] for item in equipment] == ["Excavator", "Concrete mixer"]
+    assert equipment[0]["usage_quantity"] == 3
+    assert [item["id"] for item in doc["reinforcement"]] == ["r-01", "r-02"]
+    assert doc["reinforcement"][0]["mainBarSize"] == "D12"
+
+def test_entries_without_a_key_still_append_with_unique_ids():
+    doc = sheets.merge([
+        ("architectural", [0], {"finishes": [{"id": "f-01", "area": 10}]}),
+        ("schedule", [1], {"finishes": [{"id": "f-01", "area": 12}]}),
+    ])
+    assert [item["id"] for item in doc["finishes"]] == ["f-01", "f-01-2"]
+
+def test_schedule_openings_replace_plan_counts():
+    doc = sheets.merge([
+        ("architectural", [0], {"wallSections": [{"type": "external", "doors": [{"count": 1}], "blockType": "Standard Block"}]}),
+        ("schedule", [1], {"wallSections": [{"type": "external", "doors": [{"count": 3}]}]}),
+    ])
+    assert doc["wallSections"] == [{"type": "external", "doors": [{"count": 3}], "blockType": "Standard Block"}]
+
+def test_provenance_and_errors():
+    doc = sheets.merge([
+        ("architectural", [0, 2], {"rooms": [{"name": "Kitchen"}], "floors": None}),
+        ("mep", [1], {"error": "timeout"}),
+    ])
+    assert doc["sheets"] == [
+        {"type": "architectural", "pages": [1, 3], "sections": ["rooms"]},
+        {"type": "mep", "pages": [2], "error": "timeout"},
+    ]
+    assert sheets.merge([("mep", [0], {"error": "timeout"})])["error"] == "timeout"
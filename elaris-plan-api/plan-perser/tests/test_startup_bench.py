@@ -0,0 +1,91 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import os
+import subprocess
+import sys
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import parser
+import startup_bench
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_server_import_leaves_the_parser_and_gemini_for_later():
+    code = "import sys, main; print(sorted(m for m in ('parser', 'google.generativeai', 'dotenv') if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "[]"
+
+def test_time_import():
+    assert startup_bench.time_import("json", 1) >= 0
+    assert startup_bench.time_import("no_such_module_here", 1) is None
+
+def test_upload_body_is_multipart(tmp_path):
+    path = tmp_path / "plan.pdf"
+    path.write_bytes(b"%PDF-1.4 plan")
+    body, headers = startup_bench.upload_body(str(path))
+    message = BytesParser().parsebytes(f"Content-Type: {headers['Content-Type']}\r\n\r\n".encode() + body)
+    (part,) = message.get_payload()
+    assert part.get_param("name", header="content-disposition") == "file"
+    assert part.get_filename() == "plan.pdf"
+    assert part.get_payload(decode=True) == b"%PDF-1.4 plan"
+
+@pytest.fixture
+def server():
+    """A local server answering the three timed requests, recording what it was sent"""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            seen.append((self.command, self.path, len(self.rfile.read(length))))
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        do_GET = do_POST = _reply
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", seen
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_main_times_a_running_server(tmp_path, server, monkeypatch, capsys):
+    url, seen = server
+    monkeypatch.setattr(startup_bench, "IMPORT_TARGETS", ["json"])
+    path = tmp_path / "plan.pdf"
+    path.write_bytes(b"%PDF-1.4 plan")
+    assert startup_bench.main(["--repeat", "1", "--url", url + "/", "--file", str(path)]) == 0
+    assert [(method, path) for method, path, _ in seen] == [
+        ("GET", "/health"), ("GET", "/warmup"), ("POST", "/api/plan/upload"),
+    ]
+    assert seen[-1][2] > len(b"%PDF-1.4 plan")
+    out = capsys.readouterr().out
+    assert "json" in out and "GET /warmup" in out and "POST /api/plan/upload" in out
+
+def test_warmup_endpoint(monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(parser, "warm_up", lambda: {"import": 0.1, "client": 0.0, "connect": 0.2})
+    response = client.get("/warmup")
+    assert response.status_code == 200
+    assert response.json()["status"] == "warm" and response.json()["timings"]["connect"] == 0.2
+
+    def fail():
+        raise RuntimeError("Gemini API key not found")
+
+    monkeypatch.setattr(parser, "warm_up", fail)
+    response = client.get("/warmup")
+    assert response.status_code == 503 and "Gemini API key not found" in response.json()["detail"]
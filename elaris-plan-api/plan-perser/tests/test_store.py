@@ -0,0 +1,65 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import pytest
+
+from store import Store
+
+HASHES = [0x0F0F_0F0F_0F0F_0F0F, 0x1234_5678_9ABC_DEF0]
+DIGESTS = ["d0", "d1"]
+PARTS = [("architectural", [0], {"rooms": [{"name": "Kitchen"}]}), ("structural", [1], {"reinforcement": []})]
+GROUPS = [("architectural", [0]), ("structural", [1])]
+
+@pytest.fixture
+def store(tmp_path):
+    return Store(str(tmp_path / "store.sqlite3"))
+
+def _usage(user, input_tokens, project=None):
+    """One successful model request's usage row"""
+    return {"user": user, "project": project, "model": "m", "sheet_type": "architectural", "attempt": 0, "hedge": False,
+            "ok": True, "input_tokens": input_tokens, "output_tokens": 0, "cached_tokens": 0, "seconds": 1.0}
+
+def _save(store, user, project, file_hash="f1", complete=True):
+    return store.save(file_hash, HASHES, DIGESTS, PARTS, {"projectName": "House"}, user, project, complete=complete)
+
+def test_file_hash_lookup_is_per_user_and_project(store):
+    mine = _save(store, "alice", "p1")
+    assert store.by_file_hash("f1", "alice", "p1") == mine
+    assert store.by_file_hash("f1", "alice", "p2") is None
+    assert store.by_file_hash("f1", "bob", "p1") is None
+    # Unattributed analyses are only found by unattributed callers
+    anonymous = _save(store, None, None)
+    assert store.by_file_hash("f1", None, None) == anonymous
+    assert store.by_file_hash("f1", "alice", None) is None
+
+def test_incomplete_analyses_are_not_returned_whole(store):
+    _save(store, "alice", "p1", complete=False)
+    assert store.by_file_hash("f1", "alice", "p1") is None
+
+def test_owned_and_find_match_the_owner_exactly(store):
+    mine = _save(store, "alice", "p1")
+    other = _save(store, "alice", None)
+    theirs = _save(store, "bob", "p1")
+    assert store.owned([mine, other, theirs], "alice", "p1") == {mine}
+    assert store.owned([mine, other, theirs], "alice", None) == {other}
+    assert [found["analysisId"] for found in store.find(owner=("alice", "p1"))] == [mine]
+    assert {found["analysisId"] for found in store.find()} == {mine, other, theirs}
+    assert [found["analysisId"] for found in store.find(user="bob")] == [theirs]
+    with pytest.raises(ValueError):
+        store.find(owner_name="alice")
+
+def test_parts_are_reused_only_for_the_same_owner(store):
+    mine = _save(store, "alice", "p1")
+    reused = store.find_parts(HASHES, DIGESTS.__getitem__, GROUPS, "alice", "p1")
+    assert {position: analysis_id for position, (analysis_id, _) in reused.items()} == {0: mine, 1: mine}
+    assert reused[0][1] == {"rooms": [{"name": "Kitchen"}]}
+    assert store.find_parts(HASHES, DIGESTS.__getitem__, GROUPS, "bob", "p1") == {}
+    assert store.find_parts(HASHES, DIGESTS.__getitem__, GROUPS, "alice", "p2") == {}
+
+def test_usage_totals_of_one_user(store):
+    for user, tokens in [("alice", 100), ("alice", 50), ("bob", 10)]:
+        store.record_usage(_usage(user, tokens))
+    assert [(row["user"], row["calls"], row["inputTokens"]) for row in store.usage_totals(["user"])] == [
+        ("alice", 2, 150), ("bob", 1, 10),
+    ]
+    assert [(row["user"], row["inputTokens"]) for row in store.usage_totals(["user"], user="bob")] == [("bob", 10)]
@@ -0,0 +1,62 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import pymupdf
+import pytest
+
+import parser
+import tiling
+
+A4 = (595, 842)
+A1 = (1684, 2384)
+
+def _pdf(path, sizes):
+    with pymupdf.open() as document:
+        for width, height in sizes:
+            document.new_page(width=width, height=height)
+        document.save(str(path))
+    return str(path)
+
+def test_only_oversized_pages_are_tiled(tmp_path):
+    assert tiling.pages_to_tile(_pdf(tmp_path / "a.pdf", [A4, A1, A4, A1])) == [1, 3]
+    assert tiling.pages_to_tile(_pdf(tmp_path / "b.pdf", [A4, A4])) == []
+
+def test_tile_mode_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiling, "TILE_MODE", False)
+    assert tiling.pages_to_tile(_pdf(tmp_path / "a.pdf", [A1])) == []
+
+@pytest.fixture
+def readers(monkeypatch):
+    """Fake tiled and whole-file readings, recording what each was given"""
+    calls = []
+
+    def analyze_tiled(file_path, sheet_type, on_section=None, page=0):
+        calls.append(("tiled", page))
+        return {"rooms": [{"name": f"Room {page + 1}"}], "tiling": [{"page": page + 1, "tiles": 6}]}
+
+    def analyze_cascade(file_path, sheet_type, on_section=None):
+        with pymupdf.open(file_path) as document:
+            calls.append(("whole", document.page_count))
+        return {"rooms": [{"name": "Kitchen"}], "wallDimensions": {"externalWallHeight": 3.0}}
+
+    monkeypatch.setattr(parser, "analyze_tiled", analyze_tiled)
+    monkeypatch.setattr(parser, "analyze_cascade", analyze_cascade)
+    return calls
+
+def test_mixed_file_tiles_oversized_pages_and_sends_the_rest_whole(tmp_path, readers):
+    result = parser.analyze_sheet(_pdf(tmp_path / "a.pdf", [A4, A1, A4]), "architectural")
+    assert sorted(readers) == [("tiled", 1), ("whole", 2)]
+    assert sorted(room["name"] for room in result["rooms"]) == ["Kitchen", "Room 2"]
+    assert result["tiling"] == [{"page": 2, "tiles": 6}]
+    assert result["wallDimensions"] == {"externalWallHeight": 3.0}
+    assert "sheets" not in result
+
+def test_single_oversized_page(tmp_path, readers):
+    result = parser.analyze_sheet(_pdf(tmp_path / "a.pdf", [A1]), "architectural")
+    assert readers == [("tiled", 0)]
+    assert result["tiling"] == [{"page": 1, "tiles": 6}]
+
+def test_normal_pages_and_sheets_without_walls_are_not_tiled(tmp_path, readers):
+    parser.analyze_sheet(_pdf(tmp_path / "a.pdf", [A4, A4]), "architectural")
+    parser.analyze_sheet(_pdf(tmp_path / "b.pdf", [A1]), "mep")
+    assert readers == [("whole", 2), ("whole", 1)]
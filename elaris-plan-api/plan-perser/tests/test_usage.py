@@ -0,0 +1,82 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import contextvars
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import store
+import usage
+
+PDF = b"%PDF-1.7\n" + b"0" * 5000
+
+@pytest.fixture
+def budgets(tmp_path, monkeypatch):
+    """An empty store of its own; alice may spend 1000 tokens, bob is unlimited, anyone else 500"""
+    monkeypatch.setattr(store, "_store", store.Store(str(tmp_path / "store.sqlite3")))
+    monkeypatch.setattr(usage, "TOKEN_BUDGET", 500)
+    monkeypatch.setattr(usage, "TOKEN_BUDGETS", {"alice": 1000, "bob": 0})
+    monkeypatch.setattr(usage, "ANONYMOUS_BUDGET", 300)
+    return store.get_store()
+
+def _spend(user, tokens, project=None, sheet_type=None):
+    """Record one model request billed to user, as parse_file's context would"""
+    def run():
+        usage.open_account(user, project)
+        if sheet_type:
+            usage.set_sheet_type(sheet_type)
+        response = SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=tokens, candidates_token_count=0))
+        usage.record("m", usage.counts_of(response), 0.5, ok=True)
+        return usage.current()
+
+    return contextvars.copy_context().run(run)
+
+def test_budgets_per_user(budgets):
+    assert [usage.budget_for(user) for user in ("alice", "bob", "carol", None)] == [1000, 0, 500, 300]
+    _spend("alice", 900)
+    usage.check("alice")
+    _spend("alice", 100)
+    with pytest.raises(usage.BudgetExceeded, match="alice: 1000 of 1000 tokens"):
+        usage.check("alice")
+    # Other users have their own budgets, and 0 is unlimited
+    usage.check("carol")
+    _spend("bob", 10 ** 9)
+    usage.check("bob")
+
+def test_unattributed_work_shares_one_budget(budgets):
+    _spend(None, 200)
+    _spend(None, 100)
+    with pytest.raises(usage.BudgetExceeded, match="unattributed requests"):
+        usage.check(None)
+    # Named users are not charged for it
+    usage.check("carol")
+
+def test_only_the_window_counts(budgets, monkeypatch):
+    _spend("carol", 500)
+    with pytest.raises(usage.BudgetExceeded):
+        usage.check("carol")
+    monkeypatch.setattr(usage, "BUDGET_WINDOW", 0.05)
+    time.sleep(0.1)
+    usage.check("carol")
+
+def test_requests_are_billed_to_the_account(budgets):
+    account = _spend("alice", 120, project="p1", sheet_type="structural")
+    assert account.summary()["inputTokens"] == 120
+    assert account.summary()["breakdown"][0]["sheetType"] == "structural"
+    (row,) = budgets.usage_totals(["user", "project", "sheet_type"])
+    assert (row["user"], row["project"], row["sheet_type"], row["inputTokens"]) == ("alice", "p1", "structural", 120)
+
+def test_spent_budget_refuses_uploads(budgets, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path / "uploads")
+    (tmp_path / "uploads").mkdir()
+    _spend("alice", 1000)
+    client = TestClient(main.app)
+    response = client.post(
+        "/api/plan/upload", files={"file": ("plan.pdf", PDF, "application/pdf")}, headers={"x-user-id": "alice"},
+    )
+    assert response.status_code == 429 and "Token budget exhausted" in response.json()["detail"]
+    assert list((tmp_path / "uploads").iterdir()) == []
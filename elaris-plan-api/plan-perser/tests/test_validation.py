@@ -0,0 +1,83 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+import copy
+
+import pytest
+
+import parser
+import validation
+
+VALID = {
+    "wallDimensions": {
+        "externalWallPerimiter": 40, "internalWallPerimiter": "25",
+        "externalWallHeight": 3.0, "internalWallHeight": 2.7,
+    },
+    "wallProperties": {"blockType": "Standard Block"},
+    "wallSections": [{"type": "external", "doors": [{"count": 2, "sizeType": "standard", "standardSize": "0.9 × 2.1 m"}]}],
+    "rooms": [{"name": "Kitchen", "length": 3.6, "width": 3.0}],
+    "footprint": [[0, 0], [12, 0], [12, 8], [0, 8]],
+}
+
+def _with(**sections):
+    doc = copy.deepcopy(VALID)
+    doc.update(sections)
+    return doc
+
+def test_valid_document_has_no_problems():
+    assert validation.schema_errors(VALID) == []
+    assert validation.section_problems(VALID) == {}
+
+@pytest.mark.parametrize("key", ["rooms", "footprint", "wallSections", "roofing", "plumbing"])
+@pytest.mark.parametrize("value", [5, "Kitchen", {"name": "Kitchen"}])
+def test_non_array_section_is_a_problem_not_a_crash(key, value):
+    problems = validation.section_problems(_with(**{key: value}))
+    assert any("not an array" in message for message in problems[key])
+
+def test_non_array_openings_are_reported():
+    problems = validation.section_problems(_with(wallSections=[{"type": "external", "doors": 3}]))
+    assert problems["wallSections"] == ["wallSections[0].doors is not an array"]
+
+def test_document_level_problems():
+    assert validation.section_problems({"error": "No walls found"}) == {"document": ["model returned error: No walls found"]}
+    assert validation.section_problems([1, 2]) == {"document": ["result is not an object"]}
+
+def test_plausibility_checks():
+    problems = validation.section_problems(_with(
+        wallDimensions={**VALID["wallDimensions"], "externalWallHeight": 12},
+        totalArea=96,
+        rooms=[{"name": "Hall", "length": 20, "width": 10}],
+    ))
+    assert "externalWallHeight 12.0 m" in problems["wallDimensions"][0]
+    assert any("rooms add up to 200" in message for message in problems["rooms"])
+
+@pytest.fixture
+def models(monkeypatch):
+    """Fake cascade of two models answering from a table: prompt kind -> document"""
+    calls = []
+    answers = {}
+
+    def call_gemini(file_path, prompt, model_name=None, stats=None, new_reader=None):
+        kind = "recheck" if "failed these checks" in prompt else "full"
+        calls.append((model_name, kind))
+        return copy.deepcopy(answers[model_name, kind])
+
+    monkeypatch.setattr(parser, "GEMINI_CASCADE", ["small", "large"])
+    monkeypatch.setattr(parser, "call_gemini", call_gemini)
+    return answers, calls
+
+def test_cascade_escalates_a_non_array_section(models):
+    answers, calls = models
+    answers["small", "full"] = _with(rooms=5)
+    answers["large", "recheck"] = {"rooms": [{"name": "Kitchen", "length": 3.6, "width": 3.0}]}
+    result = parser.analyze_cascade("plan.pdf", "architectural")
+    assert calls == [("small", "full"), ("large", "recheck")]
+    assert result["rooms"] == [{"name": "Kitchen", "length": 3.6, "width": 3.0}]
+    assert result["escalations"] == [{"model": "large", "problems": {"rooms": ["rooms is not an array"]}}]
+
+def test_cascade_stops_when_the_first_model_is_valid(models):
+    answers, calls = models
+    answers["small", "full"] = copy.deepcopy(VALID)
+    result = parser.analyze_cascade("plan.pdf", "architectural")
+    assert calls == [("small", "full")]
+    assert "escalations" not in result
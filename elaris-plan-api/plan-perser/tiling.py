@@ -0,0 +1,311 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Tile-and-stitch for oversized sheets (A1/A0).
+
+A large sheet sent whole is either downscaled until its dimensions are
+unreadable or times out. Instead, an overview of the sheet (a pyramid level
+that fits OVERVIEW_SIZE) is analysed as usual, while overlapping tiles cut
+from the raster cache are read with TILE_PROMPT. That prompt asks for an
+inventory of walls, openings and room labels, with positions. A sheet that
+would need more than MAX_TILES tiles is tiled from a coarser level, so the
+number of model calls, and so the latency, stops growing with sheet size.
+
+stitch() moves every tile's items into sheet coordinates and merges what
+was read twice in the overlaps. Openings and rooms are matched by tag or
+name within MERGE_RADIUS using a spatial hash; wall segments are hashed by
+angle and distance from the origin (the line they lie on), and collinear
+pieces are joined across seams.
+apply() then replaces the overview's opening lists, rooms and perimeters
+with the stitched ones where the tiles found them.
+"""
+
+import math
+import os
+import re
+from statistics import median
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Sheets whose long side is at least this many points (1/72 in) are tiled; A1 is 2384
+TILE_MODE = os.getenv("TILE_MODE", "1") == "1"
+TILE_MIN_SIDE = float(os.getenv("TILE_MIN_SIDE", "2200"))
+TILE_SIZE = 1536  # pixels
+TILE_OVERLAP = 256  # pixels; more than the longest label or opening symbol
+MAX_TILES = int(os.getenv("TILE_MAX_TILES", "24"))
+TILE_WORKERS = int(os.getenv("TILE_WORKERS", "12"))
+OVERVIEW_SIZE = 3072  # long side of the overview image
+# Items read in two tiles land within this many pixels of each other
+MERGE_RADIUS = TILE_OVERLAP // 4
+# Tiles lighter than this everywhere are blank paper and not sent
+BLANK_LEVEL = 245
+# Walls within this angle of horizontal or vertical are treated as axis-aligned
+AXIS_TOLERANCE = math.radians(5)
+# Coordinates in TILE_PROMPT answers run from 0 to this across the tile
+COORDINATE_RANGE = 1000
+
+Box = Tuple[int, int, int, int]  # top, left, height, width in level pixels
+
+def oversized(page) -> bool:
+    """Whether a PyMuPDF page is large enough to be tiled"""
+    return max(page.rect.width, page.rect.height) >= TILE_MIN_SIDE
+
+def pages_to_tile(file_path: str) -> List[int]:
+    """Zero-based numbers of the oversized pages of a sheet file; the other pages are sent as they are"""
+    if not TILE_MODE:
+        return []
+    import pymupdf
+
+    with pymupdf.open(file_path) as document:
+        return [page.number for page in document if oversized(page)]
+
+def plan(pyramid) -> Tuple[int, List[Tuple[Box, np.ndarray]]]:
+    """(level, [(box, view)]) of the non-blank tiles of the finest level needing at most MAX_TILES"""
+    for level in range(len(pyramid.levels)):
+        tiles = list(pyramid.tiles(level, TILE_SIZE, TILE_OVERLAP))
+        if len(tiles) <= MAX_TILES or level == len(pyramid.levels) - 1:
+            break
+    return level, [
+        ((top, left, view.shape[0], view.shape[1]), view)
+        for top, left, view in tiles if int(view.min()) < BLANK_LEVEL
+    ]
+
+def overview(pyramid) -> np.ndarray:
+    """The largest level that fits OVERVIEW_SIZE"""
+    for image in pyramid.levels:
+        if max(image.shape) <= OVERVIEW_SIZE:
+            return image
+    return pyramid.levels[-1]
+
+def write_png(image: np.ndarray, path: str) -> str:
+    from PIL import Image
+
+    Image.fromarray(np.ascontiguousarray(image)).save(path)
+    return path
+
+def _num(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def _key(text: Any) -> str:
+    """Tag or room name as compared across tiles ("D-01", "d01" and "D 01" are one tag)"""
+    return re.sub(r"[^a-z0-9]", "", str(text or "").lower())
+
+class SpatialHash:
+    """Items bucketed in square cells of side ``cell``; near() only looks at the cells around a point"""
+
+    def __init__(self, cell: float):
+        self.cell = cell
+        self.cells: Dict[Tuple[int, int], List[Any]] = {}
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell), int(y // self.cell)
+
+    def add(self, x: float, y: float, item: Any) -> None:
+        self.cells.setdefault(self._cell(x, y), []).append(item)
+
+    def near(self, x: float, y: float) -> Iterable[Any]:
+        cx, cy = self._cell(x, y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                yield from self.cells.get((cx + dx, cy + dy), ())
+
+def _to_sheet(item: Dict[str, Any], box: Box, keys: Iterable[Tuple[str, str]]) -> bool:
+    """Replace tile coordinates (0..COORDINATE_RANGE) by level pixels; False when any is missing"""
+    top, left, height, width = box
+    for x_key, y_key in keys:
+        x, y = _num(item.get(x_key)), _num(item.get(y_key))
+        if x is None or y is None:
+            return False
+        item[x_key] = left + min(max(x, 0), COORDINATE_RANGE) / COORDINATE_RANGE * width
+        item[y_key] = top + min(max(y, 0), COORDINATE_RANGE) / COORDINATE_RANGE * height
+    return True
+
+def _merge_points(items: List[Dict[str, Any]], label: str) -> Tuple[List[Dict[str, Any]], int]:
+    """Items (with x, y) minus those read again nearby with the same label; returns (kept, duplicates)"""
+    index = SpatialHash(MERGE_RADIUS)
+    kept: List[Dict[str, Any]] = []
+    duplicates = 0
+    for item in items:
+        tag = _key(item.get(label))
+        same = next(
+            (
+                other for other in index.near(item["x"], item["y"])
+                if other.get("kind") == item.get("kind")
+                and (not tag or not _key(other.get(label)) or _key(other.get(label)) == tag)
+                and math.dist((other["x"], other["y"]), (item["x"], item["y"])) <= MERGE_RADIUS
+            ),
+            None,
+        )
+        if same is None:
+            index.add(item["x"], item["y"], item)
+            kept.append(item)
+        else:
+            duplicates += 1
+            # The second reading fills in what the first one missed (a cut-off label, say)
+            for key, value in item.items():
+                if same.get(key) in (None, ""):
+                    same[key] = value
+    return kept, duplicates
+
+def _line(wall: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """(angle, offset, start, end): direction in [-AXIS_TOLERANCE, pi - AXIS_TOLERANCE), signed distance
+    of the line from the origin, and the wall's extent along the direction. Near-axis walls snap to the axis.
+    """
+    x1, y1, x2, y2 = wall["x1"], wall["y1"], wall["x2"], wall["y2"]
+    angle = math.atan2(y2 - y1, x2 - x1) % math.pi
+    if angle >= math.pi - AXIS_TOLERANCE:
+        angle -= math.pi
+    for axis in (0.0, math.pi / 2):
+        if abs(angle - axis) <= AXIS_TOLERANCE:
+            angle = axis
+    dx, dy = math.cos(angle), math.sin(angle)
+    # Offsets of the two ends differ when the angle was snapped; the wall sits between them
+    offset = (-x1 * dy + y1 * dx - x2 * dy + y2 * dx) / 2
+    t1, t2 = x1 * dx + y1 * dy, x2 * dx + y2 * dy
+    return angle, offset, min(t1, t2), max(t1, t2)
+
+def _merge_walls(walls: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Join collinear pieces of the same wall across tile seams; returns (walls, pieces merged away).
+
+    Walls are hashed by (type, angle bucket, offset bucket), so a piece is only compared
+    with the walls on nearly the same line.
+    """
+    lines: Dict[Tuple[str, int, int], List[Dict[str, Any]]] = {}
+    merged: List[Dict[str, Any]] = []
+    joined = 0
+    pieces = sorted(((_line(wall), wall) for wall in walls), key=lambda piece: piece[0][2])
+    # By start along the line, so a piece can only extend the walls before it
+    for (angle, offset, start, end), wall in pieces:
+        a, o = round(angle / AXIS_TOLERANCE), int(offset // MERGE_RADIUS)
+        same = next(
+            (
+                other for da in (-1, 0, 1) for do in (-1, 0, 1)
+                for other in lines.get((wall["type"], a + da, o + do), ())
+                if abs(other["angle"] - angle) <= AXIS_TOLERANCE and abs(other["offset"] - offset) <= MERGE_RADIUS
+                and start <= other["end"] + MERGE_RADIUS
+            ),
+            None,
+        )
+        if same is None:
+            entry = {**wall, "angle": angle, "offset": offset, "start": start, "end": end}
+            lines.setdefault((wall["type"], a, o), []).append(entry)
+            merged.append(entry)
+        else:
+            joined += 1
+            same["end"] = max(same["end"], end)
+            if same.get("length") is None:
+                same["length"] = wall.get("length")
+    for wall in merged:
+        angle, offset, start, end = (wall.pop(key) for key in ("angle", "offset", "start", "end"))
+        dx, dy = math.cos(angle), math.sin(angle)
+        wall.update(
+            x1=start * dx - offset * dy, y1=start * dy + offset * dx,
+            x2=end * dx - offset * dy, y2=end * dy + offset * dx,
+        )
+    return merged, joined
+
+def _pixels(wall: Dict[str, Any]) -> float:
+    return math.dist((wall["x1"], wall["y1"]), (wall["x2"], wall["y2"]))
+
+def stitch(tiles: List[Tuple[Box, Dict[str, Any]]]) -> Dict[str, Any]:
+    """One inventory of walls, openings and rooms, in level pixels, from the tile answers"""
+    walls, openings, rooms = [], [], []
+    for box, answer in tiles:
+        if not isinstance(answer, dict):
+            continue
+        for wall in answer.get("walls") or []:
+            if isinstance(wall, dict) and wall.get("type") in ("external", "internal") and _to_sheet(wall, box, (("x1", "y1"), ("x2", "y2"))):
+                wall["length"] = _num(wall.get("length"))
+                walls.append(wall)
+        for opening in answer.get("openings") or []:
+            if isinstance(opening, dict) and opening.get("kind") in ("door", "window") and _to_sheet(opening, box, (("x", "y"),)):
+                openings.append(opening)
+        for room in answer.get("rooms") or []:
+            if isinstance(room, dict) and room.get("name") and _to_sheet(room, box, (("x", "y"),)):
+                room["kind"] = "room"
+                rooms.append(room)
+
+    # Drawing scale from walls whose dimension the tile could read in full
+    ratios = [wall["length"] / _pixels(wall) for wall in walls if wall["length"] and _pixels(wall) >= MERGE_RADIUS]
+    meters_per_pixel = median(ratios) if ratios else None
+    walls, walls_joined = _merge_walls(walls)
+    openings, opening_duplicates = _merge_points(openings, "tag")
+    rooms, room_duplicates = _merge_points(rooms, "name")
+    return {
+        "walls": walls,
+        "openings": openings,
+        "rooms": rooms,
+        "metersPerPixel": meters_per_pixel,
+        "merged": walls_joined + opening_duplicates + room_duplicates,
+    }
+
+def _opening_lists(openings: List[Dict[str, Any]], wall_type: str) -> Dict[str, List[Dict[str, Any]]]:
+    """doors/windows of one wall type in the document's shape, identical openings counted together"""
+    import compact
+
+    lists = {}
+    for kind, key, detail in (("door", "doors", "type"), ("window", "windows", "glass")):
+        counts: Dict[Tuple[Any, ...], int] = {}
+        for opening in openings:
+            if opening["kind"] == kind and (opening.get("wall") or "external") == wall_type:
+                row = (_num(opening.get("width")), _num(opening.get("height")), opening.get(detail), opening.get("frame"))
+                counts[row] = counts.get(row, 0) + 1
+        lists[key] = [
+            compact.opening(key, {"width": width, "height": height, detail: value, "frame": frame, "count": count})
+            for (width, height, value, frame), count in counts.items()
+        ]
+    return lists
+
+def apply(document: Dict[str, Any], inventory: Dict[str, Any]) -> List[str]:
+    """Put the stitched inventory into an overview document; returns the sections it changed"""
+    changed = []
+    meters_per_pixel = inventory["metersPerPixel"]
+    perimeters = {
+        key: sum(_pixels(wall) for wall in inventory["walls"] if wall["type"] == wall_type)
+        for wall_type, key in (("external", "externalWallPerimiter"), ("internal", "internalWallPerimiter"))
+    }
+    if meters_per_pixel and any(perimeters.values()):
+        dimensions = document.setdefault("wallDimensions", {})
+        for key, pixels in perimeters.items():
+            if pixels:
+                dimensions[key] = round(pixels * meters_per_pixel, 2)
+        changed.append("wallDimensions")
+
+    if inventory["openings"]:
+        sections = [section for section in document.get("wallSections") or [] if isinstance(section, dict)]
+        for wall_type in ("external", "internal"):
+            lists = _opening_lists(inventory["openings"], wall_type)
+            if not lists["doors"] and not lists["windows"]:
+                continue
+            section = next((section for section in sections if section.get("type") == wall_type), None)
+            if section is None:
+                section = {"type": wall_type}
+                sections.append(section)
+            section.update(lists)
+        document["wallSections"] = sections
+        changed.append("wallSections")
+
+    if inventory["rooms"]:
+        # The overview's rooms keep their footprint positions; tiles add missed rooms and fill in sizes
+        rooms = [room for room in document.get("rooms") or [] if isinstance(room, dict)]
+        by_name = {}
+        for room in rooms:
+            by_name.setdefault(_key(room.get("name")), []).append(room)
+        for found in inventory["rooms"]:
+            matches = by_name.get(_key(found["name"]))
+            fields = {key: _num(found.get(key)) for key in ("length", "width", "area") if _num(found.get(key))}
+            if matches:
+                room = matches.pop(0)
+                for key, value in fields.items():
+                    if _num(room.get(key)) is None:
+                        room[key] = value
+            else:
+                rooms.append({"name": found["name"], **fields})
+        document["rooms"] = rooms
+        changed.append("rooms")
+    return changed
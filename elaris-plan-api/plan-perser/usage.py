@@ -0,0 +1,146 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Token and wall-time accounting for every model request, with per-user token budgets.
+
+parse_file opens an Account (user, project) in a context variable and each
+sheet sets its type; the parser carries the context into its worker threads,
+so every request - retries and hedges included - is recorded with who it was
+for, which model and which sheet. Rows go to the usage table of the store,
+which is also where budgets are checked, so subprocesses and workers on
+other nodes add up against the same budget. Requests without a user are
+billed to a shared anonymous budget.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import logs
+import metrics
+
+# Tokens a user may spend per BUDGET_WINDOW; TOKEN_BUDGETS="user=tokens,..." overrides TOKEN_BUDGET (0 = unlimited)
+TOKEN_BUDGET = int(os.getenv("TOKEN_BUDGET", "0"))
+TOKEN_BUDGETS = {
+    user.strip(): int(tokens)
+    for user, _, tokens in (item.partition("=") for item in os.getenv("TOKEN_BUDGETS", "").split(","))
+    if user.strip() and tokens.strip().isdigit()
+}
+# Work sent without X-User-Id shares one budget, so unattributed callers cannot spend without limit
+ANONYMOUS_BUDGET = int(os.getenv("ANONYMOUS_TOKEN_BUDGET", "200000"))
+BUDGET_WINDOW = float(os.getenv("TOKEN_BUDGET_WINDOW", str(24 * 3600)))  # seconds
+
+class BudgetExceeded(Exception):
+    """The user has spent their token budget for the current window"""
+
+    def __init__(self, user: Optional[str], used: int, budget: int):
+        super().__init__(f"Token budget exhausted for {user or 'unattributed requests'}: {used} of {budget} tokens used in the last {BUDGET_WINDOW / 3600:g}h")
+        self.user = user
+
+class Account:
+    """Who model requests are billed to, and what one analysis has used so far"""
+
+    def __init__(self, user: Optional[str] = None, project: Optional[str] = None):
+        self.user = user
+        self.project = project
+        self.lock = threading.Lock()
+        self.totals: Dict[Tuple[str, Optional[str]], Dict[str, float]] = {}
+
+    def add(self, model: str, sheet_type: Optional[str], counts: Dict[str, int], seconds: float) -> None:
+        with self.lock:
+            total = self.totals.setdefault((model, sheet_type), {"calls": 0, "input": 0, "output": 0, "cached": 0, "seconds": 0.0})
+            total["calls"] += 1
+            total["seconds"] += seconds
+            for key in ("input", "output", "cached"):
+                total[key] += counts.get(key, 0)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals for the analysis, and per model and sheet type"""
+        with self.lock:
+            rows = [
+                {"model": model, "sheetType": sheet_type, "calls": t["calls"], "inputTokens": t["input"],
+                 "outputTokens": t["output"], "cachedTokens": t["cached"], "seconds": round(t["seconds"], 2)}
+                for (model, sheet_type), t in self.totals.items()
+            ]
+        return {
+            **{key: sum(row[key] for row in rows) for key in ("calls", "inputTokens", "outputTokens", "cachedTokens")},
+            "seconds": round(sum(row["seconds"] for row in rows), 2),
+            "breakdown": rows,
+        }
+
+_account: contextvars.ContextVar[Optional[Account]] = contextvars.ContextVar("account", default=None)
+_sheet_type: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("sheet_type", default=None)
+
+def open_account(user: Optional[str] = None, project: Optional[str] = None) -> Account:
+    """Bill the model requests made from this context (and contexts copied from it) to user/project"""
+    account = Account(user, project)
+    _account.set(account)
+    _sheet_type.set(None)
+    return account
+
+def current() -> Optional[Account]:
+    return _account.get()
+
+def set_sheet_type(sheet_type: str) -> None:
+    _sheet_type.set(sheet_type)
+
+def budget_for(user: Optional[str]) -> int:
+    if user is None:
+        return ANONYMOUS_BUDGET
+    return TOKEN_BUDGETS.get(user, TOKEN_BUDGET)
+
+def check(user: Optional[str]) -> None:
+    """Raise BudgetExceeded when the user (None: all unattributed work) has no tokens left in the window"""
+    budget = budget_for(user)
+    if not budget:
+        return
+    from store import get_store
+
+    used = get_store().tokens_used(user, time.time() - BUDGET_WINDOW)
+    if used >= budget:
+        metrics.count("budget_rejections")
+        raise BudgetExceeded(user, used, budget)
+
+def check_current() -> None:
+    account = _account.get()
+    if account is not None:
+        check(account.user)
+
+def counts_of(response) -> Dict[str, int]:
+    """Input, output and cached token counts from a response's usage metadata"""
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "input": getattr(usage, "prompt_token_count", 0) or 0,
+        "output": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached": getattr(usage, "cached_content_token_count", 0) or 0,
+    }
+
+def record(model: str, counts: Dict[str, int], seconds: float, ok: bool, attempt: int = 0, hedge: bool = False) -> None:
+    """Account one model request to the current user, project and sheet type"""
+    account = _account.get()
+    sheet_type = _sheet_type.get()
+    if account is not None:
+        account.add(model, sheet_type, counts, seconds)
+    for key in ("input", "output", "cached"):
+        metrics.count(f"tokens.{key}.{model}", counts.get(key, 0))
+    try:
+        from store import get_store
+
+        get_store().record_usage({
+            "user": account.user if account else None,
+            "project": account.project if account else None,
+            "model": model,
+            "sheet_type": sheet_type,
+            "attempt": attempt,
+            "hedge": hedge,
+            "ok": ok,
+            "input_tokens": counts.get("input", 0),
+            "output_tokens": counts.get("output", 0),
+            "cached_tokens": counts.get("cached", 0),
+            "seconds": seconds,
+        })
+    except Exception as e:
+        # Accounting must never fail an analysis
+        logs.get_logger("usage").warning("⚠️  Could not record usage", extra={"error": str(e)})
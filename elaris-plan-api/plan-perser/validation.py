@@ -0,0 +1,177 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+from typing import Dict, Any, List
+
+WALL_DIMENSION_FIELDS = [
+    "externalWallPerimiter",
+    "internalWallPerimiter",
+    "externalWallHeight",
+    "internalWallHeight",
+]
+
+WALL_SECTION_TYPES = {"external", "internal"}
+
+# Optional top-level sections that must be arrays when present
+ARRAY_SECTIONS = [
+    "rooms", "footprint", "foundationWalling", "earthworks", "concreteStructures", "reinforcement",
+    "roofing", "plumbing", "electrical", "finishes",
+]
+
+def _is_number(value: Any) -> bool:
+    """True for real numbers and numeric strings (the schema uses both)"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+def schema_errors(result: Any) -> List[str]:
+    """Return a list of schema problems in an analysis result (empty when valid)"""
+    if not isinstance(result, dict):
+        return ["result is not an object"]
+    if "error" in result:
+        return [f"model returned error: {result['error']}"]
+
+    errors = []
+
+    dims = result.get("wallDimensions")
+    if not isinstance(dims, dict):
+        errors.append("wallDimensions missing or not an object")
+    else:
+        for field in WALL_DIMENSION_FIELDS:
+            if not _is_number(dims.get(field)):
+                errors.append(f"wallDimensions.{field} missing or not numeric")
+
+    if not isinstance(result.get("wallProperties"), dict):
+        errors.append("wallProperties missing or not an object")
+
+    sections = result.get("wallSections")
+    if not isinstance(sections, list):
+        errors.append("wallSections missing or not an array")
+    else:
+        for i, section in enumerate(sections):
+            if not isinstance(section, dict):
+                errors.append(f"wallSections[{i}] is not an object")
+                continue
+            if section.get("type") not in WALL_SECTION_TYPES:
+                errors.append(f"wallSections[{i}].type must be external or internal")
+            for key in ("doors", "windows"):
+                openings = section.get(key, [])
+                if not isinstance(openings, list):
+                    errors.append(f"wallSections[{i}].{key} is not an array")
+                    continue
+                for j, opening in enumerate(openings):
+                    if not isinstance(opening, dict) or not _is_number(opening.get("count", 1)):
+                        errors.append(f"wallSections[{i}].{key}[{j}] has no numeric count")
+
+    for key in ARRAY_SECTIONS:
+        if key in result and not isinstance(result[key], list):
+            errors.append(f"{key} is not an array")
+
+    return errors
+
+# Plausibility bounds used to decide whether a section needs a stronger model
+WALL_HEIGHT_RANGE = (2.0, 6.0)              # m
+# External perimeter against footprint area: a square gives 4*sqrt(A); allow compact to very jagged plans
+PERIMETER_AREA_RATIO = (3.6, 10.0)          # P / sqrt(A)
+MAX_INTERNAL_TO_EXTERNAL = 4.0
+MAX_OPENING_SHARE = 0.6                     # opening widths as a share of the wall length
+AREA_AGREEMENT = 0.35                       # rooms / drawn footprint vs stated area
+PERIMETER_AGREEMENT = 0.2                   # drawn footprint vs stated perimeter
+
+def _number(value: Any) -> float:
+    if isinstance(value, str):
+        value = value.split()[0] if value.split() else value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _entries(value: Any) -> List[Dict[str, Any]]:
+    """The objects of an array section; anything else (already reported by schema_errors) has none"""
+    return [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+
+def _section_of(error: str) -> str:
+    return error.split(".")[0].split("[")[0].split(" ")[0]
+
+def _polygon_area_perimeter(points: Any):
+    try:
+        xy = [(float(x), float(y)) for x, y in points]
+    except (TypeError, ValueError):
+        return 0.0, 0.0
+    if len(xy) < 3:
+        return 0.0, 0.0
+    pairs = list(zip(xy, xy[1:] + xy[:1]))
+    area = abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in pairs)) / 2
+    perimeter = sum(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5 for (x1, y1), (x2, y2) in pairs)
+    return area, perimeter
+
+def section_problems(result: Any) -> Dict[str, List[str]]:
+    """Problems per top-level section: schema errors plus cheap plausibility checks.
+
+    Checks: wall heights in range, external perimeter plausible for the floor area,
+    internal walls not out of proportion, opening widths fit in the walls, and the
+    stated area/perimeter agreeing with the rooms and any drawn footprint.
+    """
+    if not isinstance(result, dict) or "error" in result:
+        return {"document": schema_errors(result)}
+    problems: Dict[str, List[str]] = {}
+
+    def flag(sections, message):
+        for section in sections:
+            problems.setdefault(section, []).append(message)
+
+    for error in schema_errors(result):
+        flag([_section_of(error)], error)
+
+    dims = result.get("wallDimensions") if isinstance(result.get("wallDimensions"), dict) else {}
+    external = _number(dims.get("externalWallPerimiter"))
+    internal = _number(dims.get("internalWallPerimiter"))
+    for field in ("externalWallHeight", "internalWallHeight"):
+        height = _number(dims.get(field))
+        if height and not WALL_HEIGHT_RANGE[0] <= height <= WALL_HEIGHT_RANGE[1]:
+            flag(["wallDimensions"], f"{field} {height} m is outside {WALL_HEIGHT_RANGE[0]}-{WALL_HEIGHT_RANGE[1]} m")
+    if external and internal > MAX_INTERNAL_TO_EXTERNAL * external:
+        flag(["wallDimensions"], f"internal walls ({internal} m) exceed {MAX_INTERNAL_TO_EXTERNAL}x the external perimeter")
+
+    floors = max(1.0, _number(result.get("floors")))
+    area = _number(result.get("totalArea")) / floors
+    if external and area:
+        ratio = external / area ** 0.5
+        if not PERIMETER_AREA_RATIO[0] <= ratio <= PERIMETER_AREA_RATIO[1]:
+            flag(["wallDimensions", "totalArea"], f"external perimeter {external} m is implausible for {area:.0f} m² per floor")
+
+    rooms = _entries(result.get("rooms"))
+    room_area = sum(_number(room.get("length")) * _number(room.get("width")) for room in rooms)
+    # Rooms are often listed incompletely, so only rooms exceeding the floor area count
+    if area and room_area / floors > (1 + AREA_AGREEMENT) * area:
+        flag(["rooms", "totalArea"], f"rooms add up to {room_area:.0f} m² against a stated {area * floors:.0f} m²")
+
+    footprint_area, footprint_perimeter = _polygon_area_perimeter(result.get("footprint"))
+    if footprint_perimeter and external and abs(footprint_perimeter - external) > PERIMETER_AGREEMENT * external:
+        flag(["wallDimensions", "footprint"], f"drawn footprint perimeter {footprint_perimeter:.1f} m disagrees with {external} m")
+    if footprint_area and area and abs(footprint_area - area) > AREA_AGREEMENT * area:
+        flag(["totalArea", "footprint"], f"drawn footprint area {footprint_area:.0f} m² disagrees with {area:.0f} m² per floor")
+
+    if external or internal:
+        from quantities import opening_size
+
+        lengths = {"external": external, "internal": internal}
+        for section in _entries(result.get("wallSections")):
+            if not lengths.get(section.get("type")):
+                continue
+            width = sum(
+                opening_size(opening)[0] * _number(opening.get("count", 1))
+                for key in ("doors", "windows") for opening in _entries(section.get(key))
+            )
+            wall = lengths[section["type"]]
+            if width > MAX_OPENING_SHARE * wall:
+                flag(["wallSections"], f"{section['type']} openings are {width:.1f} m wide on {wall} m of wall")
+    return problems
@@ -0,0 +1,121 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+# Enum vocabularies shared with the frontend calculators. Values must match the
+# strings the calculators switch on exactly; order matters for the compact
+# output encoding (compact.py), so only ever append to these lists.
+
+WALL_TYPES = ["external", "internal"]
+BLOCK_TYPES = ["Standard Block", "Large Block", "Small Block"]
+PLASTER_OPTIONS = ["Both Sides", "One Side", "None"]
+DOOR_TYPES = ["Panel", "Steel", "Solid flush", "Semi-solid flush", "T&G", "Aluminium"]
+WINDOW_GLASS_TYPES = ["Clear", "Tinted", "Frosted"]
+FRAME_TYPES = ["Wood", "Steel", "Aluminum"]
+STANDARD_DOOR_SIZES = ["0.9 × 2.1 m", "1.0 × 2.1 m", "1.2 × 2.4 m"]
+STANDARD_WINDOW_SIZES = ["1.2 × 1.2 m", "1.5 × 1.2 m", "2.0 × 1.5 m"]
+MORTAR_RATIOS = ["1:3", "1:4", "1:5", "1:6"]
+
+PROJECT_TYPES = ["residential", "commercial", "industrial", "institutional"]
+HOUSE_TYPES = ["bungalow", "mansionate"]
+
+PLUMBING_SYSTEM_TYPES = [
+    "water-supply", "drainage", "sewage", "rainwater", "hot-water",
+    "fire-fighting", "gas-piping", "irrigation",
+]
+PIPE_MATERIALS = [
+    "PVC-u", "PVC-c", "copper", "PEX", "galvanized-steel", "HDPE", "PPR",
+    "cast-iron", "vitrified-clay",
+]
+FIXTURE_TYPES = [
+    "water-closet", "urinal", "lavatory", "kitchen-sink", "shower", "bathtub",
+    "bidet", "floor-drain", "cleanout", "hose-bib",
+]
+FIXTURE_QUALITIES = ["standard", "premium", "luxury"]
+
+ELECTRICAL_SYSTEM_TYPES = [
+    "lighting", "power", "data", "security", "cctv", "fire-alarm",
+    "access-control", "av-systems", "emergency-lighting", "renewable-energy",
+]
+CABLE_TYPES = [
+    "NYM-J", "PVC/PVC", "XLPE", "MICC", "SWA", "Data-CAT6", "Ethernet",
+    "Fiber-Optic", "Coaxial",
+]
+OUTLET_TYPES = [
+    "power-socket", "light-switch", "dimmer-switch", "data-port", "tv-point",
+    "telephone", "usb-charger", "gpo",
+]
+LIGHTING_TYPES = [
+    "led-downlight", "fluorescent", "halogen", "emergency-light", "floodlight",
+    "street-light", "decorative",
+]
+INSTALLATION_METHODS = ["surface", "concealed", "underground", "trunking"]
+CONTROL_TYPES = ["switch", "dimmer", "sensor", "smart"]
+MOUNTING_TYPES = ["surface", "flush"]
+BOARD_TYPES = ["main", "sub"]
+OUTLET_RATINGS = [6, 10, 13, 16, 20, 25, 32, 40, 45, 63]
+LIGHTING_WATTAGE = [3, 5, 7, 9, 12, 15, 18, 20, 24, 30, 36, 40, 50, 60]
+
+REINFORCEMENT_ELEMENTS = ["slab", "beam", "column", "raft-foundation", "strip-footing", "tank"]
+REBAR_SIZES = [
+    "R6", "D6", "D8", "D10", "D12", "D14", "D16", "D18", "D20", "D22", "D25",
+    "D28", "D32", "D36", "D40", "D50",
+]
+REINFORCEMENT_TYPES = ["individual_bars", "mesh"]
+MESH_GRADES = [
+    "A98", "A142", "A193", "A252", "A393", "B196", "B283", "B385", "B503", "B785",
+    "C283", "C385",
+]
+FOOTING_TYPES = ["isolated", "strip", "combined"]
+TANK_TYPES = ["septic", "underground", "overhead", "water", "circular"]
+RETAINING_WALL_TYPES = ["cantilever", "gravity", "counterfort"]
+STRUCTURE_CATEGORIES = ["substructure", "superstructure"]
+CONCRETE_ELEMENTS = [
+    "slab", "beam", "column", "septic-tank", "underground-tank", "staircase",
+    "ring-beam", "strip-footing", "raft-foundation", "pile-cap", "water-tank",
+    "ramp", "retaining-wall", "culvert", "swimming-pool", "paving", "kerb",
+    "drainage-channel", "manhole", "inspection-chamber", "soak-pit", "soakaway",
+]
+
+ROOF_TYPES = ["pitched", "flat", "gable", "hip", "mansard", "butterfly", "skillion"]
+ROOF_MATERIALS = [
+    "concrete-tiles", "clay-tiles", "metal-sheets", "box-profile", "thatch",
+    "slate", "asphalt-shingles", "green-roof", "membrane",
+]
+TIMBER_SIZES = ["50x25", "50x50", "75x50", "100x50", "100x75", "150x50", "200x50"]
+TIMBER_TYPES = ["rafter", "wall-plate", "ridge-board", "purlin", "battens", "truss", "joist"]
+TIMBER_GRADES = ["standard", "structural", "premium"]
+TIMBER_TREATMENTS = ["untreated", "pressure-treated", "fire-retardant"]
+TIMBER_UNITS = ["m", "pcs"]
+UNDERLAYMENT_TYPES = ["felt-30", "felt-40", "synthetic", "rubberized", "breathable"]
+INSULATION_TYPES = ["glass-wool", "rock-wool", "eps", "xps", "polyurethane", "reflective-foil"]
+GUTTER_TYPES = ["PVC", "Galvanized Steel", "Aluminum", "Copper"]
+DOWNPIPE_TYPES = ["PVC", "Galvanized Steel", "Aluminum", "Copper"]
+FLASHING_TYPES = ["PVC", "Galvanized Steel", "Aluminum", "Copper"]
+FASCIA_TYPES = ["PVC", "Painted Wood", "Aluminum", "Composite"]
+SOFFIT_TYPES = ["PVC", "Aluminum", "Composite", "Metal"]
+
+FINISH_CATEGORIES = ["flooring", "ceiling", "wall-finishes", "joinery"]
+FINISH_UNITS = ["m²", "m", "pcs"]
+COMMON_MATERIALS = {
+    "flooring": [
+        "Ceramic Tiles", "Porcelain Tiles", "Hardwood", "Laminate", "Vinyl",
+        "Carpet", "Polished Concrete", "Terrazzo",
+    ],
+    "ceiling": [
+        "Gypsum Board", "PVC", "Acoustic Tiles", "Exposed Concrete",
+        "Suspended Grid", "Wood Panels",
+    ],
+    "wall-finishes": ["Wallpaper", "Stone Cladding", "Tile Cladding", "Wood Paneling"],
+    "joinery": ["Solid Wood", "Plywood", "MDF", "Melamine", "Laminate"],
+}
+
+EQUIPMENT_UNITS = ["hour", "day", "week", "month"]
+STANDARD_EQUIPMENT_IDS = {
+    "Bulldozer": "15846932-db16-4a28-a477-2e4b2e1e42d5",
+    "Concrete Mixer": "3203526d-fa51-4878-911b-477b2b909db5",
+    "Generator": "32c2ea0f-be58-47f0-bdcd-3027099eac4b",
+    "Water Pump": "598ca378-6eb3-451f-89ea-f45aa6ecece8",
+    "Crane": "d4665c7d-6ace-474d-8282-e888b53e7b48",
+    "Compactor": "eb80f645-6450-4026-b007-064b5f15a72a",
+    "Excavator": "ef8d17ca-581d-4703-b200-17395bbe1c51",
+}
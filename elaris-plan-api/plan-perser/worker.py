@@ -0,0 +1,101 @@
+# © 2025 Jeff. All rights reserved.
+# Unauthorized copying, distribution, or modification of this file is strictly prohibited.
+
+"""Parser worker: pulls analysis jobs from the job queue and runs them in-process.
+
+Run as many as the model quota allows, on any node that reaches JOB_QUEUE_URL
+and JOB_FILES_DIR:
+
+    python worker.py [--once]
+
+--once drains the ready jobs and exits. SIGTERM/SIGINT finish the current job
+first; a worker that is killed outright just lets its lease expire.
+"""
+
+import contextvars
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+
+from typing import Dict, Any, Optional
+
+import logs
+from jobqueue import VISIBILITY_TIMEOUT, Broker, Job, get_broker
+
+POLL_INTERVAL = 2.0  # seconds between claims when the queue is empty
+
+stopping = threading.Event()
+log = logs.get_logger("worker")
+
+def _keep_leased(broker: Broker, job: Job, worker: str, done: threading.Event) -> None:
+    """Extend the lease while the analysis runs"""
+    while not done.wait(VISIBILITY_TIMEOUT / 3):
+        if not broker.heartbeat(job.id, worker):
+            log.warning("⚠️  Lost the lease on the job")
+            return
+
+def failure(result: Dict[str, Any]) -> Optional[str]:
+    """Why a result is not a finished analysis: its error, or the errors of the sheets that failed"""
+    if "error" in result:
+        return str(result["error"])
+    failed = [
+        f"{sheet.get('type')}: {sheet['error']}"
+        for sheet in result.get("sheets") or [] if isinstance(sheet, dict) and "error" in sheet
+    ]
+    return "; ".join(failed) or None
+
+def process(broker: Broker, job: Job, worker: str) -> str:
+    """Run one job; returns its new state"""
+    import parser as plan_parser
+
+    path = job.payload["path"]
+    # The job logs under the API request that queued it, and under its own id
+    token = logs.bind(request=job.payload.get("requestId") or logs.new_id(), job=job.id)
+    log.info(f"🛠️  Job attempt {job.attempts}/{job.max_attempts}", extra={"file": os.path.basename(path)})
+    done = threading.Event()
+    threading.Thread(
+        target=contextvars.copy_context().run, args=(_keep_leased, broker, job, worker, done), daemon=True
+    ).start()
+    try:
+        try:
+            result = plan_parser.parse_file(
+                path, job.payload.get("previousAnalysisId"), user=job.payload.get("user"), project=job.payload.get("project")
+            )
+            # An open circuit or a spent budget comes back as an error document, not an exception;
+            # it is retried like one, so an error never becomes the done result of the drawing
+            error = failure(result)
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            state = broker.fail(job.id, worker, error)
+            log.error(f"❌ Job failed ({state})", extra={"error": error})
+        else:
+            state = "done" if broker.complete(job.id, worker, result) else "running"
+    finally:
+        done.set()
+        logs.reset(token)
+    if state in ("done", "dead") and os.path.exists(path):
+        os.remove(path)
+    return state
+
+def run(once: bool = False) -> None:
+    broker = get_broker()
+    worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    log.info("👷 Worker started", extra={"worker": worker})
+    while not stopping.is_set():
+        job = broker.claim(worker)
+        if job is None:
+            if once:
+                break
+            stopping.wait(POLL_INTERVAL)
+            continue
+        process(broker, job, worker)
+    log.info("👋 Worker stopped", extra={"worker": worker})
+
+if __name__ == "__main__":
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.set())
+    run(once="--once" in sys.argv[1:])